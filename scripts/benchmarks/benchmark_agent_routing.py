@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Benchmark du choix d'un agent humain par l'index de disponibilité
+
+Mesure la latence de AgentAvailabilityIndex.choose sur un parc d'agents
+synthétique, sous un flux de notifications de charge (une notification
+pour deux escalades), ainsi que le temps d'un chargement complet.
+
+Usage:
+    python scripts/benchmarks/benchmark_agent_routing.py [n_agents]
+"""
+import sys
+import json
+import time
+import random
+from pathlib import Path
+
+# Ajouter src et scripts au path
+sys.path.append(str(Path(__file__).parent.parent.parent / "src"))
+sys.path.append(str(Path(__file__).parent.parent))
+
+from benchmarks.common import latency_summary, print_table
+from core.escalation.availability import AgentAvailabilityIndex
+
+SPECIALTIES = ["reclamations", "operations", "technique", "commercial", "general"]
+LANGUAGES = ["fr", "en", "wo", "bm"]
+N_QUERIES = 20000
+
+def synthetic_agents(n_agents: int, seed: int = 42):
+    rng = random.Random(seed)
+    return [
+        {
+            "id": f"agent_{i:05d}",
+            "name": f"Agent {i}",
+            "status": "available" if rng.random() < 0.8 else "offline",
+            "current_load": rng.randint(0, 5),
+            "max_concurrent": 5,
+            "specialties": rng.sample(SPECIALTIES, rng.randint(1, 2)),
+            "languages": ["fr"] + rng.sample(LANGUAGES[1:], rng.randint(0, 2)),
+            "last_activity": f"2024-01-01T{rng.randint(8, 17):02d}:{rng.randint(0, 59):02d}:00"
+        }
+        for i in range(n_agents)
+    ]
+
+def main():
+    n_agents = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    agents = synthetic_agents(n_agents)
+
+    print("🚀 BENCHMARK ROUTAGE DES ESCALADES")
+    print(f"[INFO] {n_agents} agents, {N_QUERIES} choix d'agent")
+
+    index = AgentAvailabilityIndex(resync_seconds=60)
+    start = time.perf_counter()
+    index.replace_all(agents)
+    load_ms = (time.perf_counter() - start) * 1000
+
+    rng = random.Random(7)
+    choose_latencies, notify_latencies = [], []
+    for i in range(N_QUERIES):
+        start = time.perf_counter()
+        agent_id = index.choose(rng.choice(SPECIALTIES), rng.choice(LANGUAGES))
+        choose_latencies.append((time.perf_counter() - start) * 1000)
+        if agent_id:
+            index.adjust_load(agent_id, 1)
+
+        if i % 2 == 0:
+            # Fin d'une escalade ailleurs : notification de la nouvelle charge
+            row = dict(rng.choice(agents))
+            row["current_load"] = rng.randint(0, 4)
+            payload = json.dumps(row)
+            start = time.perf_counter()
+            index.handle_notification(payload)
+            notify_latencies.append((time.perf_counter() - start) * 1000)
+
+    print_table("Index de disponibilité", [
+        {"operation": "choose", **latency_summary(choose_latencies)},
+        {"operation": "notification", **latency_summary(notify_latencies)},
+    ])
+    print(f"\nChargement complet: {load_ms:.1f} ms, tas: {index.get_stats()['heaps']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Benchmark du débit d'ingestion des embeddings OpenAI
+
+Compare l'ancien mode (batches de 100 textes envoyés l'un après l'autre) au
+packing par tokens avec plusieurs requêtes en vol, contre un serveur local
+compatible OpenAI (latence simulée, quelques 429 injectés).
+
+Usage:
+    python scripts/benchmarks/benchmark_embedding_ingestion.py [n_texts] [latency_ms]
+"""
+import sys
+import time
+import asyncio
+from pathlib import Path
+
+# Ajouter src et scripts au path
+sys.path.append(str(Path(__file__).parent.parent.parent / "src"))
+sys.path.append(str(Path(__file__).parent.parent))
+
+from benchmarks.common import print_table
+from benchmarks.fake_openai_server import FakeEmbeddingServer
+from core.knowledge_base.embeddings import OpenAIEmbeddingProvider, AsyncRateLimiter
+
+def make_texts(n_texts: int):
+    """Chunks de tailles variées, comme après découpage de documents"""
+    base = "Pour effectuer un transfert Coris Money, ouvrez l'application et suivez les étapes. "
+    return [base * (1 + i % 12) + f"(chunk {i})" for i in range(n_texts)]
+
+async def run(n_texts: int, latency: float, concurrency: int, max_inputs: int, fail_first: int) -> dict:
+    texts = make_texts(n_texts)
+    with FakeEmbeddingServer(latency=latency, fail_first=fail_first) as server:
+        provider = OpenAIEmbeddingProvider(
+            api_key="sk-benchmark",
+            base_url=server.base_url,
+            max_concurrency=concurrency,
+            rate_limiter=AsyncRateLimiter(requests_per_minute=100000, tokens_per_minute=100_000_000)
+        )
+        provider.max_inputs_per_request = max_inputs
+        provider.max_tokens_per_request = 20000
+
+        start = time.perf_counter()
+        await provider.embed_documents(texts)
+        elapsed = time.perf_counter() - start
+
+        return {
+            "mode": f"concurrency={concurrency}, max_inputs={max_inputs}",
+            "requests": server.request_count,
+            "429": server.failed_count,
+            "max_in_flight": server.max_in_flight,
+            "seconds": elapsed,
+            "texts_per_s": n_texts / elapsed
+        }
+
+def main():
+    n_texts = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    latency = (int(sys.argv[2]) if len(sys.argv) > 2 else 150) / 1000
+
+    print("🚀 BENCHMARK INGESTION DES EMBEDDINGS")
+    print(f"[INFO] {n_texts} textes, latence simulée {latency * 1000:.0f} ms par requête")
+
+    rows = [
+        # Ancien comportement : 100 textes par requête, séquentiel
+        asyncio.run(run(n_texts, latency, concurrency=1, max_inputs=100, fail_first=0)),
+        asyncio.run(run(n_texts, latency, concurrency=4, max_inputs=2048, fail_first=2)),
+        asyncio.run(run(n_texts, latency, concurrency=8, max_inputs=2048, fail_first=2)),
+    ]
+
+    print_table("RÉSULTATS", rows)
+
+if __name__ == "__main__":
+    main()
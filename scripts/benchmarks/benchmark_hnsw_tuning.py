@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Benchmark de réglage des index HNSW par filiale
+
+Mesure le recall@k par rapport à la recherche exacte et les latences p50/p99
+pour une grille de paramètres (M, construction_ef, search_ef), puis pour les
+paramètres configurés de chaque filiale (pack + config filiale, voir
+MultiTenantChromaManager.get_index_settings).
+
+Le corpus combine les chunks de knowledge_bases/ (embeddés hors ligne par
+HashingEmbeddingProvider, requêtes = extraits de chunks) et un corpus
+synthétique regroupé par thèmes pour atteindre la taille d'une filiale.
+
+Usage:
+    python scripts/benchmarks/benchmark_hnsw_tuning.py [n_synthetic_docs] [--target-recall 0.95] [--quick]
+"""
+import sys
+import asyncio
+import tempfile
+import time
+import numpy as np
+from pathlib import Path
+
+# Ajouter src et scripts au path
+sys.path.append(str(Path(__file__).parent.parent.parent / "src"))
+sys.path.append(str(Path(__file__).parent.parent))
+
+from benchmarks.common import synthetic_embeddings, exact_top_k, recall_at_k, time_queries, print_table
+from core.knowledge_base.index_settings import resolve_index_settings, to_collection_metadata
+from core.knowledge_base.vector_store import create_vector_store
+
+KNOWLEDGE_BASE_PATH = Path(__file__).parent.parent.parent / "knowledge_bases"
+DIMENSION = 384
+TOP_K = 5
+N_KB_QUERIES = 200
+N_SYNTHETIC_QUERIES = 300
+
+GRID = {"M": [8, 16, 32], "construction_ef": [100, 200], "search_ef": [16, 32, 64, 128]}
+QUICK_GRID = {"M": [16], "construction_ef": [100], "search_ef": [16, 64]}
+
+def load_kb_chunks():
+    """Chunks de tous les documents markdown de knowledge_bases/"""
+    from core.knowledge_base.document_processor import DocumentProcessor
+    processor = DocumentProcessor()
+
+    async def process_all():
+        chunks = []
+        paths = sorted(KNOWLEDGE_BASE_PATH.glob("*/*/*.md")) + sorted(KNOWLEDGE_BASE_PATH.glob("*/*/*.txt"))
+        for path in paths:
+            documents = await processor.process_file(str(path), filiale_id=path.parent.name,
+                                                     application=path.parent.parent.name)
+            chunks.extend(document["content"] for document in documents)
+        return chunks
+
+    return asyncio.run(process_all())
+
+def kb_queries(chunks, n_queries: int, seed: int = 7):
+    """Requêtes réalistes : fenêtres de 6 à 12 mots tirées des chunks"""
+    rng = np.random.default_rng(seed)
+    queries = []
+    for _ in range(n_queries):
+        words = chunks[rng.integers(len(chunks))].split()
+        length = int(rng.integers(6, 13))
+        start = int(rng.integers(0, max(len(words) - length, 0) + 1))
+        queries.append(" ".join(words[start:start + length]))
+    return queries
+
+def build_dataset(n_synthetic: int):
+    """Corpus et requêtes (KB + synthétiques) normalisés, avec la vérité terrain exacte"""
+    from core.knowledge_base.embeddings import HashingEmbeddingProvider
+
+    chunks = load_kb_chunks()
+    if chunks:
+        provider = HashingEmbeddingProvider(dimension=DIMENSION)
+        provider.fit(chunks)
+        kb_vectors = provider.transform(chunks)
+        kb_query_vectors = provider.transform(kb_queries(chunks, N_KB_QUERIES))
+    else:
+        print("[WARNING] Aucun contenu dans knowledge_bases/, corpus synthétique uniquement")
+        kb_vectors = kb_query_vectors = np.zeros((0, DIMENSION), dtype=np.float32)
+
+    synthetic_docs, synthetic_queries = synthetic_embeddings(n_synthetic, DIMENSION, N_SYNTHETIC_QUERIES)
+    corpus = np.vstack([kb_vectors, synthetic_docs]).astype(np.float32)
+    queries = np.vstack([kb_query_vectors, synthetic_queries]).astype(np.float32)
+    return {
+        "corpus": corpus,
+        "queries": queries,
+        "truth": exact_top_k(corpus, queries, TOP_K),
+        "n_kb_chunks": len(chunks),
+        "n_kb_queries": len(kb_query_vectors)
+    }
+
+def benchmark_settings(backend: str, settings: dict, dataset: dict) -> dict:
+    """Construit une collection avec ces paramètres puis mesure recall et latences"""
+    corpus, queries, truth = dataset["corpus"], dataset["queries"], dataset["truth"]
+    with tempfile.TemporaryDirectory() as persist_dir:
+        store = create_vector_store(backend=backend, persist_dir=persist_dir)
+        name = "hnsw_tuning"
+        store.get_or_create_collection(name, metadata={"application": "benchmark", **to_collection_metadata(settings)})
+
+        ids = [f"doc_{i}" for i in range(len(corpus))]
+        start = time.perf_counter()
+        batch_size = 1000  # Limite de taille de batch ChromaDB
+        for offset in range(0, len(corpus), batch_size):
+            end = min(offset + batch_size, len(corpus))
+            store.add(
+                name,
+                ids=ids[offset:end],
+                documents=[f"document {i}" for i in range(offset, end)],
+                metadatas=[{"index": i} for i in range(offset, end)],
+                embeddings=corpus[offset:end].tolist()
+            )
+        build_seconds = time.perf_counter() - start
+
+        def run_query(i):
+            result = store.query(name, query_embeddings=[queries[i].tolist()], n_results=TOP_K)
+            return [int(doc_id.split("_")[1]) for doc_id in result["ids"][0]]
+
+        # Préchauffage (chargement de l'index)
+        run_query(0)
+        found, latency = time_queries(run_query, len(queries))
+
+    n_kb = dataset["n_kb_queries"]
+    return {
+        "index": "exact" if backend == "numpy" else f"M{settings['M']}/c{settings['construction_ef']}/s{settings['search_ef']}",
+        "build_s": build_seconds,
+        f"recall@{TOP_K}": recall_at_k(truth, found, TOP_K),
+        "recall_kb": recall_at_k(truth[:n_kb], found[:n_kb], TOP_K) if n_kb else float("nan"),
+        "recall_synth": recall_at_k(truth[n_kb:], found[n_kb:], TOP_K),
+        **latency
+    }
+
+def grid_settings(grid: dict):
+    for m in grid["M"]:
+        for construction_ef in grid["construction_ef"]:
+            for search_ef in grid["search_ef"]:
+                yield {"space": "cosine", "M": m, "construction_ef": construction_ef, "search_ef": search_ef}
+
+def configured_settings(expected_size: int):
+    """Paramètres résolus pour chaque filiale configurée"""
+    from core.packs.manager import pack_manager
+    from core.knowledge_base.index_settings import merge_index_config
+
+    filiales_dir = Path(__file__).parent.parent.parent / "src" / "applications" / "coris_money" / "config" / "filiales"
+    for config_path in sorted(filiales_dir.glob("*.yaml")):
+        filiale_id = config_path.stem
+        pack = pack_manager.get_pack_for_filiale(filiale_id, "coris_money")
+        pack_index = (pack_manager.get_pack_config(pack, "coris_money").get("knowledge_base") or {}).get("index")
+        filiale_index = (pack_manager.get_application_config(filiale_id, "coris_money").get("knowledge_base") or {}).get("index")
+        settings = resolve_index_settings(merge_index_config(pack_index, filiale_index), expected_size)
+        yield filiale_id, pack, settings
+
+def main():
+    args = sys.argv[1:]
+    positional = [arg for arg in args if not arg.startswith("--")]
+    target_recall = 0.95
+    if "--target-recall" in args:
+        target_recall = float(args[args.index("--target-recall") + 1])
+        positional.remove(args[args.index("--target-recall") + 1])
+    n_synthetic = int(positional[0]) if positional else 20000
+    grid = QUICK_GRID if "--quick" in args else GRID
+
+    print("🚀 BENCHMARK RÉGLAGE HNSW PAR FILIALE")
+    dataset = build_dataset(n_synthetic)
+    print(f"[INFO] {dataset['n_kb_chunks']} chunks knowledge_bases + {n_synthetic} documents synthétiques, "
+          f"dimension {DIMENSION}, {len(dataset['queries'])} requêtes, top-{TOP_K}")
+
+    rows = [benchmark_settings("numpy", {}, dataset)]
+    try:
+        for settings in grid_settings(grid):
+            rows.append(benchmark_settings("chroma", settings, dataset))
+    except ImportError as e:
+        print(f"[WARNING] ChromaDB indisponible, seule la recherche exacte est mesurée: {e}")
+    print_table("GRILLE DE PARAMÈTRES", rows)
+
+    measured = {row["index"]: row for row in rows[1:]}
+    if not measured:
+        return
+
+    tenant_rows = []
+    for filiale_id, pack, settings in configured_settings(len(dataset["corpus"])):
+        if not settings:
+            continue
+        # Valeurs par défaut de ChromaDB pour les paramètres non configurés
+        settings = {"M": 16, "construction_ef": 100, "search_ef": 10, **settings}
+        row = benchmark_settings("chroma", settings, dataset)
+        measured.setdefault(row["index"], row)
+        tenant_rows.append({"filiale": filiale_id, "pack": pack, **row})
+    print_table("PARAMÈTRES CONFIGURÉS PAR FILIALE", tenant_rows)
+
+    candidates = [row for row in measured.values() if row[f"recall@{TOP_K}"] >= target_recall]
+    if candidates:
+        best = min(candidates, key=lambda row: row["p99_ms"])
+        print(f"\n[RECOMMANDATION] recall@{TOP_K} >= {target_recall}: {best['index']} "
+              f"(recall {best[f'recall@{TOP_K}']:.3f}, p99 {best['p99_ms']:.2f} ms)")
+    else:
+        print(f"\n[WARNING] Aucun paramétrage n'atteint recall@{TOP_K} >= {target_recall}")
+
+if __name__ == "__main__":
+    main()
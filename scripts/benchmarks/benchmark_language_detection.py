@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la détection de langue
+
+Compare les deux anciennes heuristiques par sous-chaînes (DocumentProcessor
+et nlp_tools) au détecteur par trigrammes : précision par langue sur des
+phrases absentes des échantillons d'apprentissage (messages courts et
+chunks longs), puis débit texte par texte et par lot.
+
+Usage:
+    python scripts/benchmarks/benchmark_language_detection.py
+"""
+import sys
+import time
+import random
+from pathlib import Path
+
+# Ajouter src et scripts au path
+sys.path.append(str(Path(__file__).parent.parent.parent / "src"))
+sys.path.append(str(Path(__file__).parent.parent))
+
+from benchmarks.common import print_table
+from core.knowledge_base.language_detector import LanguageDetector
+
+# Phrases de test (hors language_profiles.yaml)
+EVALUATION = {
+    "fr": [
+        "Bonjour", "Merci beaucoup", "Je veux envoyer de l'argent à mon frère",
+        "Pourquoi ma transaction a échoué ?", "Comment changer mon code PIN ?",
+        "Mon compte est bloqué depuis ce matin", "Quel est le taux de change aujourd'hui ?",
+        "Je n'ai pas reçu le SMS de confirmation", "Combien coûte un retrait de cinquante mille francs ?",
+        "Pouvez-vous annuler ma dernière opération ?", "Il y a une erreur sur mon relevé",
+        "Je voudrais fermer mon compte épargne",
+    ],
+    "en": [
+        "Hello", "Thank you so much", "I want to send money to my brother",
+        "Why did my transaction fail?", "How do I change my PIN?",
+        "My account has been blocked since this morning", "What is today's exchange rate?",
+        "I did not receive the confirmation text", "How much does a fifty thousand withdrawal cost?",
+        "Can you cancel my last operation?", "There is a mistake on my statement",
+        "I would like to close my savings account",
+    ],
+    "wo": [
+        "Jërëjëf lool", "Dama bëgg yónnee xaalis sama rakk",
+        "Lu tax sama yónnee bi antuwul?", "Naka laa mën a soppi sama code?",
+        "Sama kont dafa tëj ci suba si", "Amuma message bi",
+        "Ñaata la génne xaalis di jar?", "Mën nga far sama yónnee bu mujj bi?",
+        "Bëgg naa tëj sama kont", "Naka nga def, ana sa waa kër?",
+    ],
+    "bm": [
+        "I ni ce kosɛbɛ", "N b'a fɛ ka wari ci n dɔgɔcɛ ma",
+        "Mun na n ka wari cili ma ɲɛ?", "N bɛ se ka n ka code falen cogo di?",
+        "N ka kɔnti datugura kabini sɔgɔma", "Cikan ma se n ma",
+        "Wari bɔli sɔngɔ ye joli ye?", "I bɛ se ka n ka wari cili laban bɔ wa?",
+        "N b'a fɛ ka n ka kɔnti datugu", "I ka kɛnɛ wa, i ka somɔgɔw ka kɛnɛ wa?",
+    ],
+}
+THROUGHPUT_TEXTS = 20000
+
+def legacy_document_processor(text: str) -> str:
+    """Ancien DocumentProcessor._detect_language"""
+    french_indicators = ['le', 'la', 'les', 'de', 'du', 'des', 'et', 'est', 'dans', 'pour', 'avec', 'vous', 'votre']
+    english_indicators = ['the', 'and', 'is', 'in', 'for', 'with', 'you', 'your', 'this', 'that']
+    text_lower = text.lower()
+    french_count = sum(1 for word in french_indicators if word in text_lower)
+    english_count = sum(1 for word in english_indicators if word in text_lower)
+    if french_count > english_count:
+        return "fr"
+    elif english_count > french_count:
+        return "en"
+    return "unknown"
+
+def legacy_nlp_tools(text: str) -> str:
+    """Ancien nlp_tools.detect_language"""
+    french_keywords = ["bonjour", "salut", "merci", "comment", "pourquoi", "transfert", "argent"]
+    english_keywords = ["hello", "hi", "thank", "how", "why", "transfer", "money"]
+    message_lower = text.lower()
+    french_score = sum(1 for keyword in french_keywords if keyword in message_lower)
+    english_score = sum(1 for keyword in english_keywords if keyword in message_lower)
+    if french_score > english_score:
+        return "fr"
+    elif english_score > 0:
+        return "en"
+    return "fr"
+
+def long_chunks(seed: int = 42):
+    """Chunks d'environ 500 caractères assemblés à partir des phrases de test"""
+    rng = random.Random(seed)
+    chunks = []
+    for language, sentences in EVALUATION.items():
+        for _ in range(20):
+            text = ""
+            while len(text) < 500:
+                text += rng.choice(sentences) + ". "
+            chunks.append((text, language))
+    return chunks
+
+def accuracy_rows(name: str, detect, dataset) -> dict:
+    row = {"détecteur": name}
+    for language in EVALUATION:
+        samples = [(text, expected) for text, expected in dataset if expected == language]
+        row[language] = sum(detect(text) == expected for text, expected in samples) / len(samples)
+    row["global"] = sum(detect(text) == expected for text, expected in dataset) / len(dataset)
+    return row
+
+def main():
+    detector = LanguageDetector()
+    messages = [(text, language) for language, texts in EVALUATION.items() for text in texts]
+    chunks = long_chunks()
+
+    print("🚀 BENCHMARK DÉTECTION DE LANGUE")
+    print(f"[INFO] {len(messages)} messages, {len(chunks)} chunks, langues: {', '.join(EVALUATION)}")
+
+    detectors = [
+        ("ancien processor", legacy_document_processor),
+        ("ancien nlp_tools", legacy_nlp_tools),
+        ("trigrammes", detector.detect),
+    ]
+    print_table("PRÉCISION - MESSAGES", [accuracy_rows(name, detect, messages) for name, detect in detectors])
+    print_table("PRÉCISION - CHUNKS", [accuracy_rows(name, detect, chunks) for name, detect in detectors])
+
+    texts = [text for text, _ in messages] * (THROUGHPUT_TEXTS // len(messages))
+    rows = []
+    for name, run in [
+        ("ancien processor", lambda: [legacy_document_processor(text) for text in texts]),
+        ("trigrammes (1 à 1)", lambda: [detector.detect(text) for text in texts]),
+        ("trigrammes (lot)", lambda: detector.detect_batch(texts)),
+    ]:
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        rows.append({"mode": name, "textes_par_s": len(texts) / elapsed, "us_par_texte": elapsed * 1e6 / len(texts)})
+    print_table("DÉBIT (messages courts)", rows)
+
+if __name__ == "__main__":
+    main()
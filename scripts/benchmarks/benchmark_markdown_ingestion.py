@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Benchmark de l'ingestion Markdown : pipeline HTML vs découpage par sections
+
+Compare l'ancien traitement (markdown -> HTML -> BeautifulSoup.get_text() puis
+fenêtres de 1000 caractères) au découpage par titres de markdown_sections :
+temps de traitement, nombre de chunks, part des réponses contenues entières
+dans un seul chunk et pureté (taille de la réponse / taille du chunk qui la
+contient).
+
+Le corpus est une FAQ synthétique au format de
+knowledge_bases/, complétée par les fichiers .md non vides de ce dossier.
+
+Usage:
+    python scripts/benchmarks/benchmark_markdown_ingestion.py [n_sections]
+"""
+import sys
+import importlib.util
+import time
+import random
+from pathlib import Path
+
+# Ajouter src et scripts au path
+sys.path.append(str(Path(__file__).parent.parent.parent / "src"))
+sys.path.append(str(Path(__file__).parent.parent))
+
+from benchmarks.common import print_table
+from core.knowledge_base.document_processor import DocumentProcessor
+from core.knowledge_base.markdown_sections import parse_markdown_sections, chunk_markdown_sections
+
+KNOWLEDGE_BASE_PATH = Path(__file__).parent.parent.parent / "knowledge_bases"
+REPEATS = 5
+
+TOPICS = ["Comptes", "Transferts", "Cartes", "Sécurité", "Tarifs", "Application mobile"]
+SENTENCES = [
+    "Présentez-vous en agence avec une pièce d'identité en cours de validité.",
+    "Le service client est joignable du lundi au samedi de 8h à 18h.",
+    "Les frais sont prélevés automatiquement sur le compte du client.",
+    "Composez le code USSD depuis votre mobile pour suivre l'opération.",
+    "Un SMS de confirmation est envoyé dès que la transaction est validée.",
+    "En cas de perte, faites opposition immédiatement auprès de votre conseiller.",
+    "Le plafond journalier dépend du niveau de vérification du compte.",
+    "Les justificatifs doivent dater de moins de trois mois.",
+]
+
+def synthetic_document(n_sections: int, seed: int = 42):
+    """FAQ Markdown synthétique et ses réponses (texte brut, pour mesurer leur découpage)"""
+    rng = random.Random(seed)
+    lines = ["# FAQ Coris Money", "", "Réponses aux questions fréquentes des clients.", ""]
+    answers = []
+    for index in range(n_sections):
+        if index % 8 == 0:
+            lines += [f"## {TOPICS[(index // 8) % len(TOPICS)]}", ""]
+        answer = " ".join(rng.choice(SENTENCES) for _ in range(rng.randint(2, 9)))
+        answers.append(answer)
+        lines += [f"### Question {index} : comment procéder ?", "", answer, ""]
+    return "\n".join(lines), answers
+
+def legacy_chunks(processor: DocumentProcessor, markdown_text: str):
+    """Ancien pipeline : conversion HTML si disponible, puis fenêtres fixes"""
+    try:
+        import markdown
+        from bs4 import BeautifulSoup
+        text = BeautifulSoup(markdown.markdown(markdown_text), "html.parser").get_text()
+    except ImportError:
+        # Sans markdown/bs4, l'ancien code traitait le fichier comme du texte brut
+        text = markdown_text
+    return processor._chunk_text(text)
+
+def section_chunks(processor: DocumentProcessor, markdown_text: str):
+    return [chunk["content"] for chunk in chunk_markdown_sections(parse_markdown_sections(markdown_text),
+                                                                  max_chars=processor.chunk_size)]
+
+def evaluate(name: str, chunker, processor, documents) -> dict:
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        all_chunks = [chunker(processor, markdown_text) for markdown_text, _ in documents]
+    elapsed_ms = (time.perf_counter() - start) * 1000 / REPEATS
+
+    complete, purity, total_answers = 0, [], 0
+    for chunks, (_, answers) in zip(all_chunks, documents):
+        for answer in answers:
+            total_answers += 1
+            containing = [chunk for chunk in chunks if answer in chunk]
+            if containing:
+                complete += 1
+                purity.append(len(answer) / min(len(chunk) for chunk in containing))
+
+    return {
+        "pipeline": name,
+        "ms_par_doc": elapsed_ms / len(documents),
+        "chunks": sum(len(chunks) for chunks in all_chunks),
+        "réponses_entières": complete / total_answers if total_answers else 0.0,
+        "pureté": sum(purity) / len(purity) if purity else 0.0
+    }
+
+def main():
+    n_sections = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    documents = [synthetic_document(n_sections, seed) for seed in range(5)]
+    for path in sorted(KNOWLEDGE_BASE_PATH.glob("*/*/*.md")):
+        content = path.read_text(encoding="utf-8")
+        if content.strip():
+            # Réponses des fichiers réels : paragraphes sous les titres de niveau 3
+            answers = [section["content"] for section in parse_markdown_sections(content)
+                       if section["level"] == 3 and "\n" not in section["content"]]
+            documents.append((content, answers))
+
+    print("🚀 BENCHMARK INGESTION MARKDOWN")
+    print(f"[INFO] {len(documents)} documents, {n_sections} sections par document synthétique")
+
+    # Même repli que legacy_chunks quand markdown/bs4 sont absents
+    if all(importlib.util.find_spec(module) for module in ("markdown", "bs4")):
+        legacy_name = "html + fenêtres"
+    else:
+        print("[WARNING] markdown/bs4 non installés : l'ancien pipeline est mesuré en texte brut (sans conversion HTML)")
+        legacy_name = "brut + fenêtres"
+
+    processor = DocumentProcessor()
+    rows = [
+        evaluate(legacy_name, legacy_chunks, processor, documents),
+        evaluate("sections", section_chunks, processor, documents)
+    ]
+    print_table("RÉSULTATS", rows)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Benchmark du micro-batching des embeddings locaux
+
+Compare, sous N utilisateurs concurrents, l'encodage direct sur la boucle
+asyncio (ancien comportement de HuggingFaceEmbeddingProvider) et le
+MicroBatchEmbedder, en débit et en latence p50/p99.
+
+Par défaut l'encodeur est simulé (coût fixe par appel + coût par texte, hors
+GIL comme un modèle PyTorch) ; avec --model, un vrai SentenceTransformer est
+utilisé si sentence-transformers est installé.
+
+Usage:
+    python scripts/benchmarks/benchmark_micro_batching.py [concurrency] [requests_per_user] [--model NAME]
+"""
+import sys
+import time
+import asyncio
+import numpy as np
+from pathlib import Path
+
+# Ajouter src et scripts au path
+sys.path.append(str(Path(__file__).parent.parent.parent / "src"))
+sys.path.append(str(Path(__file__).parent.parent))
+
+from benchmarks.common import latency_summary, print_table
+from core.knowledge_base.micro_batcher import MicroBatchEmbedder
+
+CALL_OVERHEAD_S = 0.008
+PER_TEXT_S = 0.0003
+DIMENSION = 384
+
+def simulated_encode(texts):
+    """Encodeur simulé : le coût fixe d'un appel domine pour les petits batches"""
+    time.sleep(CALL_OVERHEAD_S + PER_TEXT_S * len(texts))
+    return np.ones((len(texts), DIMENSION), dtype=np.float32)
+
+def load_encoder(argv):
+    if "--model" not in argv:
+        return simulated_encode, "simulé"
+    model_name = argv[argv.index("--model") + 1]
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(model_name)
+    return (lambda texts: model.encode(texts, convert_to_numpy=True, batch_size=len(texts))), model_name
+
+async def run_users(embed, concurrency: int, requests_per_user: int):
+    latencies = []
+    start = time.perf_counter()
+
+    async def user(user_index: int):
+        # Latence vue par l'utilisateur : depuis que sa requête est prête (début du test
+        # ou réponse précédente), y compris l'attente d'une boucle bloquée
+        ready = start
+        for i in range(requests_per_user):
+            await embed(f"Quels sont les frais de transfert ? (utilisateur {user_index}, question {i})")
+            done = time.perf_counter()
+            latencies.append((done - ready) * 1000)
+            ready = done
+
+    await asyncio.gather(*(user(u) for u in range(concurrency)))
+    return latencies, time.perf_counter() - start
+
+async def benchmark_direct(encode, concurrency, requests_per_user) -> dict:
+    async def embed(text):
+        # Ancien comportement : encode synchrone sur la boucle
+        return encode([text])[0]
+
+    latencies, elapsed = await run_users(embed, concurrency, requests_per_user)
+    return {"mode": "direct", "req_per_s": len(latencies) / elapsed, "avg_batch": 1.0, **latency_summary(latencies)}
+
+async def benchmark_batched(encode, concurrency, requests_per_user, max_wait_ms) -> dict:
+    batcher = MicroBatchEmbedder(encode, max_batch_size=64, max_wait_ms=max_wait_ms)
+    try:
+        latencies, elapsed = await run_users(batcher.embed, concurrency, requests_per_user)
+    finally:
+        batcher.close()
+    return {
+        "mode": f"micro-batch {max_wait_ms}ms",
+        "req_per_s": len(latencies) / elapsed,
+        "avg_batch": batcher.get_stats()["avg_batch"],
+        **latency_summary(latencies)
+    }
+
+def main():
+    args = sys.argv[1:]
+    positional = [arg for arg in args if not arg.startswith("--")]
+    if "--model" in args:
+        positional.remove(args[args.index("--model") + 1])
+    concurrency = int(positional[0]) if positional else 32
+    requests_per_user = int(positional[1]) if len(positional) > 1 else 20
+
+    encode, encoder_name = load_encoder(args)
+    print("🚀 BENCHMARK MICRO-BATCHING DES EMBEDDINGS")
+    print(f"[INFO] encodeur {encoder_name}, {concurrency} utilisateurs x {requests_per_user} requêtes")
+
+    rows = [asyncio.run(benchmark_direct(encode, concurrency, requests_per_user))]
+    for max_wait_ms in [1, 5, 10]:
+        rows.append(asyncio.run(benchmark_batched(encode, concurrency, requests_per_user, max_wait_ms)))
+
+    print_table("RÉSULTATS", rows)
+
+if __name__ == "__main__":
+    main()
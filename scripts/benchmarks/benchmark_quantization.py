@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Benchmark du stockage quantifié des embeddings (float32 / float16 / int8)
+
+Rapporte, pour chaque type de stockage, la taille de la matrice de recherche,
+la perte de recall@k par rapport à la recherche exacte (avec et sans
+re-scoring pleine précision) et les latences p50/p99.
+
+Usage:
+    python scripts/benchmarks/benchmark_quantization.py [n_docs] [dimension]
+"""
+import sys
+import tempfile
+from pathlib import Path
+
+# Ajouter src et scripts au path
+sys.path.append(str(Path(__file__).parent.parent.parent / "src"))
+sys.path.append(str(Path(__file__).parent.parent))
+
+from benchmarks.common import synthetic_embeddings, exact_top_k, recall_at_k, time_queries, print_table
+from core.knowledge_base.vector_store import NumpyVectorStore
+
+N_QUERIES = 500
+TOP_K = 5
+
+def benchmark_dtype(dtype: str, rescore_factor: int, corpus, queries, truth) -> dict:
+    with tempfile.TemporaryDirectory() as persist_dir:
+        store = NumpyVectorStore(persist_dir=persist_dir, vector_dtype=dtype, rescore_factor=rescore_factor)
+        ids = [str(i) for i in range(len(corpus))]
+        store.add("benchmark", ids=ids, documents=ids, metadatas=[{} for _ in ids], embeddings=corpus)
+
+        def run_query(i):
+            result = store.query("benchmark", query_embeddings=queries[i:i + 1], n_results=TOP_K)
+            return [int(doc_id) for doc_id in result["ids"][0]]
+
+        run_query(0)
+        found, latency = time_queries(run_query, len(queries))
+        footprint = store.get_memory_footprint("benchmark")
+
+        return {
+            "dtype": dtype,
+            "rescore": rescore_factor if dtype != "float32" else "-",
+            "search_MB": footprint["search_bytes"] / 1024 / 1024,
+            "reduction_x": footprint["float32_bytes"] / max(footprint["search_bytes"], 1),
+            f"recall@{TOP_K}": recall_at_k(truth, found, TOP_K),
+            **latency
+        }
+
+def main():
+    n_docs = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    dimension = int(sys.argv[2]) if len(sys.argv) > 2 else 1536
+
+    print("🚀 BENCHMARK QUANTIFICATION DES EMBEDDINGS")
+    print(f"[INFO] {n_docs} documents, dimension {dimension}, {N_QUERIES} requêtes, top-{TOP_K}")
+
+    corpus, queries = synthetic_embeddings(n_docs, dimension, N_QUERIES)
+    truth = exact_top_k(corpus, queries, TOP_K)
+
+    rows = [benchmark_dtype("float32", 1, corpus, queries, truth)]
+    for dtype in ["float16", "int8"]:
+        # rescore=1 : pas de candidats supplémentaires, mesure la perte brute de la quantification
+        for rescore_factor in [1, 4]:
+            rows.append(benchmark_dtype(dtype, rescore_factor, corpus, queries, truth))
+
+    print_table("RÉSULTATS", rows)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Benchmark des échéances SLA des escalades
+
+Programme n échéances réparties sur les SLA des packs (30 min, 1 h, 2 h),
+en annule la moitié (escalades résolues), puis avance le temps seconde par
+seconde jusqu'à la dernière échéance. Compare la roue temporelle
+hiérarchique à un tas avec suppression paresseuse (annulation O(1) mais
+tas jamais réduit) et à un tas avec suppression réelle (annulation O(n)).
+
+Usage:
+    python scripts/benchmarks/benchmark_sla_timers.py [n_timers]
+"""
+import sys
+import heapq
+import time
+import random
+from pathlib import Path
+
+# Ajouter src et scripts au path
+sys.path.append(str(Path(__file__).parent.parent.parent / "src"))
+sys.path.append(str(Path(__file__).parent.parent))
+
+from benchmarks.common import print_table
+from core.escalation.sla import ESCALATION_SLA_MINUTES
+from core.escalation.timing_wheel import HierarchicalTimingWheel
+
+START = 1_700_000_000.0
+HORIZON = max(ESCALATION_SLA_MINUTES.values()) * 60 + 3600
+N_REMOVAL_SAMPLE = 1000
+
+def synthetic_deadlines(n_timers: int, seed: int = 42):
+    rng = random.Random(seed)
+    sla_seconds = [minutes * 60 for minutes in ESCALATION_SLA_MINUTES.values()]
+    # Escalades créées au fil de la première heure
+    deadlines = [START + rng.uniform(0, 3600) + rng.choice(sla_seconds) for _ in range(n_timers)]
+    cancelled = rng.sample(range(n_timers), n_timers // 2)
+    return deadlines, cancelled
+
+class LazyHeap:
+    def __init__(self):
+        self.heap = []
+        self.live = {}
+
+    def schedule(self, key, expires_at):
+        self.live[key] = expires_at
+        heapq.heappush(self.heap, (expires_at, key))
+
+    def cancel(self, key):
+        return self.live.pop(key, None) is not None
+
+    def advance(self, now):
+        expired = []
+        while self.heap and self.heap[0][0] <= now:
+            expires_at, key = heapq.heappop(self.heap)
+            if self.live.get(key) == expires_at:
+                del self.live[key]
+                expired.append(key)
+        return expired
+
+class EagerHeap(LazyHeap):
+    def cancel(self, key):
+        expires_at = self.live.pop(key, None)
+        if expires_at is None:
+            return False
+        self.heap.remove((expires_at, key))
+        heapq.heapify(self.heap)
+        return True
+
+def per_op_us(elapsed: float, count: int) -> float:
+    return elapsed / max(count, 1) * 1e6
+
+def run(name, timers, deadlines, cancelled, cancel_count=None):
+    cancel_count = cancel_count if cancel_count is not None else len(cancelled)
+
+    start = time.perf_counter()
+    for key, expires_at in enumerate(deadlines):
+        timers.schedule(key, expires_at)
+    schedule_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for key in cancelled[:cancel_count]:
+        timers.cancel(key)
+    cancel_time = time.perf_counter() - start
+
+    fired = 0
+    start = time.perf_counter()
+    for second in range(1, int(HORIZON) + 1):
+        fired += len(timers.advance(START + second))
+    advance_time = time.perf_counter() - start
+
+    return {
+        "structure": name,
+        "schedule_us": per_op_us(schedule_time, len(deadlines)),
+        "cancel_us": per_op_us(cancel_time, cancel_count),
+        "advance_total_s": advance_time,
+        "fired": fired
+    }
+
+def main():
+    n_timers = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    print("🚀 BENCHMARK ÉCHÉANCES SLA DES ESCALADES")
+    print(f"[INFO] {n_timers} échéances, {n_timers // 2} annulations, "
+          f"{int(HORIZON)} ticks d'une seconde")
+
+    deadlines, cancelled = synthetic_deadlines(n_timers)
+    rows = [
+        run("timing_wheel", HierarchicalTimingWheel(tick_seconds=1, start_time=START), deadlines, cancelled),
+        run("heap_lazy", LazyHeap(), deadlines, cancelled),
+        # Suppression réelle trop lente pour toutes les annulations : échantillon
+        run("heap_remove", EagerHeap(), deadlines, cancelled, cancel_count=min(N_REMOVAL_SAMPLE, len(cancelled)))
+    ]
+    print_table("Programmation, annulation et expiration", rows)
+
+if __name__ == "__main__":
+    main()
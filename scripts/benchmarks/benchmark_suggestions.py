@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Benchmark des suggestions de saisie (typeahead)
+
+Mesure la latence de SuggestionIndex.suggest sur des préfixes tirés de
+questions synthétiques, à froid (premier appel pour un préfixe) et une fois
+le préfixe mémorisé, ainsi que le temps de reconstruction d'un index.
+
+Usage:
+    python scripts/benchmarks/benchmark_suggestions.py [n_questions]
+"""
+import sys
+import time
+import random
+from pathlib import Path
+
+# Ajouter src et scripts au path
+sys.path.append(str(Path(__file__).parent.parent.parent / "src"))
+sys.path.append(str(Path(__file__).parent.parent))
+
+from benchmarks.common import latency_summary, print_table
+from core.knowledge_base.suggestions import SuggestionIndex
+
+STARTS = ["Comment", "Pourquoi", "Quels sont", "Où", "Quand", "Est-ce que je peux", "Combien coûte"]
+WORDS = ["ouvrir", "compte", "transfert", "solde", "carte", "agence", "frais", "retrait", "facture",
+         "épargne", "crédit", "plafond", "code", "mobile", "opposition", "virement", "salaire"]
+N_QUERIES = 5000
+
+def synthetic_questions(n_questions: int, seed: int = 42):
+    rng = random.Random(seed)
+    return [
+        (f"{rng.choice(STARTS)} {' '.join(rng.sample(WORDS, rng.randint(2, 6)))} ?", rng.paretovariate(1.2))
+        for _ in range(n_questions)
+    ]
+
+def measure(index: SuggestionIndex, prefixes):
+    latencies = []
+    for prefix in prefixes:
+        start = time.perf_counter()
+        index.suggest("coris_money", "coris_ci", prefix, limit=5)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latency_summary(latencies)
+
+def main():
+    n_questions = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    questions = synthetic_questions(n_questions)
+
+    print("🚀 BENCHMARK SUGGESTIONS DE SAISIE")
+    print(f"[INFO] {n_questions} questions, {N_QUERIES} frappes simulées")
+
+    index = SuggestionIndex()
+    start = time.perf_counter()
+    index.update_source("coris_money", "coris_ci", "history", questions)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    # Frappes successives : tous les préfixes d'une question tirée au hasard
+    rng = random.Random(7)
+    prefixes = []
+    while len(prefixes) < N_QUERIES:
+        text = rng.choice(questions)[0]
+        prefixes.extend(text[:length] for length in range(1, len(text) + 1))
+    prefixes = prefixes[:N_QUERIES]
+
+    rows = [
+        {"mode": "à froid", **measure(index, prefixes)},
+        {"mode": "mémorisé", **measure(index, prefixes)},
+    ]
+    print(f"[INFO] Construction de l'index: {build_ms:.1f} ms")
+    print_table("LATENCE suggest()", rows)
+
+if __name__ == "__main__":
+    main()
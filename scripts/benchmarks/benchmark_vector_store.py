@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmark des backends vectoriels : ChromaDB (HNSW) vs index NumPy memory-mappé
+
+Mesure le recall@k par rapport à la recherche exacte et les latences p50/p99
+sur un corpus synthétique de la taille d'une filiale.
+
+Usage:
+    python scripts/benchmarks/benchmark_vector_store.py [n_docs] [dimension]
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Ajouter src et scripts au path
+sys.path.append(str(Path(__file__).parent.parent.parent / "src"))
+sys.path.append(str(Path(__file__).parent.parent))
+
+from benchmarks.common import synthetic_embeddings, exact_top_k, recall_at_k, time_queries, print_table
+from core.knowledge_base.vector_store import create_vector_store
+
+N_QUERIES = 500
+TOP_K = 5
+
+def benchmark_backend(backend: str, corpus, queries, truth) -> dict:
+    """Construit la collection puis mesure recall et latence pour un backend"""
+    with tempfile.TemporaryDirectory() as persist_dir:
+        store = create_vector_store(backend=backend, persist_dir=persist_dir)
+        name = "benchmark_collection"
+        store.get_or_create_collection(name, metadata={"application": "benchmark"})
+
+        ids = [f"doc_{i}" for i in range(len(corpus))]
+        start = time.perf_counter()
+        batch_size = 1000  # Limite de taille de batch ChromaDB
+        for offset in range(0, len(corpus), batch_size):
+            store.add(
+                name,
+                ids=ids[offset:offset + batch_size],
+                documents=[f"document {i}" for i in range(offset, min(offset + batch_size, len(corpus)))],
+                metadatas=[{"index": i} for i in range(offset, min(offset + batch_size, len(corpus)))],
+                embeddings=corpus[offset:offset + batch_size].tolist()
+            )
+        build_seconds = time.perf_counter() - start
+
+        def run_query(i):
+            result = store.query(name, query_embeddings=[queries[i].tolist()], n_results=TOP_K)
+            return [int(doc_id.split("_")[1]) for doc_id in result["ids"][0]]
+
+        # Préchauffage (chargement de l'index / du memory-map)
+        run_query(0)
+        found, latency = time_queries(run_query, len(queries))
+
+        return {
+            "backend": backend,
+            "build_s": build_seconds,
+            f"recall@{TOP_K}": recall_at_k(truth, found, TOP_K),
+            **latency
+        }
+
+def main():
+    n_docs = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    dimension = int(sys.argv[2]) if len(sys.argv) > 2 else 1536
+
+    print("🚀 BENCHMARK BACKENDS VECTORIELS")
+    print(f"[INFO] {n_docs} documents, dimension {dimension}, {N_QUERIES} requêtes, top-{TOP_K}")
+
+    corpus, queries = synthetic_embeddings(n_docs, dimension, N_QUERIES)
+    truth = exact_top_k(corpus, queries, TOP_K)
+
+    rows = []
+    for backend in ["numpy", "chroma"]:
+        try:
+            rows.append(benchmark_backend(backend, corpus, queries, truth))
+        except ImportError as e:
+            print(f"[WARNING] Backend {backend} indisponible: {e}")
+
+    print_table("RÉSULTATS", rows)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Utilitaires partagés par les benchmarks de la base de connaissances
+"""
+import time
+import numpy as np
+from typing import Callable, Dict, List, Tuple
+
+def synthetic_embeddings(n_docs: int, dimension: int, n_queries: int,
+                         n_topics: int = 64, noise: float = 0.35,
+                         seed: int = 42) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Génère un corpus et des requêtes normalisés, regroupés par thèmes
+    (plus proche de vrais embeddings qu'un bruit uniforme)
+    """
+    rng = np.random.default_rng(seed)
+    topics = rng.normal(size=(n_topics, dimension)).astype(np.float32)
+
+    def sample(count: int) -> np.ndarray:
+        assignments = rng.integers(0, n_topics, size=count)
+        vectors = topics[assignments] + noise * rng.normal(size=(count, dimension)).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    return sample(n_docs), sample(n_queries)
+
+def exact_top_k(corpus: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """Vérité terrain : top-k exact par similarité cosinus"""
+    scores = queries @ corpus.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+def recall_at_k(truth: np.ndarray, found: List[List[int]], k: int) -> float:
+    """Proportion moyenne des k vrais voisins retrouvés"""
+    hits = [len(set(truth[i][:k]) & set(found[i][:k])) / k for i in range(len(found))]
+    return float(np.mean(hits)) if hits else 0.0
+
+def time_queries(run_query: Callable[[int], List[int]], n_queries: int) -> Tuple[List[List[int]], Dict]:
+    """Exécute les requêtes une à une et mesure les latences"""
+    results = []
+    latencies = []
+    for i in range(n_queries):
+        start = time.perf_counter()
+        results.append(run_query(i))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return results, latency_summary(latencies)
+
+def latency_summary(latencies_ms: List[float]) -> Dict:
+    """Percentiles de latence en millisecondes"""
+    values = np.asarray(latencies_ms)
+    return {
+        "p50_ms": float(np.percentile(values, 50)),
+        "p99_ms": float(np.percentile(values, 99)),
+        "mean_ms": float(values.mean())
+    }
+
+def print_table(title: str, rows: List[Dict]):
+    """Affiche un tableau de résultats"""
+    print(f"\n{title}")
+    print("=" * 60)
+    if not rows:
+        print("(aucun résultat)")
+        return
+    columns = list(rows[0].keys())
+    print(" | ".join(f"{column:>14}" for column in columns))
+    for row in rows:
+        print(" | ".join(
+            f"{row[column]:>14.3f}" if isinstance(row[column], float) else f"{str(row[column]):>14}"
+            for column in columns
+        ))
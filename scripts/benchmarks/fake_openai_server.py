@@ -0,0 +1,126 @@
+"""
+Serveur local compatible avec l'endpoint /v1/embeddings d'OpenAI
+
+Utilisé par les tests et benchmarks d'ingestion : latence simulée par requête,
+réponses 429 injectables et suivi des requêtes simultanées.
+"""
+import json
+import time
+import base64
+import hashlib
+import threading
+import numpy as np
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+class _HTTPServer(ThreadingHTTPServer):
+    # File d'attente suffisante pour de nombreuses connexions simultanées
+    request_queue_size = 128
+    daemon_threads = True
+
+class FakeEmbeddingServer:
+    """
+    Serveur d'embeddings factice démarré dans un thread
+
+    Args:
+        dimension: Dimension des embeddings renvoyés
+        latency: Latence simulée par requête (secondes)
+        fail_first: Nombre de premières requêtes rejetées en 429
+    """
+
+    def __init__(self, dimension: int = 16, latency: float = 0.05, fail_first: int = 0):
+        self.dimension = dimension
+        self.latency = latency
+        self.fail_first = fail_first
+        self.request_count = 0
+        self.failed_count = 0
+        self.batch_sizes: List[int] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = _HTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v1"
+
+    def embedding_for(self, text: str) -> np.ndarray:
+        """Embedding déterministe dérivé du texte"""
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        vector = np.random.default_rng(seed).normal(size=self.dimension).astype(np.float32)
+        return vector / np.linalg.norm(vector)
+
+    def start(self) -> "FakeEmbeddingServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, payload: dict):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                inputs = request.get("input", [])
+                if isinstance(inputs, str):
+                    inputs = [inputs]
+
+                with server._lock:
+                    server.request_count += 1
+                    reject = server.failed_count < server.fail_first
+                    if reject:
+                        server.failed_count += 1
+                    else:
+                        server.in_flight += 1
+                        server.max_in_flight = max(server.max_in_flight, server.in_flight)
+                        server.batch_sizes.append(len(inputs))
+
+                if reject:
+                    self._send(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_error"}})
+                    return
+
+                try:
+                    time.sleep(server.latency)
+                    data = []
+                    for index, text in enumerate(inputs):
+                        vector = server.embedding_for(text)
+                        if request.get("encoding_format") == "base64":
+                            embedding = base64.b64encode(vector.astype("<f4").tobytes()).decode("ascii")
+                        else:
+                            embedding = vector.tolist()
+                        data.append({"object": "embedding", "index": index, "embedding": embedding})
+                    tokens = sum(len(text.split()) for text in inputs)
+                    self._send(200, {
+                        "object": "list",
+                        "data": data,
+                        "model": request.get("model"),
+                        "usage": {"prompt_tokens": tokens, "total_tokens": tokens}
+                    })
+                finally:
+                    with server._lock:
+                        server.in_flight -= 1
+
+        return Handler
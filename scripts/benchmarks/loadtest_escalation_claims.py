@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Test de charge de l'affectation des escalades aux agents humains
+
+Lance des milliers d'escalades simultanées contre une vraie base PostgreSQL
+(variables CONVERSATIONS_*) et compare :
+- legacy : SELECT des candidats puis UPDATE de la charge (deux requêtes,
+  comportement d'origine) ;
+- query : EscalationRouter sans index, choix et réservation en une requête
+  (FOR UPDATE SKIP LOCKED) ;
+- index : EscalationRouter avec l'index de disponibilité, réservation par
+  incrémentation conditionnelle.
+
+Les tables sont créées dans un schéma dédié (escalation_loadtest), supprimé
+à la fin. Une surcharge est une affectation au-delà de max_concurrent.
+
+Usage:
+    python scripts/benchmarks/loadtest_escalation_claims.py [n_escalations] [n_agents]
+"""
+import os
+import sys
+import time
+import asyncio
+from pathlib import Path
+
+import asyncpg
+
+# Ajouter src et scripts au path
+sys.path.append(str(Path(__file__).parent.parent.parent / "src"))
+sys.path.append(str(Path(__file__).parent.parent))
+
+from benchmarks.common import latency_summary, print_table
+import core.escalation.router as router_module
+from core.database.connections import DatabaseManager
+from core.escalation.availability import AgentAvailabilityIndex
+from core.escalation.router import EscalationRouter
+
+SCHEMA = "escalation_loadtest"
+MAX_CONCURRENT = 5
+POOL_SIZE = int(os.getenv("LOADTEST_POOL_SIZE", "50"))
+CONTEXT = {"reason": "réclamation client", "user_language": "fr"}
+
+async def connect_pool() -> asyncpg.Pool:
+    return await asyncpg.create_pool(
+        host=os.getenv("CONVERSATIONS_HOST", "localhost"),
+        port=int(os.getenv("CONVERSATIONS_PORT", "5432")),
+        database=os.getenv("CONVERSATIONS_DB", "coris_conversations"),
+        user=os.getenv("CONVERSATIONS_USER", "coris_user"),
+        password=os.getenv("CONVERSATIONS_PASSWORD", "coris_password"),
+        min_size=POOL_SIZE,
+        max_size=POOL_SIZE,
+        server_settings={"search_path": SCHEMA}
+    )
+
+async def reset_agents(pool: asyncpg.Pool, n_agents: int):
+    async with pool.acquire() as conn:
+        await conn.execute(f"""
+            CREATE SCHEMA IF NOT EXISTS {SCHEMA};
+            DROP TABLE IF EXISTS {SCHEMA}.human_agents;
+            CREATE TABLE {SCHEMA}.human_agents (
+                id VARCHAR(100) PRIMARY KEY,
+                name VARCHAR(200) NOT NULL,
+                specialties JSONB,
+                languages JSONB,
+                status VARCHAR(20) DEFAULT 'available',
+                current_load INTEGER DEFAULT 0,
+                max_concurrent INTEGER DEFAULT {MAX_CONCURRENT},
+                last_activity TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+        """)
+        await conn.executemany(
+            f"INSERT INTO {SCHEMA}.human_agents (id, name, specialties, languages) VALUES ($1, $2, $3, $4)",
+            [(f"agent_{i:04d}", f"Agent {i}", '["reclamations"]', '["fr"]') for i in range(n_agents)]
+        )
+
+async def legacy_find_best_agent(pool: asyncpg.Pool):
+    """Comportement d'origine : sélection puis mise à jour sur deux connexions"""
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow("""
+            SELECT id FROM human_agents
+            WHERE status = 'available' AND current_load < max_concurrent
+            ORDER BY (max_concurrent - current_load)::float / max_concurrent DESC, last_activity DESC
+            LIMIT 1
+        """)
+    if not row:
+        return None
+    async with pool.acquire() as conn:
+        await conn.execute(
+            "UPDATE human_agents SET current_load = current_load + 1, last_activity = NOW() WHERE id = $1",
+            row["id"]
+        )
+    return row["id"]
+
+async def run_burst(name: str, find_agent, pool: asyncpg.Pool, n_escalations: int):
+    latencies = []
+
+    async def escalate():
+        start = time.perf_counter()
+        agent_id = await find_agent()
+        latencies.append((time.perf_counter() - start) * 1000)
+        return agent_id
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(escalate() for _ in range(n_escalations)))
+    elapsed = time.perf_counter() - start
+
+    async with pool.acquire() as conn:
+        loads = await conn.fetch("SELECT current_load, max_concurrent FROM human_agents")
+    overshoot = sum(max(0, row["current_load"] - row["max_concurrent"]) for row in loads)
+    capacity = sum(row["max_concurrent"] for row in loads)
+
+    return {
+        "strategy": name,
+        "assigned": sum(1 for agent_id in results if agent_id),
+        "capacity": capacity,
+        "overshoot": overshoot,
+        "per_second": n_escalations / elapsed,
+        **latency_summary(latencies)
+    }
+
+async def main():
+    n_escalations = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    n_agents = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    print("🚀 TEST DE CHARGE AFFECTATION DES ESCALADES")
+    print(f"[INFO] {n_escalations} escalades simultanées, {n_agents} agents x {MAX_CONCURRENT} places, "
+          f"pool de {POOL_SIZE} connexions")
+
+    pool = await connect_pool()
+    loadtest_db = DatabaseManager()
+    loadtest_db._conversations_pool = pool
+    router_module.db_manager = loadtest_db
+
+    rows = []
+    try:
+        await reset_agents(pool, n_agents)
+        rows.append(await run_burst("legacy", lambda: legacy_find_best_agent(pool), pool, n_escalations))
+
+        await reset_agents(pool, n_agents)
+        query_router = EscalationRouter(availability_index=AgentAvailabilityIndex())
+        rows.append(await run_burst("query", lambda: query_router.find_best_agent(CONTEXT), pool, n_escalations))
+
+        await reset_agents(pool, n_agents)
+        index = AgentAvailabilityIndex()
+        async with pool.acquire() as conn:
+            await index._load(conn)
+        index_router = EscalationRouter(availability_index=index)
+        rows.append(await run_burst("index", lambda: index_router.find_best_agent(CONTEXT), pool, n_escalations))
+    finally:
+        async with pool.acquire() as conn:
+            await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await pool.close()
+
+    print_table("Affectation concurrente", rows)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -122,6 +122,82 @@ async def create_conversations_database():
         last_activity TIMESTAMP DEFAULT CURRENT_TIMESTAMP
     );
     
+    -- Notifie les changements de statut, de charge ou de profil d'un agent
+    -- (canal écouté par l'index de disponibilité, core/escalation/availability.py)
+    CREATE OR REPLACE FUNCTION notify_human_agents_changed() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            PERFORM pg_notify('human_agents_changed', json_build_object('op', TG_OP, 'id', OLD.id)::text);
+            RETURN OLD;
+        END IF;
+        PERFORM pg_notify('human_agents_changed', json_build_object(
+            'op', TG_OP,
+            'id', NEW.id,
+            'status', NEW.status,
+            'current_load', NEW.current_load,
+            'max_concurrent', NEW.max_concurrent,
+            'specialties', NEW.specialties,
+            'languages', NEW.languages,
+            'last_activity', NEW.last_activity
+        )::text);
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+    
+    DROP TRIGGER IF EXISTS human_agents_notify ON human_agents;
+    CREATE TRIGGER human_agents_notify
+    AFTER INSERT OR DELETE OR UPDATE OF status, current_load, max_concurrent, specialties, languages
+    ON human_agents
+    FOR EACH ROW EXECUTE FUNCTION notify_human_agents_changed();
+    
+    -- File des escalades en attente d'un agent
+    CREATE TABLE IF NOT EXISTS escalation_queue (
+        escalation_id UUID PRIMARY KEY REFERENCES escalations(id) ON DELETE CASCADE,
+        conversation_id UUID NOT NULL,
+        priority VARCHAR(20) NOT NULL,
+        priority_rank SMALLINT NOT NULL,
+        sla_deadline TIMESTAMP WITH TIME ZONE NOT NULL,
+        routing JSONB DEFAULT '{}',
+        enqueued_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+    );
+    
+    -- Dépassements de SLA déjà signalés
+    CREATE TABLE IF NOT EXISTS escalation_sla_breaches (
+        escalation_id UUID PRIMARY KEY REFERENCES escalations(id) ON DELETE CASCADE,
+        breached_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+    );
+    
+    -- Instantanés d'escalade, mis à jour à chaque message
+    CREATE TABLE IF NOT EXISTS escalation_snapshots (
+        conversation_id UUID PRIMARY KEY REFERENCES conversations(id) ON DELETE CASCADE,
+        version INTEGER NOT NULL DEFAULT 0,
+        snapshot JSONB NOT NULL DEFAULT '{}',
+        updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+    );
+    
+    -- Activité journalière par utilisateur (statistiques glissantes sur 30 jours)
+    CREATE TABLE IF NOT EXISTS user_activity_daily (
+        user_id VARCHAR(100) NOT NULL,
+        day DATE NOT NULL,
+        conversations INTEGER NOT NULL DEFAULT 0,
+        escalated_conversations INTEGER NOT NULL DEFAULT 0,
+        duration_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+        last_conversation TIMESTAMP WITH TIME ZONE,
+        PRIMARY KEY (user_id, day)
+    );
+    
+    -- Amorçage de l'agrégat depuis les conversations existantes (jours déjà agrégés conservés)
+    INSERT INTO user_activity_daily (user_id, day, conversations, escalated_conversations,
+                                     duration_seconds, last_conversation)
+    SELECT user_id, created_at::date, COUNT(*),
+           COUNT(*) FILTER (WHERE status = 'escalated'),
+           COALESCE(SUM(EXTRACT(EPOCH FROM (updated_at - created_at))), 0),
+           MAX(created_at)
+    FROM conversations
+    WHERE created_at > NOW() - INTERVAL '30 days'
+    GROUP BY user_id, created_at::date
+    ON CONFLICT (user_id, day) DO NOTHING;
+    
     -- Index pour les performances
     CREATE INDEX IF NOT EXISTS idx_conversations_user ON conversations(user_id);
     CREATE INDEX IF NOT EXISTS idx_conversations_filiale ON conversations(filiale_id);
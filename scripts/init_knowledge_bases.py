@@ -16,8 +16,10 @@ if sys.platform == "win32":
 # Ajouter src au path
 sys.path.append(str(Path(__file__).parent.parent / "src"))
 
-from core.knowledge_base.chroma_manager import MultiTenantChromaManager
+from core.knowledge_base.chroma_manager import MultiTenantChromaManager, COMMON_FILIALE_ID
 from core.knowledge_base.document_processor import DocumentProcessor
+from core.knowledge_base.embeddings import HashingEmbeddingProvider
+from core.knowledge_base.faq_index import FaqIndex
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -26,6 +28,7 @@ class KnowledgeBaseLoader:
     def __init__(self):
         self.chroma_manager = MultiTenantChromaManager()
         self.doc_processor = DocumentProcessor()
+        self.faq_index = FaqIndex()
         
         # Mapping des noms de fichiers vers catégories
         self.file_categories = {
@@ -65,8 +68,21 @@ class KnowledgeBaseLoader:
         
         print(f"[INFO] Filiales trouvées: {', '.join(filiales_found)}")
         
+        # Toutes les collections sont réingérées : l'IDF est recalculé sur l'ensemble
+        await self.fit_hashing_idf(coris_money_path, refit=True)
+        
         total_documents = 0
         
+        # Contenu partagé (coris_money/common) : embeddé une seule fois pour toutes les filiales
+        common_path = coris_money_path / COMMON_FILIALE_ID
+        if common_path.exists():
+            print(f"\n{'='*50}")
+            print("TRAITEMENT CONTENU COMMUN")
+            print(f"{'='*50}")
+            documents_added = await self.load_filiale(COMMON_FILIALE_ID, common_path)
+            total_documents += documents_added
+            print(f"[OK] {COMMON_FILIALE_ID}: {documents_added} documents ajoutés")
+        
         for filiale_id in filiales_found:
             print(f"\n{'='*50}")
             print(f"TRAITEMENT FILIALE: {filiale_id.upper()}")
@@ -88,67 +104,149 @@ class KnowledgeBaseLoader:
             print(f"[ERROR] Dossier filiale non trouvé: {filiale_path}")
             return 0
         
-        # Trouver tous les fichiers markdown
-        md_files = list(filiale_path.glob("*.md"))
+        # Trouver tous les fichiers markdown et les exports tabulaires (lus en flux)
+        md_files = self.get_source_files(filiale_path)
         
         if not md_files:
-            print(f"[WARNING] Aucun fichier .md trouvé dans {filiale_path}")
+            print(f"[WARNING] Aucun fichier .md/.csv/.json trouvé dans {filiale_path}")
             return 0
         
         print(f"[INFO] Fichiers trouvés: {[f.name for f in md_files]}")
         
+        # Construction dans une version fantôme : les requêtes continuent sur la version publiée
+        version = self.chroma_manager.begin_reindex("coris_money", filiale_id)
+        print(f"[INFO] Construction de la version v{version}")
+        
         total_chunks = 0
+        faq_pairs = []
         
-        for md_file in md_files:
-            print(f"\n[PROCESSING] {md_file.name}...")
+        # Un fichier de même nom que dans common/ remplace les chunks communs correspondants
+        common_files = set()
+        if filiale_id != COMMON_FILIALE_ID:
+            common_path = filiale_path.parent / COMMON_FILIALE_ID
+            common_files = {f.name for f in common_path.iterdir()} if common_path.exists() else set()
+        
+        # Lots d'un même build écrits ensemble (une seule réécriture avec le backend NumPy)
+        with self.chroma_manager.deferred_writes("coris_money", filiale_id, version):
+            for md_file in md_files:
+                print(f"\n[PROCESSING] {md_file.name}...")
             
-            try:
-                # Déterminer la catégorie
-                category = self.file_categories.get(md_file.name, 'general')
-                
-                # Traiter le fichier
-                documents = await self.doc_processor.process_file(
-                    str(md_file),
-                    filiale_id=filiale_id,
-                    application="coris_money",
-                    category=category,
-                    custom_metadata={
-                        "filiale": filiale_id,
-                        "source_file": md_file.name,
-                        "load_date": "2024-01-15"
-                    }
-                )
+                try:
+                    # Déterminer la catégorie
+                    category = self.file_categories.get(md_file.name, 'general')
                 
-                if documents:
-                    # Extraire les données pour ChromaDB
-                    doc_contents = [doc["content"] for doc in documents]
-                    doc_metadatas = [doc["metadata"] for doc in documents]
-                    doc_ids = [doc["id"] for doc in documents]
-                    
-                    # Ajouter à ChromaDB
-                    await self.chroma_manager.add_documents(
-                        application="coris_money",
+                    # Traiter le fichier par lots (lecture en flux des gros exports)
+                    file_chunks = 0
+                    async for documents in self.doc_processor.iter_documents(
+                        str(md_file),
                         filiale_id=filiale_id,
-                        documents=doc_contents,
-                        metadatas=doc_metadatas,
-                        ids=doc_ids
-                    )
-                    
-                    total_chunks += len(documents)
-                    print(f"   [OK] {len(documents)} chunks ajoutés")
+                        application="coris_money",
+                        category=category,
+                        custom_metadata={
+                            "filiale": filiale_id,
+                            "source_file": md_file.name,
+                            "load_date": "2024-01-15",
+                            **({"overrides_common": md_file.name} if md_file.name in common_files else {})
+                        }
+                    ):
+                        # Ajouter à ChromaDB
+                        await self.chroma_manager.add_documents(
+                            application="coris_money",
+                            filiale_id=filiale_id,
+                            documents=[doc["content"] for doc in documents],
+                            metadatas=[doc["metadata"] for doc in documents],
+                            ids=[doc["id"] for doc in documents],
+                            version=version
+                        )
                     
-                    # Afficher un échantillon du contenu
-                    if documents:
-                        sample_content = documents[0]["content"][:100] + "..."
-                        print(f"   [SAMPLE] {sample_content}")
-                else:
-                    print(f"   [WARNING] Aucun contenu extrait de {md_file.name}")
+                        # Afficher un échantillon du contenu
+                        if file_chunks == 0:
+                            sample_content = documents[0]["content"][:100] + "..."
+                            print(f"   [SAMPLE] {sample_content}")
+                        file_chunks += len(documents)
+                
+                    if file_chunks:
+                        total_chunks += file_chunks
+                        print(f"   [OK] {file_chunks} chunks ajoutés")
+                    else:
+                        print(f"   [WARNING] Aucun contenu extrait de {md_file.name}")
+                
+                    # Paires question / réponse explicites pour l'index FAQ
+                    faq_pairs.extend(await self.doc_processor.extract_faq(str(md_file)))
                     
-            except Exception as e:
-                print(f"   [ERROR] Erreur traitement {md_file.name}: {e}")
+                except Exception as e:
+                    print(f"   [ERROR] Erreur traitement {md_file.name}: {e}")
+        
+        suppressed = self.get_suppressed_common(filiale_id)
+        if suppressed and total_chunks > 0:
+            self.chroma_manager.suppress_common_documents("coris_money", filiale_id, suppressed, version=version)
+            print(f"[INFO] Contenu commun masqué: {suppressed}")
+        
+        if total_chunks > 0:
+            self.chroma_manager.publish_version("coris_money", filiale_id, version)
+            print(f"[OK] Version v{version} publiée")
+            faq_count = await self.faq_index.build("coris_money", filiale_id, faq_pairs)
+            print(f"[OK] Index FAQ: {faq_count} questions")
+        else:
+            self.chroma_manager.discard_version("coris_money", filiale_id, version)
+            print(f"[WARNING] Version v{version} abandonnée, la version publiée reste servie")
         
         return total_chunks
     
+    def get_source_files(self, filiale_path: Path):
+        """Fichiers markdown et exports tabulaires d'une filiale"""
+        return sorted(
+            f for f in filiale_path.iterdir()
+            if f.suffix.lower() in (".md", *self.doc_processor.record_formats)
+        )
+    
+    async def fit_hashing_idf(self, coris_money_path: Path, refit: bool = False) -> bool:
+        """
+        Calcule l'IDF des embeddings hors ligne (EMBEDDING_PROVIDER=hashing)
+        
+        Calculé sur les chunks de toutes les filiales et du contenu commun, puis
+        enregistré dans HASHING_EMBEDDING_IDF_PATH, relu par l'application pour
+        les requêtes. Sans `refit`, un IDF déjà enregistré est conservé : les
+        collections des autres filiales restent cohérentes.
+        """
+        provider = self.chroma_manager.embedding_function
+        if not isinstance(provider, HashingEmbeddingProvider):
+            return False
+        if provider.is_fitted and not refit:
+            print(f"[INFO] IDF existant conservé ({provider.model})")
+            return False
+        
+        texts = []
+        filiale_paths = [item for item in sorted(coris_money_path.iterdir())
+                         if item.is_dir() and (item.name.startswith('coris_') or item.name == COMMON_FILIALE_ID)]
+        for filiale_path in filiale_paths:
+            for source_file in self.get_source_files(filiale_path):
+                try:
+                    async for documents in self.doc_processor.iter_documents(
+                        str(source_file), filiale_id=filiale_path.name, application="coris_money"
+                    ):
+                        texts.extend(doc["content"] for doc in documents)
+                except Exception as e:
+                    print(f"   [ERROR] Erreur lecture {source_file.name}: {e}")
+        
+        if not texts:
+            return False
+        provider.fit(texts).save_idf()
+        print(f"[OK] IDF calculé sur {len(texts)} chunks ({provider.model}) -> {provider.idf_path}")
+        return True
+    
+    def get_suppressed_common(self, filiale_id: str):
+        """Chunks ou fichiers communs masqués (knowledge_base.suppress_common de la config filiale)"""
+        if filiale_id == COMMON_FILIALE_ID:
+            return []
+        try:
+            from core.packs.manager import pack_manager
+            app_config = pack_manager.get_application_config(filiale_id, "coris_money")
+            return list((app_config.get("knowledge_base") or {}).get("suppress_common") or [])
+        except Exception as e:
+            print(f"[WARNING] Configuration filiale illisible: {e}")
+            return []
+    
     async def load_single_filiale(self, filiale_id: str, knowledge_base_path: str = "./knowledge_base"):
         """Charge une seule filiale"""
         
@@ -159,6 +257,7 @@ class KnowledgeBaseLoader:
             return False
         
         print(f"[INFO] Chargement filiale: {filiale_id}")
+        await self.fit_hashing_idf(filiale_path.parent)
         documents_added = await self.load_filiale(filiale_id, filiale_path)
         
         if documents_added > 0:
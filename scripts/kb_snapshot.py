@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Export / import des snapshots de la base de connaissances
+
+Les snapshots contiennent les vecteurs déjà calculés : un nouveau pod les
+charge au démarrage (KB_SNAPSHOT_DIR) sans réembedder via OpenAI.
+
+Usage:
+    python scripts/kb_snapshot.py export <filiale_id> [dossier] [application]
+    python scripts/kb_snapshot.py import <fichier.kbsnap>
+    python scripts/kb_snapshot.py verify <fichier.kbsnap>
+"""
+import sys
+import time
+from pathlib import Path
+
+# Correction encodage Windows
+if sys.platform == "win32":
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+# Ajouter src au path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+def export_snapshot(filiale_id: str, directory: str = "./data/kb_snapshots", application: str = "coris_money"):
+    from core.knowledge_base.chroma_manager import MultiTenantChromaManager
+    from core.knowledge_base.snapshots import SNAPSHOT_SUFFIX
+
+    manager = MultiTenantChromaManager()
+    path = Path(directory) / f"{manager.get_collection_name(application, filiale_id)}{SNAPSHOT_SUFFIX}"
+    start = time.perf_counter()
+    manifest = manager.export_snapshot(application, filiale_id, str(path))
+    print(f"[OK] {manifest['count']} documents exportés vers {path} "
+          f"({path.stat().st_size / 1024 / 1024:.1f} MB, {time.perf_counter() - start:.2f}s)")
+
+def import_snapshot(path: str):
+    from core.knowledge_base.chroma_manager import MultiTenantChromaManager
+
+    manager = MultiTenantChromaManager()
+    start = time.perf_counter()
+    manifest = manager.import_snapshot(path)
+    print(f"[OK] {manifest['count']} documents importés dans {manifest['collection']} "
+          f"({time.perf_counter() - start:.2f}s)")
+
+def verify_snapshot(path: str):
+    from core.knowledge_base.snapshots import load_snapshot
+
+    snapshot = load_snapshot(path)
+    manifest = snapshot["manifest"]
+    print(f"[OK] {manifest['collection']}: {manifest['count']} documents, dimension {manifest['dimension']}, "
+          f"modèle {manifest['embedding_model']}, créé le {manifest['created_at']}")
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] not in ("export", "import", "verify"):
+        print(__doc__)
+        sys.exit(1)
+
+    command, argument = sys.argv[1], sys.argv[2]
+    if command == "export":
+        export_snapshot(argument, *sys.argv[3:5])
+    elif command == "import":
+        import_snapshot(argument)
+    else:
+        verify_snapshot(argument)
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"\n❌ Erreur: {e}")
+        sys.exit(1)
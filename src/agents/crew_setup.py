@@ -1,6 +1,9 @@
 """
 Configuration et orchestration CrewAI - Version corrigée
 """
+import re
+import time
+import asyncio
 import yaml
 from pathlib import Path
 from typing import Dict, List, Optional
@@ -14,6 +17,9 @@ except ImportError:
 import structlog
 import warnings
 
+from core.knowledge_base.semantic_cache import SemanticResponseCache
+from core.knowledge_base.faq_index import FaqIndex
+
 # Ignorer les warnings de dépreciation Pydantic
 warnings.filterwarnings("ignore", category=DeprecationWarning)
 
@@ -25,6 +31,88 @@ class CorisCrewManager:
         self.tasks_config = self._load_tasks_config()
         self.agents = {}
         self.tasks = {}
+        self._chroma_manager = None
+        self.response_cache = SemanticResponseCache(kb_version_provider=self._get_kb_version)
+        self.faq_index = FaqIndex()
+    
+    def _get_chroma_manager(self):
+        """Gestionnaire de la base de connaissances, créé à la première utilisation"""
+        if self._chroma_manager is None:
+            from core.knowledge_base.chroma_manager import MultiTenantChromaManager
+            self._chroma_manager = MultiTenantChromaManager()
+        return self._chroma_manager
+    
+    def _get_kb_version(self, application: str, filiale_id: str):
+        """Version de la KB de la filiale, utilisée pour invalider le cache de réponses"""
+        try:
+            return self._get_chroma_manager().get_kb_version(application, filiale_id)
+        except Exception as e:
+            logger.warning(f"Could not resolve KB version: {e}")
+            return None
+    
+    def get_common_exclusions(self, application: str, filiale_id: str) -> set:
+        """Fichiers communs remplacés ou masqués par la filiale (ignorés dans la FAQ commune)"""
+        try:
+            return self._get_chroma_manager().get_overlay_exclusions(application, filiale_id)
+        except Exception as e:
+            logger.warning(f"Could not resolve overlay exclusions: {e}")
+            return set()
+    
+    @staticmethod
+    def _faq_response(faq_match: Dict) -> Dict:
+        """Réponse directe de l'index FAQ (sans recherche ni génération)"""
+        return {
+            "success": True,
+            "result": faq_match["answer"],
+            "crew_agents": ["faq_index"],
+            "tasks_executed": 0,
+            "mode": "faq_index",
+            "faq_match": faq_match["match"],
+            "faq_question": faq_match["question"]
+        }
+    
+    def load_knowledge_base_snapshots(self) -> List[str]:
+        """Importe les snapshots de KB_SNAPSHOT_DIR (démarrage sans appel d'embedding)"""
+        return self._get_chroma_manager().load_snapshots()
+    
+    def start_knowledge_base_gc(self, interval_seconds: float):
+        """Planifie le nettoyage des anciennes versions de collections"""
+        self._kb_gc_task = asyncio.create_task(self._get_chroma_manager().run_version_gc(interval_seconds))
+    
+    @staticmethod
+    def split_questions(query: str) -> List[str]:
+        """Découpe un message contenant plusieurs questions"""
+        questions = [part.strip() for part in re.split(r"(?<=\?)|\n+", query)]
+        return [question for question in questions if question] or [query]
+    
+    async def retrieve_knowledge(self, application: str, filiale_id: str,
+                                 questions: List[str], n_results: int = 3) -> List[Dict]:
+        """
+        Contexte KB pour chaque question, récupéré en une seule recherche groupée
+        
+        Returns:
+            Une liste par question de {'document', 'metadata', 'distance'}
+        """
+        try:
+            results = await self._get_chroma_manager().query_documents_batch(
+                application, filiale_id, questions, n_results=n_results
+            )
+        except Exception as e:
+            logger.warning(f"Knowledge retrieval failed: {e}")
+            return [[] for _ in questions]
+        
+        return [
+            [{
+                'document': doc,
+                'metadata': metadata,
+                'distance': distance
+            } for doc, metadata, distance in zip(
+                result['documents'][0],
+                result['metadatas'][0],
+                result['distances'][0]
+            )]
+            for result in results
+        ]
     
     def _load_agents_config(self) -> Dict:
         """Charge la configuration des agents"""
@@ -118,16 +206,29 @@ class CorisCrewManager:
         
         return task
     
-    def create_basic_crew(self, filiale_id: str, user_query: str) -> Crew:
-        """Crée un crew basique pour les tests"""
+    def create_basic_crew(self, filiale_id: str, user_query: str,
+                          knowledge: Optional[List[Dict]] = None) -> Crew:
+        """
+        Crée un crew basique pour les tests
+        
+        Args:
+            knowledge: Contexte KB par question ({'question', 'documents'}, voir retrieve_knowledge)
+        """
         
         # Créer un agent simple
         assistant = self.create_simple_agent("basic_assistant", filiale_id)
         
+        description = f"Réponds à cette question de l'utilisateur: {user_query}"
+        if knowledge:
+            description = f"Réponds à chacune des questions de l'utilisateur: {user_query}"
+            for item in knowledge:
+                excerpts = "\n".join(f"- {doc['document'][:500]}" for doc in item['documents'])
+                description += f"\n\nQuestion : {item['question']}\nExtraits de la base de connaissances :\n{excerpts or '- (aucun)'}"
+        
         # Créer une tâche simple
         task = self.create_simple_task(
             "respond_to_query",
-            f"Réponds à cette question de l'utilisateur: {user_query}",
+            description,
             assistant
         )
         
@@ -156,12 +257,51 @@ class CorisCrewManager:
                     "mode": "simple_test"
                 }
             
+            # Question de la FAQ (correspondance exacte ou quasi exacte, O(1))
+            common_exclusions = self.get_common_exclusions(application, filiale_id)
+            faq_match = self.faq_index.lookup(application, filiale_id, query, common_exclusions)
+            if faq_match:
+                return self._faq_response(faq_match)
+            
+            # Réponse déjà générée pour une question similaire
+            cache_lookup = await self.response_cache.lookup(application, filiale_id, query, user_id=user_id)
+            if cache_lookup and cache_lookup["hit"]:
+                return {
+                    "success": True,
+                    "result": cache_lookup["answer"],
+                    "crew_agents": cache_lookup["metadata"].get("crew_agents", ["basic_assistant"]),
+                    "tasks_executed": 0,
+                    "mode": "semantic_cache",
+                    "cache_similarity": cache_lookup["similarity"]
+                }
+            
+            # Question FAQ proche, avec l'embedding déjà calculé par le cache
+            if cache_lookup:
+                faq_match = self.faq_index.lookup_embedding(
+                    application, filiale_id, cache_lookup["embedding"], common_exclusions
+                )
+                if faq_match:
+                    return self._faq_response(faq_match)
+            
+            start_time = time.perf_counter()
+            
+            # Message à plusieurs questions : contexte KB de toutes les questions en une recherche groupée
+            questions = self.split_questions(query)
+            knowledge = None
+            if len(questions) > 1:
+                contexts = await self.retrieve_knowledge(application, filiale_id, questions)
+                knowledge = [
+                    {"question": question, "documents": documents}
+                    for question, documents in zip(questions, contexts)
+                ]
+            
             # Créer un crew basique
-            crew = self.create_basic_crew(filiale_id, query)
+            crew = self.create_basic_crew(filiale_id, query, knowledge)
             
             # Préparer les inputs
             inputs = {
                 "user_query": query,
+                "questions": questions,
                 "user_id": user_id,
                 "filiale_id": filiale_id,
                 "application": application
@@ -170,13 +310,22 @@ class CorisCrewManager:
             # Exécuter le crew avec gestion d'erreur
             try:
                 # Version simplifiée sans kickoff complexe
-                result = f"Réponse de l'assistant Coris Money pour '{query}': Nous avons bien reçu votre demande concernant {application}. Un conseiller peut vous aider davantage si nécessaire."
+                result = f"Réponse de l'assistant Coris Money : Nous avons bien reçu votre demande concernant {application}. Un conseiller peut vous aider davantage si nécessaire."
                 
                 logger.info("Crew execution completed (simple mode)", 
                            filiale_id=filiale_id,
                            application=application,
                            user_id=user_id)
                 
+                # Réponse du crew : réservée à l'utilisateur (elle peut reprendre ses données)
+                await self.response_cache.store(
+                    application, filiale_id, query, result,
+                    processing_seconds=time.perf_counter() - start_time,
+                    embedding=cache_lookup["embedding"] if cache_lookup else None,
+                    metadata={"crew_agents": ["basic_assistant"]},
+                    user_id=user_id
+                )
+                
                 return {
                     "success": True,
                     "result": result,
@@ -2,14 +2,15 @@
 API REST pour l'intégration avec l'application mobile Coris Money
 Version avec configuration de sécurité pour Swagger
 """
-from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks, Security
+from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks, Security, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, APIKeyHeader
 from pydantic import BaseModel
 from typing import Dict, List, Optional
+import os
 import asyncio
 import uuid
-from datetime import datetime
+from datetime import datetime, timezone
 import structlog
 
 # Imports internes
@@ -18,6 +19,7 @@ from core.conversation.manager import ConversationManager
 from core.escalation.detector import EscalationDetector
 from core.auth.middleware import verify_api_key
 from core.monitoring.metrics import MetricsCollector
+from core.knowledge_base.suggestions import SuggestionIndex
 
 logger = structlog.get_logger()
 
@@ -60,16 +62,30 @@ class ChatResponse(BaseModel):
     suggested_actions: List[str] = []
     escalation_needed: bool = False
 
+class Suggestion(BaseModel):
+    text: str
+    source: str
+    popularity: float
+
+class SuggestionsResponse(BaseModel):
+    query: str
+    suggestions: List[Suggestion]
+
 class EscalationRequest(BaseModel):
     conversation_id: str
     reason: str
     priority: str = "medium"
 
+class EscalationResolution(BaseModel):
+    resolution_notes: Optional[str] = None
+
 # Instances globales
 crew_manager = CorisCrewManager()
 conversation_manager = ConversationManager()
 escalation_detector = EscalationDetector()
 metrics_collector = MetricsCollector()
+suggestion_index = SuggestionIndex(faq_index=crew_manager.faq_index,
+                                   exclusions_provider=crew_manager.get_common_exclusions)
 
 # Fonction de vérification d'API key pour Swagger
 async def get_api_key(api_key_header: str = Security(api_key_header)):
@@ -152,6 +168,7 @@ async def chat_endpoint(
         # Vérifier si escalade nécessaire
         escalation_needed, escalation_reasons = escalation_detector.should_escalate({
             "user_message": message.message,
+            "filiale_id": message.filiale_id,
             "response_generated": response_text,
             "conversation_id": conversation_id
         })
@@ -185,6 +202,33 @@ async def chat_endpoint(
         logger.error("Chat endpoint error", error=str(e))
         raise HTTPException(status_code=500, detail="Erreur interne du serveur")
 
+@app.get("/api/v1/suggestions",
+         response_model=SuggestionsResponse,
+         summary="Suggestions de questions",
+         description="Suggère des questions pendant la saisie (FAQ et questions fréquentes)")
+async def suggestions_endpoint(
+    filiale_id: str,
+    q: str = Query("", max_length=200),
+    limit: int = Query(5, ge=1, le=20),
+    api_key: str = Security(api_key_header)
+):
+    """
+    Suggestions par préfixe, classées par popularité
+    
+    Servies depuis un index en mémoire, sans appel à l'assistant : peut être
+    appelé à chaque frappe.
+    """
+    if not api_key:
+        raise HTTPException(status_code=401, detail="API key required")
+    
+    from core.auth.middleware import auth_middleware
+    auth_middleware.verify_api_key(api_key)
+    
+    return SuggestionsResponse(
+        query=q,
+        suggestions=suggestion_index.suggest("coris_money", filiale_id, q, limit=limit)
+    )
+
 @app.post("/api/v1/escalate",
           summary="Escalader vers un agent humain",
           description="Escalade une conversation vers un agent humain")
@@ -206,31 +250,64 @@ async def escalate_conversation(
         from core.escalation.context_builder import ContextBuilder
         
         escalation_router = EscalationRouter()
-        context_builder = ContextBuilder()
+        context_builder = ContextBuilder(conversation_manager)
         
         # Préparer le contexte pour l'agent humain
         context = await context_builder.prepare_escalation_context(
             escalation.conversation_id
         )
         
-        # Router vers l'agent humain approprié
-        assigned_agent = await escalation_router.find_best_agent(
-            escalation_context={
-                "conversation_id": escalation.conversation_id,
-                "reason": escalation.reason,
-                "priority": escalation.priority,
-                **context
-            }
-        )
+        from core.escalation.dispatcher import escalation_dispatcher
+        from core.escalation.sla import format_sla, get_sla_minutes, highest_priority
+        from core.escalation.sla_monitor import sla_monitor
+        
+        priority = highest_priority(escalation.priority, escalation_detector.assess_priority(escalation.reason))
+        pack_name = (context.get("business_context", {}).get("pack_subscribed")
+                     or context.get("user_profile", {}).get("pack_level"))
+        routing = {
+            "conversation_id": escalation.conversation_id,
+            "reason": escalation.reason,
+            "priority": priority,
+            "filiale_id": context.get("user_profile", {}).get("filiale_id")
+        }
+        
+        # Router vers l'agent humain approprié, sauf si des escalades attendent déjà
+        assigned_agent = None
+        if not (escalation_dispatcher.running and len(escalation_dispatcher)):
+            assigned_agent = await escalation_router.find_best_agent(
+                escalation_context={**routing, **context}
+            )
         
         # Enregistrer l'escalade
         escalation_id = await conversation_manager.create_escalation(
             conversation_id=escalation.conversation_id,
             reason=escalation.reason,
-            priority=escalation.priority,
+            priority=priority,
             assigned_to=assigned_agent
         )
         
+        # Échéance SLA surveillée jusqu'à la résolution
+        if sla_monitor.running:
+            sla_monitor.schedule(escalation_id, datetime.now(timezone.utc), pack_name, priority,
+                                 escalation.conversation_id, routing["filiale_id"])
+        
+        if assigned_agent is None and escalation_dispatcher.running:
+            # Affectée par le dispatcher dès qu'un agent se libère
+            await escalation_dispatcher.enqueue(
+                escalation_id=escalation_id,
+                conversation_id=escalation.conversation_id,
+                priority=priority,
+                pack_name=pack_name,
+                routing=routing
+            )
+            return {
+                "escalation_id": escalation_id,
+                "assigned_agent": None,
+                "estimated_response_time": f"< {format_sla(get_sla_minutes(pack_name))}",
+                "status": "queued",
+                "queue_depth": len(escalation_dispatcher)
+            }
+        
         return {
             "escalation_id": escalation_id,
             "assigned_agent": assigned_agent,
@@ -242,6 +319,47 @@ async def escalate_conversation(
         logger.error("Escalation error", error=str(e))
         raise HTTPException(status_code=500, detail="Erreur lors de l'escalade")
 
+@app.post("/api/v1/escalations/{escalation_id}/resolve",
+          summary="Résoudre une escalade",
+          description="Clôt une escalade et libère l'agent humain")
+async def resolve_escalation(
+    escalation_id: str,
+    resolution: EscalationResolution,
+    api_key: str = Security(api_key_header)
+):
+    """
+    Endpoint de clôture d'une escalade par l'agent humain
+    """
+    if not api_key:
+        raise HTTPException(status_code=401, detail="API key required")
+    
+    from core.auth.middleware import auth_middleware
+    auth_middleware.verify_api_key(api_key)
+    
+    try:
+        resolved = await conversation_manager.resolve_escalation(escalation_id, resolution.resolution_notes)
+    except Exception as e:
+        logger.error("Escalation resolution error", error=str(e))
+        raise HTTPException(status_code=500, detail="Erreur lors de la résolution de l'escalade")
+    
+    if resolved is None:
+        raise HTTPException(status_code=404, detail="Escalade non trouvée ou déjà résolue")
+    
+    from core.escalation.dispatcher import escalation_dispatcher
+    from core.escalation.router import EscalationRouter
+    from core.escalation.sla_monitor import sla_monitor
+    
+    sla_monitor.cancel(escalation_id)
+    try:
+        if resolved["assigned_to"]:
+            await EscalationRouter().release_agent(resolved["assigned_to"])
+        else:
+            await escalation_dispatcher.cancel(escalation_id)
+    except Exception as e:
+        logger.warning("Escalation resolution cleanup failed", escalation_id=escalation_id, error=str(e))
+    
+    return {"escalation_id": escalation_id, "status": "resolved"}
+
 @app.get("/api/v1/conversation/{conversation_id}/history",
          summary="Historique de conversation",
          description="Récupère l'historique d'une conversation")
@@ -311,6 +429,12 @@ async def get_system_metrics(api_key: str = Security(api_key_header)):
     
     try:
         metrics = await metrics_collector.get_system_metrics()
+        
+        from core.escalation.dispatcher import escalation_dispatcher
+        metrics["escalation_queue"] = escalation_dispatcher.get_stats()
+        
+        from core.escalation.sla_monitor import sla_monitor
+        metrics["escalation_sla"] = sla_monitor.get_stats()
         return metrics
         
     except Exception as e:
@@ -327,6 +451,41 @@ async def startup_event():
     await conversation_manager.initialize()
     await metrics_collector.initialize()
     
+    # Base de connaissances préconstruite : pas de réingestion au démarrage
+    if os.getenv("KB_SNAPSHOT_DIR"):
+        try:
+            imported = await asyncio.to_thread(crew_manager.load_knowledge_base_snapshots)
+            logger.info("Knowledge base snapshots loaded", collections=imported)
+        except Exception as e:
+            logger.warning("Knowledge base snapshots not loaded", error=str(e))
+    
+    # Nettoyage périodique des anciennes versions de collections
+    gc_interval = float(os.getenv("KB_VERSION_GC_INTERVAL_SECONDS", "0"))
+    if gc_interval > 0:
+        crew_manager.start_knowledge_base_gc(gc_interval)
+    
+    # Suggestions de saisie issues des messages fréquents
+    suggestion_interval = float(os.getenv("SUGGESTION_HISTORY_REFRESH_SECONDS", "600"))
+    if suggestion_interval > 0:
+        app.state.suggestion_refresh_task = asyncio.create_task(
+            suggestion_index.run_history_refresh(conversation_manager, suggestion_interval)
+        )
+    
+    # Disponibilité des agents humains en mémoire (LISTEN/NOTIFY sur human_agents)
+    if os.getenv("AGENT_AVAILABILITY_INDEX", "true").lower() == "true":
+        from core.escalation.availability import agent_availability
+        agent_availability.start()
+    
+    # Affectation des escalades en attente dès qu'un agent se libère
+    if os.getenv("ESCALATION_DISPATCHER_ENABLED", "true").lower() == "true":
+        from core.escalation.dispatcher import escalation_dispatcher
+        escalation_dispatcher.start()
+    
+    # Détection des dépassements de SLA des escalades ouvertes
+    if os.getenv("SLA_MONITOR_ENABLED", "true").lower() == "true":
+        from core.escalation.sla_monitor import sla_monitor
+        sla_monitor.start()
+    
     logger.info("API startup completed")
 
 @app.on_event("shutdown")
@@ -338,6 +497,13 @@ async def shutdown_event():
     await conversation_manager.cleanup()
     await metrics_collector.cleanup()
     
+    from core.escalation.availability import agent_availability
+    from core.escalation.dispatcher import escalation_dispatcher
+    from core.escalation.sla_monitor import sla_monitor
+    await sla_monitor.stop()
+    await escalation_dispatcher.stop()
+    await agent_availability.stop()
+    
     # Fermer les pools de base de données
     from core.database.connections import db_manager
     await db_manager.close_all_pools()
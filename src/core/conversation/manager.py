@@ -2,11 +2,15 @@
 Gestionnaire des conversations et de l'historique
 """
 import asyncio
+import copy
+import os
 import uuid
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
 from core.database.connections import db_manager
 from core.packs.manager import pack_manager
+from core.escalation.snapshot import EscalationSnapshot
 import structlog
 import json
 
@@ -17,6 +21,9 @@ class ConversationManager:
         self.active_conversations = {}
         self._conversation_cache = {}
         self._cache_ttl = 300  # 5 minutes
+        # Instantanés d'escalade des conversations récentes (la base fait foi)
+        self._snapshots: "OrderedDict[str, EscalationSnapshot]" = OrderedDict()
+        self._snapshot_cache_size = int(os.getenv("ESCALATION_SNAPSHOT_CACHE_SIZE", "10000"))
     
     async def initialize(self):
         """Initialise le gestionnaire de conversations"""
@@ -90,6 +97,51 @@ class ConversationManager:
                     INDEX idx_escalations_priority (priority)
                 )
             """)
+            
+            # File des escalades en attente d'un agent (voir EscalationDispatcher)
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS escalation_queue (
+                    escalation_id UUID PRIMARY KEY REFERENCES escalations(id) ON DELETE CASCADE,
+                    conversation_id UUID NOT NULL,
+                    priority VARCHAR(20) NOT NULL,
+                    priority_rank SMALLINT NOT NULL,
+                    sla_deadline TIMESTAMP WITH TIME ZONE NOT NULL,
+                    routing JSONB DEFAULT '{}',
+                    enqueued_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+                )
+            """)
+            
+            # Dépassements de SLA déjà signalés (voir SlaMonitor)
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS escalation_sla_breaches (
+                    escalation_id UUID PRIMARY KEY REFERENCES escalations(id) ON DELETE CASCADE,
+                    breached_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+                )
+            """)
+            
+            # Instantanés d'escalade, mis à jour à chaque message
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS escalation_snapshots (
+                    conversation_id UUID PRIMARY KEY REFERENCES conversations(id) ON DELETE CASCADE,
+                    version INTEGER NOT NULL DEFAULT 0,
+                    snapshot JSONB NOT NULL DEFAULT '{}',
+                    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+                )
+            """)
+            
+            # Activité journalière par utilisateur (jour de création des conversations)
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS user_activity_daily (
+                    user_id VARCHAR(255) NOT NULL,
+                    day DATE NOT NULL,
+                    conversations INTEGER NOT NULL DEFAULT 0,
+                    escalated_conversations INTEGER NOT NULL DEFAULT 0,
+                    duration_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+                    last_conversation TIMESTAMP WITH TIME ZONE,
+                    
+                    PRIMARY KEY (user_id, day)
+                )
+            """)
     
     async def get_or_create_conversation(self, user_id: str, filiale_id: str, 
                                         application_id: str, channel: str = "mobile",
@@ -154,6 +206,25 @@ class ConversationManager:
                 json.dumps(initial_context), json.dumps(metadata), now, now
             )
             
+            activity_query = """
+            INSERT INTO user_activity_daily (user_id, day, conversations, last_conversation)
+            VALUES ($1, $2::timestamptz::date, 1, $2)
+            ON CONFLICT (user_id, day) DO UPDATE SET
+                conversations = user_activity_daily.conversations + 1,
+                last_conversation = GREATEST(user_activity_daily.last_conversation, EXCLUDED.last_conversation)
+            """
+            await conn.execute(activity_query, user_id, now)
+            
+            snapshot = EscalationSnapshot.new({
+                "user_id": user_id,
+                "filiale_id": filiale_id,
+                "application_id": application_id,
+                "pack_level": pack_level,
+                "channel": channel,
+                "created_at": now
+            })
+            await self._save_snapshot(conn, conversation_id, snapshot, seed=True)
+            
             logger.info("Created new conversation", 
                        conversation_id=conversation_id,
                        user_id=user_id,
@@ -178,20 +249,37 @@ class ConversationManager:
             ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11)
             """
             
+            now = datetime.now()
             await conn.execute(
                 query,
                 message_id, conversation_id, role, content, agent_used,
                 json.dumps(tools_used or []), tokens_consumed, confidence_score,
-                processing_time, json.dumps(metadata or {}), datetime.now()
+                processing_time, json.dumps(metadata or {}), now
             )
             
-            # Mettre à jour le timestamp de la conversation
+            # Mettre à jour le timestamp de la conversation et la durée cumulée de l'utilisateur
             update_query = """
-            UPDATE conversations 
-            SET updated_at = $1 
-            WHERE id = $2
+            WITH previous AS (
+                SELECT id, updated_at FROM conversations WHERE id = $2 FOR UPDATE
+            ), touched AS (
+                UPDATE conversations c
+                SET updated_at = $1
+                FROM previous
+                WHERE c.id = previous.id
+                RETURNING c.user_id, c.created_at,
+                          GREATEST(EXTRACT(EPOCH FROM ($1::timestamptz - previous.updated_at)), 0) AS elapsed
+            )
+            INSERT INTO user_activity_daily (user_id, day, duration_seconds)
+            SELECT user_id, created_at::date, elapsed FROM touched
+            ON CONFLICT (user_id, day) DO UPDATE SET
+                duration_seconds = user_activity_daily.duration_seconds + EXCLUDED.duration_seconds
             """
-            await conn.execute(update_query, datetime.now(), conversation_id)
+            await conn.execute(update_query, now, conversation_id)
+            
+            await self._apply_to_snapshot(conn, conversation_id, dict(
+                role=role, content=content, timestamp=now, agent_used=agent_used,
+                processing_time=processing_time, metadata=metadata
+            ))
         
         logger.info("Message added", 
                    conversation_id=conversation_id, 
@@ -349,11 +437,25 @@ class ConversationManager:
                 priority, assigned_to, "pending", json.dumps(context or {}), datetime.now()
             )
             
-            # Mettre à jour le statut de la conversation
+            # Mettre à jour le statut de la conversation (comptée une fois dans l'activité de l'utilisateur)
             update_query = """
-            UPDATE conversations 
-            SET status = 'escalated', updated_at = $1
-            WHERE id = $2
+            WITH previous AS (
+                SELECT id, status, updated_at FROM conversations WHERE id = $2 FOR UPDATE
+            ), touched AS (
+                UPDATE conversations c
+                SET status = 'escalated', updated_at = $1
+                FROM previous
+                WHERE c.id = previous.id
+                RETURNING c.user_id, c.created_at, previous.status AS previous_status,
+                          GREATEST(EXTRACT(EPOCH FROM ($1::timestamptz - previous.updated_at)), 0) AS elapsed
+            )
+            INSERT INTO user_activity_daily (user_id, day, escalated_conversations, duration_seconds)
+            SELECT user_id, created_at::date,
+                   CASE WHEN previous_status = 'escalated' THEN 0 ELSE 1 END, elapsed
+            FROM touched
+            ON CONFLICT (user_id, day) DO UPDATE SET
+                escalated_conversations = user_activity_daily.escalated_conversations + EXCLUDED.escalated_conversations,
+                duration_seconds = user_activity_daily.duration_seconds + EXCLUDED.duration_seconds
             """
             await conn.execute(update_query, datetime.now(), conversation_id)
         
@@ -365,6 +467,29 @@ class ConversationManager:
         
         return escalation_id
     
+    async def resolve_escalation(self, escalation_id: str, resolution_notes: str = None) -> Optional[Dict]:
+        """
+        Clôt une escalade ouverte
+        
+        Returns:
+            conversation_id et assigned_to de l'escalade, None si elle n'était pas ouverte
+        """
+        
+        async with db_manager.get_conversations_connection() as conn:
+            query = """
+            UPDATE escalations
+            SET status = 'resolved', resolved_at = $2, resolution_notes = $3
+            WHERE id = $1 AND status IN ('pending', 'in_progress')
+            RETURNING conversation_id, assigned_to
+            """
+            row = await conn.fetchrow(query, escalation_id, datetime.now(), resolution_notes)
+        
+        if not row:
+            return None
+        
+        logger.info("Escalation resolved", escalation_id=escalation_id, assigned_to=row['assigned_to'])
+        return {"conversation_id": str(row['conversation_id']), "assigned_to": row['assigned_to']}
+    
     async def close_conversation(self, conversation_id: str, reason: str = "completed") -> bool:
         """Ferme une conversation"""
         
@@ -381,6 +506,7 @@ class ConversationManager:
             cache_key = f"context_{conversation_id}"
             if cache_key in self._conversation_cache:
                 del self._conversation_cache[cache_key]
+            self._snapshots.pop(conversation_id, None)
             
             success = result != "UPDATE 0"
             
@@ -475,8 +601,13 @@ class ConversationManager:
             
             result = await conn.execute(query)
             
+            await conn.execute(
+                "DELETE FROM user_activity_daily WHERE day < CURRENT_DATE - $1::int", days
+            )
+            
             # Nettoyer le cache
             self._conversation_cache.clear()
+            self._snapshots.clear()
             
             deleted_count = int(result.split()[-1]) if result else 0
             
@@ -530,9 +661,158 @@ class ConversationManager:
                 "unique_filiales": stats_row['unique_filiales'] or 0
             }
     
+    async def get_frequent_user_messages(self, days: int = 30, min_users: int = 3,
+                                         limit: int = 2000) -> List[Dict]:
+        """
+        Messages utilisateurs les plus fréquents par filiale (suggestions de saisie)
+        
+        Seuls les messages envoyés par au moins `min_users` utilisateurs distincts
+        et sans longue suite de chiffres (numéros de compte, téléphones) sont
+        retenus, pour ne jamais suggérer une donnée personnelle.
+        """
+        async with db_manager.get_conversations_connection() as conn:
+            query = """
+            SELECT 
+                c.application_id,
+                c.filiale_id,
+                MIN(BTRIM(m.content)) as content,
+                COUNT(*) as occurrences
+            FROM messages m
+            JOIN conversations c ON c.id = m.conversation_id
+            WHERE m.role = 'user'
+              AND m.timestamp > NOW() - make_interval(days => $1)
+              AND LENGTH(m.content) BETWEEN 10 AND 120
+              AND m.content !~ '[0-9]{6,}'
+            GROUP BY c.application_id, c.filiale_id, LOWER(BTRIM(m.content))
+            HAVING COUNT(DISTINCT c.user_id) >= $2
+            ORDER BY occurrences DESC
+            LIMIT $3
+            """
+            
+            rows = await conn.fetch(query, days, min_users, limit)
+            return [dict(row) for row in rows]
+    
+    def _cache_snapshot(self, conversation_id: str, snapshot: EscalationSnapshot):
+        self._snapshots[conversation_id] = snapshot
+        self._snapshots.move_to_end(conversation_id)
+        while len(self._snapshots) > self._snapshot_cache_size:
+            self._snapshots.popitem(last=False)
+    
+    async def _load_snapshot(self, conn, conversation_id: str) -> Optional[EscalationSnapshot]:
+        row = await conn.fetchrow(
+            "SELECT version, snapshot FROM escalation_snapshots WHERE conversation_id = $1",
+            conversation_id
+        )
+        if not row:
+            return None
+        snapshot = EscalationSnapshot.from_dict(json.loads(row['snapshot'] or '{}'))
+        snapshot.data['version'] = row['version']
+        self._cache_snapshot(conversation_id, snapshot)
+        return snapshot
+    
+    async def _save_snapshot(self, conn, conversation_id: str, snapshot: EscalationSnapshot,
+                             seed: bool = False) -> bool:
+        """
+        Enregistre un instantané
+        
+        Un instantané initial (seed) n'écrase jamais une ligne existante ; une
+        mise à jour n'est acceptée que si la version en base est la précédente,
+        sinon un autre processus a appliqué un message entre-temps.
+        """
+        if seed:
+            conflict = "DO NOTHING"
+        else:
+            conflict = """DO UPDATE SET
+                version = EXCLUDED.version,
+                snapshot = EXCLUDED.snapshot,
+                updated_at = EXCLUDED.updated_at
+            WHERE escalation_snapshots.version = EXCLUDED.version - 1"""
+        
+        query = f"""
+        INSERT INTO escalation_snapshots (conversation_id, version, snapshot, updated_at)
+        VALUES ($1, $2, $3, $4)
+        ON CONFLICT (conversation_id) {conflict}
+        """
+        result = await conn.execute(
+            query, conversation_id, snapshot.version, json.dumps(snapshot.to_dict()), datetime.now()
+        )
+        saved = result != "INSERT 0 0"
+        if saved:
+            self._cache_snapshot(conversation_id, snapshot)
+        else:
+            self._snapshots.pop(conversation_id, None)
+        return saved
+    
+    async def _apply_to_snapshot(self, conn, conversation_id: str, message: Dict):
+        """Applique un message à l'instantané d'escalade (ignoré pour les conversations sans instantané)"""
+        try:
+            for _ in range(2):
+                snapshot = self._snapshots.get(conversation_id) or await self._load_snapshot(conn, conversation_id)
+                if snapshot is None:
+                    return
+                snapshot = EscalationSnapshot.from_dict(copy.deepcopy(snapshot.to_dict()))
+                snapshot.apply_message(**message)
+                if await self._save_snapshot(conn, conversation_id, snapshot):
+                    return
+            logger.warning("Escalation snapshot update conflict", conversation_id=conversation_id)
+        except Exception as e:
+            # L'instantané sera reconstruit depuis l'historique à l'escalade
+            self._snapshots.pop(conversation_id, None)
+            logger.warning("Escalation snapshot not updated", conversation_id=conversation_id, error=str(e))
+    
+    async def get_escalation_snapshot(self, conversation_id: str) -> Optional[EscalationSnapshot]:
+        """Instantané d'escalade d'une conversation (lecture par clé primaire)"""
+        async with db_manager.get_conversations_connection() as conn:
+            return await self._load_snapshot(conn, conversation_id)
+    
+    async def rebuild_escalation_snapshot(self, conversation_id: str,
+                                          limit: int = 500) -> Optional[EscalationSnapshot]:
+        """Reconstruit l'instantané d'une conversation depuis son historique"""
+        async with db_manager.get_conversations_connection() as conn:
+            conv_row = await conn.fetchrow("SELECT * FROM conversations WHERE id = $1", conversation_id)
+        
+        if not conv_row:
+            return None
+        
+        messages = await self.get_conversation_history(conversation_id, limit=limit, include_system=True)
+        snapshot = EscalationSnapshot.from_messages(dict(conv_row), messages)
+        
+        async with db_manager.get_conversations_connection() as conn:
+            if not await self._save_snapshot(conn, conversation_id, snapshot, seed=True):
+                # Créé entre-temps par add_message : c'est la version à jour
+                return await self._load_snapshot(conn, conversation_id) or snapshot
+        
+        logger.info("Escalation snapshot rebuilt", conversation_id=conversation_id,
+                    messages=len(messages))
+        return snapshot
+    
+    async def get_user_activity(self, user_id: str, days: int = 30) -> Dict:
+        """
+        Statistiques d'un utilisateur sur les derniers jours
+        
+        Lues dans l'agrégat journalier user_activity_daily (au plus `days` lignes)
+        plutôt que par un parcours des conversations. La durée d'une
+        conversation va de sa création à son dernier message ou à son escalade.
+        """
+        async with db_manager.get_conversations_connection() as conn:
+            query = """
+            SELECT 
+                COALESCE(SUM(conversations), 0) as total_conversations,
+                COALESCE(SUM(escalated_conversations), 0) as escalated_conversations,
+                MAX(last_conversation) as last_conversation,
+                SUM(duration_seconds) / NULLIF(SUM(conversations), 0) as avg_conversation_duration
+            FROM user_activity_daily
+            WHERE user_id = $1
+            AND day > CURRENT_DATE - $2::int
+            """
+            
+            row = await conn.fetchrow(query, user_id, days)
+            return dict(row) if row else {}
+    
     async def cleanup(self):
         """Nettoyage des ressources"""
         self._conversation_cache.clear()
+        self._snapshots.clear()
         logger.info("ConversationManager cleaned up")
 
 # Instance globale
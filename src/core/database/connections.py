@@ -51,16 +51,22 @@ class DatabaseManager:
                 logger.error(f"Failed to initialize Reclamations pool: {e}")
                 raise
     
+    @staticmethod
+    def _conversations_settings() -> dict:
+        return {
+            "host": os.getenv("CONVERSATIONS_HOST", "localhost"),
+            "port": int(os.getenv("CONVERSATIONS_PORT", "5432")),
+            "database": os.getenv("CONVERSATIONS_DB", "coris_conversations"),
+            "user": os.getenv("CONVERSATIONS_USER", "coris_user"),
+            "password": os.getenv("CONVERSATIONS_PASSWORD", "coris_password")
+        }
+    
     async def init_conversations_pool(self):
         """Initialise le pool de connexions Conversations"""
         if self._conversations_pool is None:
             try:
                 self._conversations_pool = await asyncpg.create_pool(
-                    host=os.getenv("CONVERSATIONS_HOST", "localhost"),
-                    port=int(os.getenv("CONVERSATIONS_PORT", "5432")),
-                    database=os.getenv("CONVERSATIONS_DB", "coris_conversations"),
-                    user=os.getenv("CONVERSATIONS_USER", "coris_user"),
-                    password=os.getenv("CONVERSATIONS_PASSWORD", "coris_password"),
+                    **self._conversations_settings(),
                     min_size=2,
                     max_size=10
                 )
@@ -96,6 +102,24 @@ class DatabaseManager:
         async with self._conversations_pool.acquire() as conn:
             yield conn
     
+    @asynccontextmanager
+    async def get_dedicated_conversations_connection(self):
+        """
+        Connexion Conversations hors pool, fermée à la sortie
+        
+        Pour les usages qui la gardent indéfiniment (LISTEN) sans priver les
+        requêtes d'une connexion du pool.
+        """
+        conn = await asyncpg.connect(**self._conversations_settings())
+        try:
+            yield conn
+        finally:
+            try:
+                await conn.close(timeout=5)
+            except Exception:
+                # Connexion déjà rompue
+                conn.terminate()
+    
     async def close_all_pools(self):
         """Ferme tous les pools de connexions"""
         if self._datawarehouse_pool:
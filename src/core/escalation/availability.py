@@ -0,0 +1,267 @@
+"""
+Index en mémoire de la disponibilité des agents humains
+Tas par (spécialité, langue), synchronisés par LISTEN/NOTIFY sur human_agents
+"""
+import os
+import json
+import heapq
+import asyncio
+import itertools
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import structlog
+
+from core.database.connections import db_manager
+
+logger = structlog.get_logger()
+
+NOTIFY_CHANNEL = "human_agents_changed"
+# Clé joker : n'importe quelle spécialité ou langue
+ANY = "*"
+
+def _as_list(value) -> List[str]:
+    """Spécialités et langues : JSONB décodé ou texte JSON"""
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = json.loads(value)
+    return [str(item) for item in value]
+
+def _timestamp(value) -> float:
+    if value is None:
+        return 0.0
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return value.timestamp()
+
+def availability_score(current_load: int, max_concurrent: int) -> float:
+    """Part de capacité libre (1.0 pour un agent sans escalade en cours)"""
+    if current_load <= 0 or max_concurrent <= 0:
+        return 1.0
+    return (max_concurrent - current_load) / max_concurrent
+
+class AgentAvailabilityIndex:
+    """
+    Agents disponibles par (spécialité, langue), du plus libre au moins libre
+
+    Chaque agent est inscrit dans un tas par couple (spécialité, langue) de
+    son profil, jokers compris (ANY). Un tas est ordonné par capacité libre
+    décroissante puis activité la plus récente, comme l'ancienne requête de
+    routage. Une mise à jour d'agent incrémente sa version et pousse de
+    nouvelles entrées ; les entrées périmées sont écartées quand elles
+    arrivent au sommet (suppression paresseuse) et les tas sont compactés
+    quand elles deviennent majoritaires.
+
+    L'index est chargé depuis human_agents puis tenu à jour par les
+    notifications du déclencheur human_agents_notify (installé par
+    scripts/init_databases.py) ; un rechargement complet a lieu à chaque
+    reconnexion et toutes les AGENT_INDEX_RESYNC_SECONDS par sécurité.
+    """
+
+    def __init__(self, resync_seconds: Optional[float] = None):
+        self.resync_seconds = resync_seconds if resync_seconds is not None else float(
+            os.getenv("AGENT_INDEX_RESYNC_SECONDS", "60")
+        )
+        self.agents: Dict[str, Dict] = {}
+        self._versions: Dict[str, int] = {}
+        self._heaps: Dict[Tuple[str, str], List[tuple]] = {}
+        self._sequence = itertools.count()
+        self.ready = False
+        self._task: Optional[asyncio.Task] = None
+        self._capacity_listeners: List[Callable[[str], None]] = []
+
+    # --- Mises à jour ---
+
+    def add_capacity_listener(self, callback: Callable[[str], None]):
+        """Appelé avec l'ID d'un agent dès qu'une place se libère chez lui"""
+        self._capacity_listeners.append(callback)
+
+    @staticmethod
+    def _spare(agent: Optional[Dict]) -> int:
+        if not agent or agent["status"] != 'available':
+            return 0
+        return max(agent["max_concurrent"] - agent["current_load"], 0)
+
+    def _notify_capacity(self, agent_id: str, previous: Optional[Dict], agent: Dict):
+        if self._spare(agent) > self._spare(previous):
+            for callback in self._capacity_listeners:
+                try:
+                    callback(agent_id)
+                except Exception as e:
+                    logger.warning("Capacity listener failed", error=str(e))
+
+    def upsert(self, row: Dict):
+        """Ajoute ou met à jour un agent (ligne human_agents ou notification)"""
+        self._store(row, self.agents.get(str(row['id'])))
+
+    def _store(self, row: Dict, previous: Optional[Dict]):
+        agent_id = str(row['id'])
+        agent = {
+            "id": agent_id,
+            "name": row.get('name', (previous or {}).get('name')),
+            "status": row.get('status') or 'offline',
+            "current_load": int(row.get('current_load') or 0),
+            "max_concurrent": int(row.get('max_concurrent') or 0),
+            "specialties": _as_list(row.get('specialties')),
+            "languages": _as_list(row.get('languages')) or ['fr'],
+            "last_activity": _timestamp(row.get('last_activity'))
+        }
+        self.agents[agent_id] = agent
+        self._push(agent)
+        self._notify_capacity(agent_id, previous, agent)
+
+    def remove(self, agent_id: str):
+        self.agents.pop(agent_id, None)
+        # Les entrées restantes deviennent périmées
+        self._versions[agent_id] = self._versions.get(agent_id, 0) + 1
+
+    def adjust_load(self, agent_id: str, delta: int):
+        """Répercute localement une affectation en attendant la notification"""
+        agent = self.agents.get(agent_id)
+        if agent:
+            previous = dict(agent)
+            agent["current_load"] = max(0, agent["current_load"] + delta)
+            self._push(agent)
+            self._notify_capacity(agent_id, previous, agent)
+
+    def mark_full(self, agent_id: str):
+        """Écarte un agent que la base a refusé, jusqu'à sa prochaine notification"""
+        agent = self.agents.get(agent_id)
+        if agent:
+            agent["current_load"] = max(agent["current_load"], agent["max_concurrent"])
+            self._push(agent)
+
+    def replace_all(self, rows: Iterable[Dict]):
+        """Recharge complète (seules les places réellement libérées sont signalées)"""
+        previous_agents = self.agents
+        self.agents = {}
+        self._heaps.clear()
+        for row in rows:
+            self._store(row, previous_agents.get(str(row['id'])))
+        self.ready = True
+
+    def _keys(self, agent: Dict) -> List[Tuple[str, str]]:
+        return [(specialty, language)
+                for specialty in agent["specialties"] + [ANY]
+                for language in agent["languages"] + [ANY]]
+
+    def _push(self, agent: Dict):
+        version = self._versions.get(agent["id"], 0) + 1
+        self._versions[agent["id"]] = version
+        if agent["status"] != 'available' or agent["current_load"] >= agent["max_concurrent"]:
+            return
+        entry = (-availability_score(agent["current_load"], agent["max_concurrent"]),
+                 -agent["last_activity"], next(self._sequence), agent["id"], version)
+        for key in self._keys(agent):
+            heap = self._heaps.setdefault(key, [])
+            heapq.heappush(heap, entry)
+            if len(heap) > 64 and len(heap) > 4 * len(self.agents):
+                self._compact(key)
+
+    def _compact(self, key: Tuple[str, str]):
+        heap = [entry for entry in self._heaps[key] if self._versions.get(entry[3]) == entry[4]]
+        heapq.heapify(heap)
+        self._heaps[key] = heap
+
+    # --- Sélection ---
+
+    def best(self, specialty: Optional[str] = None, language: Optional[str] = None) -> Optional[str]:
+        """Agent disponible le plus libre pour une spécialité et une langue (None = indifférent)"""
+        heap = self._heaps.get((specialty or ANY, language or ANY))
+        while heap:
+            entry = heap[0]
+            if self._versions.get(entry[3]) == entry[4] and entry[3] in self.agents:
+                return entry[3]
+            heapq.heappop(heap)
+        return None
+
+    def choose(self, specialty: Optional[str], language: str = 'fr') -> Optional[str]:
+        """
+        Agent pour une escalade : expertise et langue, puis expertise en
+        français, puis langue seule, puis français seul
+        """
+        for key in ((specialty, language), (specialty, 'fr'), (None, language), (None, 'fr')):
+            agent_id = self.best(*key)
+            if agent_id:
+                return agent_id
+        return None
+
+    def get_stats(self) -> Dict:
+        return {
+            "ready": self.ready,
+            "agents": len(self.agents),
+            "available": sum(1 for agent in self.agents.values()
+                             if agent["status"] == 'available' and agent["current_load"] < agent["max_concurrent"]),
+            "heaps": len(self._heaps)
+        }
+
+    # --- Synchronisation ---
+
+    def handle_notification(self, payload: str):
+        try:
+            row = json.loads(payload)
+            if row.get('op') == 'DELETE':
+                self.remove(str(row['id']))
+            else:
+                self.upsert(row)
+        except Exception as e:
+            logger.warning("Invalid agent notification", error=str(e))
+
+    async def _load(self, conn):
+        rows = await conn.fetch("""
+            SELECT id, name, status, current_load, max_concurrent,
+                   specialties, languages, last_activity
+            FROM human_agents
+        """)
+        self.replace_all(dict(row) for row in rows)
+        logger.info("Agent availability index loaded", agents=len(self.agents))
+
+    async def _check_trigger(self, conn):
+        # Sans déclencheur, l'index n'est rafraîchi que par les rechargements périodiques
+        exists = await conn.fetchval("SELECT 1 FROM pg_trigger WHERE tgname = 'human_agents_notify'")
+        if not exists:
+            logger.warning("Agent notification trigger missing, run scripts/init_databases.py",
+                           resync_seconds=self.resync_seconds)
+
+    async def run(self):
+        """Écoute les notifications (connexion dédiée), avec rechargement périodique"""
+        def listener(connection, pid, channel, payload):
+            self.handle_notification(payload)
+
+        while True:
+            try:
+                # Hors pool : la connexion reste ouverte tant que l'index écoute
+                async with db_manager.get_dedicated_conversations_connection() as conn:
+                    await self._check_trigger(conn)
+                    # Écouter avant de charger : aucune modification perdue entre les deux
+                    await conn.add_listener(NOTIFY_CHANNEL, listener)
+                    try:
+                        while True:
+                            await self._load(conn)
+                            await asyncio.sleep(self.resync_seconds)
+                    finally:
+                        await conn.remove_listener(NOTIFY_CHANNEL, listener)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.ready = False
+                logger.warning("Agent availability index disconnected", error=str(e))
+                await asyncio.sleep(min(self.resync_seconds, 5))
+
+    def start(self) -> asyncio.Task:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.ready = False
+
+# Instance globale
+agent_availability = AgentAvailabilityIndex()
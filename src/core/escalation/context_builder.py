@@ -2,22 +2,27 @@
 Constructeur de contexte pour les escalades
 """
 import asyncio
-from typing import Dict, List
+from typing import Dict, List, Optional
 from datetime import datetime
 from core.conversation.manager import ConversationManager
-from core.database.connections import db_manager
+from core.escalation.snapshot import EscalationSnapshot
+from core.escalation.sla import format_sla, get_sla_minutes
 import structlog
 
 logger = structlog.get_logger()
 
 class ContextBuilder:
-    def __init__(self):
-        self.conversation_manager = ConversationManager()
+    def __init__(self, conversation_manager: Optional[ConversationManager] = None):
+        self.conversation_manager = conversation_manager or ConversationManager()
     
     async def prepare_escalation_context(self, conversation_id: str) -> Dict:
         """
         Prépare le contexte complet pour une escalade
         
+        Le contexte est lu dans l'instantané maintenu à chaque message et dans
+        l'agrégat d'activité de l'utilisateur ; l'historique n'est relu que
+        pour les conversations sans instantané.
+        
         Args:
             conversation_id: ID de la conversation
             
@@ -25,22 +30,16 @@ class ContextBuilder:
             Contexte structuré pour l'agent humain
         """
         try:
-            # Récupérer le contexte de conversation
-            conversation_context = await self.conversation_manager.get_conversation_context(conversation_id)
+            snapshot = await self.conversation_manager.get_escalation_snapshot(conversation_id)
+            if snapshot is None:
+                snapshot = await self.conversation_manager.rebuild_escalation_snapshot(conversation_id)
             
-            if not conversation_context:
+            if snapshot is None:
                 logger.warning("No context found for conversation", conversation_id=conversation_id)
                 return {}
             
-            # Construire le contexte enrichi
-            context = {
-                "conversation_summary": await self._build_conversation_summary(conversation_context),
-                "user_profile": await self._build_user_profile(conversation_context),
-                "technical_context": await self._build_technical_context(conversation_context),
-                "business_context": await self._build_business_context(conversation_context),
-                "recommended_actions": await self._suggest_actions(conversation_context),
-                "escalation_metadata": self._build_escalation_metadata(conversation_context)
-            }
+            user_stats = await self.conversation_manager.get_user_activity(snapshot.user_id)
+            context = self.build_context(snapshot, user_stats)
             
             logger.info("Escalation context prepared", 
                        conversation_id=conversation_id,
@@ -54,106 +53,81 @@ class ContextBuilder:
                         conversation_id=conversation_id)
             return {}
     
-    async def _build_conversation_summary(self, context: Dict) -> Dict:
-        """Construit un résumé de la conversation"""
+    def build_context(self, snapshot: EscalationSnapshot, user_stats: Dict) -> Dict:
+        """Construit le contexte enrichi à partir de l'instantané"""
+        conversation_summary = self._build_conversation_summary(snapshot)
+        technical_context = self._build_technical_context(snapshot)
         
-        messages = context.get('messages', [])
-        conversation_info = context.get('conversation_info', {})
-        
-        # Analyser les messages
-        user_messages = [msg for msg in messages if msg['role'] == 'user']
-        assistant_messages = [msg for msg in messages if msg['role'] == 'assistant']
+        return {
+            "conversation_summary": conversation_summary,
+            "user_profile": self._build_user_profile(snapshot, user_stats),
+            "technical_context": technical_context,
+            "business_context": self._build_business_context(snapshot),
+            "recommended_actions": self._suggest_actions(conversation_summary, technical_context),
+            "escalation_metadata": self._build_escalation_metadata(snapshot)
+        }
+    
+    def _build_conversation_summary(self, snapshot: EscalationSnapshot) -> Dict:
+        """Construit un résumé de la conversation"""
         
-        # Identifier le problème principal
-        first_user_message = user_messages[0]['content'] if user_messages else ""
-        last_user_message = user_messages[-1]['content'] if user_messages else ""
+        data = snapshot.data
         
         # Calculer la durée
-        if messages:
-            start_time = messages[0]['timestamp']
-            end_time = messages[-1]['timestamp']
-            duration = self._calculate_duration(start_time, end_time)
+        if data['first_message_at']:
+            duration = self._calculate_duration(data['first_message_at'], data['last_message_at'])
         else:
             duration = "Inconnue"
         
         return {
-            "main_issue": first_user_message[:200] + "..." if len(first_user_message) > 200 else first_user_message,
-            "latest_message": last_user_message[:200] + "..." if len(last_user_message) > 200 else last_user_message,
-            "total_messages": len(messages),
-            "user_messages_count": len(user_messages),
-            "assistant_messages_count": len(assistant_messages),
+            "main_issue": data['main_issue'],
+            "latest_message": data['latest_message'],
+            "total_messages": data['total_messages'],
+            "user_messages_count": data['user_messages_count'],
+            "assistant_messages_count": data['assistant_messages_count'],
             "conversation_duration": duration,
-            "channel": conversation_info.get('channel', 'unknown'),
-            "created_at": conversation_info.get('created_at'),
-            "last_activity": conversation_info.get('updated_at')
+            "channel": data.get('channel', 'unknown'),
+            "created_at": data.get('created_at'),
+            "last_activity": data.get('last_activity')
         }
     
-    async def _build_user_profile(self, context: Dict) -> Dict:
-        """Construit le profil utilisateur"""
-        
-        conversation_info = context.get('conversation_info', {})
-        user_id = conversation_info.get('user_id')
-        filiale_id = conversation_info.get('filiale_id')
-        
-        # Récupérer l'historique utilisateur (derniers 30 jours)
-        async with db_manager.get_conversations_connection() as conn:
-            user_history_query = """
-            SELECT 
-                COUNT(*) as total_conversations,
-                COUNT(CASE WHEN status = 'escalated' THEN 1 END) as escalated_conversations,
-                MAX(created_at) as last_conversation,
-                AVG(EXTRACT(EPOCH FROM (updated_at - created_at))) as avg_conversation_duration
-            FROM conversations 
-            WHERE user_id = $1 
-            AND created_at > NOW() - INTERVAL '30 days'
-            """
-            
-            user_stats = await conn.fetchrow(user_history_query, user_id)
+    def _build_user_profile(self, snapshot: EscalationSnapshot, user_stats: Dict) -> Dict:
+        """Construit le profil utilisateur (statistiques des 30 derniers jours)"""
         
         return {
-            "user_id": user_id,
-            "filiale_id": filiale_id,
-            "pack_level": conversation_info.get('pack_level', 'unknown'),
-            "historical_stats": dict(user_stats) if user_stats else {},
-            "is_frequent_user": user_stats['total_conversations'] > 5 if user_stats else False,
-            "escalation_history": user_stats['escalated_conversations'] if user_stats else 0
+            "user_id": snapshot.user_id,
+            "filiale_id": snapshot.data.get('filiale_id'),
+            "pack_level": snapshot.data.get('pack_level', 'unknown'),
+            "historical_stats": user_stats or {},
+            "is_frequent_user": (user_stats or {}).get('total_conversations', 0) > 5,
+            "escalation_history": (user_stats or {}).get('escalated_conversations', 0)
         }
     
-    async def _build_technical_context(self, context: Dict) -> Dict:
+    def _build_technical_context(self, snapshot: EscalationSnapshot) -> Dict:
         """Construit le contexte technique"""
         
-        agent_actions = context.get('agent_actions', [])
-        failed_attempts = context.get('failed_attempts', 0)
-        
-        # Analyser les actions des agents
-        agents_used = list(set([action['agent_name'] for action in agent_actions]))
-        failed_actions = [action for action in agent_actions if not action.get('success', True)]
-        
-        # Calculer les temps de réponse
-        response_times = [action.get('execution_time_ms', 0) for action in agent_actions]
-        avg_response_time = sum(response_times) / len(response_times) if response_times else 0
+        data = snapshot.data
+        total_actions = data['total_agent_actions']
         
         return {
-            "agents_involved": agents_used,
-            "total_agent_actions": len(agent_actions),
-            "failed_actions": len(failed_actions),
-            "failed_attempts": failed_attempts,
-            "average_response_time_ms": avg_response_time,
-            "error_details": [action.get('error_message') for action in failed_actions if action.get('error_message')],
-            "last_successful_action": next((action for action in reversed(agent_actions) if action.get('success')), None)
+            "agents_involved": list(data['agents_involved']),
+            "total_agent_actions": total_actions,
+            "failed_actions": data['failed_actions'],
+            "failed_attempts": snapshot.failed_attempts,
+            "average_response_time_ms": data['total_response_time_ms'] / total_actions if total_actions else 0,
+            "error_details": list(data['error_details']),
+            "last_successful_action": data['last_successful_action']
         }
     
-    async def _build_business_context(self, context: Dict) -> Dict:
+    def _build_business_context(self, snapshot: EscalationSnapshot) -> Dict:
         """Construit le contexte métier"""
         
-        conversation_info = context.get('conversation_info', {})
-        filiale_id = conversation_info.get('filiale_id')
+        filiale_id = snapshot.data.get('filiale_id')
+        application = snapshot.data.get('application_id') or "coris_money"
         
         # Récupérer les informations de la filiale
-        from core.packs.manager import MultiAppPackManager
-        pack_manager = MultiAppPackManager()
+        from core.packs.manager import pack_manager
         
-        filiale_capabilities = pack_manager.get_filiale_capabilities(filiale_id, "coris_money")
+        filiale_capabilities = pack_manager.get_filiale_capabilities(filiale_id, application) if pack_manager else {}
         
         return {
             "filiale_id": filiale_id,
@@ -165,14 +139,11 @@ class ContextBuilder:
             "escalation_sla": self._get_escalation_sla(filiale_capabilities.get('pack_name'))
         }
     
-    async def _suggest_actions(self, context: Dict) -> List[str]:
+    def _suggest_actions(self, conversation_summary: Dict, technical_context: Dict) -> List[str]:
         """Suggère des actions pour l'agent humain"""
         
         actions = []
         
-        conversation_summary = await self._build_conversation_summary(context)
-        technical_context = await self._build_technical_context(context)
-        
         # Suggestions basées sur l'historique
         if technical_context['failed_attempts'] > 2:
             actions.append("Vérifier les autorisations du compte utilisateur")
@@ -204,15 +175,16 @@ class ContextBuilder:
         
         return actions[:10]  # Limiter à 10 suggestions
     
-    def _build_escalation_metadata(self, context: Dict) -> Dict:
+    def _build_escalation_metadata(self, snapshot: EscalationSnapshot) -> Dict:
         """Construit les métadonnées d'escalade"""
         
         return {
             "escalation_timestamp": datetime.now().isoformat(),
-            "context_version": "1.0",
-            "priority_score": self._calculate_priority_score(context),
-            "complexity_score": self._calculate_complexity_score(context),
-            "estimated_resolution_time": self._estimate_resolution_time(context)
+            "context_version": "1.1",
+            "snapshot_version": snapshot.version,
+            "priority_score": self._calculate_priority_score(snapshot),
+            "complexity_score": self._calculate_complexity_score(snapshot),
+            "estimated_resolution_time": self._estimate_resolution_time(snapshot)
         }
     
     def _calculate_duration(self, start_time, end_time) -> str:
@@ -251,46 +223,38 @@ class ContextBuilder:
     
     def _get_escalation_sla(self, pack_name: str) -> str:
         """Récupère le SLA d'escalade selon le pack"""
-        sla_map = {
-            'coris_basic': '2 heures',
-            'coris_advanced': '1 heure',
-            'coris_premium': '30 minutes'
-        }
-        return sla_map.get(pack_name, '2 heures')
+        return format_sla(get_sla_minutes(pack_name))
     
-    def _calculate_priority_score(self, context: Dict) -> int:
+    def _calculate_priority_score(self, snapshot: EscalationSnapshot) -> int:
         """Calcule un score de priorité (1-10)"""
         score = 5  # Score de base
         
         # Ajuster selon les échecs
-        failed_attempts = context.get('failed_attempts', 0)
-        score += min(failed_attempts, 3)
+        score += min(snapshot.failed_attempts, 3)
         
         # Ajuster selon la durée
-        conversation_duration = len(context.get('messages', []))
-        if conversation_duration > 10:
+        if snapshot.data['total_messages'] > 10:
             score += 2
         
         return min(score, 10)
     
-    def _calculate_complexity_score(self, context: Dict) -> int:
+    def _calculate_complexity_score(self, snapshot: EscalationSnapshot) -> int:
         """Calcule un score de complexité (1-10)"""
         score = 5  # Score de base
         
         # Ajuster selon le nombre d'agents impliqués
-        agents_used = len(set([action['agent_name'] for action in context.get('agent_actions', [])]))
+        agents_used = len(snapshot.data['agents_involved'])
         score += min(agents_used - 1, 3)
         
         # Ajuster selon les erreurs techniques
-        failed_actions = len([action for action in context.get('agent_actions', []) if not action.get('success', True)])
-        score += min(failed_actions, 2)
+        score += min(snapshot.data['failed_actions'], 2)
         
         return min(score, 10)
     
-    def _estimate_resolution_time(self, context: Dict) -> str:
+    def _estimate_resolution_time(self, snapshot: EscalationSnapshot) -> str:
         """Estime le temps de résolution"""
-        complexity = self._calculate_complexity_score(context)
-        priority = self._calculate_priority_score(context)
+        complexity = self._calculate_complexity_score(snapshot)
+        priority = self._calculate_priority_score(snapshot)
         
         if priority >= 8 or complexity >= 8:
             return "30-60 minutes"
@@ -4,19 +4,20 @@ Détecteur d'escalade intelligent
 from typing import Dict, Tuple, List
 import structlog
 
+from core.escalation.keyword_matcher import keyword_rules
+
 logger = structlog.get_logger()
 
 class EscalationDetector:
-    def __init__(self):
+    def __init__(self, keyword_registry=None):
         self.escalation_rules = self._load_escalation_rules()
+        self.keyword_registry = keyword_registry or keyword_rules
     
     def _load_escalation_rules(self) -> Dict:
-        """Charge les règles d'escalade"""
+        """Charge les règles d'escalade (mots-clés : voir config/keyword_rules.yaml)"""
         return {
             "failed_attempts_threshold": 3,
-            "urgent_keywords": ["urgent", "immédiat", "emergency", "bloqué", "problème grave"],
             "negative_sentiment_threshold": 0.3,
-            "complex_query_indicators": ["plusieurs", "complexe", "ne comprends pas", "confusion"],
             "timeout_minutes": 5
         }
     
@@ -37,10 +38,11 @@ class EscalationDetector:
         if failed_attempts >= self.escalation_rules["failed_attempts_threshold"]:
             reasons.append(f"multiple_failures({failed_attempts})")
         
-        # Vérifier les mots-clés urgents
-        user_message = context.get('user_message', '').lower()
-        urgent_keywords_found = [kw for kw in self.escalation_rules["urgent_keywords"] 
-                               if kw in user_message]
+        # Mots-clés (urgence, complexité, demande d'un humain) en un seul passage
+        matcher = self.keyword_registry.get_matcher("escalation", context.get('filiale_id'))
+        keyword_hits = matcher.match(context.get('user_message', ''))
+        
+        urgent_keywords_found = keyword_hits.get("urgent_keywords")
         if urgent_keywords_found:
             reasons.append(f"urgent_keywords({','.join(urgent_keywords_found)})")
         
@@ -50,8 +52,7 @@ class EscalationDetector:
             reasons.append("negative_sentiment")
         
         # Vérifier la complexité de la requête
-        complex_indicators = [ind for ind in self.escalation_rules["complex_query_indicators"]
-                            if ind in user_message]
+        complex_indicators = keyword_hits.get("complex_query")
         if complex_indicators:
             reasons.append(f"complex_query({','.join(complex_indicators)})")
         
@@ -61,8 +62,7 @@ class EscalationDetector:
             reasons.append("urgent_complaint")
         
         # Demande explicite du client
-        explicit_requests = ["agent humain", "conseiller", "responsable", "manager", "supervisor"]
-        if any(req in user_message for req in explicit_requests):
+        if keyword_hits.get("explicit_human_request"):
             reasons.append("explicit_human_request")
         
         # Problème technique détecté
@@ -0,0 +1,277 @@
+"""
+File d'attente prioritaire des escalades sans agent disponible
+Persistée dans escalation_queue, servie dès qu'une place se libère
+"""
+import os
+import json
+import heapq
+import asyncio
+import itertools
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+import structlog
+
+from core.database.connections import db_manager
+from core.escalation.sla import get_sla_minutes, priority_rank
+from core.monitoring.metrics import escalation_queue_depth_gauge, escalation_queue_wait_histogram
+
+logger = structlog.get_logger()
+
+class EscalationDispatcher:
+    """
+    Affecte les escalades en attente aux agents humains
+
+    Les escalades sont servies par échéance SLA croissante (heure d'entrée +
+    SLA du pack), puis par priorité décroissante, puis par ancienneté. La
+    file est un tas en mémoire doublé de la table escalation_queue : elle
+    est rechargée au démarrage et toutes les ESCALATION_QUEUE_RESYNC_SECONDS
+    (escalades mises en file par d'autres processus).
+
+    La distribution est réveillée par l'index de disponibilité dès qu'un
+    agent a une place libre, et au plus tard toutes les
+    ESCALATION_DISPATCH_INTERVAL_SECONDS. Elle s'arrête à la première
+    escalade pour laquelle aucun agent n'est trouvé : le coût d'un réveil
+    ne dépend pas de la longueur de la file. Une escalade n'est retirée de
+    la file que par la requête qui l'affecte, si bien que deux processus ne
+    peuvent pas l'affecter deux fois.
+    """
+
+    def __init__(self, router=None, resync_seconds: Optional[float] = None,
+                 dispatch_interval: Optional[float] = None):
+        self._router = router
+        self.resync_seconds = resync_seconds if resync_seconds is not None else float(
+            os.getenv("ESCALATION_QUEUE_RESYNC_SECONDS", "30")
+        )
+        self.dispatch_interval = dispatch_interval if dispatch_interval is not None else float(
+            os.getenv("ESCALATION_DISPATCH_INTERVAL_SECONDS", "5")
+        )
+        self._heap: List[tuple] = []
+        self._items: Dict[str, Dict] = {}
+        self._sequence = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def router(self):
+        if self._router is None:
+            from core.escalation.router import EscalationRouter
+            self._router = EscalationRouter()
+            self._router.availability_index.add_capacity_listener(lambda agent_id: self.wake())
+        return self._router
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def __len__(self):
+        return len(self._items)
+
+    # --- File en mémoire ---
+
+    def _push(self, item: Dict):
+        self._items[item["escalation_id"]] = item
+        heapq.heappush(self._heap, (
+            item["sla_deadline"].timestamp(), -priority_rank(item["priority"]),
+            item["enqueued_at"].timestamp(), next(self._sequence), item["escalation_id"]
+        ))
+
+    def _peek(self) -> Optional[Dict]:
+        while self._heap:
+            escalation_id = self._heap[0][-1]
+            if escalation_id in self._items:
+                return self._items[escalation_id]
+            # Escalade déjà affectée ou annulée
+            heapq.heappop(self._heap)
+        return None
+
+    def _discard(self, escalation_id: str):
+        self._items.pop(escalation_id, None)
+        escalation_queue_depth_gauge.set(len(self._items))
+
+    def pending(self, limit: int = 10) -> List[Dict]:
+        """Prochaines escalades servies, dans l'ordre"""
+        entries = heapq.nsmallest(limit, (entry for entry in self._heap if entry[-1] in self._items))
+        return [self._items[entry[-1]] for entry in entries]
+
+    def wake(self):
+        self._wakeup.set()
+
+    # --- Persistance ---
+
+    async def enqueue(self, escalation_id: str, conversation_id: str, priority: str,
+                      pack_name: Optional[str], routing: Dict,
+                      enqueued_at: Optional[datetime] = None) -> Dict:
+        """Met en file une escalade enregistrée sans agent (dates naïves : heure locale)"""
+        # Dates UTC avec fuseau, comme celles relues de escalation_queue (TIMESTAMPTZ)
+        enqueued_at = (enqueued_at or datetime.now(timezone.utc)).astimezone(timezone.utc)
+        item = {
+            "escalation_id": escalation_id,
+            "conversation_id": conversation_id,
+            "priority": priority,
+            "sla_deadline": enqueued_at + timedelta(minutes=get_sla_minutes(pack_name)),
+            "routing": routing,
+            "enqueued_at": enqueued_at
+        }
+
+        async with db_manager.get_conversations_connection() as conn:
+            query = """
+            INSERT INTO escalation_queue (
+                escalation_id, conversation_id, priority, priority_rank,
+                sla_deadline, routing, enqueued_at
+            ) VALUES ($1, $2, $3, $4, $5, $6, $7)
+            ON CONFLICT (escalation_id) DO NOTHING
+            """
+            await conn.execute(
+                query, escalation_id, conversation_id, priority, priority_rank(priority),
+                item["sla_deadline"], json.dumps(routing), enqueued_at
+            )
+
+        self._push(item)
+        escalation_queue_depth_gauge.set(len(self._items))
+        self.wake()
+        logger.info("Escalation queued", escalation_id=escalation_id, priority=priority,
+                    sla_deadline=item["sla_deadline"].isoformat(), queue_depth=len(self._items))
+        return item
+
+    async def load(self):
+        """Recharge la file depuis escalation_queue"""
+        started = datetime.now(timezone.utc)
+        async with db_manager.get_conversations_connection() as conn:
+            rows = await conn.fetch("""
+                SELECT escalation_id, conversation_id, priority, sla_deadline, routing, enqueued_at
+                FROM escalation_queue
+            """)
+
+        # Escalades mises en file par ce processus pendant la lecture
+        items = {escalation_id: item for escalation_id, item in self._items.items()
+                 if item["enqueued_at"] >= started}
+        for row in rows:
+            item = dict(row)
+            item["escalation_id"] = str(item["escalation_id"])
+            item["conversation_id"] = str(item["conversation_id"])
+            item["routing"] = json.loads(item["routing"] or '{}')
+            items[item["escalation_id"]] = item
+        self._items = items
+
+        self._heap = [
+            (item["sla_deadline"].timestamp(), -priority_rank(item["priority"]),
+             item["enqueued_at"].timestamp(), next(self._sequence), escalation_id)
+            for escalation_id, item in self._items.items()
+        ]
+        heapq.heapify(self._heap)
+        escalation_queue_depth_gauge.set(len(self._items))
+        logger.info("Escalation queue loaded", queue_depth=len(self._items))
+
+    async def _assign(self, item: Dict, agent_id: str) -> bool:
+        """Retire l'escalade de la file et l'affecte, en une requête"""
+        async with db_manager.get_conversations_connection() as conn:
+            query = """
+            WITH dequeued AS (
+                DELETE FROM escalation_queue
+                WHERE escalation_id = $1
+                RETURNING escalation_id
+            )
+            UPDATE escalations e
+            SET assigned_to = $2
+            FROM dequeued
+            WHERE e.id = dequeued.escalation_id
+            RETURNING e.id
+            """
+            return await conn.fetchval(query, item["escalation_id"], agent_id) is not None
+
+    async def cancel(self, escalation_id: str) -> bool:
+        """Retire une escalade de la file (résolue ou abandonnée avant affectation)"""
+        async with db_manager.get_conversations_connection() as conn:
+            result = await conn.execute("DELETE FROM escalation_queue WHERE escalation_id = $1", escalation_id)
+        self._discard(escalation_id)
+        return result != "DELETE 0"
+
+    # --- Distribution ---
+
+    async def dispatch_pending(self) -> int:
+        """
+        Affecte les escalades en tête de file tant qu'un agent est trouvé
+
+        Returns:
+            Nombre d'escalades affectées
+        """
+        assigned = 0
+        while True:
+            item = self._peek()
+            if item is None:
+                break
+
+            agent_id = await self.router.find_best_agent(item["routing"])
+            if not agent_id:
+                break
+
+            try:
+                assigned_now = await self._assign(item, agent_id)
+            except Exception:
+                # La place réservée est rendue avant la prochaine tentative
+                await self.router.release_agent(agent_id)
+                raise
+
+            if assigned_now:
+                assigned += 1
+                wait_seconds = (datetime.now(timezone.utc) - item["enqueued_at"]).total_seconds()
+                escalation_queue_wait_histogram.labels(priority=item["priority"]).observe(max(wait_seconds, 0))
+                logger.info("Queued escalation assigned", escalation_id=item["escalation_id"],
+                            agent_id=agent_id, wait_seconds=round(wait_seconds, 1))
+            else:
+                # Affectée par un autre processus entre-temps : la place est rendue
+                await self.router.release_agent(agent_id)
+            self._discard(item["escalation_id"])
+
+        return assigned
+
+    async def run(self):
+        """Boucle de distribution"""
+        loop = asyncio.get_running_loop()
+        last_load = float("-inf")
+        while True:
+            try:
+                if loop.time() - last_load >= self.resync_seconds:
+                    await self.load()
+                    last_load = loop.time()
+                self._wakeup.clear()
+                await self.dispatch_pending()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Escalation dispatch failed", error=str(e))
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.dispatch_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> asyncio.Task:
+        if not self.running:
+            self.router  # Branche le réveil sur l'index de disponibilité
+            self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_stats(self) -> Dict:
+        head = self._peek()
+        return {
+            "queue_depth": len(self._items),
+            "next_deadline": head["sla_deadline"].isoformat() if head else None,
+            "oldest_wait_seconds": max(
+                ((datetime.now(timezone.utc) - item["enqueued_at"]).total_seconds()
+                 for item in self._items.values()),
+                default=0
+            )
+        }
+
+# Instance globale
+escalation_dispatcher = EscalationDispatcher()
@@ -0,0 +1,161 @@
+"""
+Recherche de mots-clés compilée pour la détection et le routage des escalades
+Une seule expression régulière par jeu de règles, sur texte sans accents
+"""
+import os
+import re
+import time
+import unicodedata
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import yaml
+import structlog
+
+logger = structlog.get_logger()
+
+DEFAULT_RULES_PATH = Path(__file__).parent / "config" / "keyword_rules.yaml"
+APPLICATIONS_DIR = Path(__file__).parent.parent.parent / "applications"
+
+_APOSTROPHES = str.maketrans({"’": "'", "‘": "'", "`": "'"})
+_SPACES = re.compile(r"\s+")
+
+def fold_text(text: str) -> str:
+    """Minuscules, sans accents, apostrophes et espaces normalisés"""
+    text = unicodedata.normalize("NFKD", text.casefold().translate(_APOSTROPHES))
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return _SPACES.sub(" ", text).strip()
+
+class KeywordMatcher:
+    """
+    Correspondance de tous les mots-clés d'un jeu de règles en un passage
+
+    Les mots-clés sont repliés (fold_text) puis compilés en une alternative
+    unique ancrée en début de mot, le plus long d'abord. Un mot-clé trouvé
+    implique aussi ceux qui en sont le préfixe ("problème technique"
+    implique "problème") : le résultat est celui d'une recherche de tous les
+    motifs, chevauchements compris.
+    """
+
+    def __init__(self, rules: Dict[str, List[str]]):
+        self.rules = {category: list(keywords) for category, keywords in rules.items()}
+
+        # Mot-clé replié -> [(catégorie, libellé configuré)]
+        targets: Dict[str, List[Tuple[str, str]]] = {}
+        for category, keywords in self.rules.items():
+            for keyword in keywords:
+                folded = fold_text(keyword)
+                if folded and (category, keyword) not in targets.setdefault(folded, []):
+                    targets[folded].append((category, keyword))
+
+        self._hits: Dict[str, List[Tuple[str, str]]] = {
+            folded: [target for prefix in targets if folded.startswith(prefix) for target in targets[prefix]]
+            for folded in targets
+        }
+        alternatives = "|".join(re.escape(folded) for folded in sorted(targets, key=len, reverse=True))
+        # Lookahead : une correspondance par position de départ, sans consommer le texte
+        self._pattern = re.compile(rf"(?<!\w)(?=({alternatives}))") if alternatives else None
+
+    def match(self, text: str) -> Dict[str, List[str]]:
+        """
+        Mots-clés présents dans le texte, par catégorie
+
+        Returns:
+            {catégorie: [mots-clés tels que configurés, par ordre d'apparition]}
+        """
+        found: Dict[str, List[str]] = {}
+        if self._pattern is None or not text:
+            return found
+        for hit in self._pattern.finditer(fold_text(text)):
+            for category, keyword in self._hits[hit.group(1)]:
+                keywords = found.setdefault(category, [])
+                if keyword not in keywords:
+                    keywords.append(keyword)
+        return found
+
+class KeywordRuleRegistry:
+    """
+    Jeux de règles par filiale, rechargés à chaud
+
+    Les règles communes (core/escalation/config/keyword_rules.yaml) sont
+    complétées par le fichier de la filiale
+    (applications/<application>/config/keyword_rules/<filiale_id>.yaml) :
+    `add` ajoute des mots-clés, `remove` en retire. Les matchers compilés sont
+    mis en cache et recompilés quand l'un des deux fichiers change (vérifié au
+    plus toutes les KEYWORD_RULES_RELOAD_SECONDS).
+    """
+
+    def __init__(self, defaults_path: Optional[Path] = None, applications_dir: Optional[Path] = None,
+                 reload_seconds: Optional[float] = None):
+        self.defaults_path = Path(defaults_path or DEFAULT_RULES_PATH)
+        self.applications_dir = Path(applications_dir or APPLICATIONS_DIR)
+        self.reload_seconds = reload_seconds if reload_seconds is not None else float(
+            os.getenv("KEYWORD_RULES_RELOAD_SECONDS", "10")
+        )
+        # (application, filiale, groupe) -> (empreinte des fichiers, vérifié à, matcher)
+        self._matchers: Dict[Tuple, Tuple[tuple, float, KeywordMatcher]] = {}
+
+    def _filiale_path(self, application: str, filiale_id: str) -> Path:
+        return self.applications_dir / application / "config" / "keyword_rules" / f"{filiale_id}.yaml"
+
+    @staticmethod
+    def _stamp(path: Path):
+        try:
+            stat = path.stat()
+            return stat.st_mtime_ns, stat.st_size
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _read(path: Path) -> Dict:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return yaml.safe_load(f) or {}
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.error(f"Invalid keyword rules file: {path}", error=str(e))
+            raise
+
+    def _build_rules(self, group: str, application: str, filiale_id: Optional[str]) -> Dict[str, List[str]]:
+        rules = {category: list(keywords or []) for category, keywords in
+                 (self._read(self.defaults_path).get(group) or {}).items()}
+        if filiale_id:
+            overrides = self._read(self._filiale_path(application, filiale_id))
+            for category, keywords in ((overrides.get("add") or {}).get(group) or {}).items():
+                rules.setdefault(category, []).extend(keywords or [])
+            for category, keywords in ((overrides.get("remove") or {}).get(group) or {}).items():
+                removed = {fold_text(keyword) for keyword in keywords or []}
+                rules[category] = [keyword for keyword in rules.get(category, []) if fold_text(keyword) not in removed]
+        return rules
+
+    def get_matcher(self, group: str, filiale_id: Optional[str] = None,
+                    application: str = "coris_money") -> KeywordMatcher:
+        """Matcher compilé d'un groupe de règles (escalation, expertise) pour une filiale"""
+        key = (application, filiale_id, group)
+        cached = self._matchers.get(key)
+        now = time.monotonic()
+        if cached and now - cached[1] < self.reload_seconds:
+            return cached[2]
+
+        stamp = (self._stamp(self.defaults_path),
+                 self._stamp(self._filiale_path(application, filiale_id)) if filiale_id else None)
+        if cached and cached[0] == stamp:
+            self._matchers[key] = (stamp, now, cached[2])
+            return cached[2]
+
+        try:
+            matcher = KeywordMatcher(self._build_rules(group, application, filiale_id))
+        except Exception:
+            if cached:
+                # Fichier en cours d'édition ou invalide : les dernières règles valides restent actives
+                self._matchers[key] = (cached[0], now, cached[2])
+                return cached[2]
+            raise
+
+        if cached:
+            logger.info("Keyword rules reloaded", application=application, filiale_id=filiale_id, group=group)
+        self._matchers[key] = (stamp, now, matcher)
+        return matcher
+
+# Instance globale
+keyword_rules = KeywordRuleRegistry()
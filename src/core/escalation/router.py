@@ -1,16 +1,22 @@
 """
 Routeur d'escalade vers agents humains
 """
+import os
 import asyncio
 from typing import Dict, Optional, List
 from datetime import datetime
 from core.database.connections import db_manager
+from core.escalation.keyword_matcher import keyword_rules
+from core.escalation.availability import AgentAvailabilityIndex, agent_availability
+from core.monitoring.metrics import escalation_claim_counter
 import structlog
 
 logger = structlog.get_logger()
 
 class EscalationRouter:
-    def __init__(self):
+    def __init__(self, availability_index: Optional[AgentAvailabilityIndex] = None):
+        self.availability_index = availability_index or agent_availability
+        self.claim_attempts = int(os.getenv("ESCALATION_CLAIM_ATTEMPTS", "3"))
         self.routing_algorithms = {
             'expertise_based': self._route_by_expertise,
             'load_balanced': self._route_by_load,
@@ -20,7 +26,11 @@ class EscalationRouter:
     
     async def find_best_agent(self, escalation_context: Dict) -> Optional[str]:
         """
-        Trouve le meilleur agent humain pour l'escalade
+        Trouve le meilleur agent humain pour l'escalade et le réserve
+        
+        La réservation est une incrémentation conditionnelle de la charge en
+        une seule requête : un agent n'est jamais affecté au-delà de
+        max_concurrent, même lors d'un afflux d'escalades simultanées.
         
         Args:
             escalation_context: Contexte de l'escalade
@@ -29,17 +39,24 @@ class EscalationRouter:
             ID de l'agent sélectionné ou None
         """
         try:
-            # Utiliser l'algorithme hybride par défaut
-            agent_id = await self._route_hybrid(escalation_context)
+            required_expertise = self._extract_required_expertise(escalation_context)
+            user_language = escalation_context.get('user_language', 'fr')
+            
+            agent_id = None
+            if self.availability_index.ready:
+                agent_id = await self._claim_from_index(escalation_context)
+            if not agent_id:
+                # Index non chargé ou en retard sur la base
+                agent_id = await self._claim_by_query(required_expertise, user_language)
             
             if agent_id:
-                # Mettre à jour la charge de l'agent
-                await self._update_agent_load(agent_id, increment=1)
+                escalation_claim_counter.labels(result='claimed').inc()
                 logger.info("Agent assigned for escalation", 
                            agent_id=agent_id, 
                            reason=escalation_context.get('reason'))
                 return agent_id
             else:
+                escalation_claim_counter.labels(result='unavailable').inc()
                 logger.warning("No available agent found for escalation")
                 return None
                 
@@ -47,97 +64,162 @@ class EscalationRouter:
             logger.error("Error in agent routing", error=str(e))
             return None
     
-    async def _route_hybrid(self, context: Dict) -> Optional[str]:
-        """Algorithme de routage hybride (expertise + charge + langue)"""
+    async def _claim_from_index(self, context: Dict) -> Optional[str]:
+        """Réserve l'agent choisi par l'index, en essayant le suivant si la base refuse"""
+        for _ in range(self.claim_attempts):
+            agent_id = await self._route_hybrid(context)
+            if not agent_id:
+                return None
+            
+            # Réservation locale avant l'aller-retour : les escalades
+            # simultanées du processus se répartissent sur plusieurs agents
+            self.availability_index.adjust_load(agent_id, 1)
+            try:
+                claimed = await self._claim_agent(agent_id)
+            except Exception:
+                self.availability_index.adjust_load(agent_id, -1)
+                raise
+            
+            if claimed:
+                return agent_id
+            
+            escalation_claim_counter.labels(result='conflict').inc()
+            self.availability_index.mark_full(agent_id)
         
-        # Extraire les critères
-        required_expertise = self._extract_required_expertise(context)
-        user_language = context.get('user_language', 'fr')
-        priority = context.get('priority', 'medium')
+        return None
+    
+    async def _claim_agent(self, agent_id: str) -> bool:
+        """Incrémente la charge d'un agent s'il est disponible et non saturé"""
         
         async with db_manager.get_conversations_connection() as conn:
-            # Requête pour trouver les agents appropriés
             query = """
-            SELECT 
-                id, name, specialties, languages, current_load, max_concurrent,
-                CASE 
-                    WHEN current_load = 0 THEN 1.0
-                    ELSE (max_concurrent - current_load)::float / max_concurrent
-                END as availability_score
+            UPDATE human_agents 
+            SET current_load = current_load + 1,
+                last_activity = $2
+            WHERE id = $1
+            AND status = 'available'
+            AND current_load < max_concurrent
+            RETURNING current_load
+            """
+            
+            return await conn.fetchval(query, agent_id, datetime.now()) is not None
+    
+    async def _claim_by_query(self, required_expertise: str, user_language: str) -> Optional[str]:
+        """
+        Choisit et réserve un agent en une requête
+        
+        Les lignes verrouillées par des réservations concurrentes sont
+        sautées (SKIP LOCKED) : chaque transaction prend un agent différent
+        au lieu d'attendre la même ligne. La capacité est vérifiée dans la
+        sélection verrouillée, si bien que l'UPDATE ne peut plus échouer sur
+        la ligne choisie. Si aucune ligne n'a pu être prise alors que des
+        agents ont encore de la place (lignes verrouillées par d'autres
+        réservations), la requête est relancée jusqu'à ESCALATION_CLAIM_ATTEMPTS fois.
+        """
+        
+        query = """
+        WITH candidate AS (
+            SELECT id
             FROM human_agents 
             WHERE status = 'available' 
             AND current_load < max_concurrent
-            AND ($1 = ANY(languages) OR languages @> '["fr"]'::jsonb)
+            AND (languages ? $1 OR languages ? 'fr')
             ORDER BY 
-                CASE WHEN $2 = ANY(array(SELECT jsonb_array_elements_text(specialties))) THEN 1 ELSE 0 END DESC,
-                availability_score DESC,
+                (specialties ? $2 AND languages ? $1) DESC,
+                (specialties ? $2) DESC,
+                (languages ? $1) DESC,
+                CASE 
+                    WHEN current_load = 0 THEN 1.0
+                    ELSE (max_concurrent - current_load)::float / max_concurrent
+                END DESC,
                 last_activity DESC
-            LIMIT 5
-            """
-            
-            rows = await conn.fetch(query, user_language, required_expertise)
-            
-            if not rows:
-                return None
-            
-            # Sélectionner le meilleur agent selon les critères
-            for row in rows:
-                agent_specialties = row['specialties'] if row['specialties'] else []
-                
-                # Vérifier l'expertise
-                if required_expertise in agent_specialties or not required_expertise:
-                    # Vérifier la langue
-                    agent_languages = row['languages'] if row['languages'] else ['fr']
-                    if user_language in agent_languages:
-                        return row['id']
-            
-            # Fallback : prendre le premier agent disponible
-            return rows[0]['id'] if rows else None
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED
+        ), claimed AS (
+            UPDATE human_agents a
+            SET current_load = a.current_load + 1,
+                last_activity = $3
+            FROM candidate
+            WHERE a.id = candidate.id
+            RETURNING a.id
+        )
+        SELECT
+            (SELECT id FROM claimed) AS agent_id,
+            EXISTS (
+                SELECT 1 FROM human_agents
+                WHERE status = 'available'
+                AND current_load < max_concurrent
+                AND (languages ? $1 OR languages ? 'fr')
+            ) AS has_capacity
+        """
+        
+        agent_id = None
+        async with db_manager.get_conversations_connection() as conn:
+            for _ in range(max(self.claim_attempts, 1)):
+                row = await conn.fetchrow(query, user_language, required_expertise, datetime.now())
+                agent_id = row["agent_id"]
+                if agent_id or not row["has_capacity"]:
+                    break
+                escalation_claim_counter.labels(result='conflict').inc()
+        
+        if agent_id:
+            self.availability_index.adjust_load(agent_id, 1)
+        return agent_id
+    
+    async def _route_by_expertise(self, context: Dict) -> Optional[str]:
+        """Agent le plus libre ayant l'expertise requise"""
+        return self.availability_index.best(specialty=self._extract_required_expertise(context))
+    
+    async def _route_by_load(self, context: Dict) -> Optional[str]:
+        """Agent le plus libre, toutes expertises et langues confondues"""
+        return self.availability_index.best()
+    
+    async def _route_by_language(self, context: Dict) -> Optional[str]:
+        """Agent le plus libre parlant la langue de l'utilisateur"""
+        return self.availability_index.best(language=context.get('user_language', 'fr'))
+    
+    async def _route_hybrid(self, context: Dict) -> Optional[str]:
+        """Algorithme de routage hybride (expertise + charge + langue), sans requête"""
+        return self.availability_index.choose(
+            self._extract_required_expertise(context),
+            context.get('user_language', 'fr')
+        )
     
     def _extract_required_expertise(self, context: Dict) -> str:
-        """Extrait l'expertise requise du contexte"""
-        
-        reason = context.get('reason', '').lower()
-        user_message = context.get('user_message', '').lower()
+        """
+        Extrait l'expertise requise du contexte
         
-        # Mapping des mots-clés vers expertises
-        expertise_keywords = {
-            'reclamations': ['réclamation', 'complaint', 'problème', 'insatisfait', 'erreur'],
-            'operations': ['transfert', 'annulation', 'transaction', 'solde', 'compte'],
-            'technique': ['bug', 'erreur', 'ne fonctionne pas', 'problème technique', 'app'],
-            'commercial': ['tarif', 'prix', 'nouveau service', 'information produit']
-        }
+        L'expertise retenue est celle dont le plus de mots-clés apparaissent
+        dans le motif et le message. À égalité, la première dans l'ordre des
+        règles l'emporte, comme avec l'ancienne règle du premier trouvé.
+        """
+        matcher = keyword_rules.get_matcher("expertise", context.get('filiale_id'))
+        reason_hits = matcher.match(context.get('reason', ''))
+        message_hits = matcher.match(context.get('user_message', ''))
         
-        for expertise, keywords in expertise_keywords.items():
-            if any(keyword in reason or keyword in user_message for keyword in keywords):
-                return expertise
+        best_expertise, best_score = 'general', 0  # Expertise par défaut
+        for expertise in matcher.rules:
+            score = len(reason_hits.get(expertise, [])) + len(message_hits.get(expertise, []))
+            # Strictement supérieur : une expertise suivante à égalité ne remplace pas la première
+            if score > best_score:
+                best_expertise, best_score = expertise, score
         
-        return 'general'  # Expertise par défaut
+        return best_expertise
     
-    async def _update_agent_load(self, agent_id: str, increment: int = 1):
-        """Met à jour la charge de travail d'un agent"""
+    async def release_agent(self, agent_id: str):
+        """Libère un agent (diminue sa charge, sans descendre sous zéro)"""
         
         async with db_manager.get_conversations_connection() as conn:
             query = """
             UPDATE human_agents 
-            SET current_load = current_load + $1,
+            SET current_load = GREATEST(current_load - 1, 0),
                 last_activity = $2
-            WHERE id = $3
+            WHERE id = $1
             """
             
-            await conn.execute(query, increment, datetime.now(), agent_id)
-    
-    async def release_agent(self, agent_id: str):
-        """Libère un agent (diminue sa charge)"""
-        await self._update_agent_load(agent_id, increment=-1)
-        
-        # S'assurer que la charge ne devienne pas négative
-        async with db_manager.get_conversations_connection() as conn:
-            await conn.execute(
-                "UPDATE human_agents SET current_load = GREATEST(0, current_load) WHERE id = $1",
-                agent_id
-            )
+            await conn.execute(query, agent_id, datetime.now())
         
+        self.availability_index.adjust_load(agent_id, -1)
         logger.info("Agent released", agent_id=agent_id)
     
     async def get_agent_status(self, agent_id: str) -> Dict:
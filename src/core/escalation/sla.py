@@ -0,0 +1,34 @@
+"""
+Délais de prise en charge des escalades (SLA) par pack et rangs de priorité
+"""
+from typing import Optional
+
+# Délai de prise en charge par un agent humain, en minutes
+ESCALATION_SLA_MINUTES = {
+    'coris_basic': 120,
+    'coris_advanced': 60,
+    'coris_premium': 30
+}
+DEFAULT_SLA_MINUTES = 120
+
+# Priorités de EscalationDetector.assess_priority, de la plus basse à la plus haute
+PRIORITY_RANKS = {'low': 0, 'medium': 1, 'high': 2, 'urgent': 3}
+
+def get_sla_minutes(pack_name: Optional[str]) -> int:
+    """SLA du pack (celui du pack de base si le pack est inconnu)"""
+    return ESCALATION_SLA_MINUTES.get(pack_name, DEFAULT_SLA_MINUTES)
+
+def format_sla(minutes: int) -> str:
+    """SLA lisible : '30 minutes', '1 heure', '2 heures'"""
+    if minutes % 60:
+        return f"{minutes} minutes"
+    hours = minutes // 60
+    return f"{hours} heure" if hours == 1 else f"{hours} heures"
+
+def priority_rank(priority: Optional[str]) -> int:
+    return PRIORITY_RANKS.get(priority, PRIORITY_RANKS['medium'])
+
+def highest_priority(*priorities: Optional[str]) -> str:
+    """Priorité la plus haute parmi celles connues ('medium' par défaut)"""
+    known = [priority for priority in priorities if priority in PRIORITY_RANKS]
+    return max(known, key=priority_rank) if known else 'medium'
@@ -0,0 +1,219 @@
+"""
+Détection des dépassements de SLA des escalades ouvertes
+Une échéance par escalade dans une roue temporelle, sans scruter la table escalations
+"""
+import os
+import time
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+import structlog
+
+from core.database.connections import db_manager
+from core.escalation.sla import get_sla_minutes, priority_rank
+from core.escalation.timing_wheel import HierarchicalTimingWheel
+from core.monitoring.alerts import alert_manager
+from core.monitoring.metrics import escalation_sla_breach_counter, escalation_sla_timers_gauge
+
+logger = structlog.get_logger()
+
+class SlaMonitor:
+    """
+    Surveille l'échéance SLA (heure d'escalade + SLA du pack) de chaque
+    escalade ouverte
+
+    Les échéances sont programmées à la création de l'escalade et annulées à
+    sa résolution, en O(1). La roue avance toutes les SLA_MONITOR_TICK_SECONDS ;
+    une échéance atteinte est enregistrée dans escalation_sla_breaches si
+    l'escalade est toujours ouverte, puis comptée et alertée : un dépassement
+    n'est signalé qu'une fois, même avec plusieurs processus.
+
+    Les échéances sont reconstruites depuis les escalades ouvertes au
+    démarrage puis toutes les SLA_MONITOR_RESYNC_SECONDS (escalades créées ou
+    résolues par d'autres processus, dépassements non enregistrés suite à
+    une erreur de base).
+    """
+
+    def __init__(self, tick_seconds: Optional[float] = None, resync_seconds: Optional[float] = None):
+        self.tick_seconds = tick_seconds if tick_seconds is not None else float(
+            os.getenv("SLA_MONITOR_TICK_SECONDS", "1")
+        )
+        self.resync_seconds = resync_seconds if resync_seconds is not None else float(
+            os.getenv("SLA_MONITOR_RESYNC_SECONDS", "300")
+        )
+        self.wheel = HierarchicalTimingWheel(tick_seconds=self.tick_seconds, start_time=time.time())
+        self._breach_listeners: List[Callable[[Dict], None]] = []
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {"scheduled": 0, "cancelled": 0, "breaches": 0}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def __len__(self):
+        return len(self.wheel)
+
+    def add_breach_listener(self, callback: Callable[[Dict], None]):
+        """Abonne un rappel (informations de l'escalade) à chaque dépassement"""
+        self._breach_listeners.append(callback)
+
+    # --- Échéances ---
+
+    def schedule(self, escalation_id: str, escalated_at: datetime, pack_name: Optional[str],
+                 priority: str = "medium", conversation_id: Optional[str] = None,
+                 filiale_id: Optional[str] = None) -> datetime:
+        """
+        Programme l'échéance SLA d'une escalade
+
+        Returns:
+            Échéance SLA
+        """
+        sla_minutes = get_sla_minutes(pack_name)
+        deadline = escalated_at + timedelta(minutes=sla_minutes)
+        self.wheel.schedule(escalation_id, deadline.timestamp(), {
+            "escalation_id": escalation_id,
+            "conversation_id": conversation_id,
+            "filiale_id": filiale_id,
+            "pack": pack_name,
+            "priority": priority,
+            "sla_minutes": sla_minutes,
+            "escalated_at": escalated_at.timestamp(),
+            "deadline": deadline
+        })
+        self._stats["scheduled"] += 1
+        escalation_sla_timers_gauge.set(len(self.wheel))
+        return deadline
+
+    def cancel(self, escalation_id: str) -> bool:
+        """Annule l'échéance d'une escalade résolue"""
+        cancelled = self.wheel.cancel(escalation_id)
+        if cancelled:
+            self._stats["cancelled"] += 1
+            escalation_sla_timers_gauge.set(len(self.wheel))
+        return cancelled
+
+    async def rebuild(self):
+        """Reprogramme les escalades ouvertes et oublie celles résolues ailleurs"""
+        started = time.time()
+        async with db_manager.get_conversations_connection() as conn:
+            rows = await conn.fetch("""
+                SELECT e.id, e.conversation_id, e.priority, e.escalated_at, c.pack_level, c.filiale_id
+                FROM escalations e
+                JOIN conversations c ON c.id = e.conversation_id
+                LEFT JOIN escalation_sla_breaches b ON b.escalation_id = e.id
+                WHERE e.status IN ('pending', 'in_progress') AND b.escalation_id IS NULL
+            """)
+
+        open_ids = set()
+        for row in rows:
+            escalation_id = str(row["id"])
+            open_ids.add(escalation_id)
+            if escalation_id not in self.wheel:
+                self.schedule(escalation_id, row["escalated_at"], row["pack_level"], row["priority"],
+                              str(row["conversation_id"]), row["filiale_id"])
+
+        # Escalades programmées avant la lecture et absentes : résolues ou déjà signalées
+        for escalation_id, info in self.wheel.items():
+            if escalation_id not in open_ids and info["escalated_at"] < started:
+                self.wheel.cancel(escalation_id)
+        escalation_sla_timers_gauge.set(len(self.wheel))
+        logger.info("SLA timers rebuilt", timers=len(self.wheel))
+
+    # --- Dépassements ---
+
+    async def _record_breaches(self, expired: List[Tuple[str, Dict]]) -> List[Dict]:
+        """Enregistre les dépassements des escalades encore ouvertes, une seule fois"""
+        async with db_manager.get_conversations_connection() as conn:
+            rows = await conn.fetch("""
+                INSERT INTO escalation_sla_breaches (escalation_id, breached_at)
+                SELECT e.id, $2
+                FROM escalations e
+                WHERE e.id = ANY($1::uuid[]) AND e.status IN ('pending', 'in_progress')
+                ON CONFLICT (escalation_id) DO NOTHING
+                RETURNING escalation_id
+            """, [escalation_id for escalation_id, _ in expired], datetime.now(timezone.utc))
+        recorded = {str(row["escalation_id"]) for row in rows}
+        return [info for escalation_id, info in expired if escalation_id in recorded]
+
+    async def process_expired(self, now: Optional[float] = None) -> int:
+        """
+        Avance la roue et signale les dépassements
+
+        Returns:
+            Nombre de dépassements signalés
+        """
+        now = now if now is not None else time.time()
+        expired = self.wheel.advance(now)
+        if not expired:
+            return 0
+        escalation_sla_timers_gauge.set(len(self.wheel))
+
+        try:
+            breaches = await self._record_breaches(expired)
+        except Exception as e:
+            # Reprogrammées à la prochaine resynchronisation
+            logger.warning("SLA breaches not recorded", count=len(expired), error=str(e))
+            return 0
+
+        alerts = []
+        for info in breaches:
+            escalation_sla_breach_counter.labels(pack=info["pack"] or "unknown", priority=info["priority"]).inc()
+            for callback in self._breach_listeners:
+                try:
+                    callback(info)
+                except Exception as e:
+                    logger.warning("SLA breach listener failed", error=str(e))
+            alerts.append({
+                "alert_type": "escalation_sla_breach",
+                "message": "Escalation SLA breached",
+                "severity": "critical" if priority_rank(info["priority"]) >= priority_rank("high") else "warning",
+                "details": {
+                    "escalation_id": info["escalation_id"],
+                    "conversation_id": info["conversation_id"],
+                    "filiale_id": info["filiale_id"],
+                    "pack": info["pack"],
+                    "priority": info["priority"],
+                    "sla_minutes": info["sla_minutes"],
+                    "deadline": info["deadline"].isoformat(),
+                    "overdue_seconds": round(now - info["deadline"].timestamp(), 1)
+                }
+            })
+        self._stats["breaches"] += len(breaches)
+        await alert_manager.send_alerts(alerts)
+        return len(breaches)
+
+    async def run(self):
+        """Boucle d'avance de la roue"""
+        loop = asyncio.get_running_loop()
+        last_rebuild = float("-inf")
+        while True:
+            try:
+                if loop.time() - last_rebuild >= self.resync_seconds:
+                    await self.rebuild()
+                    last_rebuild = loop.time()
+                await self.process_expired()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("SLA monitor tick failed", error=str(e))
+            await asyncio.sleep(self.tick_seconds)
+
+    def start(self) -> asyncio.Task:
+        if not self.running:
+            self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_stats(self) -> Dict:
+        return {"timers": len(self.wheel), **self._stats}
+
+# Instance globale
+sla_monitor = SlaMonitor()
@@ -0,0 +1,140 @@
+"""
+Instantané d'escalade maintenu au fil de la conversation
+Chaque message met à jour des compteurs : l'escalade lit un état déjà prêt
+"""
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# Longueur des extraits de messages repris dans le résumé
+EXCERPT_CHARS = 200
+# Erreurs d'agents conservées (les plus récentes)
+MAX_ERROR_DETAILS = 10
+
+def _excerpt(text: str) -> str:
+    return text[:EXCERPT_CHARS] + "..." if len(text) > EXCERPT_CHARS else text
+
+def _isoformat(value) -> Optional[str]:
+    if value is None:
+        return None
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+class EscalationSnapshot:
+    """
+    État incrémental d'une conversation pour l'escalade
+
+    Contient les compteurs et extraits dont ContextBuilder a besoin : messages
+    par rôle, premier et dernier message utilisateur, agents sollicités, échecs
+    et temps de réponse. `apply_message` coûte O(1) ; `version` compte les
+    messages appliqués et sert au contrôle de concurrence lors de la
+    sauvegarde (voir ConversationManager).
+
+    Une action d'agent est un message assistant avec `agent_used` ; son échec
+    est signalé par `metadata["success"] = False` (et `error_message`).
+    """
+
+    def __init__(self, data: Dict):
+        self.data = data
+
+    @classmethod
+    def new(cls, conversation_info: Dict) -> "EscalationSnapshot":
+        """Instantané vide d'une conversation qui commence"""
+        return cls({
+            "version": 0,
+            "user_id": conversation_info.get("user_id"),
+            "filiale_id": conversation_info.get("filiale_id"),
+            "application_id": conversation_info.get("application_id"),
+            "pack_level": conversation_info.get("pack_level", "unknown"),
+            "channel": conversation_info.get("channel", "unknown"),
+            "created_at": _isoformat(conversation_info.get("created_at")),
+            "last_activity": _isoformat(conversation_info.get("updated_at") or conversation_info.get("created_at")),
+            "main_issue": "",
+            "latest_message": "",
+            "total_messages": 0,
+            "user_messages_count": 0,
+            "assistant_messages_count": 0,
+            "first_message_at": None,
+            "last_message_at": None,
+            "agents_involved": [],
+            "total_agent_actions": 0,
+            "failed_actions": 0,
+            "total_response_time_ms": 0.0,
+            "error_details": [],
+            "last_successful_action": None
+        })
+
+    @classmethod
+    def from_messages(cls, conversation_info: Dict, messages: List[Dict]) -> "EscalationSnapshot":
+        """Reconstruit l'instantané en rejouant un historique (conversations antérieures)"""
+        snapshot = cls.new(conversation_info)
+        for message in messages:
+            snapshot.apply_message(
+                role=message["role"],
+                content=message.get("content") or "",
+                timestamp=message.get("timestamp"),
+                agent_used=message.get("agent_used"),
+                processing_time=message.get("processing_time"),
+                metadata=message.get("metadata")
+            )
+        return snapshot
+
+    @property
+    def version(self) -> int:
+        return self.data["version"]
+
+    @property
+    def user_id(self) -> Optional[str]:
+        return self.data.get("user_id")
+
+    @property
+    def failed_attempts(self) -> int:
+        return self.data["failed_actions"]
+
+    def apply_message(self, role: str, content: str, timestamp=None, agent_used: str = None,
+                      processing_time: float = None, metadata: Dict = None):
+        """Prend en compte un nouveau message"""
+        data = self.data
+        data["version"] += 1
+        timestamp = _isoformat(timestamp or datetime.now())
+        data["last_activity"] = timestamp
+        if role == "system":
+            return
+
+        data["total_messages"] += 1
+        data["first_message_at"] = data["first_message_at"] or timestamp
+        data["last_message_at"] = timestamp
+
+        if role == "user":
+            data["user_messages_count"] += 1
+            if not data["main_issue"]:
+                data["main_issue"] = _excerpt(content)
+            data["latest_message"] = _excerpt(content)
+            return
+
+        data["assistant_messages_count"] += 1
+        if not agent_used:
+            return
+
+        metadata = metadata or {}
+        execution_time_ms = float(processing_time or 0) * 1000
+        data["total_agent_actions"] += 1
+        data["total_response_time_ms"] += execution_time_ms
+        if agent_used not in data["agents_involved"]:
+            data["agents_involved"].append(agent_used)
+
+        if metadata.get("success", True):
+            data["last_successful_action"] = {
+                "agent_name": agent_used,
+                "timestamp": timestamp,
+                "execution_time_ms": execution_time_ms
+            }
+        else:
+            data["failed_actions"] += 1
+            if metadata.get("error_message"):
+                data["error_details"] = (data["error_details"] + [metadata["error_message"]])[-MAX_ERROR_DETAILS:]
+
+    def to_dict(self) -> Dict:
+        return self.data
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "EscalationSnapshot":
+        return cls(data)
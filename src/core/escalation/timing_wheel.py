@@ -0,0 +1,107 @@
+"""
+Roue temporelle hiérarchique (échéanciers en O(1))
+"""
+import math
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+class HierarchicalTimingWheel:
+    """
+    Échéancier à roues emboîtées
+
+    Le niveau 0 compte `wheel_size` cases d'un tick ; chaque niveau suivant
+    couvre `wheel_size` cases du niveau précédent (64 cases, 4 niveaux et
+    un tick d'une seconde : environ 194 jours). Une échéance est rangée au
+    niveau le plus bas qui la contient ; quand le temps atteint une case
+    d'un niveau supérieur, ses échéances redescendent (cascade).
+
+    Ajout et annulation sont en O(1) (dictionnaire par case) ; `advance`
+    coûte un pas par tick écoulé plus les échéances déplacées ou expirées.
+    Une échéance n'expire jamais avant son heure et au plus un tick après.
+    """
+
+    def __init__(self, tick_seconds: float = 1.0, wheel_size: int = 64, levels: int = 4,
+                 start_time: float = 0.0):
+        self.tick_seconds = tick_seconds
+        self.wheel_size = wheel_size
+        self.levels = levels
+        self._spans = [wheel_size ** level for level in range(levels + 1)]
+        self._slots: List[List[Dict[Hashable, Any]]] = [
+            [{} for _ in range(wheel_size)] for _ in range(levels)
+        ]
+        # clé -> (tick d'échéance, niveau, case, charge utile)
+        self._timers: Dict[Hashable, Tuple[int, int, int, Any]] = {}
+        self.current_tick = math.floor(start_time / tick_seconds)
+
+    def __len__(self):
+        return len(self._timers)
+
+    def __contains__(self, key: Hashable):
+        return key in self._timers
+
+    def _place(self, key: Hashable, expires_tick: int, payload: Any):
+        delta = expires_tick - self.current_tick
+        level = 0
+        while level < self.levels - 1 and delta >= self._spans[level + 1]:
+            level += 1
+        if delta >= self._spans[self.levels]:
+            # Au-delà de la roue : rangée au plus loin, replacée à chaque passage
+            expires_slot_tick = self.current_tick + self._spans[self.levels] - 1
+        else:
+            expires_slot_tick = expires_tick
+        slot = (expires_slot_tick // self._spans[level]) % self.wheel_size
+        self._slots[level][slot][key] = payload
+        self._timers[key] = (expires_tick, level, slot, payload)
+
+    def schedule(self, key: Hashable, expires_at: float, payload: Any = None):
+        """Programme (ou reprogramme) une échéance ; une heure passée expire au tick suivant"""
+        self.cancel(key)
+        expires_tick = max(math.ceil(expires_at / self.tick_seconds), self.current_tick + 1)
+        self._place(key, expires_tick, payload)
+
+    def cancel(self, key: Hashable) -> bool:
+        timer = self._timers.pop(key, None)
+        if timer is None:
+            return False
+        _, level, slot, _ = timer
+        del self._slots[level][slot][key]
+        return True
+
+    def items(self) -> List[Tuple[Hashable, Any]]:
+        return [(key, timer[3]) for key, timer in self._timers.items()]
+
+    def expires_at(self, key: Hashable) -> Optional[float]:
+        timer = self._timers.get(key)
+        return timer[0] * self.tick_seconds if timer else None
+
+    def advance(self, now: float) -> List[Tuple[Hashable, Any]]:
+        """
+        Avance jusqu'à `now`
+
+        Returns:
+            [(clé, charge utile)] des échéances atteintes, dans l'ordre
+        """
+        expired = []
+        target_tick = math.floor(now / self.tick_seconds)
+        while self.current_tick < target_tick:
+            self.current_tick += 1
+            tick = self.current_tick
+
+            # Cascade des niveaux supérieurs dont une case commence à ce tick
+            for level in range(self.levels - 1, 0, -1):
+                if tick % self._spans[level] == 0:
+                    slot = (tick // self._spans[level]) % self.wheel_size
+                    timers = self._slots[level][slot]
+                    if timers:
+                        self._slots[level][slot] = {}
+                        for key, payload in timers.items():
+                            expires_tick = self._timers.pop(key)[0]
+                            self._place(key, max(expires_tick, tick), payload)
+
+            slot = tick % self.wheel_size
+            timers = self._slots[0][slot]
+            if timers:
+                self._slots[0][slot] = {}
+                for key, payload in timers.items():
+                    del self._timers[key]
+                    expired.append((key, payload))
+        return expired
@@ -2,82 +2,160 @@
 Gestionnaire ChromaDB Multi-Tenant
 """
 import os
-import chromadb
-from chromadb.config import Settings
-from chromadb.utils import embedding_functions
+import json
+import time
+import asyncio
+import numpy as np
 from typing import Dict, List, Optional
 from datetime import datetime
+from pathlib import Path
 import structlog
 
+from core.knowledge_base.vector_store import VectorStore, create_vector_store
+from core.knowledge_base.collection_versions import (
+    CollectionAliases, versioned_collection_name, version_label
+)
+from core.knowledge_base.query_cache import QueryResultCache
+from core.knowledge_base.index_settings import (
+    merge_index_config, resolve_index_settings, to_collection_metadata, from_collection_metadata
+)
+
 logger = structlog.get_logger()
 
+# Pseudo-filiale portant le contenu partagé par toutes les filiales d'une application
+COMMON_FILIALE_ID = "common"
+# Clé des métadonnées de collection d'un overlay : chunks communs remplacés ou masqués
+OVERLAY_RULES_KEY = "overlay_rules"
+
 class MultiTenantChromaManager:
-    def __init__(self):
-        self.client = self._initialize_client()
-        self._collections = {}
+    # Champs de résultat contenant une liste par requête
+    PER_QUERY_KEYS = ("ids", "documents", "metadatas", "distances", "embeddings")
+
+    def __init__(self, vector_store: Optional[VectorStore] = None):
         self.embedding_function = self._get_embedding_function()
-    
-    def _initialize_client(self):
-        """Initialise le client ChromaDB"""
-        persist_dir = os.getenv("CHROMADB_PERSIST_DIRECTORY", "./data/chroma_data")
-        
-        try:
-            client = chromadb.PersistentClient(
-                path=persist_dir,
-                settings=Settings(
-                    anonymized_telemetry=False,
-                    allow_reset=True
-                )
-            )
-            logger.info(f"ChromaDB client initialized", persist_dir=persist_dir)
-            return client
-        except Exception as e:
-            logger.error(f"Failed to initialize ChromaDB client", error=str(e))
-            raise
-    
+        self.store = vector_store or create_vector_store(embedding_function=self.embedding_function)
+        self._kb_versions = {}
+        self._kb_version_ttl = int(os.getenv("KB_VERSION_TTL_SECONDS", "30"))
+        self.filter_over_fetch = int(os.getenv("KB_FILTER_OVER_FETCH", "2"))
+        self.common_enabled = os.getenv("KB_COMMON_COLLECTION_ENABLED", "true").lower() == "true"
+        self.common_over_fetch = int(os.getenv("KB_COMMON_OVER_FETCH", "2"))
+        self._overlay_rules = {}
+        self._index_settings = {}
+        self._generations = {}
+        self.query_cache = QueryResultCache()
+        self.aliases = CollectionAliases(os.getenv(
+            "KB_ALIAS_FILE",
+            str(Path(getattr(self.store, "persist_dir", "./data")) / "collection_aliases.json")
+        ))
+        logger.info("Knowledge base vector store ready", backend=self.store.backend_name)
+
+    @property
+    def client(self):
+        """Client ChromaDB (uniquement avec le backend chroma)"""
+        return getattr(self.store, "client", None)
+
     def _get_embedding_function(self):
-        """Fonction d'embedding OpenAI"""
+        """Fonction d'embedding OpenAI (hashing hors ligne si EMBEDDING_PROVIDER=hashing)"""
+        if os.getenv("EMBEDDING_PROVIDER", "auto").lower() == "hashing":
+            from core.knowledge_base.embeddings import HashingEmbeddingProvider
+            return HashingEmbeddingProvider()
+
+        from chromadb.utils import embedding_functions
         return embedding_functions.OpenAIEmbeddingFunction(
             api_key=os.getenv("OPENAI_API_KEY"),
             model_name="text-embedding-3-small"
         )
-    
+
     def get_collection_name(self, application: str, filiale_id: str) -> str:
         """Génère le nom de collection unique"""
         return f"{application}_{filiale_id}"
-    
-    def get_or_create_collection(self, application: str, filiale_id: str):
-        """Récupère ou crée la collection"""
-        collection_name = self.get_collection_name(application, filiale_id)
-        
-        if collection_name not in self._collections:
-            try:
-                collection = self.client.get_collection(
-                    name=collection_name,
-                    embedding_function=self.embedding_function
-                )
-                logger.info(f"Retrieved existing collection: {collection_name}")
-            except Exception:
-                collection = self.client.create_collection(
-                    name=collection_name,
-                    embedding_function=self.embedding_function,
-                    metadata={
-                        "application": application,
-                        "filiale_id": filiale_id,
-                        "created_at": datetime.now().isoformat()
-                    }
-                )
-                logger.info(f"Created new collection: {collection_name}")
-            
-            self._collections[collection_name] = collection
-        
-        return self._collections[collection_name]
-    
-    async def add_documents(self, application: str, filiale_id: str, 
-                           documents: List[str], metadatas: List[Dict], ids: List[str]):
-        """Ajoute des documents à la collection"""
-        collection = self.get_or_create_collection(application, filiale_id)
-        
+
+    def get_common_collection_name(self, application: str) -> str:
+        """Collection du contenu commun à toutes les filiales (ex: coris_money_common)"""
+        return self.get_collection_name(application, COMMON_FILIALE_ID)
+
+    def resolve_collection_name(self, application: str, filiale_id: str,
+                                version: Optional[int] = None) -> str:
+        """
+        Nom physique de la collection : la version demandée, sinon celle
+        pointée par l'alias (ou la collection non versionnée historique)
+        """
+        base_name = self.get_collection_name(application, filiale_id)
+        if version is not None:
+            return versioned_collection_name(base_name, version)
+        return self.aliases.resolve(base_name)
+
+    def get_or_create_collection(self, application: str, filiale_id: str,
+                                 version: Optional[int] = None, expected_size: int = 0):
+        """
+        Récupère ou crée la collection
+
+        Une nouvelle collection reçoit les paramètres d'index de la filiale
+        (voir get_index_settings), dimensionnés pour `expected_size` documents.
+        """
+        collection_name = self.resolve_collection_name(application, filiale_id, version)
+        metadata = {
+            "application": application,
+            "filiale_id": filiale_id,
+            "created_at": datetime.now().isoformat(),
+            **to_collection_metadata(self.get_index_settings(application, filiale_id, expected_size))
+        }
+        if version is not None:
+            metadata["version"] = version
+        return self.store.get_or_create_collection(collection_name, metadata=metadata)
+
+    def deferred_writes(self, application: str, filiale_id: str, version: Optional[int] = None):
+        """
+        Regroupe les add_documents successifs d'une collection
+
+        Avec le backend NumPy, les lots sont écrits en une seule génération à
+        la sortie du bloc au lieu de réécrire la collection à chaque lot.
+        """
+        self.get_or_create_collection(application, filiale_id, version)
+        return self.store.deferred_writes(self.resolve_collection_name(application, filiale_id, version))
+
+    def get_index_settings(self, application: str, filiale_id: str, expected_size: int = 0) -> Dict:
+        """
+        Paramètres HNSW (space, M, construction_ef, search_ef) d'une collection
+
+        Lus dans `knowledge_base.index` du pack souscrit (app_packs.yaml), surchargés
+        par `knowledge_base.index` de la config filiale. Les paramètres sont
+        figés à la création : une modification s'applique au prochain reindex.
+        """
+        key = (application, filiale_id, expected_size)
+        if key not in self._index_settings:
+            self._index_settings[key] = resolve_index_settings(
+                self._load_index_config(application, filiale_id), expected_size
+            )
+        return self._index_settings[key]
+
+    def _load_index_config(self, application: str, filiale_id: str) -> Dict:
+        try:
+            from core.packs.manager import pack_manager
+            pack = pack_manager.get_pack_for_filiale(filiale_id, application)
+            pack_config = pack_manager.get_pack_config(pack, application).get("knowledge_base") or {}
+            app_config = pack_manager.get_application_config(filiale_id, application).get("knowledge_base") or {}
+            return merge_index_config(pack_config.get("index"), app_config.get("index"))
+        except Exception as e:
+            logger.warning(f"Could not read index settings for {application}/{filiale_id}: {e}")
+            return {}
+
+    async def add_documents(self, application: str, filiale_id: str,
+                           documents: List[str], metadatas: List[Dict], ids: List[str],
+                           version: Optional[int] = None):
+        """
+        Ajoute des documents à la collection
+
+        Avec `version` (voir begin_reindex), les documents vont dans la version
+        en construction, invisible des requêtes jusqu'à publish_version.
+
+        Un document de filiale dont la métadonnée `overrides_common` vaut l'id
+        ou le fichier source (`source_file`) de chunks de la collection commune
+        remplace ces chunks pour cette filiale.
+        """
+        self.get_or_create_collection(application, filiale_id, version)
+        collection_name = self.resolve_collection_name(application, filiale_id, version)
+
         enhanced_metadatas = []
         for metadata in metadatas:
             enhanced_metadata = {
@@ -87,33 +165,517 @@ class MultiTenantChromaManager:
                 "added_at": datetime.now().isoformat()
             }
             enhanced_metadatas.append(enhanced_metadata)
-        
-        collection.add(
+
+        self.store.add(
+            collection_name,
             documents=documents,
             metadatas=enhanced_metadatas,
             ids=ids
         )
-        
-        logger.info(f"Added {len(documents)} documents to {application}_{filiale_id}")
-    
-    async def query_documents(self, application: str, filiale_id: str, 
-                             query: str, n_results: int = 5):
-        """Recherche dans la collection spécifique"""
-        collection = self.get_or_create_collection(application, filiale_id)
-        
-        results = collection.query(
-            query_texts=[query],
-            n_results=n_results,
-            include=["documents", "metadatas", "distances"]
+
+        overrides = {metadata["overrides_common"] for metadata in metadatas if metadata.get("overrides_common")}
+        if overrides and filiale_id != COMMON_FILIALE_ID:
+            self._update_overlay_rules(collection_name, overrides=overrides)
+        self._bump_kb_version(collection_name)
+
+        logger.info(f"Added {len(documents)} documents to {collection_name}")
+
+    def suppress_common_documents(self, application: str, filiale_id: str, keys: List[str],
+                                  version: Optional[int] = None):
+        """
+        Masque des chunks communs pour une filiale
+
+        Args:
+            keys: Ids de chunks ou fichiers sources (`source_file`) de la collection commune
+        """
+        self.get_or_create_collection(application, filiale_id, version)
+        collection_name = self.resolve_collection_name(application, filiale_id, version)
+        self._update_overlay_rules(collection_name, suppressed=set(keys))
+        self._bump_kb_version(collection_name)
+
+    def _update_overlay_rules(self, collection_name: str, overrides=None, suppressed=None):
+        """Fusionne les règles d'overlay dans les métadonnées de la collection (JSON)"""
+        metadata = dict(self.store.get_collection_metadata(collection_name))
+        rules = json.loads(metadata.get(OVERLAY_RULES_KEY) or "{}")
+        for key, values in (("overrides", overrides), ("suppressed", suppressed)):
+            if values:
+                rules[key] = sorted(set(rules.get(key, [])) | set(values))
+        metadata[OVERLAY_RULES_KEY] = json.dumps(rules, ensure_ascii=False)
+        self.store.update_collection_metadata(collection_name, metadata)
+        self._overlay_rules.pop(collection_name, None)
+
+    def get_overlay_exclusions(self, application: str, filiale_id: str) -> set:
+        """Ids et fichiers sources des chunks communs à écarter pour une filiale"""
+        collection_name = self.resolve_collection_name(application, filiale_id)
+        cached = self._overlay_rules.get(collection_name)
+        if cached and time.monotonic() - cached[1] < self._kb_version_ttl:
+            return cached[0]
+
+        try:
+            metadata = self.store.get_collection_metadata(collection_name, refresh=True)
+            rules = json.loads(metadata.get(OVERLAY_RULES_KEY) or "{}")
+        except Exception:
+            rules = {}
+        exclusions = set(rules.get("overrides", [])) | set(rules.get("suppressed", []))
+
+        self._overlay_rules[collection_name] = (exclusions, time.monotonic())
+        return exclusions
+
+    def begin_reindex(self, application: str, filiale_id: str,
+                      expected_size: Optional[int] = None) -> int:
+        """
+        Crée une version fantôme vide à alimenter avant publication
+
+        Args:
+            expected_size: Nombre de documents attendus, pour dimensionner
+                l'index (par défaut la taille de la version servie)
+        """
+        base_name = self.get_collection_name(application, filiale_id)
+        if expected_size is None:
+            try:
+                expected_size = self.store.count(self.aliases.resolve(base_name))
+            except Exception:
+                expected_size = 0
+        version = self.aliases.begin_version(base_name)
+        self.get_or_create_collection(application, filiale_id, version, expected_size=expected_size)
+        logger.info("Knowledge base reindex started", collection=version_label(base_name, version))
+        return version
+
+    def publish_version(self, application: str, filiale_id: str, version: int) -> Optional[int]:
+        """
+        Bascule atomiquement les requêtes sur une version
+
+        Returns:
+            La version précédemment servie (pour un rollback)
+        """
+        base_name = self.get_collection_name(application, filiale_id)
+        collection_name = versioned_collection_name(base_name, version)
+        if self.store.count(collection_name) == 0:
+            raise ValueError(f"Refusing to publish empty collection {version_label(base_name, version)}")
+
+        previous = self.aliases.switch(base_name, version)
+        logger.info("Knowledge base version published",
+                   collection=version_label(base_name, version), previous=previous)
+        return previous
+
+    def rollback_version(self, application: str, filiale_id: str) -> int:
+        """Revient à la version publiée précédente"""
+        base_name = self.get_collection_name(application, filiale_id)
+        version = self.aliases.rollback(base_name)
+        logger.warning("Knowledge base rolled back", collection=version_label(base_name, version))
+        return version
+
+    def discard_version(self, application: str, filiale_id: str, version: int):
+        """Abandonne une version en construction"""
+        base_name = self.get_collection_name(application, filiale_id)
+        if self.aliases.current_version(base_name) == version:
+            raise ValueError("Cannot discard the live version")
+        collection_name = versioned_collection_name(base_name, version)
+        self.store.delete_collection(collection_name)
+        self._bump_generation(collection_name)
+        self.aliases.forget(base_name, [version])
+
+    def garbage_collect_versions(self, keep_previous: Optional[int] = None,
+                                 build_ttl_hours: Optional[float] = None) -> List[str]:
+        """
+        Supprime les versions inutiles de toutes les collections
+
+        Sont conservées : la version courante, les `keep_previous` dernières
+        versions publiées (KB_KEEP_PREVIOUS_VERSIONS, rollback possible) et les
+        versions en construction depuis moins de `build_ttl_hours`
+        (KB_VERSION_BUILD_TTL_HOURS).
+
+        Returns:
+            Libellés des versions supprimées
+        """
+        keep_previous = keep_previous if keep_previous is not None else int(os.getenv("KB_KEEP_PREVIOUS_VERSIONS", "1"))
+        build_ttl_hours = build_ttl_hours if build_ttl_hours is not None else float(os.getenv("KB_VERSION_BUILD_TTL_HOURS", "24"))
+        now = datetime.now()
+
+        deleted = []
+        for base_name in self.aliases.collections():
+            entry = self.aliases.get(base_name)
+            kept = {entry["current"]} | set(entry["history"][-keep_previous:] if keep_previous > 0 else [])
+            obsolete = []
+            for version_key, info in entry["versions"].items():
+                version = int(version_key)
+                if version in kept:
+                    continue
+                if info["status"] == "building":
+                    age_hours = (now - datetime.fromisoformat(info["created_at"])).total_seconds() / 3600
+                    if age_hours < build_ttl_hours:
+                        continue
+                self.store.delete_collection(versioned_collection_name(base_name, version))
+                self._bump_generation(versioned_collection_name(base_name, version))
+                obsolete.append(version)
+                deleted.append(version_label(base_name, version))
+            if obsolete:
+                self.aliases.forget(base_name, obsolete)
+
+        if deleted:
+            logger.info("Knowledge base versions garbage collected", versions=deleted)
+        return deleted
+
+    async def run_version_gc(self, interval_seconds: float):
+        """Boucle de nettoyage périodique des versions"""
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await asyncio.to_thread(self.garbage_collect_versions)
+            except Exception as e:
+                logger.error("Knowledge base version GC failed", error=str(e))
+
+    @staticmethod
+    def build_where(category=None, language=None, content_type=None,
+                    where: Optional[Dict] = None) -> Optional[Dict]:
+        """
+        Construit le filtre de métadonnées poussé dans la requête vectorielle
+
+        Chaque critère accepte une valeur ou une liste de valeurs acceptées.
+        """
+        clauses = []
+        for key, value in (("category", category), ("language", language), ("content_type", content_type)):
+            if value is None:
+                continue
+            if isinstance(value, (list, tuple, set)):
+                clauses.append({key: {"$in": list(value)}})
+            else:
+                clauses.append({key: value})
+        if where:
+            clauses.append(where)
+
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+    @staticmethod
+    def _truncate_results(results: Dict, n_results: int) -> Dict:
+        """Ramène chaque liste de résultats à n_results éléments"""
+        return {
+            key: [row[:n_results] for row in value] if isinstance(value, list) and value and isinstance(value[0], list) else value
+            for key, value in results.items()
+        }
+
+    async def query_documents(self, application: str, filiale_id: str,
+                             query: str, n_results: int = 5,
+                             category=None, language=None, content_type=None,
+                             where: Optional[Dict] = None, over_fetch: Optional[int] = None):
+        """
+        Recherche dans la collection spécifique
+
+        Les filtres category / language / content_type (valeurs produites par
+        DocumentProcessor._analyze_chunk) sont appliqués par le backend avant
+        le top-k. Avec un filtre, `over_fetch` (KB_FILTER_OVER_FETCH par défaut)
+        multiplie le nombre de candidats demandés à l'index approximatif avant
+        de tronquer à n_results.
+        """
+        results = await self.query_documents_batch(
+            application, filiale_id, [query], n_results=n_results,
+            category=category, language=language, content_type=content_type,
+            where=where, over_fetch=over_fetch
+        )
+        return results[0]
+
+    async def query_documents_batch(self, application: str, filiale_id: str,
+                                    queries: List[str], n_results: int = 5,
+                                    category=None, language=None, content_type=None,
+                                    where: Optional[Dict] = None,
+                                    over_fetch: Optional[int] = None) -> List[Dict]:
+        """
+        Recherche plusieurs requêtes en un seul appel d'embedding et une seule recherche
+
+        Les résultats sont mis en cache (QueryResultCache) par requête normalisée,
+        n_results et filtres, pour la génération courante des collections.
+
+        Si l'application a une collection commune, la recherche est lancée en
+        parallèle sur l'overlay de la filiale et sur la collection commune avec
+        les mêmes embeddings de requête, puis les résultats sont fusionnés par
+        distance (voir _merge_overlay_results).
+
+        Args:
+            queries: Questions à rechercher (les doublons ne sont embeddés qu'une fois)
+
+        Returns:
+            Une liste alignée sur `queries`, chaque élément au format de query_documents
+        """
+        if not queries:
+            return []
+
+        self.get_or_create_collection(application, filiale_id)
+
+        where_clause = self.build_where(category, language, content_type, where)
+        if over_fetch is None:
+            over_fetch = self.filter_over_fetch if where_clause else 1
+
+        collection_name = self.resolve_collection_name(application, filiale_id)
+        uses_common = self._uses_common_collection(application, filiale_id)
+        scope = self._query_scope(application, collection_name, uses_common)
+
+        # Une recherche par clé de cache (requête normalisée), les hits ne touchent pas l'index
+        cache_keys = {
+            query: self.query_cache.make_key(scope, query, n_results, where_clause, over_fetch)
+            for query in queries
+        }
+        per_key = {}
+        missing = {}
+        for query, cache_key in cache_keys.items():
+            if cache_key in per_key or cache_key in missing:
+                continue
+            cached = self.query_cache.get(cache_key, filiale_id)
+            if cached is not None:
+                per_key[cache_key] = cached
+            else:
+                missing[cache_key] = query
+
+        if missing:
+            unique_queries = list(missing.values())
+            n_fetch = n_results * max(over_fetch, 1)
+            if uses_common:
+                results = await self._query_with_common(
+                    application, filiale_id, collection_name, unique_queries, n_fetch, where_clause
+                )
+            else:
+                # Embedding et recherche hors de la boucle d'événements
+                results = await asyncio.to_thread(
+                    self.store.query,
+                    collection_name,
+                    query_texts=unique_queries,
+                    n_results=n_fetch,
+                    where=where_clause
+                )
+            results = self._truncate_results(results, n_results)
+
+            for position, cache_key in enumerate(missing):
+                per_key[cache_key] = {
+                    key: [value[position]] if key in self.PER_QUERY_KEYS and value is not None else value
+                    for key, value in results.items()
+                }
+                self.query_cache.put(cache_key, per_key[cache_key])
+
+        return [per_key[cache_keys[query]] for query in queries]
+
+    def _query_scope(self, application: str, collection_name: str, uses_common: bool) -> tuple:
+        """Collections physiques interrogées et leur génération (partie de la clé de cache)"""
+        scope = ((collection_name, self.get_collection_generation(collection_name)),)
+        if uses_common:
+            common_name = self.aliases.resolve(self.get_common_collection_name(application))
+            scope += ((common_name, self.get_collection_generation(common_name)),)
+        return scope
+
+    def get_collection_generation(self, collection_name: str) -> tuple:
+        """
+        Génération d'une collection physique
+
+        Compteur local incrémenté à chaque écriture ou suppression, complété par
+        la kb_version persistée (relue toutes les KB_VERSION_TTL_SECONDS) pour
+        les écritures faites par un autre processus.
+        """
+        return (self._generations.get(collection_name, 0), self._get_collection_kb_version(collection_name))
+
+    def _bump_generation(self, collection_name: str):
+        self._generations[collection_name] = self._generations.get(collection_name, 0) + 1
+
+    def _uses_common_collection(self, application: str, filiale_id: str) -> bool:
+        if not self.common_enabled or filiale_id == COMMON_FILIALE_ID:
+            return False
+        common_name = self.aliases.resolve(self.get_common_collection_name(application))
+        return self._get_collection_kb_version(common_name) is not None
+
+    async def _query_with_common(self, application: str, filiale_id: str, collection_name: str,
+                                 queries: List[str], n_fetch: int, where: Optional[Dict]) -> Dict:
+        """Recherche concurrente overlay + commun, requêtes embeddées une seule fois"""
+        common_name = self.aliases.resolve(self.get_common_collection_name(application))
+        exclusions = self.get_overlay_exclusions(application, filiale_id)
+        # Les chunks communs écartés ne doivent pas vider le top-k
+        common_fetch = n_fetch * max(self.common_over_fetch, 1) if exclusions else n_fetch
+
+        embeddings = await asyncio.to_thread(self._embed_queries, queries)
+        overlay, common = await asyncio.gather(
+            asyncio.to_thread(self.store.query, collection_name,
+                              query_embeddings=embeddings, n_results=n_fetch, where=where),
+            asyncio.to_thread(self.store.query, common_name,
+                              query_embeddings=embeddings, n_results=common_fetch, where=where)
+        )
+        return self._merge_overlay_results(overlay, common, exclusions, n_fetch)
+
+    def _embed_queries(self, queries: List[str]) -> List[List[float]]:
+        return np.asarray(self.embedding_function(queries), dtype=np.float32).tolist()
+
+    @staticmethod
+    def _merge_overlay_results(overlay: Dict, common: Dict, exclusions: set, n_results: int) -> Dict:
+        """
+        Fusionne par distance croissante les résultats de l'overlay et du commun
+
+        Les chunks communs remplacés ou masqués par la filiale (id ou
+        `source_file` dans `exclusions`) sont écartés. La métadonnée
+        `kb_layer` indique la provenance (overlay ou common).
+        """
+        merged = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for position in range(len(overlay["ids"])):
+            hits = []
+            for layer, results in (("overlay", overlay), ("common", common)):
+                for index, doc_id in enumerate(results["ids"][position]):
+                    metadata = results["metadatas"][position][index] or {}
+                    if layer == "common" and (doc_id in exclusions or metadata.get("source_file") in exclusions):
+                        continue
+                    hits.append((results["distances"][position][index], doc_id,
+                                 results["documents"][position][index], {**metadata, "kb_layer": layer}))
+
+            hits.sort(key=lambda hit: hit[0])
+            hits = hits[:n_results]
+            merged["distances"].append([hit[0] for hit in hits])
+            merged["ids"].append([hit[1] for hit in hits])
+            merged["documents"].append([hit[2] for hit in hits])
+            merged["metadatas"].append([hit[3] for hit in hits])
+        return merged
+
+    def _bump_kb_version(self, collection_name: str):
+        """Marque la collection comme modifiée (version persistée dans ses métadonnées)"""
+        self._bump_generation(collection_name)
+        kb_version = datetime.now().isoformat()
+        try:
+            metadata = dict(self.store.get_collection_metadata(collection_name))
+            metadata["kb_version"] = kb_version
+            self.store.update_collection_metadata(collection_name, metadata)
+        except Exception as e:
+            logger.warning(f"Could not persist kb_version for {collection_name}", error=str(e))
+        self._kb_versions[collection_name] = (kb_version, time.monotonic())
+
+    def get_kb_version(self, application: str, filiale_id: str) -> Optional[str]:
+        """
+        Version de la base de connaissances d'une filiale
+
+        Relue depuis le stockage au plus toutes les KB_VERSION_TTL_SECONDS secondes pour
+        détecter les réingestions faites par un autre processus. Inclut la
+        version de la collection commune lorsqu'elle est servie à la filiale.
+        """
+        kb_version = self._get_collection_kb_version(self.resolve_collection_name(application, filiale_id))
+        if kb_version and self._uses_common_collection(application, filiale_id):
+            common_name = self.aliases.resolve(self.get_common_collection_name(application))
+            kb_version = f"{kb_version}+{COMMON_FILIALE_ID}:{self._get_collection_kb_version(common_name)}"
+        return kb_version
+
+    def _get_collection_kb_version(self, collection_name: str) -> Optional[str]:
+        cached = self._kb_versions.get(collection_name)
+        if cached and time.monotonic() - cached[1] < self._kb_version_ttl:
+            return cached[0]
+
+        try:
+            metadata = self.store.get_collection_metadata(collection_name, refresh=True)
+            kb_version = metadata.get("kb_version") or metadata.get("created_at")
+        except Exception:
+            kb_version = None
+
+        self._kb_versions[collection_name] = (kb_version, time.monotonic())
+        return kb_version
+
+    @property
+    def embedding_model(self) -> str:
+        """Identifiant du modèle d'embedding, enregistré dans les snapshots"""
+        return getattr(self.embedding_function, "model", None) or os.getenv("KB_EMBEDDING_MODEL", "text-embedding-3-small")
+
+    def export_snapshot(self, application: str, filiale_id: str, path: str) -> Dict:
+        """Exporte la collection d'une filiale dans un snapshot"""
+        from core.knowledge_base.snapshots import export_collection_snapshot
+        self.get_or_create_collection(application, filiale_id)
+        return export_collection_snapshot(
+            self.store, self.resolve_collection_name(application, filiale_id), path,
+            embedding_model=self.embedding_model,
+            extra={
+                "collection": self.get_collection_name(application, filiale_id),
+                "application": application,
+                "filiale_id": filiale_id
+            }
         )
-        
-        return results
-    
+
+    def import_snapshot(self, path: str) -> Dict:
+        """
+        Charge un snapshot dans une nouvelle version puis la publie
+
+        Le modèle d'embedding du snapshot doit être celui des requêtes.
+        """
+        from core.knowledge_base.snapshots import import_collection_snapshot, read_snapshot_manifest
+        manifest = read_snapshot_manifest(path)
+        application, filiale_id = manifest.get("application"), manifest.get("filiale_id")
+        if not application or not filiale_id:
+            # Paramètres d'index de la configuration, sinon ceux du snapshot
+            snapshot_metadata = manifest.get("collection_metadata") or {}
+            index_settings = None
+            if snapshot_metadata.get("application") and snapshot_metadata.get("filiale_id"):
+                index_settings = self.get_index_settings(
+                    snapshot_metadata["application"], snapshot_metadata["filiale_id"], manifest["count"]
+                )
+            manifest = import_collection_snapshot(
+                self.store, path, expected_embedding_model=self.embedding_model, index_settings=index_settings
+            )
+            self._bump_generation(manifest["collection"])
+            return manifest
+
+        version = self.begin_reindex(application, filiale_id, expected_size=manifest["count"])
+        try:
+            manifest = import_collection_snapshot(
+                self.store, path,
+                collection_name=self.resolve_collection_name(application, filiale_id, version),
+                expected_embedding_model=self.embedding_model,
+                index_settings=self.get_index_settings(application, filiale_id, manifest["count"])
+            )
+            collection_name = self.resolve_collection_name(application, filiale_id, version)
+            metadata = dict(self.store.get_collection_metadata(collection_name))
+            self.store.update_collection_metadata(collection_name, {**metadata, "version": version})
+        except Exception:
+            self.discard_version(application, filiale_id, version)
+            raise
+        self.publish_version(application, filiale_id, version)
+        return manifest
+
+    def load_snapshots(self, directory: Optional[str] = None) -> List[str]:
+        """
+        Importe au démarrage les snapshots d'un dossier (KB_SNAPSHOT_DIR)
+
+        Une collection déjà présente avec la même kb_version n'est pas rechargée.
+
+        Returns:
+            Noms des collections importées
+        """
+        from core.knowledge_base.snapshots import SNAPSHOT_SUFFIX, SnapshotError, read_snapshot_manifest
+        directory = directory or os.getenv("KB_SNAPSHOT_DIR")
+        if not directory or not os.path.isdir(directory):
+            return []
+
+        imported = []
+        for snapshot_path in sorted(Path(directory).glob(f"*{SNAPSHOT_SUFFIX}")):
+            try:
+                manifest = read_snapshot_manifest(str(snapshot_path))
+                snapshot_version = (manifest.get("collection_metadata") or {}).get("kb_version")
+                try:
+                    current_version = self.store.get_collection_metadata(
+                        self.aliases.resolve(manifest["collection"]), refresh=True
+                    ).get("kb_version")
+                except Exception:
+                    current_version = None
+                if snapshot_version and snapshot_version == current_version:
+                    continue
+
+                self.import_snapshot(str(snapshot_path))
+                imported.append(manifest["collection"])
+            except SnapshotError as e:
+                logger.error(f"Skipping snapshot {snapshot_path.name}", error=str(e))
+
+        return imported
+
     def get_collection_stats(self, application: str, filiale_id: str) -> Dict:
         """Statistiques de la collection"""
-        collection = self.get_or_create_collection(application, filiale_id)
+        self.get_or_create_collection(application, filiale_id)
+        base_name = self.get_collection_name(application, filiale_id)
+        collection_name = self.resolve_collection_name(application, filiale_id)
+        version = self.aliases.current_version(base_name)
+        metadata = self.store.get_collection_metadata(collection_name)
         return {
-            "name": collection.name,
-            "count": collection.count(),
-            "metadata": collection.metadata
-        }
\ No newline at end of file
+            "name": base_name,
+            "physical_name": collection_name,
+            "version": version_label(base_name, version),
+            "count": self.store.count(collection_name),
+            "metadata": metadata,
+            "index": from_collection_metadata(metadata),
+            "backend": self.store.backend_name
+        }
@@ -0,0 +1,136 @@
+"""
+Versions de collections (blue/green) de la base de connaissances
+Un alias par collection logique pointe vers la version servie aux requêtes
+"""
+import os
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+import structlog
+
+logger = structlog.get_logger()
+
+# ChromaDB n'accepte pas '@' dans les noms : `coris_money_coris_ci@v42` (libellé)
+# est stocké sous `coris_money_coris_ci__v42`
+VERSION_SEPARATOR = "__v"
+
+def versioned_collection_name(base_name: str, version: int) -> str:
+    """Nom physique d'une version de collection"""
+    return f"{base_name}{VERSION_SEPARATOR}{version}"
+
+def version_label(base_name: str, version: Optional[int]) -> str:
+    """Libellé lisible `base@vN` (ou le nom de base pour une collection non versionnée)"""
+    return f"{base_name}@v{version}" if version is not None else base_name
+
+class CollectionAliases:
+    """
+    Registre des alias de collections, persisté dans un fichier JSON
+
+    Pour chaque collection logique : la version courante, l'historique des
+    versions publiées (pour le rollback) et l'état de chaque version
+    (building, live, retired). Le fichier est remplacé atomiquement
+    (os.replace) et relu dès que son inode ou son mtime change, ce qui rend la
+    bascule visible par tous les workers. Un seul processus écrivain est
+    supposé (ingestion).
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._stamp = None
+        self._data: Dict[str, Dict] = {}
+
+    def _refresh(self) -> Dict[str, Dict]:
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            self._stamp, self._data = None, {}
+            return self._data
+
+        stamp = (stat.st_ino, stat.st_mtime_ns)
+        if stamp != self._stamp:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._data = json.load(f)
+            self._stamp = stamp
+        return self._data
+
+    def _write(self, data: Dict[str, Dict]):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+        self._stamp = None
+        self._refresh()
+
+    def get(self, base_name: str) -> Dict:
+        """État des versions d'une collection logique"""
+        entry = self._refresh().get(base_name)
+        return json.loads(json.dumps(entry)) if entry else {"current": None, "history": [], "versions": {}}
+
+    def current_version(self, base_name: str) -> Optional[int]:
+        return self.get(base_name)["current"]
+
+    def resolve(self, base_name: str) -> str:
+        """Nom physique servi aux requêtes (nom de base si la collection n'est pas versionnée)"""
+        current = self.current_version(base_name)
+        return versioned_collection_name(base_name, current) if current is not None else base_name
+
+    def begin_version(self, base_name: str) -> int:
+        """Réserve la prochaine version, en construction"""
+        data = self._refresh()
+        entry = data.get(base_name) or {"current": None, "history": [], "versions": {}}
+        version = max([int(v) for v in entry["versions"]] + [0]) + 1
+        entry["versions"][str(version)] = {"status": "building", "created_at": datetime.now().isoformat()}
+        self._write({**data, base_name: entry})
+        return version
+
+    def switch(self, base_name: str, version: int) -> Optional[int]:
+        """
+        Publie une version (bascule atomique de l'alias)
+
+        Returns:
+            La version précédemment servie
+        """
+        data = self._refresh()
+        entry = data.get(base_name)
+        if not entry or str(version) not in entry["versions"]:
+            raise ValueError(f"Unknown version {version} for {base_name}")
+
+        previous = entry["current"]
+        if previous is not None and previous != version:
+            entry["history"].append(previous)
+            entry["versions"][str(previous)]["status"] = "retired"
+        entry["current"] = version
+        entry["versions"][str(version)].update({"status": "live", "published_at": datetime.now().isoformat()})
+        self._write({**data, base_name: entry})
+        return previous
+
+    def rollback(self, base_name: str) -> int:
+        """Revient à la dernière version publiée avant la version courante"""
+        data = self._refresh()
+        entry = data.get(base_name)
+        if not entry or not entry["history"]:
+            raise ValueError(f"No previous version to roll back to for {base_name}")
+
+        faulty = entry["current"]
+        version = entry["history"].pop()
+        entry["versions"][str(faulty)]["status"] = "rolled_back"
+        entry["versions"][str(version)]["status"] = "live"
+        entry["current"] = version
+        self._write({**data, base_name: entry})
+        return version
+
+    def forget(self, base_name: str, versions: List[int]):
+        """Retire des versions supprimées du registre"""
+        data = self._refresh()
+        entry = data.get(base_name)
+        if not entry:
+            return
+        for version in versions:
+            entry["versions"].pop(str(version), None)
+        entry["history"] = [version for version in entry["history"] if version not in versions]
+        self._write({**data, base_name: entry})
+
+    def collections(self) -> List[str]:
+        return list(self._refresh().keys())
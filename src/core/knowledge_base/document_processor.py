@@ -4,6 +4,8 @@ Gère l'extraction, le nettoyage et la segmentation des documents
 """
 import re
 import os
+import asyncio
+from itertools import islice
 from typing import Dict, List, Optional, Tuple, Any
 from pathlib import Path
 from datetime import datetime
@@ -15,12 +17,18 @@ import mimetypes
 try:
     import PyPDF2
     import docx
-    import markdown
     from bs4 import BeautifulSoup
     HAS_DOC_PROCESSORS = True
 except ImportError:
     HAS_DOC_PROCESSORS = False
 
+from core.knowledge_base.markdown_sections import parse_markdown_sections, chunk_markdown_sections
+from core.knowledge_base.faq_index import extract_faq_pairs
+from core.knowledge_base.language_detector import language_detector
+from core.knowledge_base.record_stream import (
+    iter_csv_records, iter_json_records, iter_jsonl_records, group_records
+)
+
 logger = structlog.get_logger()
 
 class DocumentProcessor:
@@ -39,9 +47,18 @@ class DocumentProcessor:
             '.docx': self._process_docx,
             '.html': self._process_html,
             '.json': self._process_json,
+            '.jsonl': self._process_jsonl,
             '.csv': self._process_csv
         }
         
+        # Formats lus en flux : lignes / enregistrements regroupés en chunks
+        self.record_formats = {
+            '.csv': iter_csv_records,
+            '.json': iter_json_records,
+            '.jsonl': iter_jsonl_records
+        }
+        self.stream_batch_size = int(os.getenv("KB_STREAM_BATCH_SIZE", "256"))
+        
         # Patterns pour extraction d'informations
         self.patterns = {
             'phone': r'\+225\d{8}|\d{2}\s?\d{2}\s?\d{2}\s?\d{2}',
@@ -85,6 +102,18 @@ class DocumentProcessor:
                 logger.warning(f"Unsupported file format: {file_extension}")
                 return []
             
+            # Sources tabulaires : lecture en flux, chunks de lignes entières
+            if file_extension in self.record_formats:
+                documents = [
+                    document
+                    async for batch in self.iter_documents(file_path, filiale_id, application,
+                                                           category, custom_metadata)
+                    for document in batch
+                ]
+                for document in documents:
+                    document["metadata"]["chunk_count"] = len(documents)
+                return documents
+            
             # Extraire le contenu
             content = await self.supported_formats[file_extension](file_path)
             
@@ -97,14 +126,19 @@ class DocumentProcessor:
                 file_path, filiale_id, application, category, custom_metadata
             )
             
-            # Segmenter le contenu
-            chunks = self._chunk_text(content)
+            # Segmenter le contenu (par sections pour le Markdown)
+            if file_extension == '.md':
+                segments = self._chunk_markdown(content)
+            else:
+                segments = [(chunk, {}) for chunk in self._chunk_text(content)]
+            chunks = [chunk for chunk, _ in segments]
+            languages = language_detector.detect_batch(chunks)
             
             # Traiter chaque chunk
             documents = []
-            for i, chunk in enumerate(chunks):
+            for i, (chunk, section_metadata) in enumerate(segments):
                 # Analyser le chunk
-                chunk_analysis = self._analyze_chunk(chunk)
+                chunk_analysis = self._analyze_chunk(chunk, language=languages[i])
                 
                 # Créer les métadonnées du chunk
                 chunk_metadata = {
@@ -112,6 +146,7 @@ class DocumentProcessor:
                     "chunk_index": i,
                     "chunk_count": len(chunks),
                     "chunk_size": len(chunk),
+                    **section_metadata,
                     **chunk_analysis
                 }
                 
@@ -134,6 +169,105 @@ class DocumentProcessor:
             logger.error(f"Error processing file: {file_path}", error=str(e))
             return []
     
+    async def iter_documents(self,
+                             file_path: str,
+                             filiale_id: str,
+                             application: str,
+                             category: Optional[str] = None,
+                             custom_metadata: Optional[Dict] = None,
+                             batch_size: Optional[int] = None):
+        """
+        Documents segmentés d'un fichier, par lots
+        
+        Les CSV / JSON / JSON Lines sont lus en flux : un chunk regroupe des
+        lignes entières (row_start / row_end en métadonnées) et la mémoire
+        reste bornée par un lot de `batch_size` chunks, quelle que soit la
+        taille du fichier. Les autres formats sont produits en un seul lot.
+        
+        Yields:
+            Listes de documents segmentés avec métadonnées
+        """
+        file_path = Path(file_path)
+        file_extension = file_path.suffix.lower()
+        if file_extension not in self.record_formats:
+            documents = await self.process_file(str(file_path), filiale_id, application,
+                                                category, custom_metadata)
+            if documents:
+                yield documents
+            return
+        
+        try:
+            base_metadata = await self._generate_base_metadata(
+                file_path, filiale_id, application, category, custom_metadata
+            )
+            chunks = group_records(self.record_formats[file_extension](file_path), max_chars=self.chunk_size)
+            batch_size = batch_size or self.stream_batch_size
+            
+            chunk_index = 0
+            rows = 0
+            while True:
+                # Lecture et décodage hors de la boucle d'événements
+                batch = await asyncio.to_thread(list, islice(chunks, batch_size))
+                if not batch:
+                    break
+                yield self._record_documents(file_path, base_metadata, batch, chunk_index)
+                chunk_index += len(batch)
+                rows = batch[-1][2]
+            
+            logger.info(f"Streamed file: {file_path.name}", chunks_created=chunk_index, rows=rows)
+            
+        except Exception as e:
+            logger.error(f"Error streaming file: {file_path}", error=str(e))
+    
+    def _record_documents(self, file_path: Path, base_metadata: Dict,
+                          batch: List[Tuple[str, int, int]], first_index: int) -> List[Dict]:
+        """Documents d'un lot de chunks de lignes (texte, première ligne, dernière ligne)"""
+        languages = language_detector.detect_batch([chunk for chunk, _, _ in batch])
+        documents = []
+        for offset, (chunk, row_start, row_end) in enumerate(batch):
+            chunk_index = first_index + offset
+            documents.append({
+                "id": self._generate_chunk_id(file_path, chunk_index, chunk),
+                "content": chunk.strip(),
+                "metadata": {
+                    **base_metadata,
+                    "chunk_index": chunk_index,
+                    "chunk_size": len(chunk),
+                    "row_start": row_start,
+                    "row_end": row_end,
+                    **self._analyze_chunk(chunk, language=languages[offset])
+                }
+            })
+        return documents
+    
+    async def extract_faq(self, file_path: str, custom_metadata: Optional[Dict] = None) -> List[Dict]:
+        """
+        Extrait les paires question / réponse explicites d'un fichier (index FAQ)
+        
+        Returns:
+            [{"question", "answer", "heading_path", "source_file", ...}]
+        """
+        try:
+            file_path = Path(file_path)
+            file_extension = file_path.suffix.lower()
+            # Les exports tabulaires (lus en flux) ne contiennent pas de FAQ rédigée
+            if file_extension not in self.supported_formats or file_extension in self.record_formats:
+                return []
+            
+            content = await self.supported_formats[file_extension](file_path)
+            if not content:
+                return []
+            
+            pairs = extract_faq_pairs(content, markdown=file_extension == '.md')
+            return [
+                {"source_file": file_path.name, **pair, **(custom_metadata or {})}
+                for pair in pairs
+            ]
+            
+        except Exception as e:
+            logger.error(f"Error extracting FAQ: {file_path}", error=str(e))
+            return []
+    
     async def process_text_content(self,
                                   content: str,
                                   source_name: str,
@@ -173,10 +307,11 @@ class DocumentProcessor:
             
             # Segmenter le contenu
             chunks = self._chunk_text(content)
+            languages = language_detector.detect_batch(chunks)
             
             documents = []
             for i, chunk in enumerate(chunks):
-                chunk_analysis = self._analyze_chunk(chunk)
+                chunk_analysis = self._analyze_chunk(chunk, language=languages[i])
                 
                 chunk_metadata = {
                     **base_metadata,
@@ -267,12 +402,26 @@ class DocumentProcessor:
         
         return chunks
     
-    def _analyze_chunk(self, chunk: str) -> Dict:
+    def _chunk_markdown(self, markdown_text: str) -> List[Tuple[str, Dict]]:
+        """
+        Segmente un document Markdown en suivant ses titres
+        
+        Returns:
+            Liste de (chunk, métadonnées de section : heading_path, section_title, section_level)
+        """
+        chunks = chunk_markdown_sections(parse_markdown_sections(markdown_text), max_chars=self.chunk_size)
+        return [
+            (chunk.pop("content"), chunk)
+            for chunk in chunks
+        ]
+    
+    def _analyze_chunk(self, chunk: str, language: Optional[str] = None) -> Dict:
         """
         Analyse un chunk pour extraire des informations structurées
         
         Args:
             chunk: Chunk de texte à analyser
+            language: Langue déjà détectée (détection par lot des chunks)
             
         Returns:
             Dictionnaire d'informations extraites
@@ -286,7 +435,7 @@ class DocumentProcessor:
             "is_faq": bool(re.search(self.patterns['faq_question'], chunk, re.MULTILINE)),
             "word_count": len(chunk.split()),
             "sentence_count": len(re.split(r'[.!?]+', chunk)),
-            "language": self._detect_language(chunk)
+            "language": language or self._detect_language(chunk)
         }
         
         # Extraire les entités spécifiques
@@ -308,22 +457,8 @@ class DocumentProcessor:
         return analysis
     
     def _detect_language(self, text: str) -> str:
-        """Détection basique de la langue"""
-        # Mots français courants
-        french_indicators = ['le', 'la', 'les', 'de', 'du', 'des', 'et', 'est', 'dans', 'pour', 'avec', 'vous', 'votre']
-        # Mots anglais courants
-        english_indicators = ['the', 'and', 'is', 'in', 'for', 'with', 'you', 'your', 'this', 'that']
-        
-        text_lower = text.lower()
-        french_count = sum(1 for word in french_indicators if word in text_lower)
-        english_count = sum(1 for word in english_indicators if word in text_lower)
-        
-        if french_count > english_count:
-            return "fr"
-        elif english_count > french_count:
-            return "en"
-        else:
-            return "unknown"
+        """Détection de la langue (trigrammes de caractères)"""
+        return language_detector.detect(text)
     
     def _classify_content_type(self, chunk: str, analysis: Dict) -> str:
         """Classifie le type de contenu du chunk"""
@@ -366,22 +501,8 @@ class DocumentProcessor:
             raise
     
     async def _process_markdown(self, file_path: Path) -> str:
-        """Traite un fichier Markdown"""
-        if not HAS_DOC_PROCESSORS:
-            logger.warning("Markdown processor not available, treating as text")
-            return await self._process_text(file_path)
-        
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                md_content = f.read()
-            
-            # Convertir en HTML puis extraire le texte
-            html = markdown.markdown(md_content)
-            soup = BeautifulSoup(html, 'html.parser')
-            return soup.get_text()
-        except Exception as e:
-            logger.warning(f"Error processing markdown file: {e}")
-            return await self._process_text(file_path)
+        """Traite un fichier Markdown (source brute, segmentée par _chunk_markdown)"""
+        return await self._process_text(file_path)
     
     async def _process_pdf(self, file_path: Path) -> str:
         """Traite un fichier PDF"""
@@ -440,40 +561,23 @@ class DocumentProcessor:
     async def _process_json(self, file_path: Path) -> str:
         """Traite un fichier JSON"""
         try:
-            import json
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            # Convertir le JSON en texte lisible
-            if isinstance(data, dict):
-                text_parts = []
-                for key, value in data.items():
-                    if isinstance(value, (str, int, float)):
-                        text_parts.append(f"{key}: {value}")
-                    elif isinstance(value, list):
-                        text_parts.append(f"{key}: {', '.join(map(str, value))}")
-                return "\n".join(text_parts)
-            elif isinstance(data, list):
-                return "\n".join(str(item) for item in data)
-            else:
-                return str(data)
+            return "\n".join(text for _, text in iter_json_records(file_path))
         except Exception as e:
             logger.error(f"Error processing JSON file: {e}")
             return ""
     
+    async def _process_jsonl(self, file_path: Path) -> str:
+        """Traite un fichier JSON Lines"""
+        try:
+            return "\n".join(text for _, text in iter_jsonl_records(file_path))
+        except Exception as e:
+            logger.error(f"Error processing JSON Lines file: {e}")
+            return ""
+    
     async def _process_csv(self, file_path: Path) -> str:
         """Traite un fichier CSV"""
         try:
-            import csv
-            text_parts = []
-            
-            with open(file_path, 'r', encoding='utf-8') as f:
-                csv_reader = csv.DictReader(f)
-                for row in csv_reader:
-                    row_text = ", ".join(f"{key}: {value}" for key, value in row.items() if value)
-                    text_parts.append(row_text)
-            
-            return "\n".join(text_parts)
+            return "\n".join(text for _, text in iter_csv_records(file_path))
         except Exception as e:
             logger.error(f"Error processing CSV file: {e}")
             return ""
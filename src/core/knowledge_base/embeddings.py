@@ -3,11 +3,23 @@ Gestionnaire d'embeddings pour la base de connaissances
 Supporte OpenAI et des alternatives locales
 """
 import os
+import re
+import time
+import zlib
+import random
+import hashlib
+import asyncio
+import unicodedata
 import numpy as np
-from typing import List, Optional, Dict, Any
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Optional, Dict, Any, Tuple
 import structlog
 from abc import ABC, abstractmethod
 
+from core.knowledge_base.micro_batcher import MicroBatchEmbedder
+from core.knowledge_base.vector_store import top_k_indices
+
 logger = structlog.get_logger()
 
 class EmbeddingProvider(ABC):
@@ -28,23 +40,176 @@ class EmbeddingProvider(ABC):
         """Retourne la dimension des embeddings"""
         pass
 
+# Limites par requête de l'endpoint /embeddings d'OpenAI
+OPENAI_EMBEDDING_MAX_INPUTS = 2048
+OPENAI_EMBEDDING_MAX_TOKENS_PER_REQUEST = 300000
+OPENAI_EMBEDDING_MAX_TOKENS_PER_INPUT = 8191
+
+def pack_batches(token_counts: List[int], max_tokens: int, max_inputs: int) -> List[List[int]]:
+    """
+    Regroupe des textes en batches respectant les limites de tokens et d'entrées
+
+    Args:
+        token_counts: Nombre de tokens de chaque texte
+        max_tokens: Somme maximale de tokens par batch
+        max_inputs: Nombre maximal de textes par batch
+
+    Returns:
+        Liste de batches (indices des textes, ordre d'origine conservé)
+    """
+    batches = []
+    current, current_tokens = [], 0
+    for index, tokens in enumerate(token_counts):
+        if current and (current_tokens + tokens > max_tokens or len(current) >= max_inputs):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(index)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+class AsyncRateLimiter:
+    """
+    Limiteur requêtes/minute et tokens/minute (seaux à jetons)
+
+    Partagé par toutes les requêtes en vol d'un même modèle, voir get_rate_limiter.
+    """
+    
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._request_allowance = float(requests_per_minute)
+        self._token_allowance = float(tokens_per_minute)
+        self._updated_at = time.monotonic()
+    
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated_at
+        self._updated_at = now
+        self._request_allowance = min(self.requests_per_minute,
+                                      self._request_allowance + elapsed * self.requests_per_minute / 60)
+        self._token_allowance = min(self.tokens_per_minute,
+                                    self._token_allowance + elapsed * self.tokens_per_minute / 60)
+    
+    async def acquire(self, tokens: int = 0):
+        """Attend que la requête (et ses tokens) puisse partir"""
+        tokens = min(tokens, self.tokens_per_minute)
+        while True:
+            # Pas d'await entre la vérification et la consommation : sûr dans une boucle asyncio
+            self._refill()
+            if self._request_allowance >= 1 and self._token_allowance >= tokens:
+                self._request_allowance -= 1
+                self._token_allowance -= tokens
+                return
+            
+            wait = max(
+                (1 - self._request_allowance) * 60 / self.requests_per_minute,
+                (tokens - self._token_allowance) * 60 / self.tokens_per_minute,
+                0.001
+            )
+            await asyncio.sleep(wait)
+
+_rate_limiters: Dict[str, AsyncRateLimiter] = {}
+
+def get_rate_limiter(model: str) -> AsyncRateLimiter:
+    """Limiteur partagé par modèle (OPENAI_EMBEDDING_RPM / OPENAI_EMBEDDING_TPM)"""
+    if model not in _rate_limiters:
+        _rate_limiters[model] = AsyncRateLimiter(
+            requests_per_minute=int(os.getenv("OPENAI_EMBEDDING_RPM", "3000")),
+            tokens_per_minute=int(os.getenv("OPENAI_EMBEDDING_TPM", "1000000"))
+        )
+    return _rate_limiters[model]
+
 class OpenAIEmbeddingProvider(EmbeddingProvider):
     """Fournisseur d'embeddings OpenAI"""
     
-    def __init__(self, model: str = "text-embedding-3-small", api_key: Optional[str] = None):
+    def __init__(self, model: str = "text-embedding-3-small", api_key: Optional[str] = None,
+                 base_url: Optional[str] = None, max_concurrency: Optional[int] = None,
+                 max_retries: Optional[int] = None, rate_limiter: Optional[AsyncRateLimiter] = None):
         self.model = model
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         self.dimension = 1536 if "3-small" in model else 1024
+        self.max_concurrency = max_concurrency or int(os.getenv("OPENAI_EMBEDDING_CONCURRENCY", "4"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("OPENAI_EMBEDDING_MAX_RETRIES", "5"))
+        self.max_tokens_per_request = int(os.getenv("OPENAI_EMBEDDING_BATCH_TOKENS", str(OPENAI_EMBEDDING_MAX_TOKENS_PER_REQUEST)))
+        self.max_inputs_per_request = int(os.getenv("OPENAI_EMBEDDING_BATCH_SIZE", str(OPENAI_EMBEDDING_MAX_INPUTS)))
+        self.retry_base_delay = float(os.getenv("OPENAI_EMBEDDING_RETRY_BASE_DELAY", "0.5"))
+        self.retry_max_delay = float(os.getenv("OPENAI_EMBEDDING_RETRY_MAX_DELAY", "30"))
+        self.rate_limiter = rate_limiter or get_rate_limiter(model)
         
         if not self.api_key:
             raise ValueError("OpenAI API key required")
         
         try:
             import openai
-            self.client = openai.AsyncOpenAI(api_key=self.api_key)
+            # Les reprises sont gérées ici, avec backoff et limiteur partagé
+            self.client = openai.AsyncOpenAI(api_key=self.api_key, base_url=base_url, max_retries=0)
             logger.info(f"OpenAI embedding provider initialized with model: {model}")
         except ImportError:
             raise ImportError("openai package required for OpenAI embeddings")
+        
+        self._encoding = self._load_encoding(model)
+    
+    @staticmethod
+    def _load_encoding(model: str):
+        """Tokenizer tiktoken du modèle, None si indisponible (estimation utilisée)"""
+        try:
+            import tiktoken
+            try:
+                return tiktoken.encoding_for_model(model)
+            except KeyError:
+                return tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            logger.warning(f"tiktoken unavailable, estimating token counts: {e}")
+            return None
+    
+    def count_tokens(self, text: str) -> int:
+        """Nombre de tokens d'un texte (majorant si tiktoken est indisponible)"""
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        # ~4 caractères par token en moyenne ; on reste prudent
+        return len(text.encode("utf-8")) // 2 + 1
+    
+    def _fit_to_input_limit(self, text: str, tokens: int):
+        """Tronque un texte dépassant la limite de tokens par entrée"""
+        if tokens <= OPENAI_EMBEDDING_MAX_TOKENS_PER_INPUT:
+            return text, tokens
+        if self._encoding is not None:
+            encoded = self._encoding.encode(text, disallowed_special=())[:OPENAI_EMBEDDING_MAX_TOKENS_PER_INPUT]
+            return self._encoding.decode(encoded), len(encoded)
+        ratio = OPENAI_EMBEDDING_MAX_TOKENS_PER_INPUT / tokens
+        return text[:int(len(text) * ratio)], OPENAI_EMBEDDING_MAX_TOKENS_PER_INPUT
+    
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        """429, 5xx, délais dépassés et erreurs de connexion sont rejoués ; le reste non"""
+        status = getattr(error, "status_code", None)
+        if status is not None:
+            return status == 429 or status >= 500
+        if isinstance(error, (TimeoutError, ConnectionError)):
+            return True
+        import openai
+        # APITimeoutError hérite d'APIConnectionError
+        return isinstance(error, openai.APIConnectionError)
+    
+    async def _create_embeddings(self, batch: List[str], tokens: int) -> List[List[float]]:
+        """Un appel à l'API, rejoué avec backoff exponentiel et jitter"""
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.acquire(tokens)
+            try:
+                response = await self.client.embeddings.create(
+                    model=self.model,
+                    input=batch
+                )
+                return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+            except Exception as e:
+                if attempt >= self.max_retries or not self._is_retryable(e):
+                    raise
+                delay = random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * 2 ** attempt))
+                logger.warning("Embedding request failed, retrying",
+                               attempt=attempt + 1, delay=round(delay, 3), error=str(e))
+                await asyncio.sleep(delay)
     
     async def embed_documents(self, texts: List[str]) -> List[List[float]]:
         """Génère des embeddings pour des documents"""
@@ -52,22 +217,32 @@ class OpenAIEmbeddingProvider(EmbeddingProvider):
             return []
         
         try:
-            # OpenAI permet jusqu'à 2048 textes par batch
-            batch_size = 100
-            all_embeddings = []
+            fitted = [self._fit_to_input_limit(text, self.count_tokens(text)) for text in texts]
+            texts = [text for text, _ in fitted]
+            token_counts = [tokens for _, tokens in fitted]
+            batches = pack_batches(token_counts, self.max_tokens_per_request, self.max_inputs_per_request)
             
-            for i in range(0, len(texts), batch_size):
-                batch = texts[i:i + batch_size]
-                
-                response = await self.client.embeddings.create(
-                    model=self.model,
-                    input=batch
-                )
-                
-                batch_embeddings = [item.embedding for item in response.data]
-                all_embeddings.extend(batch_embeddings)
+            all_embeddings: List[Optional[List[float]]] = [None] * len(texts)
+            semaphore = asyncio.Semaphore(self.max_concurrency)
             
-            logger.debug(f"Generated embeddings for {len(texts)} documents")
+            async def run_batch(indices: List[int]):
+                async with semaphore:
+                    embeddings = await self._create_embeddings(
+                        [texts[i] for i in indices],
+                        sum(token_counts[i] for i in indices)
+                    )
+                for i, embedding in zip(indices, embeddings):
+                    all_embeddings[i] = embedding
+            
+            # Un lot en échec annule les autres au lieu de les laisser consommer le quota
+            try:
+                async with asyncio.TaskGroup() as group:
+                    for indices in batches:
+                        group.create_task(run_batch(indices))
+            except ExceptionGroup as errors:
+                raise errors.exceptions[0] from None
+            
+            logger.debug(f"Generated embeddings for {len(texts)} documents in {len(batches)} requests")
             return all_embeddings
             
         except Exception as e:
@@ -77,12 +252,8 @@ class OpenAIEmbeddingProvider(EmbeddingProvider):
     async def embed_query(self, text: str) -> List[float]:
         """Génère un embedding pour une requête"""
         try:
-            response = await self.client.embeddings.create(
-                model=self.model,
-                input=[text]
-            )
-            
-            embedding = response.data[0].embedding
+            text, tokens = self._fit_to_input_limit(text, self.count_tokens(text))
+            embedding = (await self._create_embeddings([text], tokens))[0]
             logger.debug(f"Generated query embedding for text: {text[:50]}...")
             return embedding
             
@@ -94,7 +265,13 @@ class OpenAIEmbeddingProvider(EmbeddingProvider):
         return self.dimension
 
 class HuggingFaceEmbeddingProvider(EmbeddingProvider):
-    """Fournisseur d'embeddings Hugging Face (local)"""
+    """
+    Fournisseur d'embeddings Hugging Face (local)
+
+    `SentenceTransformer.encode` est synchrone : les requêtes passent par un
+    MicroBatchEmbedder qui les regroupe et encode dans un thread dédié, pour
+    ne pas bloquer la boucle asyncio ni sérialiser les utilisateurs.
+    """
     
     def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2"):
         self.model_name = model_name
@@ -106,6 +283,11 @@ class HuggingFaceEmbeddingProvider(EmbeddingProvider):
             logger.info(f"HuggingFace embedding provider initialized with model: {model_name}")
         except ImportError:
             raise ImportError("sentence-transformers package required for HuggingFace embeddings")
+        
+        self.batcher = MicroBatchEmbedder(self._encode)
+    
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(texts, convert_to_numpy=True, batch_size=len(texts))
     
     async def embed_documents(self, texts: List[str]) -> List[List[float]]:
         """Génère des embeddings pour des documents"""
@@ -113,9 +295,7 @@ class HuggingFaceEmbeddingProvider(EmbeddingProvider):
             return []
         
         try:
-            # SentenceTransformers est synchrone
-            embeddings = self.model.encode(texts, convert_to_numpy=True)
-            return embeddings.tolist()
+            return await self.batcher.embed_many(texts)
             
         except Exception as e:
             logger.error(f"Failed to generate document embeddings: {e}")
@@ -124,8 +304,7 @@ class HuggingFaceEmbeddingProvider(EmbeddingProvider):
     async def embed_query(self, text: str) -> List[float]:
         """Génère un embedding pour une requête"""
         try:
-            embedding = self.model.encode([text], convert_to_numpy=True)
-            return embedding[0].tolist()
+            return await self.batcher.embed(text)
             
         except Exception as e:
             logger.error(f"Failed to generate query embedding: {e}")
@@ -161,6 +340,154 @@ class FallbackEmbeddingProvider(EmbeddingProvider):
     def get_dimension(self) -> int:
         return self.dimension
 
+class HashingEmbeddingProvider(EmbeddingProvider):
+    """
+    Fournisseur d'embeddings hors ligne et déterministe
+
+    Feature hashing des mots, bigrammes de mots et n-grammes de caractères
+    (accents et casse ignorés), pondération TF sous-linéaire x IDF, vecteurs
+    normalisés L2. Aucun réseau ni modèle à télécharger : mode hors ligne pour
+    la CI, les tests de charge et les filiales isolées.
+
+    Sans `fit`, l'IDF vaut 1. scripts/init_knowledge_bases.py calcule l'IDF
+    sur les chunks ingérés et l'enregistre dans HASHING_EMBEDDING_IDF_PATH,
+    relu à la création du fournisseur : l'ingestion et la recherche utilisent
+    les mêmes poids. L'empreinte de l'IDF fait partie de `model`, si bien
+    qu'un snapshot embeddé avec d'autres poids est refusé.
+    """
+    
+    CHAR_NGRAM_SIZES = (3, 4, 5)
+    FEATURE_WEIGHTS = {"w": 1.0, "b": 0.5, "c": 0.25}
+    
+    def __init__(self, dimension: Optional[int] = None, idf_path: Optional[str] = None):
+        self.dimension = dimension or int(os.getenv("HASHING_EMBEDDING_DIM", "1024"))
+        self.idf = np.ones(self.dimension, dtype=np.float32)
+        self._update_model()
+        
+        self.idf_path = idf_path or os.getenv("HASHING_EMBEDDING_IDF_PATH", "./data/hashing_embedding_idf.npy")
+        if os.path.exists(self.idf_path):
+            self.load_idf(self.idf_path)
+        logger.info(f"Hashing embedding provider initialized with dimension: {self.dimension}", model=self.model)
+    
+    @property
+    def is_fitted(self) -> bool:
+        return not np.all(self.idf == 1.0)
+    
+    def _update_model(self):
+        """Identifiant du modèle : dimension et empreinte de l'IDF"""
+        self.model = f"hashing-tfidf-{self.dimension}"
+        if self.is_fitted:
+            self.model += f"-idf{hashlib.sha256(self.idf.tobytes()).hexdigest()[:12]}"
+    
+    @staticmethod
+    def _normalize(text: str) -> str:
+        decomposed = unicodedata.normalize("NFKD", text.lower())
+        return "".join(char for char in decomposed if not unicodedata.combining(char))
+    
+    def _hashed_counts(self, texts: List[str]):
+        """Triplets (ligne, bucket, valeur signée) de la matrice creuse des features"""
+        hash_chunks, weight_chunks, row_lengths = [], [], []
+        for text in texts:
+            words = _WORD_PATTERN.findall(self._normalize(text))
+            length = 0
+            for word in words:
+                hashes, weights = _word_features(word)
+                hash_chunks.append(hashes)
+                weight_chunks.append(weights)
+                length += len(hashes)
+            if len(words) > 1:
+                bigrams = np.fromiter((zlib.crc32(f"b:{first} {second}".encode("utf-8"))
+                                       for first, second in zip(words, words[1:])),
+                                      dtype=np.int64, count=len(words) - 1)
+                hash_chunks.append(bigrams)
+                weight_chunks.append(np.full(len(bigrams), self.FEATURE_WEIGHTS["b"], dtype=np.float32))
+                length += len(bigrams)
+            row_lengths.append(length)
+        
+        if not hash_chunks:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, np.empty(0, dtype=np.float32)
+        
+        hashes = np.concatenate(hash_chunks)
+        weights = np.concatenate(weight_chunks)
+        rows = np.repeat(np.arange(len(texts), dtype=np.int64), row_lengths)
+        
+        # TF par (texte, feature) : une feature est identifiée par son hash 32 bits
+        keys, first_index, counts = np.unique((rows << 32) | hashes, return_index=True, return_counts=True)
+        feature_hashes = keys & 0xFFFFFFFF
+        signs = np.where(feature_hashes & 0x80000000, 1.0, -1.0)
+        values = signs * weights[first_index] * (1.0 + np.log(counts))
+        return keys >> 32, feature_hashes % self.dimension, values.astype(np.float32)
+    
+    def transform(self, texts: List[str]) -> np.ndarray:
+        """Matrice (n, dimension) float32 normalisée"""
+        rows, buckets, values = self._hashed_counts(texts)
+        matrix = np.bincount(rows * self.dimension + buckets, weights=values,
+                             minlength=len(texts) * self.dimension)
+        matrix = matrix.reshape(len(texts), self.dimension).astype(np.float32) * self.idf
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1.0, norms)
+    
+    def fit(self, texts: List[str]) -> "HashingEmbeddingProvider":
+        """Calcule l'IDF lissé des buckets sur un corpus"""
+        rows, buckets, _ = self._hashed_counts(texts)
+        # Une occurrence par (texte, bucket)
+        present = np.unique(rows * self.dimension + buckets)
+        document_frequency = np.bincount(present % self.dimension, minlength=self.dimension)
+        self.idf = (np.log((1 + len(texts)) / (1 + document_frequency)) + 1).astype(np.float32)
+        self._update_model()
+        return self
+    
+    def save_idf(self, path: Optional[str] = None):
+        path = path or self.idf_path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as f:
+            np.save(f, self.idf)
+    
+    def load_idf(self, path: str):
+        idf = np.load(path)
+        if idf.shape != (self.dimension,):
+            raise ValueError(f"IDF dimension {idf.shape} does not match {self.dimension}")
+        self.idf = idf.astype(np.float32)
+        self._update_model()
+    
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        """Interface fonction d'embedding (ChromaDB, NumpyVectorStore)"""
+        return self.transform(list(input)).tolist()
+    
+    async def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Génère des embeddings pour des documents"""
+        return self.transform(texts).tolist()
+    
+    async def embed_query(self, text: str) -> List[float]:
+        """Génère un embedding pour une requête"""
+        return self.transform([text])[0].tolist()
+    
+    def get_dimension(self) -> int:
+        return self.dimension
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+@lru_cache(maxsize=1 << 16)
+def _word_features(word: str):
+    """Hashes crc32 (stables, indépendants de PYTHONHASHSEED) et poids des features d'un mot"""
+    padded = f"<{word}>"
+    features = [f"w:{word}"]
+    for size in HashingEmbeddingProvider.CHAR_NGRAM_SIZES:
+        features.extend(f"c:{padded[i:i + size]}" for i in range(len(padded) - size + 1))
+    hashes = np.fromiter((zlib.crc32(feature.encode("utf-8")) for feature in features),
+                         dtype=np.int64, count=len(features))
+    weights = np.full(len(features), HashingEmbeddingProvider.FEATURE_WEIGHTS["c"], dtype=np.float32)
+    weights[0] = HashingEmbeddingProvider.FEATURE_WEIGHTS["w"]
+    return hashes, weights
+
+EMBEDDING_PROVIDERS = {
+    "openai": OpenAIEmbeddingProvider,
+    "huggingface": HuggingFaceEmbeddingProvider,
+    "hashing": HashingEmbeddingProvider,
+    "random": FallbackEmbeddingProvider
+}
+
 class EmbeddingManager:
     """Gestionnaire principal des embeddings"""
     
@@ -169,7 +496,15 @@ class EmbeddingManager:
         logger.info(f"EmbeddingManager initialized with {type(self.provider).__name__}")
     
     def _get_default_provider(self) -> EmbeddingProvider:
-        """Sélectionne le meilleur fournisseur disponible"""
+        """
+        Sélectionne le fournisseur (EMBEDDING_PROVIDER : openai, huggingface,
+        hashing, random ou auto pour le meilleur disponible)
+        """
+        provider_name = os.getenv("EMBEDDING_PROVIDER", "auto").lower()
+        if provider_name != "auto":
+            if provider_name not in EMBEDDING_PROVIDERS:
+                raise ValueError(f"Unknown embedding provider: {provider_name}")
+            return EMBEDDING_PROVIDERS[provider_name]()
         
         # Essayer OpenAI en premier
         openai_key = os.getenv("OPENAI_API_KEY")
@@ -185,9 +520,9 @@ class EmbeddingManager:
         except Exception as e:
             logger.warning(f"Failed to initialize HuggingFace embeddings: {e}")
         
-        # Fallback vers embeddings aléatoires
-        logger.warning("Using fallback embeddings - search quality will be limited")
-        return FallbackEmbeddingProvider()
+        # Fallback hors ligne déterministe
+        logger.warning("Using offline hashing embeddings - search quality will be limited")
+        return HashingEmbeddingProvider()
     
     async def embed_documents(self, texts: List[str], metadata: Optional[List[Dict]] = None) -> List[List[float]]:
         """Génère des embeddings pour des documents avec métadonnées optionnelles"""
@@ -237,6 +572,10 @@ class EmbeddingManager:
         """Retourne la dimension des embeddings"""
         return self.provider.get_dimension()
     
+    def is_deterministic(self) -> bool:
+        """Indique si un même texte produit toujours le même embedding"""
+        return not isinstance(self.provider, FallbackEmbeddingProvider)
+
     def get_provider_info(self) -> Dict[str, Any]:
         """Retourne des informations sur le fournisseur actuel"""
         return {
@@ -286,4 +625,80 @@ def euclidean_distance(vec1: List[float], vec2: List[float]) -> float:
     vec2_np = np.array(vec2)
     
     distance = np.linalg.norm(vec1_np - vec2_np)
-    return float(distance)
\ No newline at end of file
+    return float(distance)
+
+# Utilitaires vectorisés : matrices de requêtes (m, d) contre un corpus (n, d)
+
+def normalize_embeddings(vectors) -> np.ndarray:
+    """
+    Matrice float32 normalisée L2 par ligne (les vecteurs nuls restent nuls)
+
+    À stocker une fois pour un corpus, puis passer `normalized=True` aux
+    fonctions ci-dessous pour éviter de renormaliser à chaque appel.
+    """
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+def cosine_similarity_matrix(queries, corpus, normalized: bool = False) -> np.ndarray:
+    """Similarités cosinus (m, n) entre chaque requête et chaque vecteur du corpus"""
+    if not normalized:
+        queries, corpus = normalize_embeddings(queries), normalize_embeddings(corpus)
+    return np.atleast_2d(queries) @ np.atleast_2d(corpus).T
+
+def euclidean_distance_matrix(queries, corpus) -> np.ndarray:
+    """Distances euclidiennes (m, n), via |a|² + |b|² - 2 a.b"""
+    queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+    corpus = np.atleast_2d(np.asarray(corpus, dtype=np.float32))
+    squared = (np.einsum("ij,ij->i", queries, queries)[:, None]
+               + np.einsum("ij,ij->i", corpus, corpus)[None, :]
+               - 2 * queries @ corpus.T)
+    return np.sqrt(np.maximum(squared, 0))
+
+def top_k_similar(queries, corpus, k: int, normalized: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    k plus proches voisins cosinus de chaque requête
+
+    Returns:
+        Tuple (indices (m, k), similarités (m, k)), par similarité décroissante
+    """
+    scores = cosine_similarity_matrix(queries, corpus, normalized=normalized)
+    indices = top_k_indices(scores, k)
+    return indices, np.take_along_axis(scores, indices, axis=1)
+
+def maximal_marginal_relevance(query, candidates, k: int, lambda_mult: float = 0.5,
+                               normalized: bool = False) -> List[int]:
+    """
+    Sélection MMR : pertinence pour la requête moins redondance avec les éléments déjà choisis
+
+    Args:
+        query: Vecteur de la requête (d,)
+        candidates: Vecteurs candidats (n, d), typiquement le top-k élargi d'une recherche
+        k: Nombre d'éléments à retenir
+        lambda_mult: 1.0 = pertinence seule, 0.0 = diversité seule
+
+    Returns:
+        Indices des candidats retenus, dans l'ordre de sélection
+    """
+    if not normalized:
+        query, candidates = normalize_embeddings(query), normalize_embeddings(candidates)
+    candidates = np.atleast_2d(candidates)
+    k = min(k, candidates.shape[0])
+    if k <= 0:
+        return []
+
+    relevance = (candidates @ np.ravel(query)).astype(np.float32)
+    redundancy = np.full(candidates.shape[0], -np.inf, dtype=np.float32)
+    available = np.ones(candidates.shape[0], dtype=bool)
+    selected = []
+
+    for _ in range(k):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * np.where(np.isinf(redundancy), 0.0, redundancy)
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        # Similarité maximale de chaque candidat avec la sélection, mise à jour incrémentale
+        redundancy = np.maximum(redundancy, candidates @ candidates[best])
+
+    return selected
@@ -0,0 +1,311 @@
+"""
+Index FAQ question -> réponse par filiale
+Répond directement aux questions fréquentes, sans recherche ni génération LLM
+"""
+import os
+import re
+import json
+import unicodedata
+import numpy as np
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+import structlog
+
+from core.knowledge_base.markdown_sections import parse_markdown_sections, strip_inline_markdown
+from core.monitoring.metrics import faq_index_counter
+
+logger = structlog.get_logger()
+
+# Filiale du contenu partagé (voir MultiTenantChromaManager)
+COMMON_SCOPE = "common"
+
+# Lignes "Q: ..." / "R: ..." (numérotation et gras Markdown tolérés)
+_QUESTION_LINE = re.compile(r"^\s*(?:\*\*)?(?:Q|Question)\s*\d*\s*[:.)-]\s*(?:\*\*)?\s*(.+?)\s*$", re.IGNORECASE)
+_ANSWER_LINE = re.compile(r"^\s*(?:\*\*)?(?:R|Réponse|Reponse|A|Answer)\s*\d*\s*[:.)-]\s*(?:\*\*)?\s*(.+?)\s*$", re.IGNORECASE)
+_HEADING_LINE = re.compile(r"^\s{0,3}#{1,6}\s")
+
+# Mots sans incidence sur le sens de la question (clé quasi exacte). Les
+# prépositions (de, à, vers, depuis...) restent : elles portent le sens d'un transfert
+FILLER_WORDS = {
+    "bonjour", "bonsoir", "salut", "hello", "svp", "stp", "merci", "please", "plait", "vous", "il",
+    "s", "le", "la", "les", "l", "un", "une", "des", "the"
+}
+
+def normalize_question(text: str) -> str:
+    """Casse, accents, ponctuation et espaces normalisés"""
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(re.findall(r"\w+", text))
+
+def question_key(text: str) -> str:
+    """Clé quasi exacte : mots significatifs dans l'ordre (politesse et articles ignorés)"""
+    return " ".join(word for word in normalize_question(text).split() if word not in FILLER_WORDS)
+
+def extract_faq_pairs(content: str, markdown: bool = False) -> List[Dict]:
+    """
+    Extrait les paires question / réponse d'un document
+
+    Reconnaît les lignes `Q: ...` suivies de `R: ...` (la réponse se poursuit
+    jusqu'à la ligne vide ou la question suivante) et, pour le Markdown, les
+    titres terminés par `?` dont la section est la réponse.
+
+    Returns:
+        [{"question", "answer", "heading_path"}]
+    """
+    pairs = []
+    question, answer_lines = None, None
+
+    def flush():
+        if question and answer_lines:
+            pairs.append({"question": question, "answer": " ".join(answer_lines), "heading_path": ""})
+
+    for line in content.split("\n"):
+        question_match = _QUESTION_LINE.match(line)
+        answer_match = _ANSWER_LINE.match(line) if question else None
+        if question_match:
+            flush()
+            question, answer_lines = strip_inline_markdown(question_match.group(1)), None
+        elif answer_match and answer_lines is None:
+            answer_lines = [strip_inline_markdown(answer_match.group(1))]
+        elif answer_lines is not None and line.strip() and not _HEADING_LINE.match(line):
+            answer_lines.append(strip_inline_markdown(line.strip()))
+        elif answer_lines is not None:
+            flush()
+            question, answer_lines = None, None
+    flush()
+
+    if markdown:
+        known = {normalize_question(pair["question"]) for pair in pairs}
+        for section in parse_markdown_sections(content):
+            if section["title"].endswith("?") and section["content"] and normalize_question(section["title"]) not in known:
+                pairs.append({
+                    "question": section["title"],
+                    "answer": section["content"],
+                    "heading_path": " > ".join(section["heading_path"])
+                })
+    return pairs
+
+class _FaqScope:
+    """Index d'une filiale chargé en mémoire"""
+
+    def __init__(self, data: Dict, vectors: Optional[np.ndarray], stamp):
+        self.entries: List[Dict] = data.get("entries", [])
+        self.embedding_model = data.get("embedding_model")
+        self.vectors = vectors
+        self.stamp = stamp
+        self.exact = {}
+        self.near_exact = {}
+        for position, entry in enumerate(self.entries):
+            self.exact.setdefault(normalize_question(entry["question"]), position)
+            self.near_exact.setdefault(question_key(entry["question"]), position)
+
+class FaqIndex:
+    """
+    Index FAQ par filiale : question normalisée -> réponse
+
+    Trois niveaux de correspondance :
+    - exact : question normalisée (casse, accents, ponctuation), O(1) ;
+    - near_exact : mots significatifs dans l'ordre, O(1) ;
+    - semantic : similarité cosinus des embeddings de questions au-dessus de
+      FAQ_SEMANTIC_THRESHOLD, avec l'embedding de la requête déjà calculé
+      (cache sémantique) par le même modèle.
+
+    Chaque filiale est persistée dans `FAQ_INDEX_DIR` (JSON + vecteurs .npy)
+    et rechargée dès que son fichier change (réingestion par un autre
+    processus). L'index `common` complète celui de la filiale.
+    """
+
+    def __init__(self, directory: Optional[str] = None, embedding_manager=None,
+                 semantic_threshold: Optional[float] = None):
+        self.directory = Path(directory or os.getenv("FAQ_INDEX_DIR", "./data/faq_index"))
+        self._embedding_manager = embedding_manager
+        self.semantic_threshold = semantic_threshold or float(os.getenv("FAQ_SEMANTIC_THRESHOLD", "0.95"))
+        self.enabled = os.getenv("FAQ_INDEX_ENABLED", "true").lower() == "true"
+        self._scopes: Dict[str, _FaqScope] = {}
+
+    @property
+    def embedding_manager(self):
+        if self._embedding_manager is None:
+            from core.knowledge_base.embeddings import embedding_manager
+            self._embedding_manager = embedding_manager
+        return self._embedding_manager
+
+    def _embedding_model(self) -> str:
+        provider = getattr(self.embedding_manager, "provider", None)
+        return getattr(provider, "model", None) or getattr(provider, "model_name", None) or type(provider).__name__
+
+    def _paths(self, application: str, filiale_id: str):
+        base = self.directory / f"{application}_{filiale_id}"
+        return base.with_suffix(".faq.json"), base.with_suffix(".faq.npy")
+
+    async def build(self, application: str, filiale_id: str, pairs: List[Dict],
+                    embed: bool = True) -> int:
+        """
+        Remplace l'index FAQ d'une filiale
+
+        Returns:
+            Nombre de questions indexées (doublons normalisés retirés)
+        """
+        entries = {}
+        for pair in pairs:
+            entries.setdefault(normalize_question(pair["question"]), pair)
+        entries = [entry for key, entry in entries.items() if key]
+
+        vectors = None
+        if embed and entries:
+            try:
+                embeddings = await self.embedding_manager.embed_documents([entry["question"] for entry in entries])
+                vectors = np.asarray(embeddings, dtype=np.float32)
+                vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+            except Exception as e:
+                logger.warning(f"FAQ question embeddings skipped: {e}")
+
+        json_path, vectors_path = self._paths(application, filiale_id)
+        json_path.parent.mkdir(parents=True, exist_ok=True)
+        if vectors is not None:
+            with open(vectors_path.with_suffix(".tmp"), "wb") as f:
+                np.save(f, vectors)
+            os.replace(vectors_path.with_suffix(".tmp"), vectors_path)
+        elif vectors_path.exists():
+            vectors_path.unlink()
+
+        data = {
+            "application": application,
+            "filiale_id": filiale_id,
+            "embedding_model": self._embedding_model() if vectors is not None else None,
+            "built_at": datetime.now().isoformat(),
+            "entries": entries
+        }
+        # Le JSON est écrit en dernier : son changement déclenche le rechargement
+        tmp_path = json_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, json_path)
+        self._scopes.pop(f"{application}_{filiale_id}", None)
+
+        logger.info("FAQ index built", application=application, filiale_id=filiale_id, questions=len(entries))
+        return len(entries)
+
+    def _get_scope(self, application: str, filiale_id: str) -> Optional[_FaqScope]:
+        key = f"{application}_{filiale_id}"
+        json_path, vectors_path = self._paths(application, filiale_id)
+        try:
+            stat = json_path.stat()
+        except FileNotFoundError:
+            self._scopes.pop(key, None)
+            return None
+
+        stamp = (stat.st_ino, stat.st_mtime_ns)
+        scope = self._scopes.get(key)
+        if scope is None or scope.stamp != stamp:
+            with open(json_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            vectors = np.load(vectors_path) if data.get("embedding_model") and vectors_path.exists() else None
+            scope = _FaqScope(data, vectors, stamp)
+            self._scopes[key] = scope
+        return scope
+
+    def _scopes_for(self, application: str, filiale_id: str):
+        yield self._get_scope(application, filiale_id), None
+        if filiale_id != COMMON_SCOPE:
+            yield self._get_scope(application, COMMON_SCOPE), COMMON_SCOPE
+
+    @staticmethod
+    def _allowed(entry: Dict, excluded_sources) -> bool:
+        return not excluded_sources or entry.get("source_file") not in excluded_sources
+
+    def _result(self, filiale_id: str, entry: Dict, match: str, similarity: float, scope_name) -> Dict:
+        faq_index_counter.labels(filiale_id=filiale_id, result=match).inc()
+        return {
+            "question": entry["question"],
+            "answer": entry["answer"],
+            "match": match,
+            "similarity": similarity,
+            "source_file": entry.get("source_file"),
+            "scope": scope_name or filiale_id
+        }
+
+    def lookup(self, application: str, filiale_id: str, question: str,
+               common_exclusions: Optional[set] = None) -> Optional[Dict]:
+        """
+        Correspondance exacte ou quasi exacte (O(1), sans embedding)
+
+        Args:
+            common_exclusions: Fichiers sources communs masqués ou remplacés par la filiale
+
+        Returns:
+            {"question", "answer", "match" (exact | near_exact), ...} ou None
+        """
+        if not self.enabled or not question.strip():
+            return None
+
+        normalized, key = normalize_question(question), question_key(question)
+        for match, table_key in (("exact", normalized), ("near_exact", key)):
+            for scope, scope_name in self._scopes_for(application, filiale_id):
+                if scope is None:
+                    continue
+                table = scope.exact if match == "exact" else scope.near_exact
+                position = table.get(table_key)
+                if position is None:
+                    continue
+                entry = scope.entries[position]
+                if scope_name and not self._allowed(entry, common_exclusions):
+                    continue
+                return self._result(filiale_id, entry, match, 1.0, scope_name)
+        return None
+
+    def lookup_embedding(self, application: str, filiale_id: str, embedding,
+                         common_exclusions: Optional[set] = None) -> Optional[Dict]:
+        """
+        Question FAQ la plus proche d'un embedding de requête normalisé
+
+        Ignoré si l'index a été embeddé par un autre modèle.
+        """
+        if not self.enabled or embedding is None:
+            return None
+
+        embedding = np.asarray(embedding, dtype=np.float32)
+        model = self._embedding_model()
+        best = None
+        for scope, scope_name in self._scopes_for(application, filiale_id):
+            if scope is None or scope.vectors is None or scope.embedding_model != model:
+                continue
+            if scope.vectors.shape[1] != embedding.shape[0]:
+                continue
+            similarities = scope.vectors @ embedding
+            for position in np.argsort(-similarities)[:5]:
+                entry = scope.entries[int(position)]
+                if scope_name and not self._allowed(entry, common_exclusions):
+                    continue
+                if best is None or similarities[position] > best[0]:
+                    best = (float(similarities[position]), entry, scope_name)
+                break
+
+        if best is None or best[0] < self.semantic_threshold:
+            faq_index_counter.labels(filiale_id=filiale_id, result="miss").inc()
+            return None
+        return self._result(filiale_id, best[1], "semantic", best[0], best[2])
+
+    def get_questions(self, application: str, filiale_id: str):
+        """
+        Questions indexées d'une filiale
+
+        Returns:
+            (version de l'index chargé ou None, [{"question", "source_file"}])
+        """
+        scope = self._get_scope(application, filiale_id)
+        if scope is None:
+            return None, []
+        return scope.stamp, [
+            {"question": entry["question"], "source_file": entry.get("source_file")}
+            for entry in scope.entries
+        ]
+
+    def get_stats(self, application: str, filiale_id: str) -> Dict:
+        scope = self._get_scope(application, filiale_id)
+        return {
+            "questions": len(scope.entries) if scope else 0,
+            "embedding_model": scope.embedding_model if scope else None,
+            "semantic": scope is not None and scope.vectors is not None
+        }
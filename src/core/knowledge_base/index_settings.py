@@ -0,0 +1,57 @@
+"""
+Paramètres d'index HNSW par collection
+Résolus depuis la configuration du pack (app_packs.yaml) et de la filiale
+"""
+from typing import Dict, Optional
+
+# Paramètres HNSW de ChromaDB (fixés à la création de la collection)
+INDEX_SETTING_KEYS = ("space", "M", "construction_ef", "search_ef")
+INDEX_SPACES = ("cosine", "l2", "ip")
+# ChromaDB refuse `hnsw:space` dans modify(), même inchangé : l'espace est recopié sous cette clé
+SPACE_METADATA_KEY = "index:space"
+
+def merge_index_config(pack_config: Optional[Dict], filiale_config: Optional[Dict]) -> Dict:
+    """
+    Fusionne la configuration d'index du pack et celle de la filiale
+
+    Les clés de la filiale remplacent celles du pack (y compris `size_tiers`).
+    """
+    return {**(pack_config or {}), **(filiale_config or {})}
+
+def resolve_index_settings(config: Optional[Dict], expected_size: int = 0) -> Dict:
+    """
+    Paramètres d'index pour une collection de `expected_size` documents
+
+    `size_tiers` (liste de paliers `min_documents` + paramètres) relève les
+    paramètres de base pour les grosses collections : tous les paliers
+    atteints s'appliquent, du plus petit au plus grand.
+
+    Raises:
+        ValueError: espace de distance inconnu ou paramètre non entier positif
+    """
+    config = config or {}
+    settings = {key: config[key] for key in INDEX_SETTING_KEYS if key in config}
+
+    tiers = sorted(config.get("size_tiers") or [], key=lambda tier: tier.get("min_documents", 0))
+    for tier in tiers:
+        if expected_size >= tier.get("min_documents", 0):
+            settings.update({key: tier[key] for key in INDEX_SETTING_KEYS if key in tier})
+
+    if "space" in settings and settings["space"] not in INDEX_SPACES:
+        raise ValueError(f"Unknown index space: {settings['space']}")
+    for key in ("M", "construction_ef", "search_ef"):
+        if key in settings and (not isinstance(settings[key], int) or settings[key] <= 0):
+            raise ValueError(f"Index setting {key} must be a positive integer, got {settings[key]!r}")
+    return settings
+
+def to_collection_metadata(settings: Dict) -> Dict:
+    """Métadonnées de collection ChromaDB (`hnsw:space`, `hnsw:M`...)"""
+    return {f"hnsw:{key}": settings[key] for key in INDEX_SETTING_KEYS if key in settings}
+
+def from_collection_metadata(metadata: Optional[Dict]) -> Dict:
+    """Paramètres d'index enregistrés dans les métadonnées d'une collection"""
+    metadata = metadata or {}
+    settings = {key: metadata[f"hnsw:{key}"] for key in INDEX_SETTING_KEYS if f"hnsw:{key}" in metadata}
+    if "space" not in settings and SPACE_METADATA_KEY in metadata:
+        settings["space"] = metadata[SPACE_METADATA_KEY]
+    return settings
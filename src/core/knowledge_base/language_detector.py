@@ -0,0 +1,132 @@
+"""
+Identification de la langue par trigrammes de caractères
+Profils calculés une fois depuis language_profiles.yaml, détection par lot
+"""
+import os
+import re
+import unicodedata
+from itertools import chain
+from pathlib import Path
+from typing import Dict, List, Optional
+import numpy as np
+import yaml
+import structlog
+
+logger = structlog.get_logger()
+
+PROFILES_PATH = Path(__file__).parent / "language_profiles.yaml"
+
+# Lettres uniquement (accents et ɛ, ɔ, ɲ, ŋ compris), chiffres et ponctuation retirés
+_WORDS = re.compile(r"[^\W\d_]+")
+
+def text_trigrams(text: str, max_chars: int = 1000) -> List[str]:
+    """Trigrammes d'un texte normalisé, mots séparés et encadrés par une espace"""
+    text = " " + " ".join(_WORDS.findall(unicodedata.normalize("NFC", text[:max_chars].casefold()))) + " "
+    return [text[i:i + 3] for i in range(len(text) - 2)]
+
+class LanguageDetector:
+    """
+    Classifieur bayésien naïf sur les trigrammes de caractères
+
+    La table des log-probabilités (trigramme x langue, lissage additif) est
+    construite au premier appel ; une ligne supplémentaire porte la
+    probabilité d'un trigramme inconnu. Un lot de textes est scoré en une
+    seule indexation de la table suivie d'une somme par texte.
+
+    Un texte est classé seulement s'il a assez de trigrammes connus et si
+    l'écart moyen par trigramme entre les deux meilleures langues dépasse
+    LANGUAGE_DETECTION_MIN_MARGIN ; sinon la valeur par défaut est renvoyée.
+    """
+
+    def __init__(self, profiles_path: Optional[str] = None, smoothing: float = 0.5,
+                 min_trigrams: int = 4, min_margin: Optional[float] = None):
+        self.profiles_path = Path(profiles_path or PROFILES_PATH)
+        self.smoothing = smoothing
+        self.min_trigrams = min_trigrams
+        self.min_margin = min_margin if min_margin is not None else float(
+            os.getenv("LANGUAGE_DETECTION_MIN_MARGIN", "0.1")
+        )
+        self.languages: List[str] = []
+        self._vocabulary: Dict[str, int] = {}
+        self._table: Optional[np.ndarray] = None
+
+    def _load(self):
+        with open(self.profiles_path, "r", encoding="utf-8") as f:
+            config = yaml.safe_load(f)
+
+        languages = config.get("languages", {})
+        self.languages = list(languages)
+        vocabulary: Dict[str, int] = {}
+        per_language = []
+        for code in self.languages:
+            language_counts: Dict[int, int] = {}
+            for sample in languages[code].get("samples", []):
+                for trigram in text_trigrams(sample, max_chars=len(sample)):
+                    index = vocabulary.setdefault(trigram, len(vocabulary))
+                    language_counts[index] = language_counts.get(index, 0) + 1
+            per_language.append(language_counts)
+
+        # Dernière ligne : trigramme absent des échantillons
+        counts = np.zeros((len(vocabulary) + 1, len(self.languages)), dtype=np.float64)
+        for column, language_counts in enumerate(per_language):
+            for index, count in language_counts.items():
+                counts[index, column] = count
+
+        totals = counts.sum(axis=0) + self.smoothing * counts.shape[0]
+        self._table = np.log((counts + self.smoothing) / totals).astype(np.float32)
+        self._vocabulary = vocabulary
+
+        logger.debug("Language profiles loaded", languages=self.languages, trigrams=len(vocabulary))
+
+    @property
+    def table(self) -> np.ndarray:
+        if self._table is None:
+            self._load()
+        return self._table
+
+    def score_batch(self, texts: List[str]):
+        """
+        Log-vraisemblance moyenne par trigramme de chaque texte pour chaque langue
+
+        Returns:
+            (scores de forme (textes, langues), nombre de trigrammes connus par texte)
+        """
+        table = self.table
+        unknown = len(self._vocabulary)
+        ids = [[self._vocabulary.get(trigram, unknown) for trigram in text_trigrams(text)] for text in texts]
+        lengths = np.fromiter((len(text_ids) for text_ids in ids), dtype=np.int64, count=len(ids))
+        flat = np.fromiter(chain.from_iterable(ids), dtype=np.int64, count=int(lengths.sum()))
+
+        scores = np.zeros((len(texts), len(self.languages)), dtype=np.float32)
+        known = np.zeros(len(texts), dtype=np.int64)
+        non_empty = lengths > 0
+        if flat.size:
+            offsets = (np.cumsum(lengths) - lengths)[non_empty]
+            scores[non_empty] = np.add.reduceat(table[flat], offsets, axis=0) / lengths[non_empty, None]
+            known[non_empty] = np.add.reduceat((flat != unknown).astype(np.int64), offsets)
+        return scores, known
+
+    def detect_batch(self, texts: List[str], default: str = "unknown") -> List[str]:
+        """Code de langue de chaque texte (ou `default` si le texte est trop court ou ambigu)"""
+        if not texts:
+            return []
+
+        scores, known = self.score_batch(texts)
+        if len(self.languages) < 2:
+            return [self.languages[0] if count >= self.min_trigrams else default for count in known]
+
+        ranked = np.argsort(-scores, axis=1)
+        best = scores[np.arange(len(texts)), ranked[:, 0]]
+        second = scores[np.arange(len(texts)), ranked[:, 1]]
+        confident = (known >= self.min_trigrams) & (best - second >= self.min_margin)
+        return [
+            self.languages[ranked[i, 0]] if confident[i] else default
+            for i in range(len(texts))
+        ]
+
+    def detect(self, text: str, default: str = "unknown") -> str:
+        """Code de langue d'un texte"""
+        return self.detect_batch([text], default=default)[0]
+
+# Instance globale
+language_detector = LanguageDetector()
@@ -0,0 +1,168 @@
+"""
+Découpage des documents Markdown par sections
+Les titres (#, ##, ... ou soulignés) délimitent les chunks et forment le chemin de section
+"""
+import re
+from typing import Dict, List
+
+HEADING_PATH_SEPARATOR = " > "
+
+_ATX_HEADING = re.compile(r"^ {0,3}(#{1,6})[ \t]+(.+?)[ \t]*#*[ \t]*$")
+_SETEXT_UNDERLINE = re.compile(r"^ {0,3}(=+|-+)[ \t]*$")
+_FENCE = re.compile(r"^ {0,3}(```|~~~)")
+_FRONT_MATTER = re.compile(r"\A---\n.*?\n---\n", re.DOTALL)
+
+# Syntaxe inline retirée (le texte est embeddé, pas affiché)
+_INLINE_RULES = [
+    (re.compile(r"!\[([^\]]*)\]\([^)]*\)"), r"\1"),       # images
+    (re.compile(r"\[([^\]]+)\]\([^)]*\)"), r"\1"),        # liens
+    (re.compile(r"`([^`]+)`"), r"\1"),                    # code inline
+    (re.compile(r"(\*\*|__)(.+?)\1"), r"\2"),             # gras
+    (re.compile(r"(?<![\w*])([*_])(?!\s)(.+?)(?<!\s)\1(?![\w*])"), r"\2"),  # italique
+    (re.compile(r"<[^>\n]+>"), ""),                       # balises HTML
+]
+_INLINE_MARKERS = re.compile(r"[\[`*_<]")
+_BLOCKQUOTE = re.compile(r"^ {0,3}> ?", re.MULTILINE)
+_HORIZONTAL_RULE = re.compile(r"^ {0,3}([-*_])( *\1){2,} *$")
+
+def strip_inline_markdown(text: str) -> str:
+    """Retire la mise en forme inline (liens, emphase, code, HTML)"""
+    if not _INLINE_MARKERS.search(text):
+        return text
+    for pattern, replacement in _INLINE_RULES:
+        text = pattern.sub(replacement, text)
+    return text
+
+def parse_markdown_sections(markdown_text: str) -> List[Dict]:
+    """
+    Découpe un document Markdown selon la hiérarchie de ses titres
+
+    Les titres dans les blocs de code sont ignorés. Le texte avant le premier
+    titre forme une section sans titre.
+
+    Returns:
+        Sections dans l'ordre du document :
+        {"title", "level", "heading_path" (titres parents + titre), "content"}
+    """
+    markdown_text = _FRONT_MATTER.sub("", markdown_text.replace("\r\n", "\n"))
+    lines = markdown_text.split("\n")
+
+    sections = []
+    path: List[str] = []
+    levels: List[int] = []
+    current = {"title": "", "level": 0, "heading_path": [], "lines": []}
+    in_fence = None
+
+    def start_section(title: str, level: int):
+        nonlocal current
+        sections.append(current)
+        while levels and levels[-1] >= level:
+            levels.pop()
+            path.pop()
+        levels.append(level)
+        path.append(title)
+        current = {"title": title, "level": level, "heading_path": list(path), "lines": []}
+
+    index = 0
+    while index < len(lines):
+        line = lines[index]
+        fence = _FENCE.match(line)
+        if fence:
+            in_fence = None if in_fence == fence.group(1) else (in_fence or fence.group(1))
+            current["lines"].append(line)
+        elif in_fence:
+            current["lines"].append(line)
+        elif line.lstrip(" ").startswith("#") and _ATX_HEADING.match(line):
+            match = _ATX_HEADING.match(line)
+            start_section(strip_inline_markdown(match.group(2)).strip(), len(match.group(1)))
+        elif (line.strip() and index + 1 < len(lines) and _SETEXT_UNDERLINE.match(lines[index + 1])
+              and not _HORIZONTAL_RULE.match(line)
+              and (not current["lines"] or not current["lines"][-1].strip())):
+            # Titre souligné : une ligne isolée suivie de === (niveau 1) ou --- (niveau 2)
+            underline = lines[index + 1].strip()
+            start_section(strip_inline_markdown(line).strip(), 1 if underline.startswith("=") else 2)
+            index += 1
+        else:
+            current["lines"].append(line)
+        index += 1
+    sections.append(current)
+
+    result = []
+    for section in sections:
+        content = _clean_block("\n".join(section.pop("lines")))
+        result.append({**section, "content": content})
+    return [section for section in result if section["content"] or section["title"]]
+
+def _clean_block(block: str) -> str:
+    lines = [
+        line.rstrip() for line in block.split("\n")
+        if not _FENCE.match(line) and not _HORIZONTAL_RULE.match(line)
+    ]
+    # Les règles inline ne traversent pas les fins de ligne : un seul passage par bloc
+    text = strip_inline_markdown(_BLOCKQUOTE.sub("", "\n".join(lines)))
+    # Au plus une ligne vide entre deux paragraphes
+    return re.sub(r"\n{3,}", "\n\n", text).strip()
+
+def chunk_markdown_sections(sections: List[Dict], max_chars: int = 1000) -> List[Dict]:
+    """
+    Chunks alignés sur les sections
+
+    Une section est un chunk, préfixé par son chemin de titres pour que
+    l'embedding garde le contexte. Une section trop longue est coupée aux
+    fins de paragraphe ; les titres sans contenu ne produisent pas de chunk.
+
+    Returns:
+        {"content", "heading_path" (str), "section_title", "section_level"}
+    """
+    chunks = []
+    for section in sections:
+        if not section["content"]:
+            continue
+
+        heading_path = HEADING_PATH_SEPARATOR.join(section["heading_path"])
+        prefix = f"{heading_path}\n\n" if heading_path else ""
+        for part in _split_paragraphs(section["content"], max(max_chars - len(prefix), 200)):
+            chunks.append({
+                "content": prefix + part,
+                "heading_path": heading_path,
+                "section_title": section["title"],
+                "section_level": section["level"]
+            })
+    return chunks
+
+def _split_paragraphs(text: str, max_chars: int) -> List[str]:
+    """Regroupe des paragraphes entiers jusqu'à max_chars (un paragraphe trop long est coupé aux lignes)"""
+    if len(text) <= max_chars:
+        return [text]
+
+    units = []
+    for paragraph in text.split("\n\n"):
+        if len(paragraph) <= max_chars:
+            units.append(paragraph)
+            continue
+        line_group = ""
+        for line in paragraph.split("\n"):
+            if len(line) > max_chars and line_group:
+                units.append(line_group)
+                line_group = ""
+            while len(line) > max_chars:
+                units.append(line[:max_chars])
+                line = line[max_chars:]
+            if line_group and len(line_group) + 1 + len(line) > max_chars:
+                units.append(line_group)
+                line_group = line
+            else:
+                line_group = f"{line_group}\n{line}" if line_group else line
+        if line_group:
+            units.append(line_group)
+
+    parts, current = [], ""
+    for unit in units:
+        if current and len(current) + 2 + len(unit) > max_chars:
+            parts.append(current)
+            current = unit
+        else:
+            current = f"{current}\n\n{unit}" if current else unit
+    if current:
+        parts.append(current)
+    return parts
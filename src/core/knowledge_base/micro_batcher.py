@@ -0,0 +1,137 @@
+"""
+Micro-batching des embeddings locaux
+Regroupe les requêtes concurrentes en un seul appel d'encodage exécuté hors de la boucle asyncio
+"""
+import os
+import time
+import queue
+import asyncio
+import threading
+import numpy as np
+from typing import Callable, Dict, List
+import structlog
+
+logger = structlog.get_logger()
+
+class MicroBatchEmbedder:
+    """
+    File d'attente d'embeddings vidée par un thread de travail
+
+    Les textes soumis sont accumulés jusqu'à `max_batch_size` éléments ou
+    `max_wait_ms` millisecondes après le premier, encodés en un seul appel,
+    puis les futures des appelants sont résolues dans leur boucle asyncio.
+
+    Args:
+        encode_fn: Fonction synchrone liste de textes -> matrice (n, d)
+        max_batch_size: Nombre maximal de textes par appel (HF_EMBEDDING_MAX_BATCH)
+        max_wait_ms: Attente maximale pour compléter un batch (HF_EMBEDDING_MAX_WAIT_MS)
+    """
+
+    def __init__(self, encode_fn: Callable[[List[str]], np.ndarray],
+                 max_batch_size: int = None, max_wait_ms: float = None):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size or int(os.getenv("HF_EMBEDDING_MAX_BATCH", "32"))
+        self.max_wait = (max_wait_ms if max_wait_ms is not None
+                         else float(os.getenv("HF_EMBEDDING_MAX_WAIT_MS", "5"))) / 1000
+        self._queue: "queue.Queue" = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        self._closed = False
+        self.stats = {"batches": 0, "items": 0, "max_batch": 0, "errors": 0}
+
+    def _ensure_worker(self):
+        """Démarre le thread de travail à la première requête"""
+        if self._worker is None or not self._worker.is_alive():
+            with self._worker_lock:
+                if self._worker is None or not self._worker.is_alive():
+                    self._worker = threading.Thread(target=self._run, name="embedding-micro-batcher", daemon=True)
+                    self._worker.start()
+
+    async def embed(self, text: str) -> List[float]:
+        """Embedding d'un texte, encodé avec les autres requêtes en attente"""
+        return (await self.embed_many([text]))[0]
+
+    async def embed_many(self, texts: List[str]) -> List[List[float]]:
+        """Embeddings de plusieurs textes (répartis sur un ou plusieurs batches)"""
+        if self._closed:
+            raise RuntimeError("MicroBatchEmbedder is closed")
+        if not texts:
+            return []
+
+        self._ensure_worker()
+        loop = asyncio.get_running_loop()
+        futures = []
+        for text in texts:
+            future = loop.create_future()
+            self._queue.put((text, future, loop))
+            futures.append(future)
+        return list(await asyncio.gather(*futures))
+
+    def _collect_batch(self, first) -> List:
+        """Complète un batch jusqu'à la taille maximale ou l'échéance"""
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+
+            batch = self._collect_batch(first)
+            texts = [text for text, _, _ in batch]
+            try:
+                embeddings = np.asarray(self.encode_fn(texts), dtype=np.float32)
+                if len(embeddings) != len(batch):
+                    raise ValueError(f"encode_fn returned {len(embeddings)} embeddings for {len(batch)} texts")
+                results = [(_set_result, embedding.tolist()) for embedding in embeddings]
+            except Exception as e:
+                logger.error(f"Micro-batch encoding failed: {e}")
+                self.stats["errors"] += 1
+                results = [(_set_exception, e)] * len(batch)
+
+            self.stats["batches"] += 1
+            self.stats["items"] += len(batch)
+            self.stats["max_batch"] = max(self.stats["max_batch"], len(batch))
+
+            for (_, future, loop), (resolve, value) in zip(batch, results):
+                try:
+                    loop.call_soon_threadsafe(resolve, future, value)
+                except RuntimeError:
+                    # Boucle de l'appelant déjà fermée
+                    pass
+
+    def get_stats(self) -> Dict:
+        """Statistiques de regroupement"""
+        batches = self.stats["batches"]
+        return {
+            **self.stats,
+            "avg_batch": self.stats["items"] / batches if batches else 0.0,
+            "pending": self._queue.qsize()
+        }
+
+    def close(self):
+        """Arrête le thread de travail une fois la file vidée"""
+        self._closed = True
+        if self._worker is not None:
+            self._queue.put(None)
+            self._worker.join(timeout=5)
+
+def _set_result(future: asyncio.Future, value):
+    if not future.done():
+        future.set_result(value)
+
+def _set_exception(future: asyncio.Future, error: Exception):
+    if not future.done():
+        future.set_exception(error)
@@ -0,0 +1,89 @@
+"""
+Quantification scalaire des embeddings (float16 / int8)
+Réduit l'empreinte mémoire des matrices de recherche de la base de connaissances
+"""
+import numpy as np
+from typing import Dict, Optional, Tuple
+
+SUPPORTED_DTYPES = ("float32", "float16", "int8")
+
+# Nombre de lignes converties en float32 à la fois lors du scoring
+SCORE_BLOCK_ROWS = 1024
+
+def quantize(vectors: np.ndarray, dtype: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Quantifie une matrice d'embeddings normalisés
+
+    Args:
+        vectors: Matrice (n, d) float32
+        dtype: float32, float16 ou int8
+
+    Returns:
+        Tuple (matrice quantifiée, échelles par dimension pour int8 sinon None)
+    """
+    if dtype not in SUPPORTED_DTYPES:
+        raise ValueError(f"Unsupported vector dtype: {dtype}")
+
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if dtype == "float32":
+        return vectors, None
+    if dtype == "float16":
+        return vectors.astype(np.float16), None
+
+    # int8 symétrique, une échelle par dimension
+    scales = np.abs(vectors).max(axis=0) / 127.0 if len(vectors) else np.ones(vectors.shape[1], dtype=np.float32)
+    scales = np.where(scales == 0, 1.0, scales).astype(np.float32)
+    quantized = np.clip(np.rint(vectors / scales), -127, 127).astype(np.int8)
+    return quantized, scales
+
+def dequantize(quantized: np.ndarray, scales: Optional[np.ndarray] = None) -> np.ndarray:
+    """Reconstruit une approximation float32"""
+    vectors = np.asarray(quantized, dtype=np.float32)
+    if scales is not None:
+        vectors = vectors * scales
+    return vectors
+
+def approximate_scores(queries: np.ndarray, quantized: np.ndarray,
+                       scales: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Produits scalaires approchés requêtes (m, d) x matrice quantifiée (n, d)
+
+    Pour int8, l'échelle est appliquée aux requêtes plutôt qu'à la matrice.
+    La matrice est convertie en float32 par blocs pour borner la mémoire
+    temporaire (BLAS ne travaille pas directement sur float16/int8).
+    """
+    queries = np.asarray(queries, dtype=np.float32)
+    if scales is not None:
+        queries = queries * scales
+    if quantized.dtype == np.float32:
+        return queries @ quantized.T
+
+    n_rows = quantized.shape[0]
+    scores = np.empty((queries.shape[0], n_rows), dtype=np.float32)
+    for start in range(0, n_rows, SCORE_BLOCK_ROWS):
+        block = np.asarray(quantized[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+        scores[:, start:start + SCORE_BLOCK_ROWS] = queries @ block.T
+    return scores
+
+def rescore(queries: np.ndarray, full_vectors: np.ndarray, candidates: np.ndarray) -> np.ndarray:
+    """
+    Scores exacts des candidats avec les vecteurs pleine précision
+
+    Args:
+        queries: Requêtes (m, d)
+        full_vectors: Matrice pleine précision (n, d), typiquement memory-mappée
+        candidates: Indices candidats (m, c)
+
+    Returns:
+        Scores exacts (m, c)
+    """
+    gathered = np.asarray(full_vectors[candidates.ravel()], dtype=np.float32)
+    gathered = gathered.reshape(candidates.shape[0], candidates.shape[1], -1)
+    return np.einsum("mcd,md->mc", gathered, np.asarray(queries, dtype=np.float32))
+
+def memory_footprint(quantized: np.ndarray, scales: Optional[np.ndarray] = None) -> Dict[str, int]:
+    """Taille en octets de la matrice de recherche"""
+    return {
+        "search_bytes": int(quantized.nbytes + (scales.nbytes if scales is not None else 0)),
+        "float32_bytes": int(quantized.shape[0] * quantized.shape[1] * 4) if quantized.ndim == 2 else 0
+    }
@@ -0,0 +1,84 @@
+"""
+Cache des résultats de recherche de la base de connaissances
+Évite de réinterroger l'index vectoriel pour une requête identique
+"""
+import os
+import re
+import copy
+import json
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Tuple
+import structlog
+
+from core.monitoring.metrics import (
+    kb_query_cache_counter, kb_query_cache_evictions_counter, kb_query_cache_entries_gauge
+)
+
+logger = structlog.get_logger()
+
+def normalize_query(query: str) -> str:
+    """Casse et espaces normalisés (même question, même clé)"""
+    return re.sub(r"\s+", " ", query).strip().casefold()
+
+class QueryResultCache:
+    """
+    Cache LRU des résultats de query_documents
+
+    La clé comprend la portée de la recherche (collections physiques et leur
+    génération, voir MultiTenantChromaManager.get_collection_generation), la
+    requête normalisée, n_results et les filtres. Une écriture dans une
+    collection change sa génération : les anciennes entrées ne sont plus
+    jamais servies et sortent du cache par éviction LRU.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, enabled: Optional[bool] = None):
+        self.max_entries = max_entries or int(os.getenv("KB_QUERY_CACHE_MAX_ENTRIES", "4096"))
+        self.enabled = enabled if enabled is not None else os.getenv("KB_QUERY_CACHE_ENABLED", "true").lower() == "true"
+        self._entries: "OrderedDict[Tuple, Dict]" = OrderedDict()
+        self._stats = {"hit": 0, "miss": 0, "eviction": 0}
+
+    @staticmethod
+    def make_key(scope: Hashable, query: str, n_results: int, where: Optional[Dict],
+                 over_fetch: Optional[int] = None) -> Tuple:
+        filters = json.dumps(where, sort_keys=True, default=str) if where else None
+        return (scope, normalize_query(query), n_results, filters, over_fetch)
+
+    def get(self, key: Tuple, filiale_id: str = "") -> Optional[Dict]:
+        """Résultat en cache (copie), None si absent"""
+        if not self.enabled:
+            return None
+
+        result = self._entries.get(key)
+        outcome = "miss" if result is None else "hit"
+        self._stats[outcome] += 1
+        kb_query_cache_counter.labels(filiale_id=filiale_id, result=outcome).inc()
+        if result is None:
+            return None
+
+        self._entries.move_to_end(key)
+        return copy.deepcopy(result)
+
+    def put(self, key: Tuple, result: Dict):
+        if not self.enabled:
+            return
+
+        self._entries[key] = copy.deepcopy(result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["eviction"] += 1
+            kb_query_cache_evictions_counter.inc()
+        kb_query_cache_entries_gauge.set(len(self._entries))
+
+    def clear(self):
+        self._entries.clear()
+        kb_query_cache_entries_gauge.set(0)
+
+    def get_stats(self) -> Dict:
+        lookups = self._stats["hit"] + self._stats["miss"]
+        return {
+            **self._stats,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hit_rate": self._stats["hit"] / lookups if lookups else 0.0
+        }
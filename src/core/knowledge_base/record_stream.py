@@ -0,0 +1,172 @@
+"""
+Lecture en flux des sources tabulaires (CSV, JSON, JSON Lines)
+Les lignes ou enregistrements sont lus un à un puis regroupés en chunks
+"""
+import csv
+import json
+from pathlib import Path
+from typing import Any, Iterator, Optional, Tuple
+
+READ_SIZE = 64 * 1024
+CSV_DELIMITERS = ",;\t|"
+
+# (numéro de ligne ou d'enregistrement à partir de 1, texte)
+Record = Tuple[int, str]
+
+def format_record(value: Any, label: Optional[str] = None) -> str:
+    """Texte d'un enregistrement : `clé: valeur` séparés par des virgules"""
+    if isinstance(value, dict):
+        text = ", ".join(
+            f"{key}: {item if isinstance(item, (str, int, float)) else json.dumps(item, ensure_ascii=False)}"
+            for key, item in value.items() if item not in (None, "")
+        )
+    elif isinstance(value, list):
+        text = ", ".join(map(str, value))
+    else:
+        text = str(value)
+    return f"{label}: {text}" if label else text
+
+def iter_csv_records(file_path: Path) -> Iterator[Record]:
+    """Lignes d'un CSV (séparateur détecté parmi , ; tabulation |)"""
+    with open(file_path, "r", encoding="utf-8-sig", newline="") as f:
+        try:
+            dialect = csv.Sniffer().sniff(f.read(READ_SIZE), delimiters=CSV_DELIMITERS)
+        except csv.Error:
+            dialect = csv.excel
+        f.seek(0)
+        for row_number, row in enumerate(csv.DictReader(f, dialect=dialect), start=1):
+            text = ", ".join(f"{key}: {value}" for key, value in row.items() if key and value)
+            if text:
+                yield row_number, text
+
+def iter_jsonl_records(file_path: Path) -> Iterator[Record]:
+    """Un enregistrement JSON par ligne"""
+    with open(file_path, "r", encoding="utf-8") as f:
+        for row_number, line in enumerate(f, start=1):
+            if line.strip():
+                yield row_number, format_record(json.loads(line))
+
+class _JsonStream:
+    """Décodage incrémental d'un document JSON lu par blocs"""
+
+    def __init__(self, f):
+        self.f = f
+        self.buffer = ""
+        self.position = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        data = self.f.read(READ_SIZE)
+        if not data:
+            self.eof = True
+            return False
+        # La partie déjà décodée est abandonnée : mémoire bornée par l'enregistrement courant
+        self.buffer = self.buffer[self.position:] + data
+        self.position = 0
+        return True
+
+    def peek(self) -> str:
+        """Prochain caractère significatif (espaces sautés), '' en fin de fichier"""
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position].isspace():
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self._fill():
+                return ""
+
+    def expect(self, *characters: str) -> str:
+        character = self.peek()
+        if character not in characters:
+            raise ValueError(f"JSON invalide : {characters} attendu, {character!r} trouvé")
+        self.position += 1
+        return character
+
+    def value(self) -> Any:
+        """Décode la valeur suivante, en lisant la suite du fichier si elle est incomplète"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+                # Un nombre en fin de tampon peut se poursuivre dans le bloc suivant
+                if end < len(self.buffer) or self.eof:
+                    self.position = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+def iter_json_records(file_path: Path) -> Iterator[Record]:
+    """
+    Enregistrements d'un document JSON, sans le charger entièrement
+
+    - tableau racine : un enregistrement par élément ;
+    - objet racine : un enregistrement par membre `clé: valeur`, les membres
+      tableaux étant eux-mêmes parcourus élément par élément ;
+    - autre valeur : un seul enregistrement.
+    """
+    with open(file_path, "r", encoding="utf-8") as f:
+        stream = _JsonStream(f)
+        first = stream.peek()
+        record_number = 0
+
+        def iter_array(label: Optional[str] = None):
+            nonlocal record_number
+            stream.expect("[")
+            if stream.peek() == "]":
+                stream.expect("]")
+                return
+            while True:
+                record_number += 1
+                yield record_number, format_record(stream.value(), label)
+                if stream.expect(",", "]") == "]":
+                    return
+
+        if first == "[":
+            yield from iter_array()
+        elif first == "{":
+            stream.expect("{")
+            if stream.peek() == "}":
+                return
+            while True:
+                key = stream.value()
+                stream.expect(":")
+                if stream.peek() == "[":
+                    yield from iter_array(label=str(key))
+                else:
+                    record_number += 1
+                    yield record_number, format_record(stream.value(), label=str(key))
+                if stream.expect(",", "}") == "}":
+                    return
+        elif first:
+            yield 1, format_record(stream.value())
+
+def group_records(records: Iterator[Record], max_chars: int = 1000) -> Iterator[Tuple[str, int, int]]:
+    """
+    Regroupe des enregistrements entiers en chunks d'au plus max_chars
+
+    Un enregistrement plus long que max_chars est découpé seul.
+
+    Returns:
+        (texte, première ligne, dernière ligne)
+    """
+    lines, size, row_start, row_end = [], 0, None, None
+    for row_number, text in records:
+        if lines and size + 1 + len(text) > max_chars:
+            yield "\n".join(lines), row_start, row_end
+            lines, size = [], 0
+        if len(text) > max_chars:
+            for start in range(0, len(text), max_chars):
+                yield text[start:start + max_chars], row_number, row_number
+            continue
+        if not lines:
+            row_start = row_number
+        lines.append(text)
+        size += len(text) + (1 if len(lines) > 1 else 0)
+        row_end = row_number
+    if lines:
+        yield "\n".join(lines), row_start, row_end
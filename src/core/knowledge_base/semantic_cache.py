@@ -0,0 +1,299 @@
+"""
+Cache sémantique des réponses de l'assistant
+Sert directement les réponses déjà générées pour des questions similaires
+"""
+import os
+import time
+import numpy as np
+from typing import Dict, List, Optional, Any, Callable
+import structlog
+
+from core.monitoring.metrics import semantic_cache_counter, semantic_cache_latency_saved_counter
+
+logger = structlog.get_logger()
+
+
+class _CacheScope:
+    """Entrées du cache pour une application/filiale"""
+
+    def __init__(self, pack: str, kb_version: Any):
+        self.pack = pack
+        self.kb_version = kb_version
+        self.entries: List[Dict] = []
+        self._matrix: Optional[np.ndarray] = None
+
+    def matrix(self) -> np.ndarray:
+        """Matrice (n, d) des embeddings normalisés, reconstruite si nécessaire"""
+        if self._matrix is None:
+            self._matrix = np.vstack([entry["embedding"] for entry in self.entries])
+        return self._matrix
+
+    def add(self, entry: Dict, max_entries: int):
+        self.entries.append(entry)
+        if len(self.entries) > max_entries:
+            # Évincer l'entrée la moins récemment servie
+            oldest = min(range(len(self.entries)), key=lambda i: self.entries[i]["last_hit_at"])
+            self.entries.pop(oldest)
+        self._matrix = None
+
+    def remove(self, indexes: List[int]):
+        for index in sorted(indexes, reverse=True):
+            self.entries.pop(index)
+        self._matrix = None
+
+
+class SemanticResponseCache:
+    """
+    Cache des réponses finales indexé par embedding de question
+
+    Chaque entrée conserve l'embedding de la question, la réponse, la filiale,
+    le pack et la version de la base de connaissances. Une entrée n'est servie
+    que si la similarité cosinus dépasse le seuil de la filiale et que le pack
+    et la version de KB sont toujours ceux en vigueur.
+
+    Seules les réponses tirées du seul contenu FAQ/KB sont partagées entre les
+    utilisateurs d'une filiale. Une réponse enregistrée avec un `user_id`
+    (réponse du crew, qui peut reprendre des données du client) n'est servie
+    qu'à cet utilisateur.
+    """
+
+    def __init__(self,
+                 embedding_manager=None,
+                 kb_version_provider: Optional[Callable[[str, str], Any]] = None,
+                 pack_provider: Optional[Callable[[str, str], str]] = None,
+                 config_provider: Optional[Callable[[str, str], Dict]] = None,
+                 default_threshold: Optional[float] = None,
+                 max_entries: Optional[int] = None,
+                 ttl_seconds: Optional[int] = None):
+        self._embedding_manager = embedding_manager
+        self._kb_version_provider = kb_version_provider
+        self._pack_provider = pack_provider
+        self._config_provider = config_provider
+        self.default_threshold = default_threshold or float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+        self.max_entries = max_entries or int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "2000"))
+        self.ttl_seconds = ttl_seconds or int(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "86400"))
+        self.enabled = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+
+        self._scopes: Dict[str, _CacheScope] = {}
+        self._stats: Dict[str, Dict[str, float]] = {}
+        # Moyenne glissante du temps de traitement du crew (référence pour le temps économisé)
+        self._avg_miss_latency: Dict[str, float] = {}
+
+    @property
+    def embedding_manager(self):
+        if self._embedding_manager is None:
+            from core.knowledge_base.embeddings import embedding_manager
+            self._embedding_manager = embedding_manager
+        return self._embedding_manager
+
+    def _scope_key(self, application: str, filiale_id: str, user_id: Optional[str] = None) -> str:
+        key = f"{application}_{filiale_id}"
+        return f"{key}:{user_id}" if user_id else key
+
+    def _current_pack(self, application: str, filiale_id: str) -> str:
+        if self._pack_provider:
+            return self._pack_provider(filiale_id, application)
+        from core.packs.manager import pack_manager
+        return pack_manager.get_pack_for_filiale(filiale_id, application)
+
+    def _current_kb_version(self, application: str, filiale_id: str) -> Any:
+        if self._kb_version_provider:
+            return self._kb_version_provider(application, filiale_id)
+        return None
+
+    def get_threshold(self, application: str, filiale_id: str) -> float:
+        """Seuil de similarité de la filiale (config filiale > variable d'environnement)"""
+        try:
+            if self._config_provider:
+                app_config = self._config_provider(filiale_id, application)
+            else:
+                from core.packs.manager import pack_manager
+                app_config = pack_manager.get_application_config(filiale_id, application)
+            threshold = (app_config.get("semantic_cache") or {}).get("similarity_threshold")
+            if threshold is not None:
+                return float(threshold)
+        except Exception as e:
+            logger.warning(f"Could not read semantic cache threshold: {e}")
+        return self.default_threshold
+
+    def is_available(self) -> bool:
+        """Le cache n'a de sens qu'avec des embeddings déterministes"""
+        if not self.enabled:
+            return False
+        return getattr(self.embedding_manager, "is_deterministic", lambda: True)()
+
+    def _get_valid_scope(self, application: str, filiale_id: str,
+                         user_id: Optional[str] = None) -> Optional[_CacheScope]:
+        """Retourne les entrées de la filiale (ou d'un utilisateur), invalidées si le pack ou la KB ont changé"""
+        key = self._scope_key(application, filiale_id, user_id)
+        scope = self._scopes.get(key)
+        if scope is None:
+            return None
+
+        pack = self._current_pack(application, filiale_id)
+        kb_version = self._current_kb_version(application, filiale_id)
+        if scope.pack != pack or scope.kb_version != kb_version:
+            logger.info("Semantic cache invalidated",
+                       scope=key,
+                       old_pack=scope.pack, new_pack=pack,
+                       old_kb_version=scope.kb_version, new_kb_version=kb_version)
+            del self._scopes[key]
+            return None
+
+        return scope
+
+    def _record(self, filiale_id: str, result: str, saved_seconds: float = 0.0):
+        stats = self._stats.setdefault(filiale_id, {"hit": 0, "miss": 0, "bypass": 0, "latency_saved_seconds": 0.0})
+        stats[result] += 1
+        semantic_cache_counter.labels(filiale_id=filiale_id, result=result).inc()
+        if saved_seconds > 0:
+            stats["latency_saved_seconds"] += saved_seconds
+            semantic_cache_latency_saved_counter.labels(filiale_id=filiale_id).inc(saved_seconds)
+
+    async def lookup(self, application: str, filiale_id: str, query: str,
+                     user_id: Optional[str] = None) -> Optional[Dict]:
+        """
+        Cherche une réponse en cache pour une question
+
+        Les réponses partagées de la filiale et celles de `user_id` sont consultées.
+
+        Returns:
+            None si le cache est contourné, sinon un dict {"hit": bool, ...}.
+            L'embedding calculé est toujours renvoyé pour être réutilisé par `store`.
+        """
+        if not self.is_available() or not query.strip():
+            self._record(filiale_id, "bypass")
+            return None
+
+        start = time.perf_counter()
+        try:
+            embedding = await self._embed(query)
+        except Exception as e:
+            logger.warning(f"Semantic cache lookup skipped: {e}")
+            self._record(filiale_id, "bypass")
+            return None
+
+        candidates = []
+        for owner in dict.fromkeys((None, user_id)):
+            scope = self._get_valid_scope(application, filiale_id, owner)
+            if scope is not None and scope.entries:
+                similarities = scope.matrix() @ embedding
+                index = int(np.argmax(similarities))
+                candidates.append((float(similarities[index]), index, scope))
+        if not candidates:
+            self._record(filiale_id, "miss")
+            return {"hit": False, "embedding": embedding}
+
+        best_similarity, best, scope = max(candidates, key=lambda candidate: candidate[0])
+        entry = scope.entries[best]
+
+        now = time.time()
+        if now - entry["created_at"] > self.ttl_seconds:
+            scope.remove([best])
+            self._record(filiale_id, "miss")
+            return {"hit": False, "embedding": embedding}
+
+        if best_similarity < self.get_threshold(application, filiale_id):
+            self._record(filiale_id, "miss")
+            return {"hit": False, "embedding": embedding}
+
+        entry["hits"] += 1
+        entry["last_hit_at"] = now
+        lookup_seconds = time.perf_counter() - start
+        saved = max(self._avg_miss_latency.get(filiale_id, 0.0) - lookup_seconds, 0.0)
+        self._record(filiale_id, "hit", saved)
+
+        logger.debug("Semantic cache hit",
+                    filiale_id=filiale_id,
+                    similarity=round(best_similarity, 4),
+                    cached_query=entry["query"][:50])
+
+        return {
+            "hit": True,
+            "answer": entry["answer"],
+            "similarity": best_similarity,
+            "cached_query": entry["query"],
+            "metadata": entry["metadata"],
+            "embedding": embedding
+        }
+
+    async def store(self, application: str, filiale_id: str, query: str, answer: str,
+                    processing_seconds: Optional[float] = None,
+                    embedding: Optional[np.ndarray] = None,
+                    metadata: Optional[Dict] = None,
+                    user_id: Optional[str] = None):
+        """
+        Enregistre la réponse finale générée pour une question
+
+        Args:
+            user_id: Utilisateur auquel la réponse est réservée (None : réponse
+                FAQ/KB partagée par toute la filiale)
+        """
+        if not self.is_available() or not query.strip() or not answer:
+            return
+
+        if processing_seconds is not None:
+            previous = self._avg_miss_latency.get(filiale_id)
+            self._avg_miss_latency[filiale_id] = (
+                processing_seconds if previous is None else 0.8 * previous + 0.2 * processing_seconds
+            )
+
+        if embedding is None:
+            try:
+                embedding = await self._embed(query)
+            except Exception as e:
+                logger.warning(f"Semantic cache store skipped: {e}")
+                return
+
+        key = self._scope_key(application, filiale_id, user_id)
+        scope = self._get_valid_scope(application, filiale_id, user_id)
+        if scope is None:
+            scope = _CacheScope(
+                pack=self._current_pack(application, filiale_id),
+                kb_version=self._current_kb_version(application, filiale_id)
+            )
+            self._scopes[key] = scope
+
+        now = time.time()
+        scope.add({
+            "query": query,
+            "answer": answer,
+            "embedding": embedding,
+            "metadata": metadata or {},
+            "created_at": now,
+            "last_hit_at": now,
+            "hits": 0
+        }, self.max_entries)
+
+    def invalidate(self, application: str, filiale_id: Optional[str] = None):
+        """Invalide les réponses d'une filiale (ou de toute l'application)"""
+        if filiale_id:
+            key = self._scope_key(application, filiale_id)
+            for scope_key in [k for k in self._scopes if k == key or k.startswith(f"{key}:")]:
+                del self._scopes[scope_key]
+        else:
+            prefix = f"{application}_"
+            for key in [k for k in self._scopes if k.startswith(prefix)]:
+                del self._scopes[key]
+        logger.info("Semantic cache invalidated", application=application, filiale_id=filiale_id)
+
+    async def _embed(self, text: str) -> np.ndarray:
+        embedding = np.asarray(await self.embedding_manager.embed_query(text), dtype=np.float32)
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm > 0 else embedding
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Taux de service et temps économisé par filiale"""
+        by_filiale = {}
+        for filiale_id, stats in self._stats.items():
+            lookups = stats["hit"] + stats["miss"]
+            by_filiale[filiale_id] = {
+                **stats,
+                "hit_rate": stats["hit"] / lookups if lookups else 0.0,
+                "avg_miss_latency_seconds": self._avg_miss_latency.get(filiale_id, 0.0)
+            }
+        return {
+            "enabled": self.enabled,
+            "entries": {key: len(scope.entries) for key, scope in self._scopes.items()},
+            "by_filiale": by_filiale
+        }
@@ -0,0 +1,174 @@
+"""
+Snapshots de la base de connaissances
+Export / import d'une collection (vecteurs, documents, métadonnées) sans appel d'embedding
+"""
+import io
+import json
+import zipfile
+import hashlib
+import numpy as np
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+import structlog
+
+from core.knowledge_base.vector_store import VectorStore
+from core.knowledge_base.index_settings import (
+    SPACE_METADATA_KEY, to_collection_metadata, from_collection_metadata
+)
+
+logger = structlog.get_logger()
+
+SNAPSHOT_FORMAT_VERSION = 1
+SNAPSHOT_SUFFIX = ".kbsnap"
+
+MANIFEST_FILE = "manifest.json"
+VECTORS_FILE = "vectors.npy"
+RECORDS_FILE = "records.json"
+
+class SnapshotError(Exception):
+    """Snapshot illisible, corrompu ou incompatible"""
+    pass
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def export_collection_snapshot(store: VectorStore, collection_name: str, path: str,
+                               embedding_model: str, extra: Optional[Dict] = None) -> Dict:
+    """
+    Exporte une collection dans un fichier snapshot
+
+    Le fichier est une archive zip compressée contenant `vectors.npy` (float32),
+    `records.json` (ids, documents, métadonnées) et `manifest.json` qui décrit
+    la collection, le modèle d'embedding et la somme SHA-256 de chaque fichier.
+
+    Returns:
+        Le manifeste écrit
+    """
+    data = store.get_all(collection_name)
+    vectors = np.ascontiguousarray(data["embeddings"], dtype=np.float32)
+
+    vectors_buffer = io.BytesIO()
+    np.save(vectors_buffer, vectors)
+    vectors_bytes = vectors_buffer.getvalue()
+    records_bytes = json.dumps({
+        "ids": data["ids"],
+        "documents": data["documents"],
+        "metadatas": data["metadatas"]
+    }, ensure_ascii=False).encode("utf-8")
+
+    manifest = {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "collection": collection_name,
+        "count": len(data["ids"]),
+        "dimension": int(vectors.shape[1]) if vectors.ndim == 2 else 0,
+        "embedding_model": embedding_model,
+        "collection_metadata": store.get_collection_metadata(collection_name),
+        "source_backend": store.backend_name,
+        "created_at": datetime.now().isoformat(),
+        "files": {
+            VECTORS_FILE: {"sha256": _sha256(vectors_bytes), "bytes": len(vectors_bytes)},
+            RECORDS_FILE: {"sha256": _sha256(records_bytes), "bytes": len(records_bytes)}
+        },
+        **(extra or {})
+    }
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr(MANIFEST_FILE, json.dumps(manifest, ensure_ascii=False, indent=2))
+        archive.writestr(VECTORS_FILE, vectors_bytes)
+        archive.writestr(RECORDS_FILE, records_bytes)
+    tmp_path.replace(path)
+
+    logger.info("Knowledge base snapshot exported",
+               collection=collection_name, count=manifest["count"], path=str(path))
+    return manifest
+
+def read_snapshot_manifest(path: str) -> Dict:
+    """Lit le manifeste d'un snapshot sans charger les vecteurs"""
+    try:
+        with zipfile.ZipFile(path) as archive:
+            manifest = json.loads(archive.read(MANIFEST_FILE))
+    except (OSError, KeyError, zipfile.BadZipFile, json.JSONDecodeError) as e:
+        raise SnapshotError(f"Unreadable snapshot {path}: {e}")
+
+    if manifest.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+        raise SnapshotError(f"Unsupported snapshot format: {manifest.get('format_version')}")
+    return manifest
+
+def _read_verified(archive: zipfile.ZipFile, manifest: Dict, name: str) -> bytes:
+    expected = manifest["files"][name]
+    data = archive.read(name)
+    if len(data) != expected["bytes"] or _sha256(data) != expected["sha256"]:
+        raise SnapshotError(f"Checksum mismatch for {name}")
+    return data
+
+def load_snapshot(path: str, expected_embedding_model: Optional[str] = None) -> Dict:
+    """
+    Lit et vérifie un snapshot
+
+    Returns:
+        {"manifest", "ids", "documents", "metadatas", "embeddings" (np.ndarray)}
+
+    Raises:
+        SnapshotError: fichier corrompu, format inconnu ou modèle d'embedding différent
+    """
+    manifest = read_snapshot_manifest(path)
+    if expected_embedding_model and manifest.get("embedding_model") != expected_embedding_model:
+        raise SnapshotError(
+            f"Snapshot embedded with {manifest.get('embedding_model')}, expected {expected_embedding_model}"
+        )
+
+    with zipfile.ZipFile(path) as archive:
+        vectors_bytes = _read_verified(archive, manifest, VECTORS_FILE)
+        records = json.loads(_read_verified(archive, manifest, RECORDS_FILE))
+
+    # Un seul bloc mémoire : l'en-tête .npy est lu puis le tampon est copié tel quel
+    embeddings = np.load(io.BytesIO(vectors_bytes), allow_pickle=False)
+    if len(embeddings) != manifest["count"] or len(records["ids"]) != manifest["count"]:
+        raise SnapshotError("Snapshot record count does not match its manifest")
+
+    return {"manifest": manifest, **records, "embeddings": embeddings}
+
+def import_collection_snapshot(store: VectorStore, path: str, collection_name: Optional[str] = None,
+                               expected_embedding_model: Optional[str] = None,
+                               index_settings: Optional[Dict] = None) -> Dict:
+    """
+    Remplace une collection par le contenu d'un snapshot (aucun appel d'embedding)
+
+    Args:
+        index_settings: Paramètres d'index de la collection recréée (par
+            défaut ceux lus dans les métadonnées du snapshot)
+
+    Returns:
+        Le manifeste du snapshot importé
+    """
+    snapshot = load_snapshot(path, expected_embedding_model)
+    manifest = snapshot["manifest"]
+    collection_name = collection_name or manifest["collection"]
+
+    # Les métadonnées exportées ne portent plus forcément hnsw:space (voir
+    # SPACE_METADATA_KEY) : les paramètres d'index sont réécrits au complet
+    snapshot_metadata = manifest.get("collection_metadata") or {}
+    if index_settings is None:
+        index_settings = from_collection_metadata(snapshot_metadata)
+    collection_metadata = {
+        key: value for key, value in snapshot_metadata.items()
+        if not key.startswith("hnsw:") and key != SPACE_METADATA_KEY
+    }
+    collection_metadata.update(to_collection_metadata(index_settings))
+
+    store.load_bulk(
+        collection_name,
+        ids=snapshot["ids"],
+        documents=snapshot["documents"],
+        metadatas=snapshot["metadatas"],
+        embeddings=snapshot["embeddings"],
+        metadata=collection_metadata
+    )
+
+    logger.info("Knowledge base snapshot imported",
+               collection=collection_name, count=manifest["count"], path=str(path))
+    return manifest
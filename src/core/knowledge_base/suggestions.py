@@ -0,0 +1,212 @@
+"""
+Suggestions de questions pendant la saisie (typeahead)
+Index de préfixes en mémoire : tableau trié + recherche dichotomique
+"""
+import os
+import time
+import heapq
+import asyncio
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Tuple
+import structlog
+
+from core.knowledge_base.faq_index import normalize_question, COMMON_SCOPE
+
+logger = structlog.get_logger()
+
+# Sources dans l'ordre de priorité du libellé affiché
+FAQ_SOURCE = "faq"
+HISTORY_SOURCE = "history"
+
+class _PrefixIndex:
+    """Suggestions d'une filiale triées par texte normalisé"""
+
+    def __init__(self, items: Dict[str, Dict], memo_size: int = 2048):
+        ordered = sorted(items.items())
+        self.keys = [key for key, _ in ordered]
+        self.items = [item for _, item in ordered]
+        self._memo: Dict[Tuple[str, int], List[Dict]] = {}
+        self._memo_size = memo_size
+
+    def __len__(self):
+        return len(self.keys)
+
+    def search(self, prefix: str, limit: int) -> List[Dict]:
+        """Les `limit` suggestions les plus populaires commençant par `prefix`"""
+        memo_key = (prefix, limit)
+        cached = self._memo.get(memo_key)
+        if cached is not None:
+            return cached
+
+        start = bisect_left(self.keys, prefix)
+        end = bisect_left(self.keys, prefix + "\uffff", lo=start)
+        results = heapq.nlargest(limit, self.items[start:end], key=lambda item: item["popularity"])
+
+        # Les préfixes courts reviennent sans cesse : résultat mémorisé jusqu'à la reconstruction
+        if len(self._memo) >= self._memo_size:
+            self._memo.clear()
+        self._memo[memo_key] = results
+        return results
+
+class SuggestionIndex:
+    """
+    Suggestions de questions par filiale, classées par popularité
+
+    Deux sources sont fusionnées sur la question normalisée (casse, accents,
+    ponctuation) :
+    - les questions de l'index FAQ de la filiale et de la FAQ commune (hors
+      fichiers communs remplacés ou masqués par la filiale, comme pour
+      FaqIndex.lookup), avec un poids fixe SUGGESTION_FAQ_WEIGHT ;
+    - les messages utilisateurs fréquents de l'historique, pondérés par leur
+      nombre d'occurrences.
+
+    Chaque source est remplacée indépendamment et seul l'index de la filiale
+    concernée est reconstruit. Les index FAQ sont resynchronisés au plus
+    toutes les SUGGESTION_SYNC_SECONDS, quand leur fichier a changé
+    (réingestion de la KB). Une recherche est une dichotomie dans un tableau
+    trié, mémorisée par préfixe.
+    """
+
+    def __init__(self, faq_index=None, faq_weight: Optional[float] = None,
+                 exclusions_provider: Optional[Callable[[str, str], set]] = None):
+        self.faq_index = faq_index
+        # (application, filiale_id) -> fichiers sources communs à écarter
+        self.exclusions_provider = exclusions_provider
+        self.faq_weight = faq_weight if faq_weight is not None else float(os.getenv("SUGGESTION_FAQ_WEIGHT", "1"))
+        self.sync_seconds = float(os.getenv("SUGGESTION_SYNC_SECONDS", "5"))
+        self.history_days = int(os.getenv("SUGGESTION_HISTORY_DAYS", "30"))
+        self.history_min_users = int(os.getenv("SUGGESTION_HISTORY_MIN_USERS", "3"))
+        self.history_limit = int(os.getenv("SUGGESTION_HISTORY_LIMIT", "2000"))
+
+        self._sources: Dict[Tuple[str, str], Dict[str, Dict[str, Tuple[str, float]]]] = {}
+        self._indexes: Dict[Tuple[str, str], _PrefixIndex] = {}
+        self._faq_versions: Dict[Tuple[str, str], tuple] = {}
+        self._faq_checked: Dict[Tuple[str, str], float] = {}
+
+    def update_source(self, application: str, filiale_id: str, source: str,
+                      items: List[Tuple[str, float]]):
+        """
+        Remplace une source de suggestions d'une filiale
+
+        Args:
+            items: (texte, popularité) ; les doublons normalisés sont cumulés
+        """
+        entries: Dict[str, Tuple[str, float]] = {}
+        for text, popularity in items:
+            key = normalize_question(text)
+            if not key:
+                continue
+            if key in entries:
+                entries[key] = (entries[key][0], entries[key][1] + popularity)
+            else:
+                entries[key] = (text.strip(), float(popularity))
+
+        scope = (application, filiale_id)
+        sources = self._sources.setdefault(scope, {})
+        if scope in self._indexes and sources.get(source) == entries:
+            return
+        sources[source] = entries
+        self._rebuild(scope)
+
+    def _rebuild(self, scope: Tuple[str, str]):
+        sources = self._sources.get(scope, {})
+        merged: Dict[str, Dict] = {}
+        for source in sorted(sources, key=lambda name: name != FAQ_SOURCE):
+            for key, (text, popularity) in sources[source].items():
+                item = merged.get(key)
+                if item is None:
+                    merged[key] = {"text": text, "source": source, "popularity": popularity}
+                else:
+                    # Libellé de la FAQ conservé, popularité cumulée
+                    item["popularity"] += popularity
+
+        self._indexes[scope] = _PrefixIndex(merged)
+        logger.debug("Suggestion index rebuilt", application=scope[0], filiale_id=scope[1],
+                     suggestions=len(merged))
+
+    def _sync_faq(self, application: str, filiale_id: str):
+        """Recharge les questions FAQ si l'index FAQ de la filiale ou le commun a changé"""
+        scope = (application, filiale_id)
+        now = time.monotonic()
+        if self.faq_index is None or now - self._faq_checked.get(scope, float("-inf")) < self.sync_seconds:
+            return
+        self._faq_checked[scope] = now
+
+        exclusions = set()
+        if self.exclusions_provider is not None and filiale_id != COMMON_SCOPE:
+            exclusions = set(self.exclusions_provider(application, filiale_id))
+
+        versions, questions = [frozenset(exclusions)], []
+        for faq_scope in dict.fromkeys((filiale_id, COMMON_SCOPE)):
+            version, scope_questions = self.faq_index.get_questions(application, faq_scope)
+            versions.append(version)
+            questions.extend(
+                entry["question"] for entry in scope_questions
+                if faq_scope == filiale_id or entry["source_file"] not in exclusions
+            )
+
+        if self._faq_versions.get(scope) != tuple(versions):
+            self._faq_versions[scope] = tuple(versions)
+            self.update_source(application, filiale_id, FAQ_SOURCE,
+                               [(question, self.faq_weight) for question in questions])
+
+    def suggest(self, application: str, filiale_id: str, prefix: str, limit: int = 5) -> List[Dict]:
+        """
+        Suggestions commençant par le texte saisi
+
+        Returns:
+            [{"text", "source" (faq | history), "popularity"}] par popularité décroissante
+        """
+        try:
+            self._sync_faq(application, filiale_id)
+        except Exception as e:
+            logger.warning(f"FAQ suggestions not synchronized: {e}")
+
+        index = self._indexes.get((application, filiale_id))
+        if index is None or limit <= 0:
+            return []
+        return [dict(item) for item in index.search(normalize_question(prefix), limit)]
+
+    async def refresh_history(self, conversation_manager) -> int:
+        """
+        Recharge les messages utilisateurs fréquents de toutes les filiales
+
+        Returns:
+            Nombre de filiales mises à jour
+        """
+        rows = await conversation_manager.get_frequent_user_messages(
+            days=self.history_days,
+            min_users=self.history_min_users,
+            limit=self.history_limit
+        )
+
+        grouped: Dict[Tuple[str, str], List[Tuple[str, float]]] = {}
+        for row in rows:
+            grouped.setdefault((row["application_id"], row["filiale_id"]), []).append(
+                (row["content"], row["occurrences"])
+            )
+
+        # Les filiales sans message fréquent perdent leurs anciennes suggestions d'historique
+        stale = [scope for scope, sources in self._sources.items()
+                 if HISTORY_SOURCE in sources and scope not in grouped]
+        for application, filiale_id in list(grouped) + stale:
+            self.update_source(application, filiale_id, HISTORY_SOURCE,
+                               grouped.get((application, filiale_id), []))
+
+        logger.info("Suggestion history refreshed", filiales=len(grouped), messages=len(rows))
+        return len(grouped)
+
+    async def run_history_refresh(self, conversation_manager, interval_seconds: float):
+        """Rafraîchit périodiquement les suggestions issues de l'historique"""
+        while True:
+            try:
+                await self.refresh_history(conversation_manager)
+            except Exception as e:
+                logger.warning(f"Suggestion history refresh failed: {e}")
+            await asyncio.sleep(interval_seconds)
+
+    def get_stats(self) -> Dict:
+        return {
+            f"{application}_{filiale_id}": len(index)
+            for (application, filiale_id), index in self._indexes.items()
+        }
@@ -0,0 +1,711 @@
+"""
+Backends de stockage vectoriel pour la base de connaissances
+ChromaDB (HNSW) ou index NumPy memory-mappé (recherche exacte)
+"""
+import os
+import re
+import json
+import numpy as np
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Any, Callable
+import structlog
+
+from core.knowledge_base.quantization import (
+    SUPPORTED_DTYPES, quantize, approximate_scores, rescore, memory_footprint
+)
+from core.knowledge_base.index_settings import SPACE_METADATA_KEY
+
+logger = structlog.get_logger()
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices des k meilleurs scores par ligne, triés par score décroissant (argpartition)"""
+    scores = np.atleast_2d(scores)
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64)
+    if k < scores.shape[1]:
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+    order = np.argsort(-np.take_along_axis(scores, candidates, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(candidates, order, axis=1)
+
+class VectorStore(ABC):
+    """
+    Interface des backends vectoriels
+
+    Les collections sont désignées par leur nom et les résultats de `query`
+    suivent le format ChromaDB (listes par requête de ids, documents,
+    metadatas et distances) pour que les appelants restent inchangés.
+    """
+
+    backend_name = "abstract"
+
+    @abstractmethod
+    def get_or_create_collection(self, name: str, metadata: Optional[Dict] = None):
+        """Récupère ou crée une collection"""
+        pass
+
+    @abstractmethod
+    def add(self, name: str, ids: List[str], documents: List[str], metadatas: List[Dict],
+            embeddings: Optional[List[List[float]]] = None):
+        """Ajoute des documents à une collection"""
+        pass
+
+    @abstractmethod
+    def query(self, name: str, query_texts: Optional[List[str]] = None,
+              query_embeddings: Optional[List[List[float]]] = None,
+              n_results: int = 5, where: Optional[Dict] = None) -> Dict[str, List]:
+        """
+        Recherche les plus proches voisins pour une ou plusieurs requêtes
+
+        `where` suit la syntaxe de filtre ChromaDB (égalité, $eq, $ne, $in,
+        $nin, $gt, $gte, $lt, $lte, $and, $or) et est appliqué avant le top-k.
+        """
+        pass
+
+    @abstractmethod
+    def count(self, name: str) -> int:
+        """Nombre de documents de la collection"""
+        pass
+
+    @abstractmethod
+    def get_collection_metadata(self, name: str, refresh: bool = False) -> Dict:
+        """Métadonnées de la collection"""
+        pass
+
+    @abstractmethod
+    def update_collection_metadata(self, name: str, metadata: Dict):
+        """Remplace les métadonnées de la collection"""
+        pass
+
+    @abstractmethod
+    def delete_collection(self, name: str):
+        """Supprime une collection"""
+        pass
+
+    @abstractmethod
+    def get_all(self, name: str) -> Dict[str, Any]:
+        """Contenu complet : ids, documents, metadatas et embeddings (matrice float32)"""
+        pass
+
+    @contextmanager
+    def deferred_writes(self, name: str):
+        """Regroupe les ajouts à une collection (sans effet pour un backend qui écrit au fil de l'eau)"""
+        yield
+
+    def load_bulk(self, name: str, ids: List[str], documents: List[str], metadatas: List[Dict],
+                  embeddings: np.ndarray, metadata: Optional[Dict] = None):
+        """Remplace une collection par des documents déjà embeddés"""
+        self.delete_collection(name)
+        self.get_or_create_collection(name, metadata=metadata)
+        if ids:
+            self.add(name, ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+
+class ChromaVectorStore(VectorStore):
+    """Backend ChromaDB (index HNSW persistant)"""
+
+    backend_name = "chroma"
+
+    def __init__(self, persist_dir: Optional[str] = None, embedding_function: Optional[Callable] = None):
+        self.persist_dir = persist_dir or os.getenv("CHROMADB_PERSIST_DIRECTORY", "./data/chroma_data")
+        self.embedding_function = embedding_function
+        self.client = self._initialize_client()
+        self._collections = {}
+
+    def _initialize_client(self):
+        """Initialise le client ChromaDB"""
+        import chromadb
+        from chromadb.config import Settings
+
+        try:
+            client = chromadb.PersistentClient(
+                path=self.persist_dir,
+                settings=Settings(
+                    anonymized_telemetry=False,
+                    allow_reset=True
+                )
+            )
+            logger.info("ChromaDB client initialized", persist_dir=self.persist_dir)
+            return client
+        except Exception as e:
+            logger.error("Failed to initialize ChromaDB client", error=str(e))
+            raise
+
+    def get_or_create_collection(self, name: str, metadata: Optional[Dict] = None):
+        if name not in self._collections:
+            try:
+                collection = self.client.get_collection(
+                    name=name,
+                    embedding_function=self.embedding_function
+                )
+                logger.info(f"Retrieved existing collection: {name}")
+            except Exception:
+                collection = self.client.create_collection(
+                    name=name,
+                    embedding_function=self.embedding_function,
+                    metadata=metadata
+                )
+                logger.info(f"Created new collection: {name}")
+
+            self._collections[name] = collection
+
+        return self._collections[name]
+
+    def add(self, name: str, ids: List[str], documents: List[str], metadatas: List[Dict],
+            embeddings: Optional[List[List[float]]] = None):
+        collection = self.get_or_create_collection(name)
+        collection.add(
+            documents=documents,
+            metadatas=metadatas,
+            ids=ids,
+            embeddings=embeddings
+        )
+
+    def query(self, name: str, query_texts: Optional[List[str]] = None,
+              query_embeddings: Optional[List[List[float]]] = None,
+              n_results: int = 5, where: Optional[Dict] = None) -> Dict[str, List]:
+        collection = self.get_or_create_collection(name)
+        return collection.query(
+            query_texts=query_texts if query_embeddings is None else None,
+            query_embeddings=query_embeddings,
+            n_results=n_results,
+            where=where or None,
+            include=["documents", "metadatas", "distances"]
+        )
+
+    def count(self, name: str) -> int:
+        return self.get_or_create_collection(name).count()
+
+    def get_collection_metadata(self, name: str, refresh: bool = False) -> Dict:
+        if refresh:
+            collection = self.client.get_collection(
+                name=name,
+                embedding_function=self.embedding_function
+            )
+            self._collections[name] = collection
+            return collection.metadata or {}
+        return self.get_or_create_collection(name).metadata or {}
+
+    def update_collection_metadata(self, name: str, metadata: Dict):
+        # modify() remplace toutes les métadonnées : les paramètres d'index fixés à la
+        # création sont recopiés depuis la collection, sauf hnsw:space que ChromaDB refuse
+        self.get_or_create_collection(name)
+        current = self.get_collection_metadata(name, refresh=True)
+        metadata = {key: value for key, value in metadata.items() if not key.startswith("hnsw:")}
+        metadata.update({key: value for key, value in current.items() if key.startswith("hnsw:")})
+        space = metadata.pop("hnsw:space", None) or current.get(SPACE_METADATA_KEY)
+        if space:
+            metadata[SPACE_METADATA_KEY] = space
+        self._collections[name].modify(metadata=metadata)
+
+    def delete_collection(self, name: str):
+        try:
+            self.client.delete_collection(name=name)
+        except Exception:
+            # Collection absente
+            pass
+        self._collections.pop(name, None)
+
+    def get_all(self, name: str) -> Dict[str, Any]:
+        data = self.get_or_create_collection(name).get(include=["embeddings", "documents", "metadatas"])
+        embeddings = data.get("embeddings")
+        return {
+            "ids": list(data["ids"]),
+            "documents": list(data["documents"]),
+            "metadatas": [dict(metadata or {}) for metadata in data["metadatas"]],
+            "embeddings": np.asarray(embeddings if embeddings is not None else [], dtype=np.float32)
+        }
+
+    def load_bulk(self, name: str, ids: List[str], documents: List[str], metadatas: List[Dict],
+                  embeddings: np.ndarray, metadata: Optional[Dict] = None):
+        self.delete_collection(name)
+        self.get_or_create_collection(name, metadata=metadata)
+        # ChromaDB limite la taille d'un ajout
+        batch_size = getattr(self.client, "get_max_batch_size", lambda: 5000)()
+        for start in range(0, len(ids), batch_size):
+            end = start + batch_size
+            self.add(name, ids=ids[start:end], documents=documents[start:end],
+                     metadatas=metadatas[start:end], embeddings=embeddings[start:end])
+
+# Fichiers d'une génération (vectors.3.npy, columns.3.json, quantized.3.npy)
+_GENERATION_FILE = re.compile(r"^(?:vectors|columns|quantized)\.(\d+)\.(?:npy|json)$")
+
+class _NumpyCollection:
+    """État chargé d'une collection NumPy (vecteurs memory-mappés + colonnes)"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.manifest_stamp: Optional[tuple] = None
+        self.manifest: Dict[str, Any] = {}
+        self.vectors: np.ndarray = np.zeros((0, 0), dtype=np.float32)
+        # Matrice de recherche quantifiée (None si float32)
+        self.quantized: Optional[np.ndarray] = None
+        self.scales: Optional[np.ndarray] = None
+        self.ids: List[str] = []
+        self.documents: List[str] = []
+        self.columns: Dict[str, List[Any]] = {}
+        self._column_arrays: Dict[str, np.ndarray] = {}
+
+    def column_arrays(self) -> Dict[str, np.ndarray]:
+        """Colonnes de métadonnées en tableaux NumPy (construits une fois par génération)"""
+        if len(self._column_arrays) != len(self.columns):
+            for key, values in self.columns.items():
+                if key not in self._column_arrays:
+                    array = np.empty(len(values), dtype=object)
+                    for i, value in enumerate(values):
+                        array[i] = value
+                    self._column_arrays[key] = array
+        return self._column_arrays
+
+    def row_metadata(self, index: int) -> Dict:
+        return {
+            key: values[index] for key, values in self.columns.items()
+            if values[index] is not None
+        }
+
+class NumpyVectorStore(VectorStore):
+    """
+    Backend NumPy : matrice float32 normalisée par collection, recherche exacte
+
+    Chaque collection est un dossier contenant une matrice `.npy` ouverte en
+    lecture seule avec `mmap_mode='r'` (les pages sont partagées entre workers
+    via le page cache), un fichier de colonnes JSON (ids, documents et une
+    liste de valeurs par clé de métadonnée) et un `manifest.json` qui pointe
+    vers la génération courante. Une écriture produit une nouvelle génération
+    puis remplace le manifeste atomiquement ; les lecteurs détectent le
+    changement via l'inode et le mtime du manifeste. Un seul processus écrivain est
+    supposé (ingestion).
+
+    Avec KB_VECTOR_DTYPE=float16 ou int8, une matrice de recherche quantifiée
+    est écrite à côté de la matrice float32 : la recherche parcourt la matrice
+    quantifiée (2 à 4 fois moins de pages résidentes), puis les
+    `n_results * rescore_factor` meilleurs candidats sont re-scorés avec les
+    vecteurs pleine précision, dont seules ces lignes sont lues.
+
+    Chaque `add` réécrit toute la génération. Pour une ingestion par lots,
+    `deferred_writes` accumule les ajouts en mémoire et les écrit en une
+    génération à la sortie (ou tous les KB_NUMPY_FLUSH_ROWS documents, ou
+    avant une lecture de la collection).
+
+    Les distances retournées sont des distances cosinus (1 - similarité).
+    """
+
+    backend_name = "numpy"
+
+    def __init__(self, persist_dir: Optional[str] = None, embedding_function: Optional[Callable] = None,
+                 vector_dtype: Optional[str] = None, rescore_factor: Optional[int] = None):
+        self.persist_dir = Path(persist_dir or os.getenv("KB_NUMPY_DIRECTORY", "./data/vector_index"))
+        self.persist_dir.mkdir(parents=True, exist_ok=True)
+        self.embedding_function = embedding_function
+        self.vector_dtype = (vector_dtype or os.getenv("KB_VECTOR_DTYPE", "float32")).lower()
+        if self.vector_dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"Unsupported vector dtype: {self.vector_dtype}")
+        self.rescore_factor = rescore_factor or int(os.getenv("KB_RESCORE_FACTOR", "4"))
+        self.flush_rows = int(os.getenv("KB_NUMPY_FLUSH_ROWS", "100000"))
+        self._collections: Dict[str, _NumpyCollection] = {}
+        # Ajouts différés par collection (voir deferred_writes)
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        logger.info("NumPy vector store initialized",
+                   persist_dir=str(self.persist_dir),
+                   vector_dtype=self.vector_dtype)
+
+    def _collection_path(self, name: str) -> Path:
+        return self.persist_dir / name
+
+    def _load(self, name: str) -> Optional[_NumpyCollection]:
+        """Charge (ou recharge si le manifeste a changé) une collection"""
+        path = self._collection_path(name)
+        manifest_path = path / "manifest.json"
+
+        try:
+            stat = manifest_path.stat()
+        except FileNotFoundError:
+            self._collections.pop(name, None)
+            return None
+
+        # Le manifeste est remplacé par os.replace : l'inode change à chaque écriture
+        stamp = (stat.st_ino, stat.st_mtime_ns)
+        collection = self._collections.get(name)
+        if collection is not None and collection.manifest_stamp == stamp:
+            return collection
+
+        collection = _NumpyCollection(path)
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            collection.manifest = json.load(f)
+
+        if collection.manifest.get("count", 0) > 0:
+            collection.vectors = np.load(path / collection.manifest["vectors_file"], mmap_mode='r')
+            if collection.manifest.get("quantized_file"):
+                collection.quantized = np.load(path / collection.manifest["quantized_file"], mmap_mode='r')
+                scales = collection.manifest.get("scales")
+                collection.scales = np.asarray(scales, dtype=np.float32) if scales is not None else None
+            with open(path / collection.manifest["columns_file"], 'r', encoding='utf-8') as f:
+                columns = json.load(f)
+            collection.ids = columns["ids"]
+            collection.documents = columns["documents"]
+            collection.columns = columns["metadatas"]
+        else:
+            dimension = collection.manifest.get("dimension") or 0
+            collection.vectors = np.zeros((0, dimension), dtype=np.float32)
+
+        collection.manifest_stamp = stamp
+        self._collections[name] = collection
+        return collection
+
+    def _write_json_atomic(self, path: Path, data: Dict):
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _write_generation(self, name: str, manifest: Dict, vectors: np.ndarray,
+                          ids: List[str], documents: List[str], columns: Dict[str, List[Any]]):
+        """Écrit une nouvelle génération puis bascule le manifeste"""
+        path = self._collection_path(name)
+        path.mkdir(parents=True, exist_ok=True)
+
+        generation = manifest.get("generation", 0) + 1
+        vectors_file = f"vectors.{generation}.npy"
+        columns_file = f"columns.{generation}.json"
+        quantized_file = None
+        scales = None
+
+        self._save_array(path / vectors_file, np.ascontiguousarray(vectors, dtype=np.float32))
+        if self.vector_dtype != "float32":
+            quantized, scales = quantize(vectors, self.vector_dtype)
+            quantized_file = f"quantized.{generation}.npy"
+            self._save_array(path / quantized_file, quantized)
+        self._write_json_atomic(path / columns_file, {
+            "ids": ids,
+            "documents": documents,
+            "metadatas": columns
+        })
+
+        manifest = {
+            **manifest,
+            "generation": generation,
+            "dimension": int(vectors.shape[1]) if vectors.ndim == 2 else 0,
+            "count": len(ids),
+            "vectors_file": vectors_file,
+            "columns_file": columns_file,
+            "vector_dtype": self.vector_dtype,
+            "quantized_file": quantized_file,
+            "scales": scales.tolist() if scales is not None else None
+        }
+        self._write_json_atomic(path / "manifest.json", manifest)
+        self._remove_old_generations(path, generation)
+
+    def _remove_old_generations(self, path: Path, generation: int):
+        """
+        Supprime les fichiers des générations antérieures à la précédente
+
+        La génération précédente est conservée jusqu'à l'écriture suivante : un
+        lecteur qui vient de lire l'ancien manifeste peut encore ouvrir ses
+        fichiers. Ceux qui l'ont déjà mappée gardent l'inode.
+        """
+        for file in path.iterdir():
+            match = _GENERATION_FILE.match(file.name)
+            if match and int(match.group(1)) < generation - 1:
+                try:
+                    file.unlink()
+                except FileNotFoundError:
+                    pass
+
+    def _save_array(self, path: Path, array: np.ndarray):
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp_path, 'wb') as f:
+            np.save(f, array)
+        os.replace(tmp_path, path)
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        if self.embedding_function is None:
+            raise ValueError("An embedding function is required to embed texts")
+        return np.asarray(self.embedding_function(texts), dtype=np.float32)
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def get_or_create_collection(self, name: str, metadata: Optional[Dict] = None):
+        collection = self._load(name)
+        if collection is None:
+            path = self._collection_path(name)
+            path.mkdir(parents=True, exist_ok=True)
+            self._write_json_atomic(path / "manifest.json", {
+                "generation": 0,
+                "dimension": 0,
+                "count": 0,
+                "metadata": metadata or {}
+            })
+            logger.info(f"Created new collection: {name}")
+            collection = self._load(name)
+        return collection
+
+    def add(self, name: str, ids: List[str], documents: List[str], metadatas: List[Dict],
+            embeddings: Optional[List[List[float]]] = None):
+        collection = self.get_or_create_collection(name)
+        pending = self._pending.get(name)
+
+        # Même comportement que ChromaDB : les ids existants sont ignorés
+        existing_ids = pending["known_ids"] if pending is not None else set(collection.ids)
+        keep = []
+        for i, doc_id in enumerate(ids):
+            if doc_id not in existing_ids:
+                keep.append(i)
+                if pending is not None:
+                    existing_ids.add(doc_id)
+        if len(keep) < len(ids):
+            logger.warning(f"Ignoring {len(ids) - len(keep)} existing ids in {name}")
+        if not keep:
+            return
+
+        ids = [ids[i] for i in keep]
+        documents = [documents[i] for i in keep]
+        metadatas = [metadatas[i] for i in keep]
+        if embeddings is not None:
+            new_vectors = self._normalize(np.asarray(embeddings, dtype=np.float32)[keep])
+        else:
+            new_vectors = self._normalize(self._embed(documents))
+
+        if pending is not None:
+            pending["ids"].extend(ids)
+            pending["documents"].extend(documents)
+            pending["metadatas"].extend(metadatas)
+            pending["vectors"].append(new_vectors)
+            if len(pending["ids"]) >= self.flush_rows:
+                self.flush(name)
+            return
+
+        self._append(name, collection, ids, documents, metadatas, new_vectors)
+
+    def _append(self, name: str, collection: _NumpyCollection, ids: List[str], documents: List[str],
+                metadatas: List[Dict], new_vectors: np.ndarray):
+        """Écrit une génération contenant la collection et les nouveaux documents"""
+        count = len(collection.ids)
+        columns = {key: list(values) for key, values in collection.columns.items()}
+        for key in {key for metadata in metadatas for key in metadata}:
+            columns.setdefault(key, [None] * count)
+        for key, values in columns.items():
+            values.extend(metadata.get(key) for metadata in metadatas)
+
+        if count:
+            vectors = np.concatenate([np.asarray(collection.vectors), new_vectors])
+        else:
+            vectors = new_vectors
+
+        self._write_generation(
+            name, collection.manifest, vectors,
+            collection.ids + ids, collection.documents + documents, columns
+        )
+
+    @contextmanager
+    def deferred_writes(self, name: str):
+        if name in self._pending:
+            yield
+            return
+        collection = self.get_or_create_collection(name)
+        self._pending[name] = {"known_ids": set(collection.ids), "ids": [], "documents": [],
+                               "metadatas": [], "vectors": []}
+        try:
+            yield
+        finally:
+            try:
+                self.flush(name)
+            finally:
+                self._pending.pop(name, None)
+
+    def flush(self, name: str):
+        """Écrit les ajouts différés de la collection en une génération"""
+        pending = self._pending.get(name)
+        if not pending or not pending["ids"]:
+            return
+        ids, documents, metadatas = pending["ids"], pending["documents"], pending["metadatas"]
+        new_vectors = np.concatenate(pending["vectors"])
+        pending.update(ids=[], documents=[], metadatas=[], vectors=[])
+        self._append(name, self.get_or_create_collection(name), ids, documents, metadatas, new_vectors)
+
+    def query(self, name: str, query_texts: Optional[List[str]] = None,
+              query_embeddings: Optional[List[List[float]]] = None,
+              n_results: int = 5, where: Optional[Dict] = None) -> Dict[str, List]:
+        if query_embeddings is None:
+            query_embeddings = self._embed(query_texts or [])
+        queries = self._normalize(query_embeddings)
+        n_queries = queries.shape[0]
+
+        empty = {"ids": [[] for _ in range(n_queries)], "documents": [[] for _ in range(n_queries)],
+                 "metadatas": [[] for _ in range(n_queries)], "distances": [[] for _ in range(n_queries)]}
+
+        self.flush(name)
+        collection = self._load(name)
+        if collection is None or not collection.ids:
+            return empty
+
+        rows = None
+        if where:
+            rows = np.flatnonzero(evaluate_where(collection.column_arrays(), len(collection.ids), where))
+            if rows.size == 0:
+                return empty
+
+        top_indexes, top_scores = self._search(collection, queries, n_results, rows)
+
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for indexes, scores in zip(top_indexes, top_scores):
+            results["ids"].append([collection.ids[i] for i in indexes])
+            results["documents"].append([collection.documents[i] for i in indexes])
+            results["metadatas"].append([collection.row_metadata(i) for i in indexes])
+            results["distances"].append((1.0 - scores).tolist())
+        return results
+
+    def _search(self, collection: _NumpyCollection, queries: np.ndarray, k: int,
+                rows: Optional[np.ndarray] = None):
+        """
+        Top-k exact, ou approché sur la matrice quantifiée puis re-scoré en float32
+
+        `rows` restreint la recherche aux lignes retenues par le filtre ; les
+        indices retournés sont toujours ceux de la collection complète.
+        """
+        if collection.quantized is None:
+            vectors = collection.vectors if rows is None else collection.vectors[rows]
+            scores = queries @ vectors.T
+            indexes = top_k_indices(scores, k)
+            top_scores = np.take_along_axis(scores, indexes, axis=1)
+            return (indexes if rows is None else rows[indexes]), top_scores
+
+        quantized = collection.quantized if rows is None else collection.quantized[rows]
+        approx = approximate_scores(queries, quantized, collection.scales)
+        candidates = top_k_indices(approx, k * self.rescore_factor)
+        if rows is not None:
+            candidates = rows[candidates]
+        exact = rescore(queries, collection.vectors, candidates)
+        order = top_k_indices(exact, k)
+        return np.take_along_axis(candidates, order, axis=1), np.take_along_axis(exact, order, axis=1)
+
+    def count(self, name: str) -> int:
+        self.flush(name)
+        collection = self._load(name)
+        return len(collection.ids) if collection else 0
+
+    def get_memory_footprint(self, name: str) -> Dict[str, int]:
+        """Taille de la matrice parcourue à chaque recherche"""
+        self.flush(name)
+        collection = self._load(name)
+        if collection is None:
+            return {"search_bytes": 0, "float32_bytes": 0}
+        if collection.quantized is not None:
+            return memory_footprint(collection.quantized, collection.scales)
+        return memory_footprint(collection.vectors)
+
+    def get_collection_metadata(self, name: str, refresh: bool = False) -> Dict:
+        collection = self._load(name)
+        if collection is None:
+            raise ValueError(f"Collection {name} does not exist")
+        return collection.manifest.get("metadata", {})
+
+    def update_collection_metadata(self, name: str, metadata: Dict):
+        collection = self.get_or_create_collection(name)
+        manifest = {**collection.manifest, "metadata": metadata}
+        manifest_path = self._collection_path(name) / "manifest.json"
+        self._write_json_atomic(manifest_path, manifest)
+        # Même génération : inutile de relire vecteurs et colonnes au prochain accès
+        stat = manifest_path.stat()
+        collection.manifest = manifest
+        collection.manifest_stamp = (stat.st_ino, stat.st_mtime_ns)
+
+    def delete_collection(self, name: str):
+        import shutil
+        shutil.rmtree(self._collection_path(name), ignore_errors=True)
+        self._collections.pop(name, None)
+        if name in self._pending:
+            self._pending[name] = {"known_ids": set(), "ids": [], "documents": [],
+                                   "metadatas": [], "vectors": []}
+
+    def get_all(self, name: str) -> Dict[str, Any]:
+        self.flush(name)
+        collection = self._load(name)
+        if collection is None:
+            raise ValueError(f"Collection {name} does not exist")
+        return {
+            "ids": list(collection.ids),
+            "documents": list(collection.documents),
+            "metadatas": [collection.row_metadata(i) for i in range(len(collection.ids))],
+            "embeddings": np.asarray(collection.vectors, dtype=np.float32)
+        }
+
+    def load_bulk(self, name: str, ids: List[str], documents: List[str], metadatas: List[Dict],
+                  embeddings: np.ndarray, metadata: Optional[Dict] = None):
+        """Écrit directement une nouvelle génération (pas de relecture ni de fusion)"""
+        collection = self.get_or_create_collection(name, metadata=metadata)
+        columns = {key: [] for key in {key for row in metadatas for key in row}}
+        for key, values in columns.items():
+            values.extend(row.get(key) for row in metadatas)
+
+        vectors = self._normalize(embeddings) if len(ids) else np.zeros((0, 0), dtype=np.float32)
+        manifest = {**collection.manifest, "metadata": metadata or {}}
+        self._write_generation(name, manifest, vectors, list(ids), list(documents), columns)
+
+_COMPARISONS = {
+    "$eq": lambda values, operand: values == operand,
+    "$ne": lambda values, operand: values != operand,
+    "$gt": lambda values, operand: values > operand,
+    "$gte": lambda values, operand: values >= operand,
+    "$lt": lambda values, operand: values < operand,
+    "$lte": lambda values, operand: values <= operand,
+}
+
+def evaluate_where(columns: Dict[str, np.ndarray], n_rows: int, where: Dict) -> np.ndarray:
+    """
+    Évalue un filtre `where` (syntaxe ChromaDB) sur des métadonnées en colonnes
+
+    Returns:
+        Masque booléen (n_rows,)
+    """
+    mask = np.ones(n_rows, dtype=bool)
+    for key, condition in where.items():
+        if key in ("$and", "$or"):
+            masks = [evaluate_where(columns, n_rows, clause) for clause in condition]
+            combined = np.logical_and.reduce(masks) if key == "$and" else np.logical_or.reduce(masks)
+            mask &= combined
+            continue
+
+        # Clé absente de toute la collection : seuls $ne / $nin peuvent correspondre
+        values = columns[key] if key in columns else np.full(n_rows, None, dtype=object)
+
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+
+        for operator, operand in condition.items():
+            if operator in ("$in", "$nin"):
+                allowed = set(operand)
+                matches = np.fromiter((value in allowed for value in values), dtype=bool, count=n_rows)
+                mask &= matches if operator == "$in" else ~matches
+            elif operator in _COMPARISONS:
+                present = np.fromiter((value is not None for value in values), dtype=bool, count=n_rows)
+                if operator in ("$eq", "$ne"):
+                    matches = np.asarray(_COMPARISONS[operator](values, operand), dtype=bool)
+                    mask &= matches if operator == "$ne" else matches & present
+                else:
+                    matches = np.zeros(n_rows, dtype=bool)
+                    matches[present] = np.asarray(_COMPARISONS[operator](values[present], operand), dtype=bool)
+                    mask &= matches
+            else:
+                raise ValueError(f"Unsupported where operator: {operator}")
+    return mask
+
+VECTOR_STORE_BACKENDS = {
+    "chroma": ChromaVectorStore,
+    "numpy": NumpyVectorStore
+}
+
+def create_vector_store(backend: Optional[str] = None, embedding_function: Optional[Callable] = None,
+                        persist_dir: Optional[str] = None) -> VectorStore:
+    """Instancie le backend configuré (KB_VECTOR_BACKEND: chroma | numpy)"""
+    backend = (backend or os.getenv("KB_VECTOR_BACKEND", "chroma")).lower()
+    if backend not in VECTOR_STORE_BACKENDS:
+        raise ValueError(f"Unknown vector store backend: {backend}")
+    return VECTOR_STORE_BACKENDS[backend](persist_dir=persist_dir, embedding_function=embedding_function)
@@ -0,0 +1,65 @@
+"""
+Alertes opérationnelles : journal, métrique et webhook optionnel
+"""
+import os
+import asyncio
+from datetime import datetime
+from typing import Dict, List, Optional
+import structlog
+
+from core.monitoring.metrics import alert_counter
+
+logger = structlog.get_logger()
+
+class AlertManager:
+    """
+    Émet les alertes opérationnelles
+
+    Chaque alerte est journalisée et comptée ; si ALERT_WEBHOOK_URL est
+    défini, elle est aussi postée en JSON (Slack, Teams, astreinte...). Un
+    webhook en échec n'empêche jamais le traitement appelant.
+    """
+
+    def __init__(self, webhook_url: Optional[str] = None, timeout: Optional[float] = None):
+        self.webhook_url = webhook_url if webhook_url is not None else os.getenv("ALERT_WEBHOOK_URL", "")
+        self.timeout = timeout if timeout is not None else float(os.getenv("ALERT_WEBHOOK_TIMEOUT_SECONDS", "5"))
+
+    async def send_alert(self, alert_type: str, message: str, severity: str = "warning",
+                         details: Optional[Dict] = None) -> bool:
+        """
+        Émet une alerte
+
+        Returns:
+            True si l'alerte a été transmise au webhook
+        """
+        alert_counter.labels(alert_type=alert_type, severity=severity).inc()
+        log = logger.error if severity == "critical" else logger.warning
+        log(message, alert_type=alert_type, severity=severity, **(details or {}))
+
+        if not self.webhook_url:
+            return False
+
+        payload = {
+            "alert_type": alert_type,
+            "severity": severity,
+            "message": message,
+            "details": details or {},
+            "timestamp": datetime.now().isoformat()
+        }
+        try:
+            import httpx
+            async with httpx.AsyncClient(timeout=self.timeout) as client:
+                response = await client.post(self.webhook_url, json=payload)
+                response.raise_for_status()
+            return True
+        except Exception as e:
+            logger.warning("Alert webhook failed", alert_type=alert_type, error=str(e))
+            return False
+
+    async def send_alerts(self, alerts: List[Dict]) -> int:
+        """Émet plusieurs alertes en parallèle (arguments de send_alert)"""
+        results = await asyncio.gather(*(self.send_alert(**alert) for alert in alerts))
+        return sum(1 for sent in results if sent)
+
+# Instance globale
+alert_manager = AlertManager()
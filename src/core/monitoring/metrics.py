@@ -48,6 +48,75 @@ error_counter = Counter(
     ['error_type', 'component']
 )
 
+semantic_cache_counter = Counter(
+    'coris_semantic_cache_requests_total',
+    'Requêtes du cache sémantique de réponses',
+    ['filiale_id', 'result']  # result: hit/miss/bypass
+)
+
+semantic_cache_latency_saved_counter = Counter(
+    'coris_semantic_cache_latency_saved_seconds_total',
+    'Temps de traitement économisé par le cache sémantique',
+    ['filiale_id']
+)
+
+kb_query_cache_counter = Counter(
+    'coris_kb_query_cache_requests_total',
+    'Requêtes du cache de résultats de la base de connaissances',
+    ['filiale_id', 'result']  # result: hit/miss
+)
+
+kb_query_cache_evictions_counter = Counter(
+    'coris_kb_query_cache_evictions_total',
+    'Entrées évincées du cache de résultats (LRU)'
+)
+
+kb_query_cache_entries_gauge = Gauge(
+    'coris_kb_query_cache_entries',
+    'Entrées du cache de résultats de la base de connaissances'
+)
+
+faq_index_counter = Counter(
+    'coris_faq_index_requests_total',
+    "Recherches dans l'index FAQ",
+    ['filiale_id', 'result']  # result: exact/near_exact/semantic/miss
+)
+
+escalation_claim_counter = Counter(
+    'coris_escalation_agent_claims_total',
+    "Tentatives de prise en charge d'une escalade par un agent humain",
+    ['result']  # result: claimed/conflict/unavailable
+)
+
+escalation_queue_depth_gauge = Gauge(
+    'coris_escalation_queue_depth',
+    "Escalades en attente d'un agent humain"
+)
+
+escalation_queue_wait_histogram = Histogram(
+    'coris_escalation_queue_wait_seconds',
+    "Attente en file avant affectation d'un agent humain",
+    ['priority'],
+    buckets=[10, 30, 60, 300, 900, 1800, 3600, 7200]
+)
+
+escalation_sla_timers_gauge = Gauge(
+    'coris_escalation_sla_timers',
+    "Escalades ouvertes dont l'échéance SLA est surveillée"
+)
+
+escalation_sla_breach_counter = Counter(
+    'coris_escalation_sla_breaches_total',
+    'Escalades non résolues à leur échéance SLA',
+    ['pack', 'priority']
+)
+
+alert_counter = Counter(
+    'coris_alerts_total',
+    'Alertes opérationnelles émises',
+    ['alert_type', 'severity']
+)
+
 class MetricsCollector:
     def __init__(self):
         self.start_time = time.time()
@@ -164,7 +164,34 @@ class MultiAppPackManager:
         
         # Pack par défaut
         return "coris_basic"
-    
+
+    def get_application_config(self, filiale_id: str, application: str) -> Dict:
+        """
+        Retourne la section de configuration d'une application pour une filiale
+        """
+        try:
+            filiale_config = self._load_filiale_config(filiale_id, application)
+
+            if filiale_config and "applications" in filiale_config:
+                return filiale_config["applications"].get(application, {}) or {}
+
+            # Certaines configs placent les applications sous la clé filiale
+            filiale_section = filiale_config.get("filiale", {}) if filiale_config else {}
+            return filiale_section.get("applications", {}).get(application, {}) or {}
+        except Exception as e:
+            logger.error(f"Error getting application config: {e}")
+            return {}
+
+    def get_pack_config(self, pack_name: str, application: str) -> Dict:
+        """
+        Retourne la configuration d'un pack spécifique à une application
+        """
+        try:
+            return self.app_packs.get(application, {}).get(pack_name, {}) or {}
+        except Exception as e:
+            logger.error(f"Error getting pack config: {e}")
+            return {}
+
     def get_pack_features(self, pack_name: str, application: str) -> Set[str]:
         """
         Retourne les fonctionnalités incluses dans un pack
@@ -10,6 +10,17 @@ import structlog
 logger = structlog.get_logger()
 pack_manager = MultiAppPackManager()
 
+# Gestionnaire partagé : store vectoriel ouvert une fois et cache de résultats commun aux appels
+_chroma_manager = None
+
+def get_chroma_manager():
+    global _chroma_manager
+    if _chroma_manager is None:
+        # Import local pour éviter les imports circulaires
+        from core.knowledge_base.chroma_manager import MultiTenantChromaManager
+        _chroma_manager = MultiTenantChromaManager()
+    return _chroma_manager
+
 class CorisMoneyAPIClient:
     def __init__(self, base_url: str, api_key: str):
         self.base_url = base_url
@@ -58,40 +69,8 @@ class CorisMoneyAPIClient:
             logger.error("Failed to cancel transfer", error=str(e))
             return {"error": "Cancellation failed"}
 
-# Fonctions MCP Tools pour CrewAI
-async def coris_faq_search(query: str, filiale_id: str, category: str = None) -> List[Dict]:
-    """
-    Recherche dans la FAQ Coris Money spécifique à la filiale
-    """
-    if not pack_manager.can_access_feature(filiale_id, "coris_money", "coris_faq_system"):
-        raise PermissionError("Cette fonctionnalité nécessite Pack Basic ou supérieur")
-    
-    # Import local pour éviter les imports circulaires
-    from core.knowledge_base.chroma_manager import MultiTenantChromaManager
-    
-    chroma_manager = MultiTenantChromaManager()
-    
-    # Recherche dans ChromaDB
-    results = await chroma_manager.query_documents(
-        application="coris_money",
-        filiale_id=filiale_id,
-        query=query,
-        n_results=5
-    )
-    
-    # Filtrer par catégorie si spécifiée
-    if category and results.get('documents'):
-        filtered_results = []
-        for i, metadata in enumerate(results['metadatas'][0]):
-            if metadata.get('category') == category:
-                filtered_results.append({
-                    'content': results['documents'][0][i],
-                    'metadata': metadata,
-                    'relevance': 1 - results['distances'][0][i]
-                })
-        return filtered_results
-    
-    # Retourner tous les résultats
+def _format_faq_results(results: Dict) -> List[Dict]:
+    """Met en forme le résultat d'une requête FAQ"""
     if results.get('documents'):
         return [{
             'content': doc,
@@ -105,6 +84,34 @@ async def coris_faq_search(query: str, filiale_id: str, category: str = None) ->
     
     return []
 
+# Fonctions MCP Tools pour CrewAI
+async def coris_faq_search(query: str, filiale_id: str, category: str = None) -> List[Dict]:
+    """
+    Recherche dans la FAQ Coris Money spécifique à la filiale
+    """
+    results = await coris_faq_search_batch([query], filiale_id, category)
+    return results[0]
+
+async def coris_faq_search_batch(queries: List[str], filiale_id: str,
+                                 category: str = None) -> List[List[Dict]]:
+    """
+    Recherche plusieurs questions dans la FAQ Coris Money en un seul aller-retour
+    (message à plusieurs questions, appels groupés des agents)
+    """
+    if not pack_manager.can_access_feature(filiale_id, "coris_money", "coris_faq_system"):
+        raise PermissionError("Cette fonctionnalité nécessite Pack Basic ou supérieur")
+    
+    # Recherche dans ChromaDB, filtrée par catégorie avant le top-k
+    results = await get_chroma_manager().query_documents_batch(
+        application="coris_money",
+        filiale_id=filiale_id,
+        queries=queries,
+        n_results=5,
+        category=category
+    )
+    
+    return [_format_faq_results(result) for result in results]
+
 async def get_transfer_fees(amount: float, destination: str, filiale_id: str) -> Dict:
     """
     Calcule les frais de transfert Coris Money
@@ -8,6 +8,8 @@ import os
 from dotenv import load_dotenv
 import structlog
 
+from core.knowledge_base.language_detector import language_detector
+
 load_dotenv()
 logger = structlog.get_logger()
 
@@ -65,24 +67,14 @@ async def detect_language(message: str) -> str:
     """
     Détecte la langue d'un message
     """
-    # Langues supportées par Coris Money
-    supported_languages = ["fr", "en"]
-    
-    # Simple détection basée sur des mots-clés
-    french_keywords = ["bonjour", "salut", "merci", "comment", "pourquoi", "transfert", "argent"]
-    english_keywords = ["hello", "hi", "thank", "how", "why", "transfer", "money"]
-    
-    message_lower = message.lower()
-    
-    french_score = sum(1 for keyword in french_keywords if keyword in message_lower)
-    english_score = sum(1 for keyword in english_keywords if keyword in message_lower)
-    
-    if french_score > english_score:
-        return "fr"
-    elif english_score > 0:
-        return "en"
-    else:
-        return "fr"  # Défaut pour l'Afrique francophone
+    # Défaut pour l'Afrique francophone si le message est trop court ou ambigu
+    return language_detector.detect(message, default="fr")
+
+async def detect_languages(messages: List[str]) -> List[str]:
+    """
+    Détecte la langue de plusieurs messages en un seul lot
+    """
+    return language_detector.detect_batch(messages, default="fr")
 
 async def analyze_sentiment(message: str) -> Dict:
     """
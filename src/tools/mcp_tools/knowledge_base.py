@@ -8,25 +8,25 @@ async def search_knowledge_base(query: str, filiale_id: str, application: str,
                                category: str = None, n_results: int = 5):
     """Recherche dans la base de connaissances spécifique à la filiale/app"""
     
-    # Recherche dans la collection dédiée
+    # Recherche dans la collection dédiée, le filtre de catégorie est appliqué par l'index
     results = await chroma_manager.query_documents(
         application=application,
         filiale_id=filiale_id,
         query=query,
-        n_results=n_results
+        n_results=n_results,
+        category=category
     )
     
-    # Filtrage par catégorie si spécifié
     if category:
-        filtered_results = []
-        for i, metadata in enumerate(results['metadatas'][0]):
-            if metadata.get('category') == category:
-                filtered_results.append({
-                    'document': results['documents'][0][i],
-                    'metadata': metadata,
-                    'distance': results['distances'][0][i]
-                })
-        return filtered_results
+        return [{
+            'document': doc,
+            'metadata': metadata,
+            'distance': distance
+        } for doc, metadata, distance in zip(
+            results['documents'][0],
+            results['metadatas'][0],
+            results['distances'][0]
+        )]
     
     return results
 
@@ -0,0 +1,154 @@
+"""
+Tests unitaires pour l'index de disponibilité des agents humains
+"""
+import json
+import asyncio
+import pytest
+import sys
+from contextlib import asynccontextmanager
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, patch
+
+sys.path.append(str(Path(__file__).parent.parent.parent / "src"))
+
+from core.escalation.availability import AgentAvailabilityIndex
+from core.escalation.router import EscalationRouter
+
+def agent(agent_id, load=0, max_concurrent=5, specialties=("reclamations",), languages=("fr",),
+          status="available", last_activity="2024-01-01T10:00:00"):
+    return {
+        "id": agent_id,
+        "name": agent_id,
+        "status": status,
+        "current_load": load,
+        "max_concurrent": max_concurrent,
+        "specialties": json.dumps(list(specialties)),
+        "languages": list(languages),
+        "last_activity": last_activity
+    }
+
+class TestAgentAvailabilityIndex:
+
+    @pytest.fixture
+    def index(self):
+        index = AgentAvailabilityIndex(resync_seconds=60)
+        index.replace_all([
+            agent("busy", load=4),
+            agent("free", load=1),
+            agent("ops", load=0, specialties=["operations"], languages=["fr", "wo"]),
+            agent("full", load=5),
+            agent("away", status="offline"),
+        ])
+        return index
+
+    def test_most_spare_capacity_first(self, index):
+        assert index.best(specialty="reclamations") == "free"
+        assert index.best() == "ops"
+
+    def test_unavailable_agents_are_skipped(self, index):
+        assert index.best(specialty="reclamations", language="fr") == "free"
+        assert index.get_stats()["available"] == 3
+
+    def test_choose_falls_back_from_expertise_to_language(self, index):
+        assert index.choose("operations", "wo") == "ops"
+        assert index.choose("reclamations", "wo") == "free"
+        assert index.choose("general", "wo") == "ops"
+        assert index.choose("general", "bm") == "ops"
+
+    def test_notifications_update_ordering(self, index):
+        index.handle_notification(json.dumps(agent("free", load=5, max_concurrent=5)))
+        assert index.best(specialty="reclamations") == "busy"
+
+        index.handle_notification(json.dumps({"op": "DELETE", "id": "busy"}))
+        assert index.best(specialty="reclamations") is None
+
+        index.handle_notification(json.dumps(agent("away", load=0)))
+        assert index.best(specialty="reclamations") == "away"
+
+    def test_adjust_load_and_ties_by_last_activity(self):
+        index = AgentAvailabilityIndex(resync_seconds=60)
+        index.replace_all([
+            agent("a", load=1, last_activity="2024-01-01T10:00:00"),
+            agent("b", load=1, last_activity="2024-01-01T11:00:00"),
+        ])
+        assert index.best() == "b"
+
+        index.adjust_load("b", 1)
+        assert index.best() == "a"
+
+    def test_stale_entries_are_compacted(self, index):
+        for i in range(1000):
+            index.adjust_load("free", 1 if i % 2 == 0 else -1)
+
+        assert index.best(specialty="reclamations") == "free"
+        assert all(len(heap) <= 64 or len(heap) <= 4 * len(index.agents) for heap in index._heaps.values())
+
+    def test_resync_only_signals_freed_capacity(self, index):
+        """Un rechargement complet ne réveille les écouteurs que pour les places libérées"""
+        freed = []
+        index.add_capacity_listener(freed.append)
+        rows = [agent("busy", load=4), agent("free", load=1), agent("full", load=5)]
+
+        index.replace_all(rows)
+        assert freed == []
+
+        index.replace_all([agent("busy", load=4), agent("free", load=2), agent("full", load=3)])
+        assert freed == ["full"]
+
+    @pytest.mark.asyncio
+    async def test_listen_uses_dedicated_connection(self):
+        """LISTEN garde sa propre connexion, pas une connexion du pool"""
+        conn = AsyncMock()
+        conn.fetchval.return_value = 1
+        conn.fetch.return_value = [agent("agent_001")]
+        conn.add_listener = AsyncMock()
+        conn.remove_listener = AsyncMock()
+        closed = asyncio.Event()
+
+        @asynccontextmanager
+        async def dedicated_connection():
+            try:
+                yield conn
+            finally:
+                closed.set()
+
+        db = MagicMock()
+        db.get_dedicated_conversations_connection = dedicated_connection
+        db.get_conversations_connection.side_effect = AssertionError("pool connection used")
+
+        index = AgentAvailabilityIndex(resync_seconds=60)
+        with patch("core.escalation.availability.db_manager", db):
+            index.start()
+            for _ in range(20):
+                if index.ready:
+                    break
+                await asyncio.sleep(0)
+            await index.stop()
+
+        assert "agent_001" in index.agents
+        conn.execute.assert_not_awaited()
+        conn.add_listener.assert_awaited_once()
+        conn.remove_listener.assert_awaited_once()
+        assert closed.is_set()
+
+class TestRouterWithIndex:
+
+    @pytest.mark.asyncio
+    @patch('core.escalation.router.db_manager')
+    async def test_choice_without_select(self, mock_db_manager):
+        """Index chargé : la base n'est sollicitée que pour enregistrer la charge"""
+        mock_conn = AsyncMock()
+        mock_db_manager.get_conversations_connection.return_value.__aenter__.return_value = mock_conn
+        index = AgentAvailabilityIndex(resync_seconds=60)
+        index.replace_all([agent("agent_001", load=1), agent("agent_002", load=3)])
+        router = EscalationRouter(availability_index=index)
+
+        agent_id = await router.find_best_agent({"reason": "réclamation client", "user_language": "fr"})
+
+        assert agent_id == "agent_001"
+        mock_conn.fetch.assert_not_called()
+        mock_conn.fetchval.assert_called_once()
+        assert index.agents["agent_001"]["current_load"] == 2
+
+if __name__ == "__main__":
+    pytest.main([__file__])
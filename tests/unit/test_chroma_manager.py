@@ -0,0 +1,309 @@
+"""
+Tests unitaires pour le gestionnaire multi-tenant de la base de connaissances
+"""
+import pytest
+from unittest.mock import patch
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent / "src"))
+
+from core.knowledge_base.chroma_manager import MultiTenantChromaManager
+from core.knowledge_base.vector_store import NumpyVectorStore, ChromaVectorStore
+from core.knowledge_base.index_settings import resolve_index_settings
+
+def keyword_embedding(texts):
+    """Embedding déterministe : présence de quelques mots-clés"""
+    vocabulary = ["solde", "transfert", "frais", "agence", "compte"]
+    return [[float(word in text.lower()) + 0.01 for word in vocabulary] for text in texts]
+
+class KeywordEmbeddingFunction:
+    """keyword_embedding avec la signature attendue par ChromaDB"""
+
+    def __call__(self, input):
+        return keyword_embedding(input)
+
+@pytest.fixture
+def manager(tmp_path):
+    """Gestionnaire adossé au backend NumPy (sans ChromaDB ni OpenAI)"""
+    with patch.object(MultiTenantChromaManager, '_get_embedding_function', return_value=keyword_embedding):
+        store = NumpyVectorStore(persist_dir=str(tmp_path), embedding_function=keyword_embedding)
+        return MultiTenantChromaManager(vector_store=store)
+
+@pytest.mark.asyncio
+class TestMultiTenantChromaManager:
+
+    async def test_add_and_query_documents(self, manager):
+        """Les documents ajoutés sont retrouvés dans la collection de la filiale"""
+        await manager.add_documents(
+            "coris_money", "coris_ci",
+            documents=["Consulter son solde", "Frais de transfert"],
+            metadatas=[{"category": "faq"}, {"category": "tarifs"}],
+            ids=["doc1", "doc2"]
+        )
+
+        results = await manager.query_documents("coris_money", "coris_ci", "mon solde", n_results=1)
+
+        assert results["ids"][0] == ["doc1"]
+        assert results["metadatas"][0][0]["filiale_id"] == "coris_ci"
+        assert results["metadatas"][0][0]["application"] == "coris_money"
+
+    async def test_collections_are_isolated(self, manager):
+        """Chaque filiale a sa propre collection"""
+        await manager.add_documents("coris_money", "coris_ci", ["Consulter son solde"], [{}], ["doc1"])
+
+        results = await manager.query_documents("coris_money", "coris_bf", "solde")
+
+        assert results["ids"] == [[]]
+
+    async def test_query_documents_with_filters(self, manager):
+        """Les filtres de catégorie et de langue sont poussés dans la requête"""
+        await manager.add_documents(
+            "coris_money", "coris_ci",
+            documents=["Consulter son solde", "Frais de transfert", "Check your balance"],
+            metadatas=[{"category": "faq", "language": "fr"}, {"category": "tarifs", "language": "fr"},
+                       {"category": "faq", "language": "en"}],
+            ids=["doc1", "doc2", "doc3"]
+        )
+
+        results = await manager.query_documents("coris_money", "coris_ci", "frais transfert",
+                                                n_results=1, category="faq", language="fr")
+
+        assert results["ids"] == [["doc1"]]
+
+    async def test_query_documents_batch(self, manager):
+        """Plusieurs requêtes en un seul appel, résultats alignés sur les requêtes"""
+        await manager.add_documents(
+            "coris_money", "coris_ci",
+            documents=["Consulter son solde", "Frais de transfert"],
+            metadatas=[{}, {}],
+            ids=["doc1", "doc2"]
+        )
+        calls = []
+        original_query = manager.store.query
+        def counting_query(*args, **kwargs):
+            calls.append(kwargs.get("query_texts"))
+            return original_query(*args, **kwargs)
+        manager.store.query = counting_query
+
+        results = await manager.query_documents_batch(
+            "coris_money", "coris_ci", ["mon solde", "frais transfert", "mon solde"], n_results=1
+        )
+
+        assert calls == [["mon solde", "frais transfert"]]
+        assert [result["ids"] for result in results] == [[["doc1"]], [["doc2"]], [["doc1"]]]
+        assert results[1]["documents"] == [["Frais de transfert"]]
+
+    async def test_build_where(self):
+        """Plusieurs critères sont combinés avec $and"""
+        assert MultiTenantChromaManager.build_where() is None
+        assert MultiTenantChromaManager.build_where(category="faq") == {"category": "faq"}
+        assert MultiTenantChromaManager.build_where(category="faq", language=["fr", "en"]) == {
+            "$and": [{"category": "faq"}, {"language": {"$in": ["fr", "en"]}}]
+        }
+
+    async def test_add_documents_bumps_kb_version(self, manager):
+        """Chaque ajout change la version de la KB"""
+        await manager.add_documents("coris_money", "coris_ci", ["Consulter son solde"], [{}], ["doc1"])
+        first_version = manager.get_kb_version("coris_money", "coris_ci")
+
+        await manager.add_documents("coris_money", "coris_ci", ["Frais de transfert"], [{}], ["doc2"])
+        second_version = manager.get_kb_version("coris_money", "coris_ci")
+
+        assert first_version is not None
+        assert second_version != first_version
+
+    async def test_collection_stats(self, manager):
+        """Les statistiques exposent le nombre de documents et le backend"""
+        await manager.add_documents("coris_money", "coris_ci", ["Consulter son solde"], [{}], ["doc1"])
+
+        stats = manager.get_collection_stats("coris_money", "coris_ci")
+
+        assert stats["name"] == "coris_money_coris_ci"
+        assert stats["count"] == 1
+        assert stats["backend"] == "numpy"
+        assert stats["metadata"]["filiale_id"] == "coris_ci"
+
+@pytest.mark.asyncio
+class TestCollectionVersions:
+
+    async def publish(self, manager, documents, ids):
+        version = manager.begin_reindex("coris_money", "coris_ci")
+        await manager.add_documents("coris_money", "coris_ci", documents, [{} for _ in ids], ids, version=version)
+        manager.publish_version("coris_money", "coris_ci", version)
+        return version
+
+    async def test_shadow_version_invisible_until_published(self, manager):
+        """Les requêtes restent sur la version publiée pendant la reconstruction"""
+        await self.publish(manager, ["Consulter son solde"], ["old"])
+
+        version = manager.begin_reindex("coris_money", "coris_ci")
+        await manager.add_documents("coris_money", "coris_ci", ["Consulter son solde v2"], [{}], ["new"], version=version)
+
+        before = await manager.query_documents("coris_money", "coris_ci", "solde")
+        manager.publish_version("coris_money", "coris_ci", version)
+        after = await manager.query_documents("coris_money", "coris_ci", "solde")
+
+        assert before["ids"] == [["old"]]
+        assert after["ids"] == [["new"]]
+        assert manager.get_collection_stats("coris_money", "coris_ci")["version"] == f"coris_money_coris_ci@v{version}"
+
+    async def test_switch_visible_to_other_workers(self, manager, tmp_path):
+        """Un autre processus partageant le stockage suit la bascule de l'alias"""
+        with patch.object(MultiTenantChromaManager, '_get_embedding_function', return_value=keyword_embedding):
+            other = MultiTenantChromaManager(
+                vector_store=NumpyVectorStore(persist_dir=str(tmp_path), embedding_function=keyword_embedding)
+            )
+        await self.publish(manager, ["Consulter son solde"], ["v1"])
+        assert (await other.query_documents("coris_money", "coris_ci", "solde"))["ids"] == [["v1"]]
+
+        await self.publish(manager, ["Consulter son solde"], ["v2"])
+
+        assert (await other.query_documents("coris_money", "coris_ci", "solde"))["ids"] == [["v2"]]
+
+    async def test_rollback(self, manager):
+        """Le rollback ramène la version précédente"""
+        first = await self.publish(manager, ["Consulter son solde"], ["v1"])
+        await self.publish(manager, ["Consulter son solde"], ["v2"])
+
+        assert manager.rollback_version("coris_money", "coris_ci") == first
+        assert (await manager.query_documents("coris_money", "coris_ci", "solde"))["ids"] == [["v1"]]
+
+    async def test_empty_version_not_published(self, manager):
+        """Une version vide ne peut pas être publiée"""
+        version = manager.begin_reindex("coris_money", "coris_ci")
+
+        with pytest.raises(ValueError):
+            manager.publish_version("coris_money", "coris_ci", version)
+
+    async def test_garbage_collection(self, manager):
+        """Le GC garde la version courante et la précédente, supprime le reste"""
+        for i in range(4):
+            await self.publish(manager, ["Consulter son solde"], [f"v{i + 1}"])
+        abandoned = manager.begin_reindex("coris_money", "coris_ci")
+
+        deleted = manager.garbage_collect_versions(keep_previous=1, build_ttl_hours=1)
+
+        assert deleted == ["coris_money_coris_ci@v1", "coris_money_coris_ci@v2"]
+        entry = manager.aliases.get("coris_money_coris_ci")
+        assert sorted(int(v) for v in entry["versions"]) == [3, 4, abandoned]
+        assert manager.store.count("coris_money_coris_ci__v3") == 1
+
+        assert manager.garbage_collect_versions(keep_previous=0, build_ttl_hours=0) == [
+            "coris_money_coris_ci@v3", f"coris_money_coris_ci@v{abandoned}"
+        ]
+
+@pytest.mark.asyncio
+class TestCommonCollection:
+
+    @pytest.fixture
+    async def common(self, manager):
+        """Contenu commun coris_money_common"""
+        await manager.add_documents(
+            "coris_money", "common",
+            documents=["Frais de transfert standard", "Ouvrir un compte", "Solde et relevé"],
+            metadatas=[{"source_file": "tarifs.md"}, {"source_file": "faq.md"}, {"source_file": "faq.md"}],
+            ids=["common_frais", "common_compte", "common_solde"]
+        )
+        return manager
+
+    async def test_query_merges_overlay_and_common(self, common):
+        """Une filiale sans contenu propre est servie par la collection commune"""
+        await common.add_documents("coris_money", "coris_sn", ["Agences de Dakar"], [{}], ["sn_agence"])
+
+        results = await common.query_documents("coris_money", "coris_sn", "ouvrir un compte en agence", n_results=2)
+
+        assert set(results["ids"][0]) == {"common_compte", "sn_agence"}
+        layers = {metadata["kb_layer"] for metadata in results["metadatas"][0]}
+        assert layers == {"common", "overlay"}
+
+    async def test_overlay_overrides_common_chunks(self, common):
+        """Un document de filiale remplace les chunks communs qu'il surcharge"""
+        await common.add_documents(
+            "coris_money", "coris_bf",
+            documents=["Frais de transfert au Burkina"],
+            metadatas=[{"overrides_common": "tarifs.md"}],
+            ids=["bf_frais"]
+        )
+
+        bf = await common.query_documents("coris_money", "coris_bf", "frais de transfert", n_results=3)
+        ci = await common.query_documents("coris_money", "coris_ci", "frais de transfert", n_results=3)
+
+        assert "common_frais" not in bf["ids"][0]
+        assert bf["ids"][0][0] == "bf_frais"
+        assert ci["ids"][0][0] == "common_frais"
+
+    async def test_suppressed_common_chunks(self, common):
+        """Une filiale peut masquer des chunks communs sans les remplacer"""
+        common.suppress_common_documents("coris_money", "coris_ml", ["common_solde"])
+
+        results = await common.query_documents("coris_money", "coris_ml", "solde", n_results=3)
+
+        assert "common_solde" not in results["ids"][0]
+        assert len(results["ids"][0]) == 2
+
+    async def test_kb_version_includes_common(self, common):
+        """Une réingestion du commun change la version vue par chaque filiale"""
+        await common.add_documents("coris_money", "coris_ci", ["Consulter son solde"], [{}], ["ci_solde"])
+        before = common.get_kb_version("coris_money", "coris_ci")
+
+        await common.add_documents("coris_money", "common", ["Horaires des agences"], [{}], ["common_agence"])
+
+        assert common.get_kb_version("coris_money", "coris_ci") != before
+
+INDEX_CONFIG = {
+    "space": "cosine", "M": 16, "construction_ef": 100, "search_ef": 32,
+    "size_tiers": [{"min_documents": 1000, "M": 32, "search_ef": 64},
+                   {"min_documents": 50000, "search_ef": 128}]
+}
+
+@pytest.mark.asyncio
+class TestIndexSettings:
+
+    async def test_size_tiers(self):
+        """Les paliers atteints relèvent les paramètres de base"""
+        assert resolve_index_settings(INDEX_CONFIG, 10) == {
+            "space": "cosine", "M": 16, "construction_ef": 100, "search_ef": 32
+        }
+        assert resolve_index_settings(INDEX_CONFIG, 60000) == {
+            "space": "cosine", "M": 32, "construction_ef": 100, "search_ef": 128
+        }
+
+    async def test_invalid_settings_rejected(self):
+        with pytest.raises(ValueError):
+            resolve_index_settings({"space": "manhattan"})
+        with pytest.raises(ValueError):
+            resolve_index_settings({"M": 0})
+
+    async def test_reindex_sized_from_live_version(self, manager):
+        """Une nouvelle version est créée avec les paramètres de la taille servie"""
+        with patch.object(manager, '_load_index_config', return_value=INDEX_CONFIG):
+            first = manager.begin_reindex("coris_money", "coris_ci")
+            await manager.add_documents("coris_money", "coris_ci", ["Consulter son solde"], [{}], ["doc1"], version=first)
+            manager.publish_version("coris_money", "coris_ci", first)
+
+            assert manager.get_collection_stats("coris_money", "coris_ci")["index"]["M"] == 16
+
+            second = manager.begin_reindex("coris_money", "coris_ci", expected_size=5000)
+            metadata = manager.store.get_collection_metadata(f"coris_money_coris_ci__v{second}")
+
+        assert metadata["hnsw:M"] == 32
+        assert metadata["hnsw:search_ef"] == 64
+
+    async def test_chroma_settings_survive_writes(self, tmp_path):
+        """Les écritures (kb_version) ne font pas disparaître les paramètres d'index"""
+        pytest.importorskip("chromadb")
+        store = ChromaVectorStore(persist_dir=str(tmp_path), embedding_function=KeywordEmbeddingFunction())
+        with patch.object(MultiTenantChromaManager, '_get_embedding_function', return_value=keyword_embedding):
+            manager = MultiTenantChromaManager(vector_store=store)
+
+        with patch.object(manager, '_load_index_config', return_value=INDEX_CONFIG):
+            for doc_id in ("doc1", "doc2"):
+                await manager.add_documents("coris_money", "coris_ci", ["Consulter son solde"], [{}], [doc_id])
+            stats = manager.get_collection_stats("coris_money", "coris_ci")
+
+        assert stats["index"] == {"space": "cosine", "M": 16, "construction_ef": 100, "search_ef": 32}
+        assert "kb_version" in store.get_collection_metadata(stats["physical_name"], refresh=True)
+
+if __name__ == "__main__":
+    pytest.main([__file__])
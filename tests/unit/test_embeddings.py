@@ -0,0 +1,339 @@
+"""
+Tests unitaires pour les fournisseurs d'embeddings
+"""
+import pytest
+import time
+import asyncio
+import numpy as np
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent / "src"))
+sys.path.append(str(Path(__file__).parent.parent.parent / "scripts"))
+
+from core.knowledge_base.embeddings import (
+    OpenAIEmbeddingProvider, AsyncRateLimiter, pack_batches,
+    HashingEmbeddingProvider, EmbeddingManager,
+    cosine_similarity, euclidean_distance, normalize_embeddings, cosine_similarity_matrix,
+    euclidean_distance_matrix, top_k_similar, maximal_marginal_relevance
+)
+from core.knowledge_base.micro_batcher import MicroBatchEmbedder
+from benchmarks.fake_openai_server import FakeEmbeddingServer
+
+@pytest.fixture
+def fake_server():
+    """Serveur d'embeddings local compatible OpenAI"""
+    with FakeEmbeddingServer(latency=0.05) as server:
+        yield server
+
+def make_provider(server, **kwargs):
+    kwargs.setdefault("rate_limiter", AsyncRateLimiter(requests_per_minute=60000, tokens_per_minute=10_000_000))
+    provider = OpenAIEmbeddingProvider(api_key="sk-test", base_url=server.base_url, **kwargs)
+    provider.retry_base_delay = 0.01
+    return provider
+
+class TestPackBatches:
+
+    def test_respects_token_and_input_limits(self):
+        """Les batches ne dépassent ni le budget de tokens ni le nombre d'entrées"""
+        batches = pack_batches([40, 40, 40, 10, 10, 10, 10], max_tokens=100, max_inputs=3)
+
+        assert batches == [[0, 1], [2, 3, 4], [5, 6]]
+
+    def test_oversized_text_gets_its_own_batch(self):
+        """Un texte plus gros que le budget part seul"""
+        assert pack_batches([10, 500, 10], max_tokens=100, max_inputs=10) == [[0], [1], [2]]
+
+@pytest.mark.asyncio
+class TestOpenAIEmbeddingProvider:
+
+    async def test_embeddings_follow_input_order(self, fake_server):
+        """Les embeddings sont renvoyés dans l'ordre des textes malgré la concurrence"""
+        provider = make_provider(fake_server, max_concurrency=4)
+        provider.max_inputs_per_request = 5
+        texts = [f"document numéro {i}" for i in range(23)]
+
+        embeddings = await provider.embed_documents(texts)
+
+        assert len(embeddings) == 23
+        for text, embedding in zip(texts, embeddings):
+            assert np.allclose(embedding, fake_server.embedding_for(text), atol=1e-6)
+        assert sorted(fake_server.batch_sizes) == [3, 5, 5, 5, 5]
+
+    async def test_concurrent_requests_improve_throughput(self, fake_server):
+        """Plusieurs requêtes en vol réduisent le temps d'ingestion"""
+        texts = [f"texte {i}" for i in range(40)]
+
+        sequential = make_provider(fake_server, max_concurrency=1)
+        sequential.max_inputs_per_request = 5
+        start = time.perf_counter()
+        await sequential.embed_documents(texts)
+        sequential_time = time.perf_counter() - start
+
+        concurrent = make_provider(fake_server, max_concurrency=8)
+        concurrent.max_inputs_per_request = 5
+        start = time.perf_counter()
+        await concurrent.embed_documents(texts)
+        concurrent_time = time.perf_counter() - start
+
+        assert fake_server.max_in_flight > 1
+        assert concurrent_time < sequential_time / 2
+
+    async def test_rate_limited_batches_are_retried(self):
+        """Les réponses 429 sont rejouées avec backoff"""
+        with FakeEmbeddingServer(latency=0.01, fail_first=3) as server:
+            provider = make_provider(server, max_concurrency=2, max_retries=5)
+
+            embeddings = await provider.embed_documents(["solde", "frais"])
+
+        assert len(embeddings) == 2
+        assert server.failed_count == 3
+
+    async def test_gives_up_after_max_retries(self):
+        """Au-delà du nombre de reprises, l'erreur est propagée"""
+        with FakeEmbeddingServer(latency=0.01, fail_first=10) as server:
+            provider = make_provider(server, max_retries=1)
+
+            with pytest.raises(Exception):
+                await provider.embed_query("solde")
+
+        assert server.request_count == 2
+
+    async def test_failed_batch_cancels_the_others(self, fake_server):
+        """Une erreur définitive sur un lot annule les lots encore en cours"""
+        provider = make_provider(fake_server, max_concurrency=4)
+        provider.max_inputs_per_request = 1
+        cancelled = []
+
+        async def create_embeddings(batch, tokens):
+            if batch == ["invalide"]:
+                raise ValueError("invalid input")
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append(batch[0])
+                raise
+            return [[0.0]]
+
+        provider._create_embeddings = create_embeddings
+        start = time.perf_counter()
+        with pytest.raises(ValueError):
+            await provider.embed_documents(["solde", "frais", "invalide", "agence"])
+
+        assert time.perf_counter() - start < 1
+        assert sorted(cancelled) == ["agence", "frais", "solde"]
+
+    async def test_only_transient_errors_are_retried(self):
+        import httpx
+        import openai
+
+        class StatusError(Exception):
+            def __init__(self, status_code):
+                self.status_code = status_code
+
+        request = httpx.Request("POST", "http://localhost/v1/embeddings")
+        assert OpenAIEmbeddingProvider._is_retryable(StatusError(429))
+        assert OpenAIEmbeddingProvider._is_retryable(StatusError(503))
+        assert OpenAIEmbeddingProvider._is_retryable(openai.APITimeoutError(request=request))
+        assert OpenAIEmbeddingProvider._is_retryable(openai.APIConnectionError(request=request))
+        assert OpenAIEmbeddingProvider._is_retryable(asyncio.TimeoutError())
+        assert not OpenAIEmbeddingProvider._is_retryable(StatusError(400))
+        assert not OpenAIEmbeddingProvider._is_retryable(ValueError("invalid input"))
+
+class TestAsyncRateLimiter:
+
+    @pytest.mark.asyncio
+    async def test_throttles_requests(self):
+        """Le limiteur espace les requêtes au-delà de la capacité du seau"""
+        limiter = AsyncRateLimiter(requests_per_minute=600, tokens_per_minute=1_000_000)
+        limiter._request_allowance = 1
+
+        start = time.perf_counter()
+        for _ in range(3):
+            await limiter.acquire(tokens=10)
+
+        # 600 requêtes/minute : 0.1 s par requête après la première
+        assert time.perf_counter() - start >= 0.18
+
+class TestMicroBatchEmbedder:
+
+    @staticmethod
+    def slow_encode(texts):
+        """Encodeur factice : coût fixe par appel, vecteur dérivé de la longueur"""
+        time.sleep(0.02)
+        return np.array([[len(text), 1.0] for text in texts], dtype=np.float32)
+
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_share_batches(self):
+        """Les requêtes simultanées sont encodées ensemble et résolues dans l'ordre"""
+        batcher = MicroBatchEmbedder(self.slow_encode, max_batch_size=16, max_wait_ms=10)
+        texts = ["a" * i for i in range(1, 33)]
+
+        try:
+            embeddings = await asyncio.gather(*(batcher.embed(text) for text in texts))
+        finally:
+            batcher.close()
+
+        assert [embedding[0] for embedding in embeddings] == [float(len(text)) for text in texts]
+        stats = batcher.get_stats()
+        assert stats["items"] == 32
+        assert stats["batches"] <= 4
+        assert stats["max_batch"] <= 16
+
+    @pytest.mark.asyncio
+    async def test_event_loop_is_not_blocked(self):
+        """L'encodage s'exécute hors de la boucle asyncio"""
+        batcher = MicroBatchEmbedder(self.slow_encode, max_wait_ms=1)
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.001)
+
+        task = asyncio.create_task(ticker())
+        try:
+            for _ in range(5):
+                await batcher.embed("solde")
+        finally:
+            task.cancel()
+            batcher.close()
+
+        assert ticks > 20
+
+    @pytest.mark.asyncio
+    async def test_encoding_errors_are_propagated(self):
+        """Une erreur d'encodage est remontée à chaque appelant du batch"""
+        def failing_encode(texts):
+            raise RuntimeError("model crashed")
+
+        batcher = MicroBatchEmbedder(failing_encode, max_wait_ms=1)
+        try:
+            with pytest.raises(RuntimeError):
+                await batcher.embed("solde")
+        finally:
+            batcher.close()
+
+class TestHashingEmbeddingProvider:
+
+    @pytest.fixture
+    def provider(self):
+        return HashingEmbeddingProvider(dimension=512)
+
+    def test_deterministic_across_instances(self, provider):
+        """Un même texte donne le même vecteur, quelle que soit l'instance"""
+        other = HashingEmbeddingProvider(dimension=512)
+
+        assert np.array_equal(provider.transform(["Frais de transfert"]), other.transform(["Frais de transfert"]))
+
+    def test_related_texts_are_closer(self, provider):
+        """Des textes partageant des mots sont plus proches que des textes sans rapport"""
+        vectors = provider.transform(["Quels sont les frais de transfert ?", "frais transfert", "Horaires des agences"])
+
+        assert vectors[0] @ vectors[1] > 0.5
+        assert vectors[0] @ vectors[1] > vectors[0] @ vectors[2] + 0.4
+
+    def test_case_and_accents_ignored(self, provider):
+        """La casse et les accents n'influencent pas l'embedding"""
+        vectors = provider.transform(["Dépôt à l'agence", "DEPOT A L'AGENCE"])
+
+        assert vectors[0] @ vectors[1] == pytest.approx(1.0)
+
+    def test_vectors_are_normalized(self, provider):
+        """Les vecteurs sont normalisés, le texte vide donne le vecteur nul"""
+        vectors = provider.transform(["Consulter son solde", ""])
+
+        assert np.linalg.norm(vectors[0]) == pytest.approx(1.0, abs=1e-5)
+        assert not vectors[1].any()
+
+    def test_fit_downweights_common_terms(self, provider, tmp_path):
+        """Après fit, les termes présents partout comptent moins"""
+        corpus = [f"coris money {topic}" for topic in ["solde", "transfert", "frais", "agence", "compte"]]
+        before = provider.transform(["coris money solde", "coris money agence"])
+        provider.fit(corpus)
+        after = provider.transform(["coris money solde", "coris money agence"])
+
+        assert after[0] @ after[1] < before[0] @ before[1]
+
+        provider.save_idf(str(tmp_path / "idf.npy"))
+        reloaded = HashingEmbeddingProvider(dimension=512, idf_path=str(tmp_path / "idf.npy"))
+        assert np.allclose(reloaded.transform(["coris money solde"]), after[:1])
+
+    def test_model_includes_idf_fingerprint(self, provider, tmp_path, monkeypatch):
+        """Le modèle change avec l'IDF ; l'IDF enregistré est relu via HASHING_EMBEDDING_IDF_PATH"""
+        assert provider.model == "hashing-tfidf-512"
+
+        provider.fit(["coris money solde", "coris money agence"])
+        assert provider.model.startswith("hashing-tfidf-512-idf")
+
+        idf_path = tmp_path / "idf" / "hashing.npy"
+        provider.save_idf(str(idf_path))
+        monkeypatch.setenv("HASHING_EMBEDDING_IDF_PATH", str(idf_path))
+        assert HashingEmbeddingProvider(dimension=512).model == provider.model
+
+        provider.fit(["frais de transfert", "horaires des agences"])
+        assert HashingEmbeddingProvider(dimension=512).model != provider.model
+
+    @pytest.mark.asyncio
+    async def test_selected_by_embedding_manager(self, monkeypatch):
+        """EMBEDDING_PROVIDER=hashing sélectionne le fournisseur hors ligne, déterministe"""
+        monkeypatch.setenv("EMBEDDING_PROVIDER", "hashing")
+        manager = EmbeddingManager()
+
+        assert isinstance(manager.provider, HashingEmbeddingProvider)
+        assert manager.is_deterministic()
+        assert await manager.embed_query("solde") == await manager.embed_query("solde")
+
+    def test_unknown_provider_rejected(self, monkeypatch):
+        """Un fournisseur inconnu est refusé"""
+        monkeypatch.setenv("EMBEDDING_PROVIDER", "word2vec")
+
+        with pytest.raises(ValueError):
+            EmbeddingManager()
+
+class TestVectorizedSimilarity:
+
+    @pytest.fixture
+    def vectors(self):
+        rng = np.random.default_rng(1)
+        return rng.normal(size=(200, 32)).astype(np.float32), rng.normal(size=(5, 32)).astype(np.float32)
+
+    def test_matrices_match_pairwise_functions(self, vectors):
+        """Les versions matricielles donnent les mêmes valeurs que les fonctions paire à paire"""
+        corpus, queries = vectors
+
+        similarities = cosine_similarity_matrix(queries, corpus)
+        distances = euclidean_distance_matrix(queries, corpus)
+
+        assert similarities.shape == (5, 200)
+        assert similarities[2, 17] == pytest.approx(cosine_similarity(queries[2], corpus[17]), abs=1e-5)
+        assert distances[3, 42] == pytest.approx(euclidean_distance(queries[3], corpus[42]), abs=1e-3)
+
+    def test_top_k_matches_full_sort(self, vectors):
+        """Le top-k par argpartition correspond au tri complet"""
+        corpus, queries = vectors
+        normalized = normalize_embeddings(corpus)
+
+        indices, scores = top_k_similar(normalize_embeddings(queries), normalized, k=10, normalized=True)
+
+        expected = np.argsort(-cosine_similarity_matrix(queries, corpus), axis=1)[:, :10]
+        assert np.array_equal(indices, expected)
+        assert np.all(np.diff(scores, axis=1) <= 0)
+        assert normalized.dtype == np.float32
+
+    def test_mmr_diversifies_results(self):
+        """MMR écarte un quasi-doublon au profit d'un résultat différent"""
+        query = np.array([1.0, 0.0, 0.0])
+        candidates = np.array([
+            [0.95, 0.31, 0.0],
+            [0.94, 0.34, 0.0],  # quasi-doublon du premier
+            [0.80, 0.0, 0.6]
+        ])
+
+        assert maximal_marginal_relevance(query, candidates, k=2, lambda_mult=1.0) == [0, 1]
+        assert maximal_marginal_relevance(query, candidates, k=2, lambda_mult=0.5) == [0, 2]
+        assert maximal_marginal_relevance(query, candidates, k=10) == [0, 2, 1]
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -118,20 +118,8 @@ class TestEscalationRouter:
         mock_conn = AsyncMock()
         mock_db_manager.get_conversations_connection.return_value.__aenter__.return_value = mock_conn
         
-        # Mock des agents disponibles
-        mock_conn.fetch.return_value = [
-            {
-                'id': 'agent_001',
-                'name': 'Agent Test',
-                'specialties': ['reclamations'],
-                'languages': ['fr'],
-                'current_load': 1,
-                'max_concurrent': 5
-            }
-        ]
-        
-        # Mock de la mise à jour de charge
-        mock_conn.execute = AsyncMock()
+        # Agent choisi et réservé par la même requête
+        mock_conn.fetchrow.return_value = {'agent_id': 'agent_001', 'has_capacity': True}
         
         context = {
             'reason': 'réclamation urgente',
@@ -142,7 +130,7 @@ class TestEscalationRouter:
         agent_id = await router.find_best_agent(context)
         
         assert agent_id == 'agent_001'
-        mock_conn.execute.assert_called()  # Vérifier que la charge a été mise à jour
+        mock_conn.fetchrow.assert_called_once()  # Sélection et charge en une seule requête
     
     @patch('core.escalation.router.db_manager')
     async def test_find_best_agent_no_agents(self, mock_db_manager, router):
@@ -151,7 +139,7 @@ class TestEscalationRouter:
         mock_db_manager.get_conversations_connection.return_value.__aenter__.return_value = mock_conn
         
         # Aucun agent disponible
-        mock_conn.fetch.return_value = []
+        mock_conn.fetchrow.return_value = {'agent_id': None, 'has_capacity': False}
         
         context = {
             'reason': 'test',
@@ -193,8 +181,8 @@ class TestEscalationRouter:
         
         await router.release_agent('agent_001')
         
-        # Vérifier que deux requêtes ont été exécutées
-        assert mock_conn.execute.call_count == 2
+        # Décrément borné à zéro en une seule requête
+        assert mock_conn.execute.call_count == 1
 
 if __name__ == "__main__":
     pytest.main([__file__])
\ No newline at end of file
@@ -0,0 +1,172 @@
+"""
+Tests unitaires de la réservation concurrente des agents humains
+"""
+import asyncio
+import pytest
+import sys
+from contextlib import asynccontextmanager
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+sys.path.append(str(Path(__file__).parent.parent.parent / "src"))
+
+from core.escalation.availability import AgentAvailabilityIndex
+from core.escalation.router import EscalationRouter
+
+N_AGENTS = 40
+MAX_CONCURRENT = 5
+
+class AgentsTable:
+    """
+    Table human_agents en mémoire
+
+    Chaque requête est atomique et rend la main à la boucle avant de
+    s'exécuter, pour entrelacer les escalades concurrentes.
+    """
+
+    def __init__(self):
+        self.agents = {
+            f"agent_{i:02d}": {"status": "available", "current_load": 0, "max_concurrent": MAX_CONCURRENT}
+            for i in range(N_AGENTS)
+        }
+        self.statements = 0
+        # Agents verrouillés par d'autres transactions (sautés par SKIP LOCKED)
+        self.locked = set()
+
+    def _free(self):
+        return [agent_id for agent_id, agent in self.agents.items()
+                if agent["status"] == "available" and agent["current_load"] < agent["max_concurrent"]]
+
+    async def fetchrow(self, query, *args):
+        await asyncio.sleep(0)
+        self.statements += 1
+        assert "SKIP LOCKED" in query
+        free = self._free()
+        claimable = [agent_id for agent_id in free if agent_id not in self.locked]
+        if not claimable:
+            return {"agent_id": None, "has_capacity": bool(free)}
+        self.agents[claimable[0]]["current_load"] += 1
+        return {"agent_id": claimable[0], "has_capacity": True}
+
+    async def fetchval(self, query, *args):
+        await asyncio.sleep(0)
+        self.statements += 1
+        agent = self.agents[args[0]]
+        if agent["status"] != "available" or agent["current_load"] >= agent["max_concurrent"]:
+            return None
+        agent["current_load"] += 1
+        return agent["current_load"]
+
+    async def execute(self, query, *args):
+        await asyncio.sleep(0)
+        self.statements += 1
+        agent = self.agents[args[0]]
+        agent["current_load"] = max(agent["current_load"] - 1, 0)
+        return "UPDATE 1"
+
+def fake_db(table):
+    @asynccontextmanager
+    async def connection():
+        yield table
+
+    db = MagicMock()
+    db.get_conversations_connection = connection
+    return db
+
+def index_for(table):
+    index = AgentAvailabilityIndex(resync_seconds=60)
+    index.replace_all([
+        {"id": agent_id, "languages": ["fr"], "specialties": ["reclamations"],
+         "last_activity": "2024-01-01T10:00:00", **agent}
+        for agent_id, agent in table.agents.items()
+    ])
+    return index
+
+CONTEXT = {"reason": "réclamation client", "user_language": "fr"}
+
+class TestConcurrentClaims:
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("with_index", [True, False])
+    async def test_burst_never_exceeds_capacity(self, with_index):
+        """Afflux de 2000 escalades pour 200 places : aucune surcharge"""
+        table = AgentsTable()
+        index = index_for(table) if with_index else AgentAvailabilityIndex(resync_seconds=60)
+        router = EscalationRouter(availability_index=index)
+
+        with patch("core.escalation.router.db_manager", fake_db(table)):
+            results = await asyncio.gather(*(router.find_best_agent(CONTEXT) for _ in range(2000)))
+
+        assigned = [agent_id for agent_id in results if agent_id]
+        assert len(assigned) == N_AGENTS * MAX_CONCURRENT
+        assert all(agent["current_load"] == MAX_CONCURRENT for agent in table.agents.values())
+        assert all(assigned.count(agent_id) == MAX_CONCURRENT for agent_id in table.agents)
+
+    @pytest.mark.asyncio
+    async def test_stale_index_falls_back_to_query(self):
+        """Agent saturé en base mais libre dans l'index : un autre agent est réservé"""
+        table = AgentsTable()
+        index = index_for(table)
+        for agent_id in list(table.agents)[:-1]:
+            table.agents[agent_id]["current_load"] = MAX_CONCURRENT
+        router = EscalationRouter(availability_index=index)
+
+        with patch("core.escalation.router.db_manager", fake_db(table)):
+            agent_id = await router.find_best_agent(CONTEXT)
+
+        assert agent_id == f"agent_{N_AGENTS - 1:02d}"
+        assert table.agents[agent_id]["current_load"] == 1
+
+    @pytest.mark.asyncio
+    async def test_query_retried_while_free_agents_are_locked(self):
+        """Agents libres mais verrouillés : la réservation est relancée au lieu de renvoyer None"""
+        table = AgentsTable()
+        table.locked = set(table.agents)
+        attempts = []
+        original_fetchrow = table.fetchrow
+
+        async def fetchrow(query, *args):
+            attempts.append(query)
+            if len(attempts) == 3:
+                table.locked.clear()  # Les réservations concurrentes sont validées
+            return await original_fetchrow(query, *args)
+
+        table.fetchrow = fetchrow
+        router = EscalationRouter(availability_index=AgentAvailabilityIndex(resync_seconds=60))
+
+        with patch("core.escalation.router.db_manager", fake_db(table)):
+            agent_id = await router.find_best_agent(CONTEXT)
+
+        assert agent_id == "agent_00"
+        assert len(attempts) == 3
+
+    @pytest.mark.asyncio
+    async def test_query_not_retried_without_capacity(self):
+        table = AgentsTable()
+        for agent in table.agents.values():
+            agent["current_load"] = MAX_CONCURRENT
+        router = EscalationRouter(availability_index=AgentAvailabilityIndex(resync_seconds=60))
+
+        with patch("core.escalation.router.db_manager", fake_db(table)):
+            assert await router.find_best_agent(CONTEXT) is None
+
+        assert table.statements == 1
+
+    @pytest.mark.asyncio
+    async def test_release_frees_capacity(self):
+        table = AgentsTable()
+        index = index_for(table)
+        router = EscalationRouter(availability_index=index)
+
+        with patch("core.escalation.router.db_manager", fake_db(table)):
+            agent_id = await router.find_best_agent(CONTEXT)
+            statements = table.statements
+            await router.release_agent(agent_id)
+            await router.release_agent(agent_id)
+
+        assert table.statements == statements + 2
+        assert table.agents[agent_id]["current_load"] == 0
+        assert index.agents[agent_id]["current_load"] == 0
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,202 @@
+"""
+Tests unitaires pour la file d'attente prioritaire des escalades
+"""
+import pytest
+import sys
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, patch
+
+sys.path.append(str(Path(__file__).parent.parent.parent / "src"))
+
+from core.escalation.availability import AgentAvailabilityIndex
+from core.escalation.dispatcher import EscalationDispatcher
+
+NOW = datetime(2024, 1, 1, 10, 0, 0)
+
+class QueueTable:
+    """Tables escalation_queue et escalations en mémoire"""
+
+    def __init__(self):
+        self.queue = {}
+        self.assigned = {}
+
+    async def execute(self, query, *args):
+        if "INSERT INTO escalation_queue" in query:
+            escalation_id, conversation_id, priority, _, sla_deadline, routing, enqueued_at = args
+            self.queue.setdefault(escalation_id, {
+                "escalation_id": escalation_id, "conversation_id": conversation_id, "priority": priority,
+                "sla_deadline": sla_deadline, "routing": routing, "enqueued_at": enqueued_at
+            })
+            return "INSERT 0 1"
+        if "DELETE FROM escalation_queue" in query:
+            return "DELETE 1" if self.queue.pop(args[0], None) else "DELETE 0"
+        raise AssertionError(query)
+
+    async def fetch(self, query, *args):
+        return [dict(row) for row in self.queue.values()]
+
+    async def fetchval(self, query, escalation_id, agent_id):
+        if self.queue.pop(escalation_id, None) is None:
+            return None
+        self.assigned[escalation_id] = agent_id
+        return escalation_id
+
+def fake_db(table):
+    @asynccontextmanager
+    async def connection():
+        yield table
+
+    db = MagicMock()
+    db.get_conversations_connection = connection
+    return db
+
+def router_with_agents(agent_ids):
+    router = MagicMock()
+    agents = list(agent_ids)
+    router.find_best_agent = AsyncMock(side_effect=lambda context: agents.pop(0) if agents else None)
+    router.release_agent = AsyncMock()
+    return router
+
+async def enqueue(dispatcher, escalation_id, pack_name, priority="medium", minutes_ago=0):
+    return await dispatcher.enqueue(
+        escalation_id=escalation_id,
+        conversation_id=f"conv-{escalation_id}",
+        priority=priority,
+        pack_name=pack_name,
+        routing={"reason": escalation_id, "priority": priority},
+        enqueued_at=NOW - timedelta(minutes=minutes_ago)
+    )
+
+class TestEscalationDispatcher:
+
+    @pytest.mark.asyncio
+    async def test_order_by_sla_deadline_then_priority(self):
+        table = QueueTable()
+        dispatcher = EscalationDispatcher(router=router_with_agents([]), resync_seconds=60)
+
+        with patch("core.escalation.dispatcher.db_manager", fake_db(table)):
+            await enqueue(dispatcher, "basic_old", "coris_basic", minutes_ago=80)        # échéance +40 min
+            await enqueue(dispatcher, "premium_new", "coris_premium")                     # échéance +30 min
+            await enqueue(dispatcher, "advanced_low", "coris_advanced", "low", 30)        # échéance +30 min
+            await enqueue(dispatcher, "advanced_urgent", "coris_advanced", "urgent", 30)  # échéance +30 min
+
+        order = [item["escalation_id"] for item in dispatcher.pending()]
+        assert order == ["advanced_urgent", "premium_new", "advanced_low", "basic_old"]
+
+    @pytest.mark.asyncio
+    async def test_dispatch_until_no_agent(self):
+        table = QueueTable()
+        router = router_with_agents(["agent_1", "agent_2"])
+        dispatcher = EscalationDispatcher(router=router, resync_seconds=60)
+
+        with patch("core.escalation.dispatcher.db_manager", fake_db(table)):
+            for i in range(5):
+                await enqueue(dispatcher, f"esc_{i}", "coris_basic", minutes_ago=10 - i)
+            assigned = await dispatcher.dispatch_pending()
+
+        assert assigned == 2
+        assert table.assigned == {"esc_0": "agent_1", "esc_1": "agent_2"}
+        assert len(dispatcher) == 3 and len(table.queue) == 3
+        # Une seule tentative infructueuse, quelle que soit la longueur de la file
+        assert router.find_best_agent.await_count == 3
+
+    @pytest.mark.asyncio
+    async def test_queue_survives_restart(self):
+        table = QueueTable()
+        dispatcher = EscalationDispatcher(router=router_with_agents([]), resync_seconds=60)
+
+        with patch("core.escalation.dispatcher.db_manager", fake_db(table)):
+            await enqueue(dispatcher, "basic", "coris_basic", minutes_ago=5)
+            await enqueue(dispatcher, "premium", "coris_premium")
+
+            restarted = EscalationDispatcher(router=router_with_agents([]), resync_seconds=60)
+            await restarted.load()
+
+        assert [item["escalation_id"] for item in restarted.pending()] == ["premium", "basic"]
+        assert restarted.pending()[0]["routing"] == {"reason": "premium", "priority": "medium"}
+
+    @pytest.mark.asyncio
+    async def test_already_assigned_elsewhere_releases_agent(self):
+        table = QueueTable()
+        router = router_with_agents(["agent_1"])
+        dispatcher = EscalationDispatcher(router=router, resync_seconds=60)
+
+        with patch("core.escalation.dispatcher.db_manager", fake_db(table)):
+            await enqueue(dispatcher, "esc_1", "coris_basic")
+            table.queue.clear()  # Affectée par un autre processus
+            assigned = await dispatcher.dispatch_pending()
+
+        assert assigned == 0
+        router.release_agent.assert_awaited_once_with("agent_1")
+        assert len(dispatcher) == 0
+
+    @pytest.mark.asyncio
+    async def test_assign_failure_releases_agent(self):
+        table = QueueTable()
+        router = router_with_agents(["agent_1"])
+        dispatcher = EscalationDispatcher(router=router, resync_seconds=60)
+
+        with patch("core.escalation.dispatcher.db_manager", fake_db(table)):
+            await enqueue(dispatcher, "esc_1", "coris_basic")
+            table.fetchval = AsyncMock(side_effect=ConnectionError("connection lost"))
+            with pytest.raises(ConnectionError):
+                await dispatcher.dispatch_pending()
+
+        router.release_agent.assert_awaited_once_with("agent_1")
+        # Toujours en file pour la prochaine tentative
+        assert len(dispatcher) == 1 and "esc_1" in table.queue
+
+    @pytest.mark.asyncio
+    async def test_wait_measured_in_utc(self):
+        """Les dates relues de la base (UTC avec fuseau) et celles du processus se comparent"""
+        table = QueueTable()
+        router = router_with_agents(["agent_1"])
+        dispatcher = EscalationDispatcher(router=router, resync_seconds=60)
+
+        with patch("core.escalation.dispatcher.db_manager", fake_db(table)):
+            await dispatcher.enqueue("esc_local", "conv-esc_local", "medium", "coris_basic", {})
+            table.queue["esc_db"] = {
+                "escalation_id": "esc_db", "conversation_id": "conv-esc_db", "priority": "medium",
+                "sla_deadline": datetime.now(timezone.utc) + timedelta(minutes=25),
+                "routing": "{}", "enqueued_at": datetime.now(timezone.utc) - timedelta(minutes=5)
+            }
+            await dispatcher.load()
+
+            assert len(dispatcher) == 2
+            assert 299 <= dispatcher.get_stats()["oldest_wait_seconds"] < 310
+            assert await dispatcher.dispatch_pending() == 1
+
+        assert table.assigned == {"esc_db": "agent_1"}
+
+    @pytest.mark.asyncio
+    async def test_cancel_removes_from_queue(self):
+        table = QueueTable()
+        dispatcher = EscalationDispatcher(router=router_with_agents(["agent_1"]), resync_seconds=60)
+
+        with patch("core.escalation.dispatcher.db_manager", fake_db(table)):
+            await enqueue(dispatcher, "esc_1", "coris_basic")
+            assert await dispatcher.cancel("esc_1") is True
+            assert await dispatcher.dispatch_pending() == 0
+
+        assert table.queue == {}
+
+    def test_freed_capacity_wakes_dispatcher(self):
+        index = AgentAvailabilityIndex(resync_seconds=60)
+        index.replace_all([{"id": "agent_1", "status": "available", "current_load": 5, "max_concurrent": 5,
+                            "specialties": [], "languages": ["fr"]}])
+        router = MagicMock()
+        router.availability_index = index
+        dispatcher = EscalationDispatcher(resync_seconds=60)
+
+        with patch("core.escalation.router.EscalationRouter", return_value=router):
+            dispatcher.router
+
+        index.mark_full("agent_1")
+        assert not dispatcher._wakeup.is_set()
+        index.adjust_load("agent_1", -1)
+        assert dispatcher._wakeup.is_set()
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,188 @@
+"""
+Tests unitaires pour les instantanés d'escalade
+"""
+import json
+import pytest
+import sys
+from contextlib import asynccontextmanager
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+
+sys.path.append(str(Path(__file__).parent.parent.parent / "src"))
+
+from core.escalation.snapshot import EscalationSnapshot
+from core.escalation.context_builder import ContextBuilder
+from core.conversation.manager import ConversationManager
+
+CONVERSATION_INFO = {
+    "user_id": "user_1",
+    "filiale_id": "coris_ci",
+    "application_id": "coris_money",
+    "pack_level": "coris_advanced",
+    "channel": "mobile",
+    "created_at": "2024-01-01T10:00:00"
+}
+
+MESSAGES = [
+    {"role": "user", "content": "Mon transfert n'est pas arrivé", "timestamp": "2024-01-01T10:00:00"},
+    {"role": "assistant", "content": "Je vérifie", "agent_used": "transaction_agent",
+     "processing_time": 1.5, "metadata": {}, "timestamp": "2024-01-01T10:00:05"},
+    {"role": "system", "content": "trace interne", "timestamp": "2024-01-01T10:00:06"},
+    {"role": "assistant", "content": "Erreur", "agent_used": "account_agent",
+     "processing_time": 0.5, "metadata": {"success": False, "error_message": "timeout"},
+     "timestamp": "2024-01-01T10:01:00"},
+    {"role": "user", "content": "x" * 300, "timestamp": "2024-01-01T10:12:00"},
+]
+
+class FakeConnection:
+    """Table escalation_snapshots en mémoire, avec la garde de version de la requête"""
+
+    def __init__(self):
+        self.rows = {}
+        self.executed = []
+
+    async def fetchrow(self, query, *args):
+        if "FROM escalation_snapshots" in query:
+            row = self.rows.get(args[0])
+            return {"version": row[0], "snapshot": row[1]} if row else None
+        return None
+
+    async def execute(self, query, *args):
+        self.executed.append(query)
+        if "INTO escalation_snapshots" not in query:
+            return "OK"
+        conversation_id, version, snapshot = args[:3]
+        current = self.rows.get(conversation_id)
+        if current and ("DO NOTHING" in query or current[0] != version - 1):
+            return "INSERT 0 0"
+        self.rows[conversation_id] = (version, snapshot)
+        return "INSERT 0 1"
+
+def fake_db(conn):
+    @asynccontextmanager
+    async def connection():
+        yield conn
+
+    db = AsyncMock()
+    db.get_conversations_connection = connection
+    return db
+
+class TestEscalationSnapshot:
+
+    def test_incremental_counters(self):
+        snapshot = EscalationSnapshot.from_messages(CONVERSATION_INFO, MESSAGES)
+        data = snapshot.data
+
+        assert snapshot.version == 5
+        assert data["total_messages"] == 4
+        assert data["user_messages_count"] == 2
+        assert data["assistant_messages_count"] == 2
+        assert data["main_issue"] == "Mon transfert n'est pas arrivé"
+        assert data["latest_message"] == "x" * 200 + "..."
+        assert data["agents_involved"] == ["transaction_agent", "account_agent"]
+        assert data["failed_actions"] == 1
+        assert data["error_details"] == ["timeout"]
+        assert data["total_response_time_ms"] == 2000
+        assert data["last_successful_action"]["agent_name"] == "transaction_agent"
+
+    def test_serializable_round_trip(self):
+        snapshot = EscalationSnapshot.from_messages(CONVERSATION_INFO, MESSAGES)
+        restored = EscalationSnapshot.from_dict(json.loads(json.dumps(snapshot.to_dict())))
+
+        assert restored.data == snapshot.data
+
+    def test_context_built_from_snapshot(self):
+        builder = ContextBuilder(conversation_manager=AsyncMock())
+        snapshot = EscalationSnapshot.from_messages(CONVERSATION_INFO, MESSAGES)
+
+        with patch.object(builder, "_build_business_context", return_value={}):
+            context = builder.build_context(snapshot, {"total_conversations": 7, "escalated_conversations": 2})
+
+        assert context["conversation_summary"]["total_messages"] == 4
+        assert context["conversation_summary"]["conversation_duration"] == "12 minutes"
+        assert context["technical_context"]["average_response_time_ms"] == 1000
+        assert context["user_profile"]["is_frequent_user"] is True
+        assert context["user_profile"]["escalation_history"] == 2
+        assert "Vérifier le statut du transfert dans le système" in context["recommended_actions"]
+        assert context["escalation_metadata"]["snapshot_version"] == 5
+
+class TestContextBuilder:
+
+    @pytest.mark.asyncio
+    async def test_prepare_reads_snapshot_without_history(self):
+        """L'escalade lit l'instantané et l'agrégat utilisateur, sans relire l'historique"""
+        manager = AsyncMock()
+        manager.get_escalation_snapshot.return_value = EscalationSnapshot.from_messages(CONVERSATION_INFO, MESSAGES)
+        manager.get_user_activity.return_value = {"total_conversations": 1, "escalated_conversations": 0}
+        builder = ContextBuilder(conversation_manager=manager)
+
+        with patch.object(builder, "_build_business_context", return_value={}):
+            context = await builder.prepare_escalation_context("conv-1")
+
+        assert context["conversation_summary"]["main_issue"] == "Mon transfert n'est pas arrivé"
+        manager.get_user_activity.assert_awaited_once_with("user_1")
+        manager.rebuild_escalation_snapshot.assert_not_awaited()
+        manager.get_conversation_context.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_prepare_rebuilds_missing_snapshot(self):
+        manager = AsyncMock()
+        manager.get_escalation_snapshot.return_value = None
+        manager.rebuild_escalation_snapshot.return_value = EscalationSnapshot.new(CONVERSATION_INFO)
+        manager.get_user_activity.return_value = {}
+        builder = ContextBuilder(conversation_manager=manager)
+
+        with patch.object(builder, "_build_business_context", return_value={}):
+            context = await builder.prepare_escalation_context("conv-1")
+
+        manager.rebuild_escalation_snapshot.assert_awaited_once_with("conv-1")
+        assert context["conversation_summary"]["conversation_duration"] == "Inconnue"
+
+class TestSnapshotPersistence:
+
+    @pytest.mark.asyncio
+    async def test_apply_message_updates_snapshot(self):
+        conn = FakeConnection()
+        manager = ConversationManager()
+
+        with patch("core.conversation.manager.db_manager", fake_db(conn)):
+            await manager._save_snapshot(conn, "conv-1", EscalationSnapshot.new(CONVERSATION_INFO), seed=True)
+            await manager.add_message("conv-1", "user", "Bonjour")
+            await manager.add_message("conv-1", "assistant", "Bonjour !", agent_used="faq_agent")
+            snapshot = await manager.get_escalation_snapshot("conv-1")
+
+        assert snapshot.version == 2
+        assert snapshot.data["main_issue"] == "Bonjour"
+        assert snapshot.data["agents_involved"] == ["faq_agent"]
+
+    @pytest.mark.asyncio
+    async def test_stale_cache_is_reloaded(self):
+        """Un message appliqué par un autre processus n'est pas écrasé"""
+        conn = FakeConnection()
+        manager = ConversationManager()
+        other_process = ConversationManager()
+
+        with patch("core.conversation.manager.db_manager", fake_db(conn)):
+            await manager._save_snapshot(conn, "conv-1", EscalationSnapshot.new(CONVERSATION_INFO), seed=True)
+            await manager.add_message("conv-1", "user", "Premier message")
+            await other_process.add_message("conv-1", "assistant", "Réponse", agent_used="faq_agent")
+            await manager.add_message("conv-1", "user", "Dernier message")
+            snapshot = await manager.get_escalation_snapshot("conv-1")
+
+        assert snapshot.version == 3
+        assert snapshot.data["total_messages"] == 3
+        assert snapshot.data["latest_message"] == "Dernier message"
+
+    @pytest.mark.asyncio
+    async def test_conversation_without_snapshot_is_skipped(self):
+        conn = FakeConnection()
+        manager = ConversationManager()
+
+        with patch("core.conversation.manager.db_manager", fake_db(conn)):
+            await manager.add_message("legacy", "user", "Bonjour")
+
+        assert "legacy" not in conn.rows
+        assert any("user_activity_daily" in query for query in conn.executed)
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,134 @@
+"""
+Tests unitaires pour l'index FAQ question -> réponse
+"""
+import pytest
+import numpy as np
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent / "src"))
+
+from core.knowledge_base.faq_index import FaqIndex, extract_faq_pairs, normalize_question
+from core.knowledge_base.document_processor import DocumentProcessor
+
+FAQ_TEXT = """# FAQ Coris Money
+
+Q: Comment ouvrir un compte Coris Money ?
+R: Rendez-vous en **agence** avec votre pièce d'identité.
+Un SMS confirme l'ouverture.
+
+Question 2 : Quels sont les frais de transfert ?
+Réponse 2 : 1% du montant, plafonné à 5000 FCFA.
+
+## Comment consulter mon solde ?
+Composez le #144# depuis votre mobile.
+
+## Tarifs
+- Transfert national : 1%
+"""
+
+class KeywordEmbeddings:
+    """Embeddings déterministes : présence de quelques mots-clés"""
+    provider = type("Provider", (), {"model": "keywords"})()
+    vocabulary = ["compte", "ouvrir", "frais", "transfert", "solde"]
+
+    def vectorize(self, text):
+        vector = np.array([float(word in normalize_question(text)) for word in self.vocabulary]) + 0.01
+        return vector / np.linalg.norm(vector)
+
+    async def embed_documents(self, texts):
+        return [self.vectorize(text).tolist() for text in texts]
+
+@pytest.fixture
+async def faq_index(tmp_path):
+    index = FaqIndex(directory=str(tmp_path), embedding_manager=KeywordEmbeddings(), semantic_threshold=0.9)
+    await index.build("coris_money", "coris_ci", extract_faq_pairs(FAQ_TEXT, markdown=True))
+    return index
+
+class TestFaqExtraction:
+
+    def test_question_answer_lines_and_headings(self):
+        """Lignes Q:/R: (réponse sur plusieurs lignes) et titres Markdown en question"""
+        pairs = extract_faq_pairs(FAQ_TEXT, markdown=True)
+
+        assert [pair["question"] for pair in pairs] == [
+            "Comment ouvrir un compte Coris Money ?",
+            "Quels sont les frais de transfert ?",
+            "Comment consulter mon solde ?",
+        ]
+        assert pairs[0]["answer"] == "Rendez-vous en agence avec votre pièce d'identité. Un SMS confirme l'ouverture."
+        assert pairs[2]["heading_path"] == "FAQ Coris Money > Comment consulter mon solde ?"
+
+    def test_plain_text_ignores_headings(self):
+        pairs = extract_faq_pairs(FAQ_TEXT)
+
+        assert len(pairs) == 2
+
+@pytest.mark.asyncio
+class TestFaqIndex:
+
+    async def test_exact_lookup_ignores_case_accents_punctuation(self, faq_index):
+        match = faq_index.lookup("coris_money", "coris_ci", "quels sont les FRAIS de transfert")
+
+        assert match["match"] == "exact"
+        assert match["answer"].startswith("1% du montant")
+
+    async def test_near_exact_lookup(self, faq_index):
+        """Formules de politesse et articles ignorés"""
+        match = faq_index.lookup("coris_money", "coris_ci", "Bonjour, comment consulter le mon solde ? Merci")
+
+        assert match["match"] == "near_exact"
+        assert match["question"] == "Comment consulter mon solde ?"
+
+    async def test_near_exact_keeps_transfer_direction(self, tmp_path):
+        """Une question au sens de transfert inversé n'est pas la même question"""
+        index = FaqIndex(directory=str(tmp_path), embedding_manager=KeywordEmbeddings(), semantic_threshold=0.99)
+        await index.build("coris_money", "coris_ci", [
+            {"question": "Comment transférer d'Orange Money vers Coris Money ?", "answer": "Depuis Orange Money."},
+            {"question": "Comment envoyer de l'argent au Mali depuis le Sénégal ?", "answer": "Depuis le Sénégal."}
+        ])
+
+        assert index.lookup("coris_money", "coris_ci", "Comment transférer de Coris Money vers Orange Money ?") is None
+        assert index.lookup("coris_money", "coris_ci", "Comment envoyer de l'argent au Sénégal depuis le Mali ?") is None
+        match = index.lookup("coris_money", "coris_ci", "Bonjour, comment transférer d'Orange Money vers Coris Money svp")
+        assert match["match"] == "near_exact"
+
+    async def test_semantic_lookup_with_query_embedding(self, faq_index):
+        embedding = KeywordEmbeddings().vectorize("je veux ouvrir un compte")
+
+        match = faq_index.lookup_embedding("coris_money", "coris_ci", embedding)
+
+        assert match["match"] == "semantic"
+        assert match["question"] == "Comment ouvrir un compte Coris Money ?"
+        assert faq_index.lookup("coris_money", "coris_ci", "je veux ouvrir un compte") is None
+
+    async def test_common_index_fallback_and_exclusions(self, faq_index):
+        """La FAQ commune complète celle de la filiale, sauf fichiers remplacés"""
+        await faq_index.build("coris_money", "common", [
+            {"question": "Où trouver une agence ?", "answer": "Sur coris.example", "source_file": "faq.md"}
+        ])
+
+        assert faq_index.lookup("coris_money", "coris_ci", "où trouver une agence")["scope"] == "common"
+        assert faq_index.lookup("coris_money", "coris_ci", "où trouver une agence", {"faq.md"}) is None
+
+    async def test_rebuild_reloaded_by_other_instance(self, faq_index, tmp_path):
+        reader = FaqIndex(directory=str(tmp_path), embedding_manager=KeywordEmbeddings())
+        assert reader.lookup("coris_money", "coris_ci", "Comment consulter mon solde ?")
+
+        await faq_index.build("coris_money", "coris_ci", [
+            {"question": "Comment consulter mon solde ?", "answer": "Via l'application mobile."}
+        ])
+
+        assert reader.lookup("coris_money", "coris_ci", "Comment consulter mon solde ?")["answer"] == "Via l'application mobile."
+
+    async def test_document_processor_extract_faq(self, tmp_path):
+        path = tmp_path / "faq.md"
+        path.write_text(FAQ_TEXT, encoding="utf-8")
+
+        pairs = await DocumentProcessor().extract_faq(str(path))
+
+        assert len(pairs) == 3
+        assert all(pair["source_file"] == "faq.md" for pair in pairs)
+
+if __name__ == "__main__":
+    pytest.main([__file__])
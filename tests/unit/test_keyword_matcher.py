@@ -0,0 +1,121 @@
+"""
+Tests unitaires pour les mots-clés compilés de l'escalade
+"""
+import os
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent / "src"))
+
+from core.escalation.keyword_matcher import KeywordMatcher, KeywordRuleRegistry, fold_text
+from core.escalation.detector import EscalationDetector
+from core.escalation.router import EscalationRouter
+
+class TestKeywordMatcher:
+
+    def test_accent_and_case_insensitive(self):
+        matcher = KeywordMatcher({"reclamations": ["réclamation"], "urgent": ["bloqué"]})
+
+        assert matcher.match("Je fais une RECLAMATION, mon compte est bloque") == {
+            "reclamations": ["réclamation"],
+            "urgent": ["bloqué"],
+        }
+
+    def test_all_hits_in_one_pass_including_overlaps(self):
+        """Un mot-clé trouvé implique ses préfixes, y compris d'autres catégories"""
+        matcher = KeywordMatcher({
+            "reclamations": ["problème", "erreur"],
+            "technique": ["problème technique", "erreur"],
+        })
+
+        assert matcher.match("Problème technique : erreur 500") == {
+            "technique": ["problème technique", "erreur"],
+            "reclamations": ["problème", "erreur"],
+        }
+
+    def test_keywords_match_at_word_start_only(self):
+        matcher = KeywordMatcher({"urgent": ["bloqué", "immédiat"]})
+
+        assert matcher.match("compte débloqué") == {}
+        assert matcher.match("répondez immédiatement") == {"urgent": ["immédiat"]}
+
+    def test_fold_text(self):
+        assert fold_text("  L’Agence   Élevée ") == "l'agence elevee"
+
+class TestKeywordRuleRegistry:
+
+    @pytest.fixture
+    def registry(self, tmp_path):
+        defaults = tmp_path / "keyword_rules.yaml"
+        defaults.write_text("escalation:\n  urgent_keywords: [urgent, bloqué]\n", encoding="utf-8")
+        (tmp_path / "coris_money" / "config" / "keyword_rules").mkdir(parents=True)
+        return KeywordRuleRegistry(defaults_path=defaults, applications_dir=tmp_path, reload_seconds=0)
+
+    def write_filiale_rules(self, tmp_path, content):
+        path = tmp_path / "coris_money" / "config" / "keyword_rules" / "coris_ci.yaml"
+        path.write_text(content, encoding="utf-8")
+        # Horodatage distinct même sur un système de fichiers à faible résolution
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    def test_filiale_add_and_remove(self, registry, tmp_path):
+        self.write_filiale_rules(tmp_path, "add:\n  escalation:\n    urgent_keywords: [fraude]\n"
+                                           "remove:\n  escalation:\n    urgent_keywords: [bloque]\n")
+
+        assert registry.get_matcher("escalation", "coris_ci").rules == {"urgent_keywords": ["urgent", "fraude"]}
+        assert registry.get_matcher("escalation", "coris_bf").rules == {"urgent_keywords": ["urgent", "bloqué"]}
+
+    def test_hot_reload_keeps_last_valid_rules(self, registry, tmp_path):
+        self.write_filiale_rules(tmp_path, "add:\n  escalation:\n    urgent_keywords: [fraude]\n")
+        assert registry.get_matcher("escalation", "coris_ci").match("fraude")
+
+        self.write_filiale_rules(tmp_path, "add:\n  escalation:\n    urgent_keywords: [arnaque]\n")
+        assert registry.get_matcher("escalation", "coris_ci").match("arnaque")
+        assert not registry.get_matcher("escalation", "coris_ci").match("fraude")
+
+        self.write_filiale_rules(tmp_path, "add: [invalide\n")
+        assert registry.get_matcher("escalation", "coris_ci").match("arnaque")
+
+class TestEscalationKeywords:
+
+    def test_detector_uses_filiale_rules(self, tmp_path):
+        defaults = tmp_path / "keyword_rules.yaml"
+        defaults.write_text("escalation:\n  urgent_keywords: [urgent]\n", encoding="utf-8")
+        rules_dir = tmp_path / "coris_money" / "config" / "keyword_rules"
+        rules_dir.mkdir(parents=True)
+        (rules_dir / "coris_ci.yaml").write_text("add:\n  escalation:\n    urgent_keywords: [arnaque]\n", encoding="utf-8")
+        detector = EscalationDetector(keyword_registry=KeywordRuleRegistry(defaults, tmp_path))
+
+        assert detector.should_escalate({"user_message": "C'est une arnaque", "filiale_id": "coris_ci"}) == (
+            True, "urgent_keywords(arnaque)"
+        )
+        assert detector.should_escalate({"user_message": "C'est une arnaque", "filiale_id": "coris_bf"})[0] is False
+
+    def test_expertise_with_most_hits_wins(self):
+        router = EscalationRouter()
+
+        expertise = router._extract_required_expertise({
+            "reason": "problème transfert",
+            "user_message": "mon transfert est bloqué"
+        })
+
+        assert expertise == "operations"
+
+    def test_expertise_ties_keep_rule_order(self):
+        """À égalité de mots-clés, la première expertise des règles l'emporte"""
+        router = EscalationRouter()
+
+        # "erreur" appartient à reclamations et à technique
+        assert router._extract_required_expertise({"reason": "erreur", "user_message": ""}) == "reclamations"
+        # Un mot-clé de chaque : même résultat que la règle du premier trouvé
+        assert router._extract_required_expertise({
+            "reason": "bug", "user_message": "réclamation"
+        }) == "reclamations"
+        # Un mot-clé technique de plus départage
+        assert router._extract_required_expertise({
+            "reason": "bug de l'app", "user_message": "erreur"
+        }) == "technique"
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,47 @@
+"""
+Tests unitaires pour le détecteur de langue par trigrammes
+"""
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent / "src"))
+
+from core.knowledge_base.language_detector import LanguageDetector, text_trigrams
+from core.knowledge_base.document_processor import DocumentProcessor
+
+class TestLanguageDetector:
+
+    def test_trigrams_ignore_digits_and_punctuation(self):
+        assert text_trigrams("Le 12/05 !") == [" le", "le "]
+
+    def test_detect_batch(self):
+        """fr, en et langues locales dans un même lot"""
+        detector = LanguageDetector()
+
+        languages = detector.detect_batch([
+            "Comment envoyer de l'argent à ma mère ?",
+            "Where is my money?",
+            "Dama bëgg yónnee xaalis",
+            "N b'a fɛ ka wari ci",
+        ])
+
+        assert languages == ["fr", "en", "wo", "bm"]
+
+    def test_short_or_ambiguous_text_uses_default(self):
+        detector = LanguageDetector()
+
+        assert detector.detect_batch(["ok", "", "123456"], default="fr") == ["fr", "fr", "fr"]
+
+    def test_batch_matches_single_detection(self):
+        detector = LanguageDetector()
+        texts = ["Bonjour", "", "Thank you very much", "Jërëjëf", "Mon solde svp"]
+
+        assert detector.detect_batch(texts) == [detector.detect(text) for text in texts]
+
+    def test_common_words_inside_other_words_ignored(self):
+        """'le' dans 'hello' ne rend plus un texte anglais français"""
+        assert DocumentProcessor()._detect_language("Hello, please tell me my balance") == "en"
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,92 @@
+"""
+Tests unitaires pour le découpage Markdown par sections
+"""
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent / "src"))
+
+from core.knowledge_base.markdown_sections import parse_markdown_sections, chunk_markdown_sections
+from core.knowledge_base.document_processor import DocumentProcessor
+
+FAQ_MARKDOWN = """# FAQ Coris Money
+
+Questions fréquentes des clients.
+
+## Comptes
+
+### Comment ouvrir un compte ?
+Rendez-vous en **agence** avec votre [pièce d'identité](https://coris.example/cni).
+
+### Comment consulter mon solde ?
+Composez le `#144#` depuis votre mobile.
+
+```
+# Ceci n'est pas un titre
+```
+
+Tarifs
+------
+- Transfert national : 1%
+"""
+
+class TestMarkdownSections:
+
+    def test_heading_paths(self):
+        """Chaque section connaît le chemin de ses titres parents"""
+        sections = parse_markdown_sections(FAQ_MARKDOWN)
+
+        assert [section["heading_path"] for section in sections] == [
+            ["FAQ Coris Money"],
+            ["FAQ Coris Money", "Comptes"],
+            ["FAQ Coris Money", "Comptes", "Comment ouvrir un compte ?"],
+            ["FAQ Coris Money", "Comptes", "Comment consulter mon solde ?"],
+            ["FAQ Coris Money", "Tarifs"],
+        ]
+
+    def test_inline_markdown_removed_and_code_headings_ignored(self):
+        sections = parse_markdown_sections(FAQ_MARKDOWN)
+
+        assert sections[2]["content"] == "Rendez-vous en agence avec votre pièce d'identité."
+        assert "# Ceci n'est pas un titre" in sections[3]["content"]
+
+    def test_section_aligned_chunks(self):
+        """Un chunk par section avec contenu, préfixé par le chemin de titres"""
+        chunks = chunk_markdown_sections(parse_markdown_sections(FAQ_MARKDOWN))
+
+        assert len(chunks) == 4
+        assert chunks[1]["heading_path"] == "FAQ Coris Money > Comptes > Comment ouvrir un compte ?"
+        assert chunks[1]["content"].startswith("FAQ Coris Money > Comptes > Comment ouvrir un compte ?\n\n")
+        assert chunks[1]["section_level"] == 3
+
+    def test_long_section_split_on_paragraphs(self):
+        paragraphs = [f"Étape {i} : " + "vérifier les informations du client. " * 8 for i in range(10)]
+        markdown_text = "## Procédure\n\n" + "\n\n".join(paragraphs)
+
+        chunks = chunk_markdown_sections(parse_markdown_sections(markdown_text), max_chars=800)
+
+        assert len(chunks) > 1
+        assert all(len(chunk["content"]) <= 800 for chunk in chunks)
+        assert all(chunk["content"].startswith("Procédure\n\n") for chunk in chunks)
+        body = "".join(chunk["content"] for chunk in chunks)
+        assert all(paragraph.strip() in body for paragraph in paragraphs)
+
+@pytest.mark.asyncio
+class TestDocumentProcessorMarkdown:
+
+    async def test_process_markdown_file(self, tmp_path):
+        """Les fichiers .md sont segmentés par section avec le chemin de titres en métadonnée"""
+        path = tmp_path / "faq.md"
+        path.write_text(FAQ_MARKDOWN, encoding="utf-8")
+
+        documents = await DocumentProcessor().process_file(str(path), filiale_id="coris_ci", application="coris_money")
+
+        assert len(documents) == 4
+        metadata = documents[2]["metadata"]
+        assert metadata["heading_path"] == "FAQ Coris Money > Comptes > Comment consulter mon solde ?"
+        assert metadata["section_title"] == "Comment consulter mon solde ?"
+        assert metadata["chunk_count"] == 4
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,113 @@
+"""
+Tests unitaires pour le cache de résultats de la base de connaissances
+"""
+import pytest
+from unittest.mock import MagicMock, patch
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent / "src"))
+
+from core.knowledge_base.chroma_manager import MultiTenantChromaManager
+from core.knowledge_base.query_cache import QueryResultCache
+from core.knowledge_base.vector_store import NumpyVectorStore
+
+def keyword_embedding(texts):
+    """Embedding déterministe : présence de quelques mots-clés"""
+    vocabulary = ["solde", "transfert", "frais", "agence", "compte"]
+    return [[float(word in text.lower()) + 0.01 for word in vocabulary] for text in texts]
+
+@pytest.fixture
+async def manager(tmp_path):
+    """Gestionnaire NumPy dont les recherches dans l'index sont comptées"""
+    with patch.object(MultiTenantChromaManager, '_get_embedding_function', return_value=keyword_embedding):
+        store = NumpyVectorStore(persist_dir=str(tmp_path), embedding_function=keyword_embedding)
+        manager = MultiTenantChromaManager(vector_store=store)
+
+    await manager.add_documents(
+        "coris_money", "coris_ci",
+        documents=["Consulter son solde", "Frais de transfert"],
+        metadatas=[{"category": "faq"}, {"category": "tarifs"}],
+        ids=["doc1", "doc2"]
+    )
+    manager.index_calls = []
+    original_query = store.query
+    def counting_query(name, **kwargs):
+        manager.index_calls.append(kwargs.get("query_texts"))
+        return original_query(name, **kwargs)
+    store.query = counting_query
+    return manager
+
+@pytest.mark.asyncio
+class TestQueryResultCache:
+
+    async def test_identical_query_served_from_cache(self, manager):
+        """Une requête identique (casse, espaces) ne réinterroge pas l'index"""
+        first = await manager.query_documents("coris_money", "coris_ci", "Mon solde", n_results=1)
+        second = await manager.query_documents("coris_money", "coris_ci", "  mon   SOLDE ", n_results=1)
+
+        assert second == first
+        assert len(manager.index_calls) == 1
+        assert manager.query_cache.get_stats()["hit"] == 1
+
+    async def test_key_includes_n_results_and_filters(self, manager):
+        await manager.query_documents("coris_money", "coris_ci", "frais", n_results=1)
+        await manager.query_documents("coris_money", "coris_ci", "frais", n_results=2)
+        await manager.query_documents("coris_money", "coris_ci", "frais", n_results=1, category="faq")
+
+        assert len(manager.index_calls) == 3
+
+    async def test_add_documents_invalidates(self, manager):
+        """Une écriture change la génération : l'entrée en cache n'est plus servie"""
+        await manager.query_documents("coris_money", "coris_ci", "agence", n_results=1)
+        await manager.add_documents("coris_money", "coris_ci", ["Horaires des agences"], [{}], ["doc3"])
+
+        results = await manager.query_documents("coris_money", "coris_ci", "agence", n_results=1)
+
+        assert results["ids"] == [["doc3"]]
+        assert len(manager.index_calls) == 2
+
+    async def test_batch_only_searches_misses(self, manager):
+        await manager.query_documents("coris_money", "coris_ci", "mon solde", n_results=1)
+
+        results = await manager.query_documents_batch(
+            "coris_money", "coris_ci", ["mon solde", "frais de transfert"], n_results=1
+        )
+
+        assert [result["ids"] for result in results] == [[["doc1"]], [["doc2"]]]
+        assert manager.index_calls[-1] == ["frais de transfert"]
+
+    async def test_cached_results_are_copies(self, manager):
+        first = await manager.query_documents("coris_money", "coris_ci", "solde", n_results=1)
+        first["metadatas"][0][0]["category"] = "modifié"
+
+        second = await manager.query_documents("coris_money", "coris_ci", "solde", n_results=1)
+
+        assert second["metadatas"][0][0]["category"] == "faq"
+
+    async def test_faq_tool_shares_cache_across_calls(self, manager):
+        """L'outil FAQ réutilise le même gestionnaire, donc son cache"""
+        from tools.applications.coris_money import banking_apis
+
+        with patch.object(banking_apis, "_chroma_manager", manager), \
+             patch.object(banking_apis, "pack_manager", MagicMock()):
+            assert banking_apis.get_chroma_manager() is manager
+            first = await banking_apis.coris_faq_search("Mon solde", "coris_ci")
+            second = await banking_apis.coris_faq_search("mon solde", "coris_ci")
+
+        assert second == first
+        assert len(manager.index_calls) == 1
+
+    async def test_lru_eviction(self):
+        cache = QueryResultCache(max_entries=2, enabled=True)
+        for query in ["a", "b"]:
+            cache.put(cache.make_key("scope", query, 5, None), {"ids": [[query]]})
+        cache.get(cache.make_key("scope", "a", 5, None))
+        cache.put(cache.make_key("scope", "c", 5, None), {"ids": [["c"]]})
+
+        assert cache.get(cache.make_key("scope", "b", 5, None)) is None
+        assert cache.get(cache.make_key("scope", "a", 5, None)) == {"ids": [["a"]]}
+        assert cache.get_stats()["eviction"] == 1
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,104 @@
+"""
+Tests unitaires pour l'ingestion en flux des sources CSV / JSON
+"""
+import json
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent / "src"))
+
+from core.knowledge_base import record_stream
+from core.knowledge_base.record_stream import (
+    iter_csv_records, iter_json_records, iter_jsonl_records, group_records
+)
+from core.knowledge_base.document_processor import DocumentProcessor
+
+AGENCES = [
+    {"agence": f"Agence {i}", "ville": "Abidjan" if i % 2 else "Bouaké", "horaires": "8h-17h", "telephone": None}
+    for i in range(1, 31)
+]
+
+class TestRecordStream:
+
+    def test_csv_semicolon_export(self, tmp_path):
+        """Export Excel français : BOM et séparateur point-virgule"""
+        path = tmp_path / "tarifs.csv"
+        path.write_text("\ufeffoperation;frais\nTransfert national;1%\nRetrait;\n", encoding="utf-8")
+
+        assert list(iter_csv_records(path)) == [
+            (1, "operation: Transfert national, frais: 1%"),
+            (2, "operation: Retrait"),
+        ]
+
+    def test_json_array_read_in_small_blocks(self, tmp_path, monkeypatch):
+        """Les enregistrements coupés entre deux blocs de lecture sont reconstitués"""
+        monkeypatch.setattr(record_stream, "READ_SIZE", 7)
+        path = tmp_path / "agences.json"
+        path.write_text(json.dumps(AGENCES + [12345678]), encoding="utf-8")
+
+        records = list(iter_json_records(path))
+
+        assert len(records) == 31
+        assert records[0] == (1, "agence: Agence 1, ville: Abidjan, horaires: 8h-17h")
+        assert records[-1] == (31, "12345678")
+
+    def test_json_object_members_and_nested_arrays(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(record_stream, "READ_SIZE", 5)
+        path = tmp_path / "reseau.json"
+        path.write_text(json.dumps({"pays": "CI", "agences": AGENCES[:2], "vide": []}), encoding="utf-8")
+
+        assert [text for _, text in iter_json_records(path)] == [
+            "pays: CI",
+            "agences: agence: Agence 1, ville: Abidjan, horaires: 8h-17h",
+            "agences: agence: Agence 2, ville: Bouaké, horaires: 8h-17h",
+        ]
+
+    def test_jsonl(self, tmp_path):
+        path = tmp_path / "agences.jsonl"
+        path.write_text("\n".join(json.dumps(agence) for agence in AGENCES[:3]) + "\n\n", encoding="utf-8")
+
+        assert [number for number, _ in iter_jsonl_records(path)] == [1, 2, 3]
+
+    def test_group_records_keeps_rows_whole(self):
+        records = [(i, f"ligne {i} " + "x" * 40) for i in range(1, 11)]
+
+        chunks = list(group_records(iter(records), max_chars=100))
+
+        assert [(start, end) for _, start, end in chunks] == [(1, 2), (3, 4), (5, 6), (7, 8), (9, 10)]
+        assert all(len(text) <= 100 for text, _, _ in chunks)
+
+@pytest.mark.asyncio
+class TestStreamingIngestion:
+
+    async def test_iter_documents_batches_with_row_ranges(self, tmp_path):
+        path = tmp_path / "agences.csv"
+        path.write_text("agence,ville\n" + "\n".join(f"Agence {i},Abidjan" for i in range(1, 201)), encoding="utf-8")
+        processor = DocumentProcessor()
+        processor.chunk_size = 200
+
+        batches = [batch async for batch in processor.iter_documents(
+            str(path), filiale_id="coris_ci", application="coris_money", batch_size=4
+        )]
+
+        documents = [document for batch in batches for document in batch]
+        assert all(len(batch) <= 4 for batch in batches)
+        assert documents[0]["metadata"]["row_start"] == 1
+        assert documents[-1]["metadata"]["row_end"] == 200
+        assert all(
+            previous["metadata"]["row_end"] + 1 == current["metadata"]["row_start"]
+            for previous, current in zip(documents, documents[1:])
+        )
+
+    async def test_process_file_collects_streamed_chunks(self, tmp_path):
+        path = tmp_path / "agences.json"
+        path.write_text(json.dumps(AGENCES), encoding="utf-8")
+
+        documents = await DocumentProcessor().process_file(str(path), filiale_id="coris_ci", application="coris_money")
+
+        assert documents
+        assert documents[0]["metadata"]["chunk_count"] == len(documents)
+        assert "Agence 30" in documents[-1]["content"]
+
+if __name__ == "__main__":
+    pytest.main([__file__])
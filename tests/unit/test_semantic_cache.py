@@ -0,0 +1,143 @@
+"""
+Tests unitaires pour le cache sémantique des réponses
+"""
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent / "src"))
+
+from core.knowledge_base.semantic_cache import SemanticResponseCache
+
+class FakeEmbeddingManager:
+    """Embeddings déterministes à partir d'une table de vecteurs"""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+        self.calls = 0
+
+    async def embed_query(self, query):
+        self.calls += 1
+        return self.vectors[query]
+
+    def is_deterministic(self):
+        return True
+
+@pytest.mark.asyncio
+class TestSemanticResponseCache:
+
+    @pytest.fixture
+    def state(self):
+        return {"pack": "coris_basic", "kb_version": "v1"}
+
+    @pytest.fixture
+    def cache(self, state):
+        """Fixture pour le cache avec des fournisseurs contrôlés"""
+        vectors = {
+            "comment consulter mon solde": [1.0, 0.0, 0.0],
+            "comment consulter mon solde ?": [0.99, 0.05, 0.0],
+            "frais de transfert": [0.0, 1.0, 0.0]
+        }
+        return SemanticResponseCache(
+            embedding_manager=FakeEmbeddingManager(vectors),
+            kb_version_provider=lambda application, filiale_id: state["kb_version"],
+            pack_provider=lambda filiale_id, application: state["pack"],
+            config_provider=lambda filiale_id, application: {},
+            default_threshold=0.9
+        )
+
+    async def test_hit_for_similar_question(self, cache):
+        """Une question proche sert la réponse en cache"""
+        await cache.store("coris_money", "coris_ci", "comment consulter mon solde", "Composez #144#")
+
+        result = await cache.lookup("coris_money", "coris_ci", "comment consulter mon solde ?")
+
+        assert result["hit"] is True
+        assert result["answer"] == "Composez #144#"
+        assert result["similarity"] > 0.9
+
+    async def test_miss_for_different_question(self, cache):
+        """Une question différente ne sert pas la réponse"""
+        await cache.store("coris_money", "coris_ci", "comment consulter mon solde", "Composez #144#")
+
+        result = await cache.lookup("coris_money", "coris_ci", "frais de transfert")
+
+        assert result["hit"] is False
+        assert cache.get_stats()["by_filiale"]["coris_ci"]["miss"] == 1
+
+    async def test_scoped_by_filiale(self, cache):
+        """Les réponses d'une filiale ne sont pas servies à une autre"""
+        await cache.store("coris_money", "coris_ci", "comment consulter mon solde", "Composez #144#")
+
+        result = await cache.lookup("coris_money", "coris_bf", "comment consulter mon solde")
+
+        assert result["hit"] is False
+
+    async def test_user_answers_not_shared(self, cache):
+        """Une réponse enregistrée pour un utilisateur n'est servie qu'à lui"""
+        await cache.store("coris_money", "coris_ci", "comment consulter mon solde", "Votre solde : 12 500 FCFA",
+                          user_id="user_1")
+
+        other = await cache.lookup("coris_money", "coris_ci", "comment consulter mon solde", user_id="user_2")
+        anonymous = await cache.lookup("coris_money", "coris_ci", "comment consulter mon solde")
+        owner = await cache.lookup("coris_money", "coris_ci", "comment consulter mon solde", user_id="user_1")
+
+        assert other["hit"] is False
+        assert anonymous["hit"] is False
+        assert owner["answer"] == "Votre solde : 12 500 FCFA"
+
+    async def test_shared_answers_served_to_every_user(self, cache):
+        """Une réponse FAQ/KB (sans user_id) est partagée par la filiale"""
+        await cache.store("coris_money", "coris_ci", "comment consulter mon solde", "Composez #144#")
+
+        result = await cache.lookup("coris_money", "coris_ci", "comment consulter mon solde", user_id="user_2")
+
+        assert result["answer"] == "Composez #144#"
+
+    async def test_invalidate_filiale_drops_user_answers(self, cache):
+        await cache.store("coris_money", "coris_ci", "frais de transfert", "500 FCFA", user_id="user_1")
+        cache.invalidate("coris_money", "coris_ci")
+
+        result = await cache.lookup("coris_money", "coris_ci", "frais de transfert", user_id="user_1")
+
+        assert result["hit"] is False
+
+    async def test_invalidated_on_kb_version_change(self, cache, state):
+        """Une nouvelle version de KB invalide les réponses"""
+        await cache.store("coris_money", "coris_ci", "comment consulter mon solde", "Composez #144#")
+        state["kb_version"] = "v2"
+
+        result = await cache.lookup("coris_money", "coris_ci", "comment consulter mon solde")
+
+        assert result["hit"] is False
+
+    async def test_invalidated_on_pack_change(self, cache, state):
+        """Un changement de pack invalide les réponses"""
+        await cache.store("coris_money", "coris_ci", "comment consulter mon solde", "Composez #144#")
+        state["pack"] = "coris_premium"
+
+        result = await cache.lookup("coris_money", "coris_ci", "comment consulter mon solde")
+
+        assert result["hit"] is False
+
+    async def test_reuses_lookup_embedding(self, cache):
+        """L'embedding calculé au lookup est réutilisé au store"""
+        lookup = await cache.lookup("coris_money", "coris_ci", "frais de transfert")
+        await cache.store("coris_money", "coris_ci", "frais de transfert", "500 FCFA",
+                          embedding=lookup["embedding"])
+
+        assert cache.embedding_manager.calls == 1
+
+    async def test_latency_saved_is_measured(self, cache):
+        """Le temps économisé est estimé à partir du temps de traitement du crew"""
+        await cache.store("coris_money", "coris_ci", "comment consulter mon solde", "Composez #144#",
+                          processing_seconds=2.0)
+        await cache.lookup("coris_money", "coris_ci", "comment consulter mon solde")
+
+        stats = cache.get_stats()["by_filiale"]["coris_ci"]
+        assert stats["hit"] == 1
+        assert stats["hit_rate"] == 1.0
+        assert stats["latency_saved_seconds"] > 1.9
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,187 @@
+"""
+Tests unitaires pour la roue temporelle et la détection des dépassements de SLA
+"""
+import math
+import random
+import pytest
+import sys
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, patch
+
+sys.path.append(str(Path(__file__).parent.parent.parent / "src"))
+
+from core.escalation.sla_monitor import SlaMonitor
+from core.escalation.timing_wheel import HierarchicalTimingWheel
+
+NOW = datetime(2024, 1, 1, 10, 0, 0, tzinfo=timezone.utc)
+
+class TestHierarchicalTimingWheel:
+
+    def test_expires_on_time_across_levels(self):
+        rng = random.Random(7)
+        start = 1_000_000
+        wheel = HierarchicalTimingWheel(tick_seconds=1, wheel_size=8, levels=3, start_time=start)
+        # 8 x 8 x 8 ticks par tour complet : certaines échéances dépassent la roue
+        expected = {}
+        for key in range(2000):
+            expires_at = start + rng.uniform(0, 1500)
+            wheel.schedule(key, expires_at, key)
+            expected[key] = max(math.ceil(expires_at), start + 1)
+        for key in rng.sample(range(2000), 500):
+            assert wheel.cancel(key)
+            del expected[key]
+
+        fired = {}
+        now = start
+        while now < start + 1600:
+            now += rng.uniform(0.5, 5)
+            for key, payload in wheel.advance(now):
+                assert payload == key
+                fired[key] = math.floor(now)
+
+        assert fired.keys() == expected.keys()
+        assert all(expected[key] <= fired[key] for key in fired)
+        assert len(wheel) == 0
+
+    def test_expires_within_one_tick(self):
+        wheel = HierarchicalTimingWheel(tick_seconds=1, wheel_size=4, levels=3, start_time=0)
+        wheel.schedule("a", 37.2)
+        assert wheel.advance(37.9) == []
+        assert wheel.advance(38.0) == [("a", None)]
+
+    def test_reschedule_and_cancel(self):
+        wheel = HierarchicalTimingWheel(tick_seconds=1, wheel_size=4, levels=2, start_time=0)
+        wheel.schedule("a", 5)
+        wheel.schedule("a", 50)
+        assert len(wheel) == 1 and wheel.expires_at("a") == 50
+        assert wheel.advance(10) == []
+        assert wheel.cancel("a") and not wheel.cancel("a")
+        assert wheel.advance(60) == []
+
+    def test_past_deadline_expires_next_tick(self):
+        wheel = HierarchicalTimingWheel(tick_seconds=1, start_time=100)
+        wheel.schedule("late", 10)
+        assert wheel.advance(101) == [("late", None)]
+
+class EscalationsTable:
+    """Tables escalations et escalation_sla_breaches en mémoire"""
+
+    def __init__(self):
+        self.open = {}
+        self.breaches = set()
+
+    async def fetch(self, query, *args):
+        if "INSERT INTO escalation_sla_breaches" in query:
+            escalation_ids, _ = args
+            recorded = [escalation_id for escalation_id in escalation_ids
+                        if escalation_id in self.open and escalation_id not in self.breaches]
+            self.breaches.update(recorded)
+            return [{"escalation_id": escalation_id} for escalation_id in recorded]
+        return [row for escalation_id, row in self.open.items() if escalation_id not in self.breaches]
+
+def fake_db(table):
+    @asynccontextmanager
+    async def connection():
+        yield table
+
+    db = MagicMock()
+    db.get_conversations_connection = connection
+    return db
+
+def escalation_row(escalation_id, pack_level, minutes_ago, priority="medium"):
+    return {"id": escalation_id, "conversation_id": f"conv-{escalation_id}", "priority": priority,
+            "escalated_at": NOW - timedelta(minutes=minutes_ago), "pack_level": pack_level,
+            "filiale_id": "coris_ci"}
+
+@pytest.fixture
+def alerts():
+    manager = MagicMock()
+    manager.send_alerts = AsyncMock(return_value=0)
+    with patch("core.escalation.sla_monitor.alert_manager", manager):
+        yield manager
+
+class TestSlaMonitor:
+
+    @pytest.mark.asyncio
+    async def test_breach_alerted_once_per_open_escalation(self, alerts):
+        table = EscalationsTable()
+        monitor = SlaMonitor(tick_seconds=1, resync_seconds=60)
+        monitor.wheel = HierarchicalTimingWheel(start_time=NOW.timestamp())
+        breached = []
+        monitor.add_breach_listener(breached.append)
+
+        table.open["premium"] = escalation_row("premium", "coris_premium", 0, "urgent")
+        monitor.schedule("premium", NOW, "coris_premium", "urgent", "conv-premium", "coris_ci")
+        monitor.schedule("basic", NOW, "coris_basic")
+
+        with patch("core.escalation.sla_monitor.db_manager", fake_db(table)):
+            assert await monitor.process_expired(NOW.timestamp() + 29 * 60) == 0
+            assert await monitor.process_expired(NOW.timestamp() + 31 * 60) == 1
+            # Escalade déjà close : pas de dépassement
+            assert await monitor.process_expired(NOW.timestamp() + 121 * 60) == 0
+
+        assert [info["escalation_id"] for info in breached] == ["premium"]
+        alert = alerts.send_alerts.await_args_list[0].args[0][0]
+        assert alert["alert_type"] == "escalation_sla_breach"
+        assert alert["severity"] == "critical"
+        assert alert["details"]["sla_minutes"] == 30
+        assert len(monitor) == 0
+
+    @pytest.mark.asyncio
+    async def test_resolved_escalation_is_not_alerted(self, alerts):
+        table = EscalationsTable()
+        monitor = SlaMonitor(tick_seconds=1, resync_seconds=60)
+        monitor.wheel = HierarchicalTimingWheel(start_time=NOW.timestamp())
+        table.open["esc_1"] = escalation_row("esc_1", "coris_advanced", 0)
+        monitor.schedule("esc_1", NOW, "coris_advanced")
+
+        assert monitor.cancel("esc_1") is True
+        with patch("core.escalation.sla_monitor.db_manager", fake_db(table)):
+            assert await monitor.process_expired(NOW.timestamp() + 2 * 3600) == 0
+
+        assert table.breaches == set()
+        assert monitor.get_stats()["cancelled"] == 1
+
+    @pytest.mark.asyncio
+    async def test_rebuild_after_restart(self, alerts):
+        table = EscalationsTable()
+        table.open["overdue"] = escalation_row("overdue", "coris_premium", 45)
+        table.open["pending"] = escalation_row("pending", "coris_basic", 45)
+        monitor = SlaMonitor(tick_seconds=1, resync_seconds=60)
+        monitor.wheel = HierarchicalTimingWheel(start_time=NOW.timestamp())
+
+        with patch("core.escalation.sla_monitor.db_manager", fake_db(table)):
+            await monitor.rebuild()
+            assert len(monitor) == 2
+            # Échéance dépassée pendant l'arrêt : signalée au tick suivant
+            assert await monitor.process_expired(NOW.timestamp() + 1) == 1
+            assert monitor.wheel.expires_at("pending") == (NOW + timedelta(minutes=75)).timestamp()
+
+            # Résolue par un autre processus : oubliée à la resynchronisation
+            del table.open["pending"]
+            await monitor.rebuild()
+
+        assert len(monitor) == 0
+        assert table.breaches == {"overdue"}
+
+    @pytest.mark.asyncio
+    async def test_unrecorded_breach_retried_after_resync(self, alerts):
+        table = EscalationsTable()
+        table.open["esc_1"] = escalation_row("esc_1", "coris_premium", 0)
+        monitor = SlaMonitor(tick_seconds=1, resync_seconds=60)
+        monitor.wheel = HierarchicalTimingWheel(start_time=NOW.timestamp())
+        monitor.schedule("esc_1", NOW, "coris_premium")
+
+        failing_db = MagicMock()
+        failing_db.get_conversations_connection = MagicMock(side_effect=ConnectionError("db down"))
+        with patch("core.escalation.sla_monitor.db_manager", failing_db):
+            assert await monitor.process_expired(NOW.timestamp() + 31 * 60) == 0
+
+        with patch("core.escalation.sla_monitor.db_manager", fake_db(table)):
+            await monitor.rebuild()
+            assert await monitor.process_expired(NOW.timestamp() + 32 * 60) == 1
+
+if __name__ == "__main__":
+    pytest.main([__file__])
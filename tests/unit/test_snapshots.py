@@ -0,0 +1,135 @@
+"""
+Tests unitaires pour les snapshots de la base de connaissances
+"""
+import pytest
+import zipfile
+from unittest.mock import patch
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent / "src"))
+
+from core.knowledge_base.chroma_manager import MultiTenantChromaManager
+from core.knowledge_base.vector_store import NumpyVectorStore, ChromaVectorStore
+from core.knowledge_base.snapshots import SnapshotError, load_snapshot, read_snapshot_manifest
+
+def keyword_embedding(texts):
+    """Embedding déterministe : présence de quelques mots-clés"""
+    vocabulary = ["solde", "transfert", "frais", "agence", "compte"]
+    return [[float(word in text.lower()) + 0.01 for word in vocabulary] for text in texts]
+
+def make_manager(persist_dir, embedding_function=keyword_embedding):
+    with patch.object(MultiTenantChromaManager, '_get_embedding_function', return_value=embedding_function):
+        store = NumpyVectorStore(persist_dir=str(persist_dir), embedding_function=embedding_function)
+        return MultiTenantChromaManager(vector_store=store)
+
+class KeywordEmbeddingFunction:
+    """keyword_embedding avec la signature attendue par ChromaDB"""
+
+    def __call__(self, input):
+        return keyword_embedding(input)
+
+def make_chroma_manager(persist_dir):
+    with patch.object(MultiTenantChromaManager, '_get_embedding_function', return_value=keyword_embedding):
+        store = ChromaVectorStore(persist_dir=str(persist_dir), embedding_function=KeywordEmbeddingFunction())
+        return MultiTenantChromaManager(vector_store=store)
+
+@pytest.fixture
+async def source(tmp_path):
+    """Gestionnaire avec une collection chargée"""
+    manager = make_manager(tmp_path / "source")
+    await manager.add_documents(
+        "coris_money", "coris_ci",
+        documents=["Consulter son solde", "Frais de transfert", "Horaires des agences"],
+        metadatas=[{"category": "faq"}, {"category": "tarifs"}, {"category": "faq"}],
+        ids=["doc1", "doc2", "doc3"]
+    )
+    return manager
+
+@pytest.mark.asyncio
+class TestKnowledgeBaseSnapshots:
+
+    async def test_roundtrip_without_embedding_calls(self, source, tmp_path):
+        """Un pod restaure la collection sans appeler la fonction d'embedding des documents"""
+        snapshot_path = tmp_path / "coris_money_coris_ci.kbsnap"
+        manifest = source.export_snapshot("coris_money", "coris_ci", str(snapshot_path))
+
+        calls = []
+        def counting_embedding(texts):
+            calls.append(list(texts))
+            return keyword_embedding(texts)
+
+        target = make_manager(tmp_path / "target", counting_embedding)
+        target.import_snapshot(str(snapshot_path))
+
+        assert manifest["count"] == 3
+        assert calls == []
+        assert target.get_kb_version("coris_money", "coris_ci") == source.get_kb_version("coris_money", "coris_ci")
+
+        results = await target.query_documents("coris_money", "coris_ci", "frais", n_results=1, category="tarifs")
+        assert results["ids"] == [["doc2"]]
+        assert results["metadatas"][0][0]["filiale_id"] == "coris_ci"
+
+    async def test_corrupted_snapshot_rejected(self, source, tmp_path):
+        """Une modification du contenu est détectée par la somme de contrôle"""
+        snapshot_path = tmp_path / "snapshot.kbsnap"
+        source.export_snapshot("coris_money", "coris_ci", str(snapshot_path))
+
+        tampered_path = tmp_path / "tampered.kbsnap"
+        with zipfile.ZipFile(snapshot_path) as original, zipfile.ZipFile(tampered_path, "w") as tampered:
+            for item in original.infolist():
+                data = original.read(item.filename)
+                if item.filename == "records.json":
+                    data = data.replace(b"Consulter", b"Supprimer")
+                tampered.writestr(item, data)
+
+        with pytest.raises(SnapshotError):
+            load_snapshot(str(tampered_path))
+
+    async def test_embedding_model_mismatch_rejected(self, source, tmp_path):
+        """Un snapshot d'un autre modèle d'embedding n'est pas chargé"""
+        snapshot_path = tmp_path / "snapshot.kbsnap"
+        source.export_snapshot("coris_money", "coris_ci", str(snapshot_path))
+
+        assert read_snapshot_manifest(str(snapshot_path))["embedding_model"] == source.embedding_model
+        with pytest.raises(SnapshotError):
+            load_snapshot(str(snapshot_path), expected_embedding_model="text-embedding-3-large")
+
+    async def test_load_snapshots_skips_up_to_date_collections(self, source, tmp_path):
+        """Au démarrage, seules les collections absentes ou périmées sont importées"""
+        snapshot_dir = tmp_path / "snapshots"
+        source.export_snapshot("coris_money", "coris_ci", str(snapshot_dir / "coris_money_coris_ci.kbsnap"))
+
+        target = make_manager(tmp_path / "target")
+
+        assert target.load_snapshots(str(snapshot_dir)) == ["coris_money_coris_ci"]
+        assert target.load_snapshots(str(snapshot_dir)) == []
+        assert target.get_collection_stats("coris_money", "coris_ci")["count"] == 3
+
+    async def test_chroma_roundtrip_keeps_distance_space(self, tmp_path):
+        """La collection importée garde l'espace de distance configuré (cosinus)"""
+        pytest.importorskip("chromadb")
+        index_config = {"space": "cosine", "M": 16}
+        snapshot_path = tmp_path / "coris_money_coris_ci.kbsnap"
+
+        source = make_chroma_manager(tmp_path / "source")
+        with patch.object(source, '_load_index_config', return_value=index_config):
+            await source.add_documents(
+                "coris_money", "coris_ci",
+                documents=["Consulter son solde", "Frais de transfert"], metadatas=[{}, {}], ids=["doc1", "doc2"]
+            )
+        expected = await source.query_documents("coris_money", "coris_ci", "solde et frais", n_results=2)
+        source.export_snapshot("coris_money", "coris_ci", str(snapshot_path))
+
+        target = make_chroma_manager(tmp_path / "target")
+        with patch.object(target, '_load_index_config', return_value=index_config):
+            target.import_snapshot(str(snapshot_path))
+            results = await target.query_documents("coris_money", "coris_ci", "solde et frais", n_results=2)
+            stats = target.get_collection_stats("coris_money", "coris_ci")
+
+        assert results["ids"] == expected["ids"]
+        assert results["distances"][0] == pytest.approx(expected["distances"][0], abs=1e-5)
+        assert stats["index"] == index_config
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,111 @@
+"""
+Tests unitaires pour les suggestions de questions (typeahead)
+"""
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent / "src"))
+
+from core.knowledge_base.faq_index import FaqIndex
+from core.knowledge_base.suggestions import SuggestionIndex
+
+class FakeConversationManager:
+    """Historique de messages fréquents en mémoire"""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def get_frequent_user_messages(self, days, min_users, limit):
+        return self.rows
+
+@pytest.fixture
+async def faq_index(tmp_path):
+    index = FaqIndex(directory=str(tmp_path))
+    await index.build("coris_money", "coris_ci", [
+        {"question": "Comment ouvrir un compte ?", "answer": "En agence."},
+        {"question": "Comment consulter mon solde ?", "answer": "Via #144#."},
+        {"question": "Quels sont les frais de transfert ?", "answer": "1%."},
+    ], embed=False)
+    await index.build("coris_money", "common", [
+        {"question": "Comment contacter le service client ?", "answer": "Au 100."},
+    ], embed=False)
+    return index
+
+@pytest.mark.asyncio
+class TestSuggestionIndex:
+
+    async def test_prefix_matches_faq_and_common(self, faq_index):
+        """Préfixe insensible à la casse et aux accents, FAQ commune incluse"""
+        suggestions = SuggestionIndex(faq_index=faq_index)
+
+        texts = [item["text"] for item in suggestions.suggest("coris_money", "coris_ci", "COMMENT c")]
+
+        assert sorted(texts) == ["Comment consulter mon solde ?", "Comment contacter le service client ?"]
+        assert suggestions.suggest("coris_money", "coris_ci", "xyz") == []
+
+    async def test_ranked_by_popularity_with_history(self, faq_index):
+        """Les messages fréquents s'ajoutent à la FAQ et cumulent leur popularité"""
+        suggestions = SuggestionIndex(faq_index=faq_index, faq_weight=1)
+        await suggestions.refresh_history(FakeConversationManager([
+            {"application_id": "coris_money", "filiale_id": "coris_ci",
+             "content": "comment ouvrir un compte", "occurrences": 40},
+            {"application_id": "coris_money", "filiale_id": "coris_ci",
+             "content": "Comment payer ma facture d'électricité", "occurrences": 12},
+        ]))
+
+        results = suggestions.suggest("coris_money", "coris_ci", "comment", limit=3)
+
+        assert [item["text"] for item in results] == [
+            "Comment ouvrir un compte ?",  # libellé FAQ, popularité 1 + 40
+            "Comment payer ma facture d'électricité",
+            "Comment consulter mon solde ?",
+        ]
+        assert results[0]["popularity"] == 41
+        assert results[1]["source"] == "history"
+
+    async def test_faq_rebuild_picked_up(self, faq_index):
+        """Une réingestion de la FAQ reconstruit l'index de la filiale"""
+        suggestions = SuggestionIndex(faq_index=faq_index)
+        suggestions.sync_seconds = 0
+        assert suggestions.suggest("coris_money", "coris_ci", "horaires") == []
+
+        await faq_index.build("coris_money", "coris_ci", [
+            {"question": "Horaires des agences ?", "answer": "8h-17h."}
+        ], embed=False)
+
+        assert [item["text"] for item in suggestions.suggest("coris_money", "coris_ci", "horaires")] == [
+            "Horaires des agences ?"
+        ]
+
+    async def test_common_questions_respect_overlay_exclusions(self, faq_index):
+        """Les fichiers communs remplacés ou masqués par la filiale ne sont pas suggérés"""
+        await faq_index.build("coris_money", "common", [
+            {"question": "Comment contacter le service client ?", "answer": "Au 100.", "source_file": "contact.md"},
+            {"question": "Comment changer mon code PIN ?", "answer": "Menu sécurité.", "source_file": "securite.md"},
+        ], embed=False)
+        exclusions = {"contact.md"}
+        suggestions = SuggestionIndex(faq_index=faq_index,
+                                      exclusions_provider=lambda application, filiale_id: exclusions)
+        suggestions.sync_seconds = 0
+
+        texts = [item["text"] for item in suggestions.suggest("coris_money", "coris_ci", "comment c", limit=5)]
+        assert sorted(texts) == ["Comment changer mon code PIN ?", "Comment consulter mon solde ?"]
+
+        exclusions.clear()
+        texts = [item["text"] for item in suggestions.suggest("coris_money", "coris_ci", "comment contacter")]
+        assert texts == ["Comment contacter le service client ?"]
+
+    async def test_stale_history_removed(self, faq_index):
+        suggestions = SuggestionIndex()
+        row = {"application_id": "coris_money", "filiale_id": "coris_bf",
+               "content": "Comment retirer de l'argent", "occurrences": 5}
+        await suggestions.refresh_history(FakeConversationManager([row]))
+        assert suggestions.suggest("coris_money", "coris_bf", "comment retirer")
+
+        await suggestions.refresh_history(FakeConversationManager([]))
+
+        assert suggestions.suggest("coris_money", "coris_bf", "comment retirer") == []
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,216 @@
+"""
+Tests unitaires pour le backend vectoriel NumPy
+"""
+import pytest
+import numpy as np
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent / "src"))
+
+from core.knowledge_base.vector_store import NumpyVectorStore, create_vector_store
+from core.knowledge_base.quantization import quantize, dequantize
+
+def keyword_embedding(texts):
+    """Embedding déterministe : présence de quelques mots-clés"""
+    vocabulary = ["solde", "transfert", "frais", "agence", "compte"]
+    return [[float(word in text.lower()) + 0.01 for word in vocabulary] for text in texts]
+
+class TestNumpyVectorStore:
+
+    @pytest.fixture
+    def store(self, tmp_path):
+        """Fixture pour un store NumPy dans un dossier temporaire"""
+        return NumpyVectorStore(persist_dir=str(tmp_path), embedding_function=keyword_embedding)
+
+    @pytest.fixture
+    def populated_store(self, store):
+        store.get_or_create_collection("coris_money_coris_ci", metadata={"filiale_id": "coris_ci"})
+        store.add(
+            "coris_money_coris_ci",
+            ids=["doc1", "doc2", "doc3"],
+            documents=["Consulter son solde", "Frais de transfert", "Horaires des agences"],
+            metadatas=[{"category": "faq"}, {"category": "tarifs"}, {"category": "faq", "city": "Abidjan"}]
+        )
+        return store
+
+    def test_query_returns_nearest_documents(self, populated_store):
+        """La recherche retourne les documents les plus proches en premier"""
+        results = populated_store.query("coris_money_coris_ci", query_texts=["mon solde"], n_results=2)
+
+        assert results["ids"][0][0] == "doc1"
+        assert len(results["ids"][0]) == 2
+        assert results["distances"][0][0] <= results["distances"][0][1]
+        assert results["metadatas"][0][0] == {"category": "faq"}
+
+    def test_query_multiple_embeddings(self, populated_store):
+        """Plusieurs requêtes sont traitées en une seule recherche"""
+        results = populated_store.query(
+            "coris_money_coris_ci",
+            query_embeddings=keyword_embedding(["solde", "frais transfert"]),
+            n_results=1
+        )
+
+        assert results["ids"] == [["doc1"], ["doc2"]]
+
+    def test_n_results_larger_than_collection(self, populated_store):
+        """n_results est borné par la taille de la collection"""
+        results = populated_store.query("coris_money_coris_ci", query_texts=["agence"], n_results=10)
+
+        assert len(results["ids"][0]) == 3
+        assert results["ids"][0][0] == "doc3"
+
+    def test_existing_ids_are_ignored(self, populated_store):
+        """Comme ChromaDB, un id déjà présent n'est pas ajouté deux fois"""
+        populated_store.add("coris_money_coris_ci", ids=["doc1"], documents=["autre"], metadatas=[{}])
+
+        assert populated_store.count("coris_money_coris_ci") == 3
+
+    def test_reload_from_disk(self, populated_store, tmp_path):
+        """Un autre processus relit la collection memory-mappée"""
+        reader = NumpyVectorStore(persist_dir=str(tmp_path), embedding_function=keyword_embedding)
+
+        assert reader.count("coris_money_coris_ci") == 3
+        assert isinstance(reader._load("coris_money_coris_ci").vectors, np.memmap)
+
+        populated_store.add("coris_money_coris_ci", ids=["doc4"], documents=["Ouvrir un compte"],
+                            metadatas=[{"category": "produits"}])
+
+        assert reader.count("coris_money_coris_ci") == 4
+        results = reader.query("coris_money_coris_ci", query_texts=["compte"], n_results=1)
+        assert results["ids"][0] == ["doc4"]
+
+    def test_previous_generation_kept_for_readers(self, populated_store, tmp_path):
+        """Un lecteur qui a lu l'ancien manifeste peut encore ouvrir ses fichiers"""
+        name = "coris_money_coris_ci"
+        path = tmp_path / name
+        stale_manifest = dict(populated_store._load(name).manifest)
+
+        populated_store.add(name, ids=["doc4"], documents=["Ouvrir un compte"], metadatas=[{}])
+
+        assert (path / stale_manifest["vectors_file"]).exists()
+        assert (path / stale_manifest["columns_file"]).exists()
+
+        populated_store.add(name, ids=["doc5"], documents=["Frais d'agence"], metadatas=[{}])
+
+        assert not (path / stale_manifest["vectors_file"]).exists()
+        assert sorted(file.name for file in path.glob("vectors.*.npy")) == ["vectors.2.npy", "vectors.3.npy"]
+
+    def test_where_filter_applied_before_top_k(self, populated_store):
+        """Le filtre de métadonnées restreint les candidats avant le top-k"""
+        results = populated_store.query("coris_money_coris_ci", query_texts=["frais de transfert"],
+                                        n_results=1, where={"category": "faq"})
+
+        assert results["ids"][0][0] in ("doc1", "doc3")
+        assert all(m["category"] == "faq" for m in results["metadatas"][0])
+
+    def test_where_operators(self, populated_store):
+        """Les opérateurs $in, $ne et $and sont supportés"""
+        results = populated_store.query(
+            "coris_money_coris_ci", query_texts=["agence"], n_results=5,
+            where={"$and": [{"category": {"$in": ["faq", "produits"]}}, {"city": {"$ne": "Abidjan"}}]}
+        )
+
+        assert results["ids"] == [["doc1"]]
+
+    def test_where_without_match(self, populated_store):
+        """Un filtre sans correspondance retourne des listes vides"""
+        results = populated_store.query("coris_money_coris_ci", query_texts=["solde"],
+                                        where={"category": "inconnue"})
+
+        assert results["ids"] == [[]]
+
+    def test_unknown_where_operator_rejected(self, populated_store):
+        """Un opérateur inconnu est refusé"""
+        with pytest.raises(ValueError):
+            populated_store.query("coris_money_coris_ci", query_texts=["solde"],
+                                  where={"category": {"$like": "f%"}})
+
+    def test_collection_metadata(self, populated_store):
+        """Les métadonnées de collection sont persistées dans le manifeste"""
+        metadata = populated_store.get_collection_metadata("coris_money_coris_ci")
+        populated_store.update_collection_metadata("coris_money_coris_ci", {**metadata, "kb_version": "v2"})
+
+        assert populated_store.get_collection_metadata("coris_money_coris_ci") == {
+            "filiale_id": "coris_ci", "kb_version": "v2"
+        }
+
+    def test_deferred_writes_single_generation(self, store):
+        """Les lots différés sont écrits en une seule génération"""
+        name = "coris_money_coris_ci"
+        with store.deferred_writes(name):
+            for batch in range(5):
+                store.add(name, ids=[f"doc{batch}", "doc0"], documents=[f"Frais de transfert {batch}"] * 2,
+                          metadatas=[{"batch": batch}] * 2)
+                store.update_collection_metadata(name, {"kb_version": batch})
+            assert store._load(name).manifest["generation"] == 0
+
+        collection = store._load(name)
+        assert collection.manifest["generation"] == 1
+        assert collection.ids == [f"doc{batch}" for batch in range(5)]
+        assert store.get_collection_metadata(name) == {"kb_version": 4}
+
+    def test_deferred_writes_flushed_before_read(self, store):
+        name = "coris_money_coris_ci"
+        with store.deferred_writes(name):
+            store.add(name, ids=["doc1"], documents=["Consulter son solde"], metadatas=[{}])
+            assert store.count(name) == 1
+            store.add(name, ids=["doc2"], documents=["Horaires des agences"], metadatas=[{}])
+
+        assert store.count(name) == 2
+        assert store._load(name).manifest["generation"] == 2
+
+    def test_empty_collection_query(self, store):
+        """Une collection vide retourne des listes vides par requête"""
+        store.get_or_create_collection("empty")
+        results = store.query("empty", query_texts=["solde"], n_results=3)
+
+        assert results["ids"] == [[]]
+
+    def test_factory_rejects_unknown_backend(self):
+        """Un backend inconnu est refusé"""
+        with pytest.raises(ValueError):
+            create_vector_store(backend="faiss")
+
+class TestQuantizedStorage:
+
+    @pytest.fixture
+    def corpus(self):
+        rng = np.random.default_rng(0)
+        vectors = rng.normal(size=(500, 64)).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    @pytest.mark.parametrize("dtype,max_error", [("float16", 1e-3), ("int8", 2e-2)])
+    def test_quantize_roundtrip(self, corpus, dtype, max_error):
+        """La reconstruction reste proche des vecteurs d'origine"""
+        quantized, scales = quantize(corpus, dtype)
+
+        assert quantized.dtype == np.dtype(dtype)
+        assert np.abs(dequantize(quantized, scales) - corpus).max() < max_error
+
+    @pytest.mark.parametrize("dtype,ratio", [("float16", 2), ("int8", 4)])
+    def test_quantized_store_matches_exact_search(self, tmp_path, corpus, dtype, ratio):
+        """Avec re-scoring, le top-k quantifié est celui de la recherche exacte"""
+        exact_store = NumpyVectorStore(persist_dir=str(tmp_path / "exact"))
+        quantized_store = NumpyVectorStore(persist_dir=str(tmp_path / dtype), vector_dtype=dtype)
+        ids = [f"doc{i}" for i in range(len(corpus))]
+        for store in (exact_store, quantized_store):
+            store.add("kb", ids=ids, documents=ids, metadatas=[{} for _ in ids], embeddings=corpus)
+
+        queries = corpus[:20] + 0.1
+        exact = exact_store.query("kb", query_embeddings=queries, n_results=5)
+        approx = quantized_store.query("kb", query_embeddings=queries, n_results=5)
+
+        assert approx["ids"] == exact["ids"]
+        assert np.allclose(approx["distances"], exact["distances"], atol=1e-5)
+
+        footprint = quantized_store.get_memory_footprint("kb")
+        assert footprint["float32_bytes"] / footprint["search_bytes"] > ratio * 0.9
+
+    def test_unknown_dtype_rejected(self, tmp_path):
+        """Un type de stockage inconnu est refusé"""
+        with pytest.raises(ValueError):
+            NumpyVectorStore(persist_dir=str(tmp_path), vector_dtype="int4")
+
+if __name__ == "__main__":
+    pytest.main([__file__])